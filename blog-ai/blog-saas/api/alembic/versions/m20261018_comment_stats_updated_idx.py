@@ -0,0 +1,38 @@
+"""index comment_stats.updated_at for incremental reputation runs
+
+app.services.reputation_job finds agents whose comments received votes
+since the previous run via comment_stats.updated_at.
+
+Revision ID: m20261018_comment_stats_updated_idx
+Revises: m20261018_jobs
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_comment_stats_updated_idx"
+down_revision = "m20261018_jobs"
+branch_labels = None
+depends_on = None
+
+
+def _index_exists(conn, table: str, name: str) -> bool:
+    try:
+        return any(ix["name"] == name for ix in inspect(conn).get_indexes(table))
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if not _index_exists(conn, "comment_stats", "ix_comment_stats_updated_at"):
+        op.create_index("ix_comment_stats_updated_at", "comment_stats", ["updated_at"])
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if _index_exists(conn, "comment_stats", "ix_comment_stats_updated_at"):
+        op.drop_index("ix_comment_stats_updated_at", table_name="comment_stats")
@@ -0,0 +1,70 @@
+"""conversations: per-participant unread counters and last-read pointers
+
+user1_unread / user2_unread count the other side's unread messages and
+user1_last_read_id / user2_last_read_id hold the newest message each has
+read, so the inbox and the unread badge stop counting messages per
+request (app.services.inbox). Backfilled from messages.read; the inbox
+pages over (user_id, last_message_at, id) on either side.
+
+Revision ID: m20261018_conversation_unread
+Revises: m20261018_metrics_snapshots
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_conversation_unread"
+down_revision = "m20261018_metrics_snapshots"
+branch_labels = None
+depends_on = None
+
+
+def _columns(conn, table: str) -> set[str]:
+    try:
+        return {c["name"] for c in inspect(conn).get_columns(table)}
+    except Exception:
+        return set()
+
+
+def upgrade() -> None:
+    cols = _columns(op.get_bind(), "conversations")
+    if not cols:
+        return
+    for side in ("user1", "user2"):
+        if f"{side}_unread" not in cols:
+            op.add_column("conversations", sa.Column(f"{side}_unread", sa.Integer(), nullable=False, server_default="0"))
+        if f"{side}_last_read_id" not in cols:
+            op.add_column("conversations", sa.Column(f"{side}_last_read_id", sa.Integer(), nullable=True))
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_conversations_{side}_activity "
+            f"ON conversations ({side}_id, last_message_at, id)"
+        )
+
+    # user1's unread messages are the ones user2 sent, and vice versa
+    for side, other in (("user1", "user2"), ("user2", "user1")):
+        op.execute(
+            f"""
+            UPDATE conversations SET
+                {side}_unread = (
+                    SELECT COUNT(*) FROM messages m
+                    WHERE m.conversation_id = conversations.id
+                      AND m.sender_id = conversations.{other}_id AND m.read = false
+                ),
+                {side}_last_read_id = (
+                    SELECT MAX(m.id) FROM messages m
+                    WHERE m.conversation_id = conversations.id
+                      AND m.sender_id = conversations.{other}_id AND m.read = true
+                )
+            """
+        )
+
+
+def downgrade() -> None:
+    for side in ("user1", "user2"):
+        op.execute(f"DROP INDEX IF EXISTS ix_conversations_{side}_activity")
+        op.drop_column("conversations", f"{side}_last_read_id")
+        op.drop_column("conversations", f"{side}_unread")
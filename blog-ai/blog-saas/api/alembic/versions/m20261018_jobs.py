@@ -0,0 +1,60 @@
+"""jobs table for the durable background job queue
+
+Rows are claimed by app.jobs.worker with SELECT ... FOR UPDATE SKIP LOCKED.
+dedupe_key is unique so periodic and event jobs can be enqueued with
+INSERT ... ON CONFLICT DO NOTHING.
+
+Revision ID: m20261018_jobs
+Revises: m20261018_post_rank
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_jobs"
+down_revision = "m20261018_post_rank"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(conn, table: str) -> bool:
+    insp = inspect(conn)
+    try:
+        return table in insp.get_table_names()
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "jobs"):
+        return
+
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_type", sa.String(60), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False, server_default="{}"),
+        sa.Column("status", sa.String(20), nullable=False, server_default="queued"),
+        sa.Column("priority", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer(), nullable=False, server_default="5"),
+        sa.Column("run_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("dedupe_key", sa.String(200), nullable=True, unique=True),
+        sa.Column("locked_by", sa.String(120), nullable=True),
+        sa.Column("locked_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_jobs_claim", "jobs", ["status", "job_type", "run_at"])
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "jobs"):
+        op.drop_table("jobs")
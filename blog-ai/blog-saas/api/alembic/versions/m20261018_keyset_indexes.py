@@ -0,0 +1,50 @@
+"""indexes for (created_at, id) keyset pagination
+
+Messages and notifications are now paged by (created_at, id) per
+conversation / user. posts and comments already have
+(org_id, status, created_at) / (org_id, post_id, created_at).
+
+notifications has no ORM model, so its index only exists via this
+migration.
+
+Revision ID: m20261018_keyset_indexes
+Revises: m20261018_live_room_state
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_keyset_indexes"
+down_revision = "m20261018_live_room_state"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(conn, table: str) -> bool:
+    insp = inspect(conn)
+    try:
+        return table in insp.get_table_names()
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "messages"):
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_messages_conv_created "
+            "ON messages (conversation_id, created_at, id)"
+        )
+    if _table_exists(conn, "notifications"):
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_notifications_user_created "
+            "ON notifications (user_id, created_at, id)"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_notifications_user_created")
+    op.execute("DROP INDEX IF EXISTS ix_messages_conv_created")
@@ -0,0 +1,64 @@
+"""live room shared state: join requests, blocks, leases
+
+Moves the per-process dicts of app/api/v1/live.py into tables every worker
+sees (app.models.live_room). Nothing to backfill — the old state was
+in-memory only.
+
+Revision ID: m20261018_live_room_state
+Revises: m20261018_video_candidates
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_live_room_state"
+down_revision = "m20261018_video_candidates"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(conn, table: str) -> bool:
+    insp = inspect(conn)
+    try:
+        return table in insp.get_table_names()
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if not _table_exists(conn, "live_join_requests"):
+        op.create_table(
+            "live_join_requests",
+            sa.Column("room_name", sa.String(length=100), primary_key=True),
+            sa.Column("username", sa.String(length=60), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("display_name", sa.String(length=120), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+    if not _table_exists(conn, "live_room_blocks"):
+        op.create_table(
+            "live_room_blocks",
+            sa.Column("room_name", sa.String(length=100), primary_key=True),
+            sa.Column("username", sa.String(length=60), primary_key=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+    if not _table_exists(conn, "live_room_leases"):
+        op.create_table(
+            "live_room_leases",
+            sa.Column("room_name", sa.String(length=100), primary_key=True),
+            sa.Column("lease", sa.String(length=40), primary_key=True),
+            sa.Column("owner", sa.String(length=120), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    for table in ("live_room_leases", "live_room_blocks", "live_join_requests"):
+        if _table_exists(conn, table):
+            op.drop_table(table)
@@ -0,0 +1,47 @@
+"""llm_cache: persistent tier of the LLM response cache
+
+Revision ID: m20261018_llm_cache
+Revises: m20261018_rate_limit_counters
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_llm_cache"
+down_revision = "m20261018_rate_limit_counters"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(conn, table: str) -> bool:
+    insp = inspect(conn)
+    try:
+        return table in insp.get_table_names()
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "llm_cache"):
+        return
+    op.create_table(
+        "llm_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("site", sa.String(40), nullable=False),
+        sa.Column("provider", sa.String(40), nullable=False),
+        sa.Column("model", sa.String(120), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_llm_cache_expires", "llm_cache", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_llm_cache_expires", table_name="llm_cache")
+    op.drop_table("llm_cache")
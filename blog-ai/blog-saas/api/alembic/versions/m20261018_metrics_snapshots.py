@@ -0,0 +1,34 @@
+"""metrics_snapshots for cross-process /metrics
+
+One row per live process (gunicorn worker or job worker) holding its
+cumulative counters as JSON; /metrics sums the recent rows and the
+"retired" row expired processes are folded into. See app.core.metrics. UNLOGGED on Postgres like rate_limit_counters: it is
+rewritten every few seconds and worthless after a crash. No ORM model.
+
+Revision ID: m20261018_metrics_snapshots
+Revises: m20261018_post_policy_score
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_metrics_snapshots"
+down_revision = "m20261018_post_policy_score"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    unlogged = "UNLOGGED " if op.get_bind().dialect.name == "postgresql" else ""
+    op.execute(
+        f"CREATE {unlogged}TABLE IF NOT EXISTS metrics_snapshots ("
+        "node VARCHAR(200) PRIMARY KEY, "
+        "updated_at DOUBLE PRECISION NOT NULL, "
+        "payload TEXT NOT NULL)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS metrics_snapshots")
@@ -0,0 +1,128 @@
+"""post_stats + comment_stats materialized engagement counters
+
+Creates the two counter tables read by the feed endpoints and backfills
+them from the source tables (comments, votes, post_votes, saved_posts,
+video_views). After this lands the writers keep them up to date
+incrementally and app.services.engagement_counters.reconcile_counters()
+repairs drift on a schedule.
+
+Idempotent: table creation is guarded by inspect(); the backfill only
+inserts rows that don't exist yet.
+
+Revision ID: m20261018_post_comment_stats
+Revises: m20260504_baseline_drift
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_post_comment_stats"
+down_revision = "m20260504_baseline_drift"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(conn, table: str) -> bool:
+    insp = inspect(conn)
+    try:
+        return table in insp.get_table_names()
+    except Exception:
+        return False
+
+
+def _counter(name: str) -> sa.Column:
+    return sa.Column(name, sa.Integer(), nullable=False, server_default="0")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    if not _table_exists(conn, "post_stats"):
+        op.create_table(
+            "post_stats",
+            sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("org_id", sa.Integer(), nullable=False),
+            _counter("comment_count"),
+            _counter("human_comment_count"),
+            _counter("upvotes"),
+            _counter("downvotes"),
+            _counter("comment_upvotes"),
+            _counter("saves"),
+            _counter("views"),
+            _counter("completed_views"),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_post_stats_org_id", "post_stats", ["org_id"])
+        op.create_index("ix_post_stats_org_comments", "post_stats", ["org_id", "comment_count"])
+        op.create_index("ix_post_stats_org_upvotes", "post_stats", ["org_id", "upvotes"])
+
+    if not _table_exists(conn, "comment_stats"):
+        op.create_table(
+            "comment_stats",
+            sa.Column("comment_id", sa.Integer(), sa.ForeignKey("comments.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("post_id", sa.Integer(), nullable=False),
+            _counter("upvotes"),
+            _counter("downvotes"),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_comment_stats_post_id", "comment_stats", ["post_id"])
+
+    # ── Backfill ────────────────────────────────────────────────────────────
+    saves_sql = "0"
+    if _table_exists(conn, "saved_posts"):
+        saves_sql = "(SELECT COUNT(*) FROM saved_posts s WHERE s.post_id = p.id)"
+    views_sql = completed_sql = "0"
+    if _table_exists(conn, "video_views"):
+        views_sql = "(SELECT COUNT(*) FROM video_views v WHERE v.post_id = p.id)"
+        completed_sql = (
+            "(SELECT COALESCE(SUM(CASE WHEN v.completed THEN 1 ELSE 0 END), 0) "
+            "FROM video_views v WHERE v.post_id = p.id)"
+        )
+
+    op.execute(f"""
+        INSERT INTO post_stats (post_id, org_id, comment_count, human_comment_count,
+                                comment_upvotes, saves, views, completed_views)
+        SELECT p.id, p.org_id,
+          (SELECT COUNT(*) FROM comments c
+            WHERE c.post_id = p.id AND c.status = 'published'),
+          (SELECT COUNT(*) FROM comments c
+            WHERE c.post_id = p.id AND c.status = 'published' AND c.author_type = 'user'),
+          (SELECT COUNT(*) FROM votes vt JOIN comments c ON c.id = vt.comment_id
+            WHERE c.post_id = p.id AND vt.value = 1),
+          {saves_sql},
+          {views_sql},
+          {completed_sql}
+        FROM posts p
+        WHERE NOT EXISTS (SELECT 1 FROM post_stats ps WHERE ps.post_id = p.id)
+    """)
+
+    if _table_exists(conn, "post_votes"):
+        op.execute("""
+            UPDATE post_stats SET
+              upvotes = (SELECT COUNT(*) FROM post_votes pv
+                          WHERE pv.post_id = post_stats.post_id AND pv.value = 1),
+              downvotes = (SELECT COUNT(*) FROM post_votes pv
+                            WHERE pv.post_id = post_stats.post_id AND pv.value = -1)
+        """)
+
+    op.execute("""
+        INSERT INTO comment_stats (comment_id, post_id, upvotes, downvotes)
+        SELECT vt.comment_id, c.post_id,
+               SUM(CASE WHEN vt.value = 1 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN vt.value = -1 THEN 1 ELSE 0 END)
+        FROM votes vt JOIN comments c ON c.id = vt.comment_id
+        WHERE NOT EXISTS (SELECT 1 FROM comment_stats cs WHERE cs.comment_id = vt.comment_id)
+        GROUP BY vt.comment_id, c.post_id
+    """)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "comment_stats"):
+        op.drop_table("comment_stats")
+    if _table_exists(conn, "post_stats"):
+        op.drop_table("post_stats")
@@ -0,0 +1,50 @@
+"""post_contexts: rolling debate summary and cached digest per post
+
+Prompt builders send the digest and the summary instead of the raw post
+body and the last comments (app.services.debate_context). Rows are
+created lazily on the first prompt for a post; no backfill.
+
+Revision ID: m20261018_post_contexts
+Revises: m20261018_conversation_unread
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_post_contexts"
+down_revision = "m20261018_conversation_unread"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(conn, table: str) -> bool:
+    insp = inspect(conn)
+    try:
+        return table in insp.get_table_names()
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "post_contexts"):
+        return
+    op.create_table(
+        "post_contexts",
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("org_id", sa.Integer(), nullable=False),
+        sa.Column("body_hash", sa.String(64), nullable=False, server_default=""),
+        sa.Column("digest", sa.Text(), nullable=False, server_default=""),
+        sa.Column("summary", sa.Text(), nullable=False, server_default=""),
+        sa.Column("summarized_through_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("summarized_comments", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("post_contexts")
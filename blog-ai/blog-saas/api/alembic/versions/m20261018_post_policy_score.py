@@ -0,0 +1,52 @@
+"""posts.policy_score / policy_reason for the moderation queue
+
+The moderation sweep and PostModerationAdapter read and write these, but
+posts never had them. NULL policy_score = not scored yet.
+
+Databases built with create_all already have both columns (the Post model
+declares them), so upgrade() only adds what is missing. downgrade() can't
+tell the two cases apart and therefore only drops the index: the columns
+stay, with whatever scores they hold. Drop them by hand if a database
+really has to go back to the pre-moderation schema.
+
+Revision ID: m20261018_post_policy_score
+Revises: m20261018_llm_cache
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_post_policy_score"
+down_revision = "m20261018_llm_cache"
+branch_labels = None
+depends_on = None
+
+
+def _columns(conn, table: str) -> set[str]:
+    try:
+        return {c["name"] for c in inspect(conn).get_columns(table)}
+    except Exception:
+        return set()
+
+
+def upgrade() -> None:
+    cols = _columns(op.get_bind(), "posts")
+    if not cols:
+        return
+    if "policy_score" not in cols:
+        op.add_column("posts", sa.Column("policy_score", sa.Integer(), nullable=True))
+    if "policy_reason" not in cols:
+        op.add_column("posts", sa.Column("policy_reason", sa.String(500), nullable=True))
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_posts_needs_review "
+        "ON posts (id) WHERE status = 'needs_review' AND policy_score IS NULL"
+    )
+
+
+def downgrade() -> None:
+    # not the columns: they may predate this revision (see the docstring)
+    op.execute("DROP INDEX IF EXISTS ix_posts_needs_review")
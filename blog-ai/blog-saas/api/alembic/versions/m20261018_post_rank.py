@@ -0,0 +1,57 @@
+"""post_rank precomputed feed ranking table
+
+Holds hot / feed / top / commented sort keys per published post, each with
+an (org_id, key, post_id) index for keyset pagination. Rows are written by
+app.services.ranking.refresh_post_ranks(); the table starts empty and is
+filled by the first scheduled refresh.
+
+Revision ID: m20261018_post_rank
+Revises: m20261018_post_comment_stats
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_post_rank"
+down_revision = "m20261018_post_comment_stats"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(conn, table: str) -> bool:
+    insp = inspect(conn)
+    try:
+        return table in insp.get_table_names()
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "post_rank"):
+        return
+
+    op.create_table(
+        "post_rank",
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("org_id", sa.Integer(), nullable=False),
+        sa.Column("hot_score", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("feed_score", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("top_score", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("comment_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_post_rank_org_hot", "post_rank", ["org_id", "hot_score", "post_id"])
+    op.create_index("ix_post_rank_org_feed", "post_rank", ["org_id", "feed_score", "post_id"])
+    op.create_index("ix_post_rank_org_top", "post_rank", ["org_id", "top_score", "post_id"])
+    op.create_index("ix_post_rank_org_commented", "post_rank", ["org_id", "comment_count", "post_id"])
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "post_rank"):
+        op.drop_table("post_rank")
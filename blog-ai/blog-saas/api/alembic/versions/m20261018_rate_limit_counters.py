@@ -0,0 +1,40 @@
+"""rate_limit_counters for the shared slowapi storage
+
+One row per (limit key, fixed window) — see app.core.rate_limit_storage.
+UNLOGGED on Postgres: the counters are only worth a few minutes, losing
+them on a crash just resets the limits, and skipping the WAL keeps the
+batched upserts cheap. No ORM model; only written with raw SQL.
+
+Revision ID: m20261018_rate_limit_counters
+Revises: m20261018_keyset_indexes
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_rate_limit_counters"
+down_revision = "m20261018_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    unlogged = "UNLOGGED " if op.get_bind().dialect.name == "postgresql" else ""
+    op.execute(
+        f"CREATE {unlogged}TABLE IF NOT EXISTS rate_limit_counters ("
+        "bucket VARCHAR(512) NOT NULL, "
+        "win BIGINT NOT NULL, "
+        "hits INTEGER NOT NULL DEFAULT 0, "
+        "expires_at BIGINT NOT NULL, "
+        "PRIMARY KEY (bucket, win))"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_rate_limit_counters_expires "
+        "ON rate_limit_counters (expires_at)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS rate_limit_counters")
@@ -0,0 +1,87 @@
+"""full-text search: tsvector + GIN on posts / agent_profiles
+
+Postgres gets a plain search_vector column, a trigger that fills it and a
+GIN index. A STORED generated column would rewrite posts under an ACCESS
+EXCLUSIVE lock for the whole build; this way the ALTER only takes the lock
+for a catalog change, the existing rows are backfilled SEARCH_BACKFILL_BATCH
+at a time (one commit each) and the index is built CONCURRENTLY. Rows not
+backfilled yet just don't match searches until they are. SQLite dev
+databases get the FTS5 tables + sync triggers instead, rebuilt from the
+existing rows. The DDL lives in app.models.search_index so create_all and
+this migration agree.
+
+Revision ID: m20261018_search_index
+Revises: m20261018_comment_stats_updated_idx
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import os
+
+from alembic import op
+from sqlalchemy import text
+
+from app.models.search_index import (
+    POSTGRES_DDL,
+    POSTGRES_INDEXES,
+    SQLITE_DDL,
+    agents_tsvector,
+    posts_tsvector,
+    postgres_index_ddl,
+)
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_search_index"
+down_revision = "m20261018_comment_stats_updated_idx"
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = int(os.getenv("SEARCH_BACKFILL_BATCH", "5000"))
+
+
+def _backfill(table: str, vector: str) -> None:
+    bind = op.get_bind()
+    while True:
+        n = bind.execute(text(
+            f"UPDATE {table} SET search_vector = {vector} WHERE id IN ("
+            f"SELECT id FROM {table} WHERE search_vector IS NULL ORDER BY id LIMIT :n)"
+        ), {"n": BACKFILL_BATCH}).rowcount
+        if not n:
+            break
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for stmts in POSTGRES_DDL.values():
+            for stmt in stmts:
+                op.execute(stmt)
+        # outside the migration transaction: each backfill batch commits on
+        # its own and CREATE INDEX CONCURRENTLY can't run inside one
+        with op.get_context().autocommit_block():
+            _backfill("posts", posts_tsvector())
+            _backfill("agent_profiles", agents_tsvector())
+            for table in POSTGRES_DDL:
+                op.execute(postgres_index_ddl(table, concurrently=True))
+    elif dialect == "sqlite":
+        for stmts in SQLITE_DDL.values():
+            for stmt in stmts:
+                op.execute(stmt)
+        op.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+        op.execute("INSERT INTO agents_fts(agents_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for table in POSTGRES_DDL:
+            fn = f"{table}_search_vector_fill"
+            op.execute(f"DROP TRIGGER IF EXISTS {fn} ON {table}")
+            op.execute(f"DROP FUNCTION IF EXISTS {fn}()")
+            op.execute(f"DROP INDEX IF EXISTS {POSTGRES_INDEXES[table]}")
+            op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        for fts, table in (("posts_fts", "posts"), ("agents_fts", "agent_profiles")):
+            for suffix in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {fts}")
@@ -0,0 +1,58 @@
+"""video_candidates precomputed video-feed signals
+
+One row per recent published video post with the viewer-independent feed
+signals (trending, save / watch scores, tags, detected language). Rows are
+written by app.services.video_feed.refresh_video_candidates(); the table
+starts empty and is filled by the first scheduled refresh (or the first
+feed request of an org).
+
+Revision ID: m20261018_video_candidates
+Revises: m20261018_search_index
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import inspect
+
+# revision identifiers, used by Alembic.
+revision = "m20261018_video_candidates"
+down_revision = "m20261018_search_index"
+branch_labels = None
+depends_on = None
+
+
+def _table_exists(conn, table: str) -> bool:
+    insp = inspect(conn)
+    try:
+        return table in insp.get_table_names()
+    except Exception:
+        return False
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "video_candidates"):
+        return
+
+    op.create_table(
+        "video_candidates",
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("org_id", sa.Integer(), nullable=False),
+        sa.Column("author_user_id", sa.Integer(), nullable=True),
+        sa.Column("language", sa.String(length=8), nullable=False, server_default="en"),
+        sa.Column("tags", sa.Text(), nullable=False, server_default=""),
+        sa.Column("trending", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("save_score", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("watch_score", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("post_created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_video_candidates_org_created", "video_candidates", ["org_id", "post_created_at"])
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if _table_exists(conn, "video_candidates"):
+        op.drop_table("video_candidates")
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from app.core.deps import get_db, get_current_user, require_org_role
+from app.core.rate_limit import LLM_ROUTE_LIMIT, limiter, user_or_ip
 from app.models.user import User
 from app.api.v1.schemas.agents import AgentOut
 from app.services.agent_factory import create_random_agents
@@ -10,8 +11,10 @@ from app.services.agent_factory import create_random_agents
 router = APIRouter(tags=["agent-factory"])
 
 @router.post("/orgs/{org_id}/agents/spawn", response_model=list[AgentOut])
+@limiter.limit(LLM_ROUTE_LIMIT, key_func=user_or_ip)
 def spawn_agents(
     org_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
     n: int = Query(default=3, ge=1, le=20),
@@ -1,18 +1,21 @@
-﻿from fastapi import APIRouter, Depends, HTTPException, Query
+﻿from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
 from app.core.db import get_db
 from app.core.deps import get_current_user
 from app.core.logging import get_logger
+from app.core.rate_limit import LLM_ROUTE_LIMIT, limiter, user_or_ip
 from app.services.agent_post_generator import generate_post_for_agent
 
 log = get_logger(__name__)
 router = APIRouter(prefix="/orgs/{org_id}/agents", tags=["agent-posts"])
 
 @router.post("/{agent_id}/generate-post")
+@limiter.limit(LLM_ROUTE_LIMIT, key_func=user_or_ip)
 def generate_post(
     org_id: int,
     agent_id: int,
+    request: Request,
     publish: bool = Query(True),
     topic_hint: str | None = Query(None),
     source: str = Query("manual", pattern="^(manual|autopost|api|scheduler)$"),
@@ -335,8 +335,8 @@ def create_human_post(
     db.commit()
     db.refresh(post)
     try:
-        from app.services.tag_extractor import save_tags_for_post
-        save_tags_for_post(db, post.id, post.title, post.body_md)
+        from app.services.job_queue import dispatch
+        dispatch(db, "extract_tags", {"post_id": post.id}, dedupe_key=f"tags:{post.id}")
     except Exception:
         pass
 
@@ -1,19 +1,22 @@
 """
 Endpoints para generación automática de posts
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_db, get_current_user
 from app.core.plan_enforcement import check_post_limit, check_agent_limit
+from app.core.rate_limit import LLM_ROUTE_LIMIT, limiter, user_or_ip
 from app.services.post_generator_simple import PostGeneratorSimple as PostGenerator
 from app.models.agent_profile import AgentProfile
 
 router = APIRouter()
 
 @router.post("/orgs/{org_id}/generate-post")
+@limiter.limit(LLM_ROUTE_LIMIT, key_func=user_or_ip)
 def generate_post_from_trends(
     org_id: int,
+    request: Request,
     agent_id: int = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
@@ -53,8 +56,10 @@ def generate_post_from_trends(
     }
 
 @router.post("/orgs/{org_id}/generate-multiple")
+@limiter.limit(LLM_ROUTE_LIMIT, key_func=user_or_ip)
 def generate_multiple_posts(
     org_id: int,
+    request: Request,
     count: int = 3,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
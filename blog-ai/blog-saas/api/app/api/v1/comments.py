@@ -1,18 +1,31 @@
 from __future__ import annotations
+import asyncio
 import hashlib
+import json
 from typing import Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.core.db import get_db
 from app.core.deps import get_current_user
 from app.core.logging import get_logger
+from app.core.pagination import cached_count, created_keyset, cut_page
+from app.core.rate_limit import COMMENT_LIMIT, limiter, user_or_ip
 
 log = get_logger(__name__)
 from app.models.comment import Comment
 from app.models.post import Post
 from app.models.user import User
+from app.services.comment_stream import get_stream_hub
+from app.services.comment_tree import ThreadNode, load_thread, thread_comments
+from app.services.engagement_counters import (
+    load_comment_stats,
+    load_post_stats,
+    record_comment_created,
+    record_comment_vote,
+)
 
 router = APIRouter(tags=["comments"])
 
@@ -40,16 +53,44 @@ def _comment_dict(c: Comment, user: User | None = None, agent=None) -> dict:
     }
 
 
+def _enricher(db: Session, rows: list[Comment]):
+    """Batch-load authors, agents and vote counts for `rows`; returns the
+    per-comment serializer."""
+    # Cargar usuarios para comentarios humanos
+    user_ids = {c.author_user_id for c in rows if c.author_user_id}
+    users = {u.id: u for u in db.query(User).filter(User.id.in_(user_ids)).all()} if user_ids else {}
+
+    # Cargar agentes para comentarios de agentes
+    from app.models.agent_profile import AgentProfile
+    agent_ids = {c.author_agent_id for c in rows if c.author_agent_id}
+    agents = {a.id: a for a in db.query(AgentProfile).filter(AgentProfile.id.in_(agent_ids)).all()} if agent_ids else {}
+
+    # Vote counts from the materialized comment_stats rows
+    vote_stats = load_comment_stats(db, [c.id for c in rows])
+
+    def enrich(c):
+        d = _comment_dict(c, users.get(c.author_user_id), agents.get(c.author_agent_id))
+        stats = vote_stats.get(c.id, {})
+        d["upvotes"] = stats.get("upvotes", 0)
+        d["downvotes"] = stats.get("downvotes", 0)
+        return d
+
+    return enrich
+
+
 @router.get("/orgs/{org_id}/posts/{post_id}/comments")
 def list_comments(
     org_id: int,
     post_id: int,
     status: str | None = None,
     source: str | None = None,
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(default=50, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+    cursor: str | None = None,
     db: Session = Depends(get_db),
 ) -> dict[str, Any]:
+    """Oldest first, keyset-paged on (created_at, id): pass back
+    `next_cursor`. `offset` is honoured only without a cursor."""
     post = db.query(Post).filter(Post.org_id == org_id, Post.id == post_id).first()
     if not post or post.status == "draft":
         raise HTTPException(status_code=404, detail="Post not found")
@@ -60,62 +101,125 @@ def list_comments(
     if source:
         q = q.filter(Comment.source == source)
 
-    total = q.count()
-    rows = (
-        q.order_by(Comment.id.asc())
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
+    if status in (None, "published") and not source:
+        # materialized counter (published comments); close enough as a
+        # pager total for the unfiltered view too
+        total = load_post_stats(db, [post_id]).get(post_id, {}).get("comment_count", 0)
+    else:
+        total = cached_count(("comments", post_id, status, source), q.count)
 
-    # Cargar usuarios para comentarios humanos
-    user_ids = {c.author_user_id for c in rows if c.author_user_id}
-    users = {u.id: u for u in db.query(User).filter(User.id.in_(user_ids)).all()} if user_ids else {}
+    clause, order = created_keyset(db, Comment.created_at, Comment.id, cursor, descending=False)
+    q = q.order_by(*order)
+    if clause is not None:
+        q = q.filter(clause)
+    elif offset:
+        q = q.offset(offset)
+    rows, next_cursor = cut_page(q.limit(limit + 1).all(), limit, lambda c: (c.created_at, c.id))
 
-    # Cargar agentes para comentarios de agentes
-    from app.models.agent_profile import AgentProfile
-    agent_ids = {c.author_agent_id for c in rows if c.author_agent_id}
-    agents = {a.id: a for a in db.query(AgentProfile).filter(AgentProfile.id.in_(agent_ids)).all()} if agent_ids else {}
+    enrich = _enricher(db, rows)
+    return {
+        "post_id": post_id,
+        "debate_status": getattr(post, "debate_status", "none"),
+        "total": total,
+        "comments": [enrich(c) for c in rows],
+        "next_cursor": next_cursor,
+    }
 
-    # Cargar agentes para comentarios de agentes
-    from app.models.agent_profile import AgentProfile
-    agent_ids = {c.author_agent_id for c in rows if c.author_agent_id}
-    agents = {a.id: a for a in db.query(AgentProfile).filter(AgentProfile.id.in_(agent_ids)).all()} if agent_ids else {}
 
-    # Cargar vote counts para todos los comentarios
-    from app.models.vote import Vote
-    from sqlalchemy import func
-    comment_ids = [c.id for c in rows]
-    up_counts = dict(
-        db.query(Vote.comment_id, func.count(Vote.id))
-        .filter(Vote.comment_id.in_(comment_ids), Vote.value == 1)
-        .group_by(Vote.comment_id).all()
-    ) if comment_ids else {}
-    down_counts = dict(
-        db.query(Vote.comment_id, func.count(Vote.id))
-        .filter(Vote.comment_id.in_(comment_ids), Vote.value == -1)
-        .group_by(Vote.comment_id).all()
-    ) if comment_ids else {}
+@router.get("/orgs/{org_id}/posts/{post_id}/comments/thread")
+def comment_thread(
+    org_id: int,
+    post_id: int,
+    parent_id: int | None = None,
+    roots: int = Query(default=20, ge=1, le=100),
+    replies: int = Query(default=3, ge=0, le=50),
+    depth: int = Query(default=4, ge=0, le=20),
+    cursor: str | None = None,
+    status: str | None = None,
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    """The post's comments as a tree: `roots` top-level comments (or the
+    replies of `parent_id`), each with its first `replies` children down to
+    `depth` levels. Nodes with more children carry `replies_cursor` — call
+    again with parent_id=<node id>&cursor=<it> to expand them."""
+    post = db.query(Post).filter(Post.org_id == org_id, Post.id == post_id).first()
+    if not post or post.status == "draft":
+        raise HTTPException(status_code=404, detail="Post not found")
+    if parent_id is not None:
+        parent = db.query(Comment.id).filter(Comment.id == parent_id, Comment.post_id == post_id).first()
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent comment not found")
 
-    def enrich(c):
-        d = _comment_dict(c, users.get(c.author_user_id), agents.get(c.author_agent_id))
-        d["upvotes"] = up_counts.get(c.id, 0)
-        d["downvotes"] = down_counts.get(c.id, 0)
+    nodes, next_cursor = load_thread(
+        db, org_id, post_id, parent_id=parent_id, roots=roots, replies=replies,
+        depth=depth, cursor=cursor, status=status,
+    )
+    enrich = _enricher(db, thread_comments(nodes))
+
+    def serialize(node: ThreadNode) -> dict:
+        d = enrich(node.comment)
+        d["replies"] = [serialize(r) for r in node.replies]
+        d["more_replies"] = node.more_replies
+        d["replies_cursor"] = node.replies_cursor
         return d
 
     return {
         "post_id": post_id,
+        "parent_id": parent_id,
         "debate_status": getattr(post, "debate_status", "none"),
-        "total": total,
-        "comments": [enrich(c) for c in rows],
+        "comments": [serialize(n) for n in nodes],
+        "next_cursor": next_cursor,
     }
 
 
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+async def _sse_events(request: Request, post_id: int, keepalive: float = SSE_KEEPALIVE_SECONDS):
+    """Format hub events as text/event-stream until the client goes away;
+    a comment line every `keepalive` seconds keeps proxies from closing
+    the connection."""
+    async with get_stream_hub().subscribe(post_id) as events:
+        yield ": connected\n\n"
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.get("/orgs/{org_id}/posts/{post_id}/comments/stream")
+async def stream_comments(
+    org_id: int,
+    post_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """Server-sent events for agent replies being written on this post
+    (comment_start / comment_delta / comment_done / comment_abort, see
+    app.services.comment_stream). Only live events: load the existing
+    comments with the list or thread endpoint first."""
+    post = db.query(Post).filter(Post.org_id == org_id, Post.id == post_id).first()
+    if not post or post.status == "draft":
+        raise HTTPException(status_code=404, detail="Post not found")
+    db.close()  # the stream can stay open for hours; don't hold a connection
+
+    return StreamingResponse(
+        _sse_events(request, post_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/orgs/{org_id}/posts/{post_id}/comments")
+@limiter.limit(COMMENT_LIMIT, key_func=user_or_ip)
 def create_comment(
     org_id: int,
     post_id: int,
     payload: CommentIn,
+    request: Request,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ) -> dict:
@@ -153,6 +257,7 @@ def create_comment(
         comment_hash=comment_hash,
     )
     db.add(comment)
+    record_comment_created(db, comment)
     db.commit()
     db.refresh(comment)
 
@@ -211,7 +316,6 @@ def vote_comment(
     user: User = Depends(get_current_user),
 ) -> dict:
     from app.models.vote import Vote
-    from sqlalchemy import func
 
     if payload.value not in (1, -1):
         raise HTTPException(status_code=400, detail="value must be 1 or -1")
@@ -223,24 +327,29 @@ def vote_comment(
     existing = db.query(Vote).filter(Vote.user_id == user.id, Vote.comment_id == comment_id).one_or_none()
 
     if existing:
+        old_value = existing.value
         if existing.value == payload.value:
             # Toggle off — eliminar voto
             db.delete(existing)
+            record_comment_vote(db, comment, old=old_value, new=0)
             db.commit()
             action = "removed"
         else:
             existing.value = payload.value
+            record_comment_vote(db, comment, old=old_value, new=payload.value)
             db.commit()
             action = "changed"
     else:
         vote = Vote(org_id=org_id, user_id=user.id, comment_id=comment_id, value=payload.value)
         db.add(vote)
+        record_comment_vote(db, comment, old=0, new=payload.value)
         db.commit()
         action = "added"
 
     # Contar totales
-    ups = db.query(func.count(Vote.id)).filter(Vote.comment_id == comment_id, Vote.value == 1).scalar()
-    downs = db.query(func.count(Vote.id)).filter(Vote.comment_id == comment_id, Vote.value == -1).scalar()
+    stats = load_comment_stats(db, [comment_id]).get(comment_id, {})
+    ups = stats.get("upvotes", 0)
+    downs = stats.get("downvotes", 0)
 
     # Notificar al autor del comentario si recibe upvote
     try:
@@ -272,9 +381,5 @@ def get_votes(
     comment_id: int,
     db: Session = Depends(get_db),
 ) -> dict:
-    from app.models.vote import Vote
-    from sqlalchemy import func
-
-    ups = db.query(func.count(Vote.id)).filter(Vote.comment_id == comment_id, Vote.value == 1).scalar()
-    downs = db.query(func.count(Vote.id)).filter(Vote.comment_id == comment_id, Vote.value == -1).scalar()
-    return {"upvotes": ups, "downvotes": downs}
+    stats = load_comment_stats(db, [comment_id]).get(comment_id, {})
+    return {"upvotes": stats.get("upvotes", 0), "downvotes": stats.get("downvotes", 0)}
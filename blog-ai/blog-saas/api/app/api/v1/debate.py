@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
 from app.core.db import get_db
+from app.core.rate_limit import LLM_ROUTE_LIMIT, limiter, user_or_ip
 from app.models.post import Post
 from app.models.agent_profile import AgentProfile
 from app.models.agent_action import AgentAction
@@ -15,9 +16,11 @@ router = APIRouter(tags=["debate"])
 
 
 @router.post("/orgs/{org_id}/posts/{post_id}/spawn-debate")
+@limiter.limit(LLM_ROUTE_LIMIT, key_func=user_or_ip)
 def spawn_debate(
     org_id: int,
     post_id: int,
+    request: Request,
     agent_ids: str = Query(..., description="Comma-separated agent_profile IDs, e.g. 1,3,7"),
     rounds: int = Query(2, ge=1, le=10),
     publish: bool = Query(True),
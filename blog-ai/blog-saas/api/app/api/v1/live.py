@@ -14,12 +14,16 @@ AI_LIVE_INITIAL_DELAY_SEC = int(os.getenv("AI_LIVE_INITIAL_DELAY_SEC", "60"))
 AI_LIVE_INTERVAL_SEC = int(os.getenv("AI_LIVE_INTERVAL_SEC", "180"))
 AI_LIVE_MAX_COMMENTS_PER_STREAM = int(os.getenv("AI_LIVE_MAX_COMMENTS_PER_STREAM", "20"))
 
-from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from app.core import identity, metrics
 from app.core.db import get_db, SessionLocal
 from app.core.deps import get_current_user
 from app.models.user import User
+from app.services import live_rooms
+from app.services.live_broker import NODE_ID, get_hub
+from app.services.live_chat import ChatRateLimiter, chat_row, get_chat_writer
 from typing import Optional
 
 router = APIRouter()
@@ -97,12 +101,9 @@ def _create_livekit_token(room_name: str, identity: str, display_name: str = Non
         return f"{sig_input}.{sig_b64}"
 
 
-# ── WebSocket connections per room ────────────────────────────────────
-_room_connections: dict[str, list[WebSocket]] = {}
-# ── Pending join requests per room ────────────────────────────────────
-_join_requests: dict[str, list[dict]] = {}
-# ── Blocked usernames per room (in-memory, lost on restart) ───────────
-_blocked_per_room: dict[str, set[str]] = {}
+# WebSockets, join requests and blocks are shared across workers: sockets
+# fan out through the live broker hub, the rest lives in live_* tables
+# (see app/services/live_broker.py and app/services/live_rooms.py).
 
 
 @router.post("/live/start")
@@ -366,20 +367,8 @@ async def end_live(
         "UPDATE live_streams SET status='ended', ended_at=NOW() WHERE room_name=:room"
     ), {"room": room_name})
     db.commit()
-    if room_name in _room_connections:
-        ended_msg = json.dumps({"type": "stream_ended", "message": "Stream has ended"})
-        async def _broadcast_ended():
-            for ws in list(_room_connections.get(room_name, [])):
-                try:
-                    await ws.send_text(ended_msg)
-                except Exception:
-                    pass
-            if room_name in _room_connections:
-                del _room_connections[room_name]
-        try:
-            asyncio.ensure_future(_broadcast_ended())
-        except Exception:
-            del _room_connections[room_name]
+    live_rooms.clear_room(db, room_name)
+    await get_hub().broadcast(room_name, {"type": "stream_ended", "message": "Stream has ended"})
     return {"ok": True}
 
 
@@ -415,13 +404,8 @@ async def block_from_live(
     username = payload.get("username")
     if not username:
         raise HTTPException(status_code=400, detail="username required")
-    _blocked_per_room.setdefault(room_name, set()).add(username)
-    block_msg = json.dumps({"type": "blocked", "username": username})
-    for ws in list(_room_connections.get(room_name, [])):
-        try:
-            await ws.send_text(block_msg)
-        except Exception:
-            pass
+    live_rooms.block_user(db, room_name, username)
+    await get_hub().broadcast(room_name, {"type": "blocked", "username": username})
     return {"ok": True, "blocked": username}
 
 
@@ -439,23 +423,14 @@ async def request_join(
     if not stream:
         raise HTTPException(status_code=404, detail="Stream not found")
 
-    request_msg = json.dumps({
+    live_rooms.add_join_request(db, room_name, user.username, user.display_name or user.username, user.id)
+    await get_hub().broadcast(room_name, {
         "type": "join_request",
         "username": user.username,
         "display_name": user.display_name or user.username,
         "user_id": user.id,
         "room_name": room_name,
     })
-    if room_name not in _join_requests:
-        _join_requests[room_name] = []
-    existing = [r for r in _join_requests[room_name] if r["username"] != user.username]
-    _join_requests[room_name] = existing + [{"username": user.username, "display_name": user.display_name or user.username, "user_id": user.id}]
-
-    for ws in list(_room_connections.get(room_name, [])):
-        try:
-            await ws.send_text(request_msg)
-        except Exception:
-            pass
     return {"ok": True, "message": "Request sent to host"}
 
 
@@ -472,14 +447,8 @@ async def accept_join(
     accept = payload.get("accept", True)
 
     if not accept:
-        reject_msg = json.dumps({"type": "join_rejected", "username": username})
-        if room_name in _join_requests:
-            _join_requests[room_name] = [r for r in _join_requests[room_name] if r["username"] != username]
-        for ws in list(_room_connections.get(room_name, [])):
-            try:
-                await ws.send_text(reject_msg)
-            except Exception:
-                pass
+        live_rooms.remove_join_request(db, room_name, username)
+        await get_hub().broadcast(room_name, {"type": "join_rejected", "username": username})
         return {"ok": True, "accepted": False}
 
     invitee = db.query(User).filter(User.username == username).first()
@@ -493,20 +462,14 @@ async def accept_join(
         can_publish=True,
     )
 
-    accept_msg = json.dumps({
+    live_rooms.remove_join_request(db, room_name, username)
+    await get_hub().broadcast(room_name, {
         "type": "join_accepted",
         "username": username,
         "token": token,
         "livekit_url": LIVEKIT_URL,
         "room_name": room_name,
     })
-    if room_name in _join_requests:
-        _join_requests[room_name] = [r for r in _join_requests[room_name] if r["username"] != username]
-    for ws in list(_room_connections.get(room_name, [])):
-        try:
-            await ws.send_text(accept_msg)
-        except Exception:
-            pass
     return {"ok": True, "accepted": True, "token": token, "livekit_url": LIVEKIT_URL}
 
 
@@ -520,12 +483,7 @@ async def kick_from_live(
     """Host kicks a co-host from the live."""
     _require_host(db, room_name, user.id)
     username = payload.get("username")
-    kick_msg = json.dumps({"type": "kicked", "username": username})
-    for ws in list(_room_connections.get(room_name, [])):
-        try:
-            await ws.send_text(kick_msg)
-        except Exception:
-            pass
+    await get_hub().broadcast(room_name, {"type": "kicked", "username": username})
     return {"ok": True, "kicked": username}
 
 
@@ -536,16 +494,11 @@ async def leave_live(
     user: User = Depends(get_current_user),
 ):
     """Co-host leaves the live (back to viewer)."""
-    leave_msg = json.dumps({
+    await get_hub().broadcast(room_name, {
         "type": "cohost_left",
         "username": user.username,
         "display_name": user.display_name or user.username,
     })
-    for ws in list(_room_connections.get(room_name, [])):
-        try:
-            await ws.send_text(leave_msg)
-        except Exception:
-            pass
     db.execute(text("UPDATE live_streams SET viewer_count = GREATEST(viewer_count - 1, 0) WHERE room_name=:room"), {"room": room_name})
     db.commit()
     return {"ok": True}
@@ -559,7 +512,7 @@ def get_join_requests(
 ):
     """Host polls for pending join requests."""
     _require_host(db, room_name, user.id)
-    requests = _join_requests.get(room_name, [])
+    requests = live_rooms.list_join_requests(db, room_name)
     return {"requests": requests}
 
 
@@ -712,7 +665,7 @@ async def send_gift(
     db.commit()
 
     sender_name = user.display_name or user.username or f"user_{user.id}"
-    gift_msg = json.dumps({
+    await get_hub().broadcast(room_name, {
         "type": "gift",
         "sender": sender_name,
         "sender_username": user.username,
@@ -721,11 +674,6 @@ async def send_gift(
         "coin_amount": gift.coin_cost,
         "animation": gift.animation_type,
     })
-    for ws in list(_room_connections.get(room_name, [])):
-        try:
-            await ws.send_text(gift_msg)
-        except Exception:
-            pass
 
     return {
         "ok": True,
@@ -797,59 +745,89 @@ def get_chat_history(room_name: str, limit: int = 50, db: Session = Depends(get_
 
 
 # ── WebSocket chat ────────────────────────────────────────────────────
+_chat_limiter = ChatRateLimiter()
+
+
+def _chat_sender_key(token: Optional[str], websocket: WebSocket):
+    """Rate-limit key for a chat socket: the account behind `token`, else
+    the socket itself. Never a field of the message, which the client
+    could change on every send."""
+    if token:
+        try:
+            return ("user", identity.token_user_id(token))
+        except HTTPException:
+            pass
+    return ("ws", id(websocket))
+
+
 @router.websocket("/live/{room_name}/ws")
-async def live_chat_ws(websocket: WebSocket, room_name: str):
+async def live_chat_ws(websocket: WebSocket, room_name: str, token: Optional[str] = Query(default=None)):
+    """Nothing in here blocks the loop: rows go to the write-behind chat
+    buffer and fan-out is queued per socket by the hub."""
     await websocket.accept()
-    if room_name not in _room_connections:
-        _room_connections[room_name] = []
-    _room_connections[room_name].append(websocket)
-
-    if len(_room_connections[room_name]) == 1:
+    sender_key = _chat_sender_key(token, websocket)
+    hub = get_hub()
+    writer = get_chat_writer()
+    if await hub.connect(room_name, websocket):
         asyncio.create_task(_ai_agent_loop(room_name))
 
     try:
         while True:
             data = await websocket.receive_text()
-            msg = json.loads(data)
+            try:
+                msg = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(msg, dict):
+                continue
             sender_username = msg.get("username")
             # Drop messages from blocked users (host called /block on them).
-            if sender_username and sender_username in _blocked_per_room.get(room_name, set()):
+            if hub.is_blocked(room_name, sender_username):
                 continue
-            db = SessionLocal()
-            try:
-                db.execute(text(
-                    "INSERT INTO live_chat (room_name, user_id, username, display_name, message) "
-                    "VALUES (:room, :uid, :uname, :dname, :msg)"
-                ), {"room": room_name, "uid": msg.get("user_id"), "uname": sender_username,
-                    "dname": msg.get("display_name"), "msg": msg.get("message", "")})
-                db.commit()
-            finally:
-                db.close()
+            if not _chat_limiter.allow((room_name, sender_key)):
+                hub.send_local(room_name, websocket, {"type": "rate_limited", "message": "Slow down"})
+                continue
+            writer.add(chat_row(
+                room_name, msg.get("message", ""),
+                user_id=msg.get("user_id"), username=sender_username, display_name=msg.get("display_name"),
+            ))
 
-            broadcast = json.dumps({
+            await hub.broadcast(room_name, {
                 "type": "chat",
                 "username": sender_username,
                 "display_name": msg.get("display_name"),
                 "message": msg.get("message"),
                 "is_agent": False,
             })
-            dead = []
-            for ws in _room_connections.get(room_name, []):
-                try:
-                    await ws.send_text(broadcast)
-                except Exception:
-                    dead.append(ws)
-            for ws in dead:
-                _room_connections[room_name].remove(ws)
 
     except WebSocketDisconnect:
-        if websocket in _room_connections.get(room_name, []):
-            _room_connections[room_name].remove(websocket)
+        pass
+    finally:
+        hub.disconnect(room_name, websocket)
+
+
+AI_LIVE_LEASE = "ai_agents"
+
+
+def _hold_ai_lease(db: Session, room_name: str) -> bool:
+    """Only one process per room runs the commenter; every worker with a
+    local viewer starts the loop, the lease picks which one comments."""
+    try:
+        return live_rooms.claim_lease(db, room_name, AI_LIVE_LEASE, NODE_ID, AI_LIVE_INTERVAL_SEC * 2 + 60)
+    except Exception:
+        db.rollback()
+        return False
 
 
 async def _ai_agent_loop(room_name: str):
-    """AI agents comment periodically on the live stream (throttled)."""
+    """AI agents comment periodically on the live stream (throttled).
+
+    Runs in every process with a local viewer. Those without the lease keep
+    asking for it each interval, so the loop moves to another process when
+    the holder's viewers leave (it releases) or the holder dies (the lease
+    expires)."""
     await asyncio.sleep(AI_LIVE_INITIAL_DELAY_SEC)
+    hub = get_hub()
     db = SessionLocal()
     try:
         stream = db.execute(
@@ -862,19 +840,19 @@ async def _ai_agent_loop(room_name: str):
 
         from app.services.llm_client import LLMClient
         from app.models.agent_profile import AgentProfile
+        from app.services.agent_roster import get_roster
         llm = LLMClient()
-        agents = db.query(AgentProfile).filter(
-            AgentProfile.org_id == 1,
-            AgentProfile.is_enabled == True,
-        ).order_by(AgentProfile.reputation_score.desc()).limit(20).all()
+        roster = get_roster(db, 1)
+        agents = sorted(roster.enabled, key=lambda a: -a.reputation_score)[:20]
 
     finally:
         db.close()
 
     cycle = 0
-    while _room_connections.get(room_name):
+    held = False
+    while hub.has_connections(room_name):
         await asyncio.sleep(AI_LIVE_INTERVAL_SEC)
-        if not _room_connections.get(room_name):
+        if not hub.has_connections(room_name):
             break
         if cycle >= AI_LIVE_MAX_COMMENTS_PER_STREAM:
             break
@@ -887,41 +865,45 @@ async def _ai_agent_loop(room_name: str):
             ).first()
             if not still_live or still_live[0] != "live":
                 break
+            held = _hold_ai_lease(db, room_name)
+            if not held:
+                continue
 
             if not agents:
                 continue
             agent = random.choice(agents)
+            bio = db.query(AgentProfile.bio).filter(AgentProfile.id == agent.id).scalar()
             try:
-                comment = llm.chat(
-                    system=f"You are {agent.display_name}, {agent.bio or 'an AI debater'}. Keep responses under 20 words.",
-                    user=f"React briefly to this live stream: '{title}'"
-                )
+                # achat runs on the shared LLM engine loop, so this doesn't
+                # stall every other websocket on the server while we wait
+                with metrics.stage("live_ai.comment"):
+                    comment = await llm.achat(
+                        system=f"You are {agent.display_name}, {bio or 'an AI debater'}. Keep responses under 20 words.",
+                        user=f"React briefly to this live stream: '{title}'"
+                    )
                 comment = comment.strip()[:200]
             except Exception:
                 continue
 
-            db.execute(text(
-                "INSERT INTO live_chat (room_name, message, is_agent, agent_name) "
-                "VALUES (:room, :msg, TRUE, :aname)"
-            ), {"room": room_name, "msg": comment, "aname": agent.display_name})
-            db.commit()
+            get_chat_writer().add(chat_row(room_name, comment, is_agent=True, agent_name=agent.display_name))
 
-            broadcast = json.dumps({
+            await hub.broadcast(room_name, {
                 "type": "chat",
                 "username": agent.handle,
                 "display_name": agent.display_name,
                 "message": comment,
                 "is_agent": True,
             })
-            dead = []
-            for ws in _room_connections.get(room_name, []):
-                try:
-                    await ws.send_text(broadcast)
-                except Exception:
-                    dead.append(ws)
-            for ws in dead:
-                _room_connections[room_name].remove(ws)
 
         finally:
             db.close()
         cycle += 1
+
+    if held:
+        db = SessionLocal()
+        try:
+            live_rooms.release_lease(db, room_name, AI_LIVE_LEASE, NODE_ID)
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
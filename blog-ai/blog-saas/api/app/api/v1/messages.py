@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, WebSocket, WebSocketDisconnect, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
 from app.core.db import get_db
 from app.core.deps import get_current_user
+from app.core.pagination import created_keyset, cut_page
 from app.models.user import User
 from app.models.message import Conversation, Message
+from app.services import inbox
 from pydantic import BaseModel
 from typing import Dict, List
 import json
-from datetime import datetime
 
 router = APIRouter(tags=["messages"])
 
@@ -51,61 +52,55 @@ def _get_or_create_conversation(db: Session, user1_id: int, user2_id: int) -> Co
     return conv
 
 
-def _conv_dict(conv: Conversation, me_id: int, db: Session) -> dict:
-    other_id = conv.user2_id if conv.user1_id == me_id else conv.user1_id
-    other = db.query(User).filter(User.id == other_id).first()
-    unread = db.query(Message).filter(
-        Message.conversation_id == conv.id,
-        Message.sender_id != me_id,
-        Message.read == False,
-    ).count()
-    return {
-        "id": conv.id,
-        "other_user": {
-            "id": other.id,
-            "username": other.username,
-            "display_name": other.display_name or other.username,
-            "avatar_url": other.avatar_url or "",
-        } if other else None,
-        "last_message_preview": conv.last_message_preview or "",
-        "last_message_at": str(conv.last_message_at) if conv.last_message_at else "",
-        "unread": unread,
-    }
-
-
 # ── REST endpoints ──────────────────────────────────────────────
 
 @router.get("/messages/conversations")
-def list_conversations(db: Session = Depends(get_db), me: User = Depends(get_current_user)):
-    convs = db.query(Conversation).filter(
-        or_(Conversation.user1_id == me.id, Conversation.user2_id == me.id)
-    ).order_by(Conversation.last_message_at.desc()).all()
-    return [_conv_dict(c, me.id, db) for c in convs]
+def list_conversations(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    me: User = Depends(get_current_user),
+):
+    """Most recently active first. Older pages: pass the X-Next-Cursor
+    response header back as `cursor`."""
+    convs, next_cursor = inbox.inbox_page(db, me.id, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return convs
 
 
 @router.get("/messages/conversations/{conv_id}/messages")
-def get_messages(conv_id: int, limit: int = 50, db: Session = Depends(get_db), me: User = Depends(get_current_user)):
+def get_messages(
+    conv_id: int,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+    me: User = Depends(get_current_user),
+):
+    """The latest `limit` messages, oldest first. Older pages: pass the
+    X-Next-Cursor response header back as `cursor`."""
     conv = db.query(Conversation).filter(Conversation.id == conv_id).first()
     if not conv or (conv.user1_id != me.id and conv.user2_id != me.id):
         raise HTTPException(status_code=404, detail="Conversation not found")
-    msgs = db.query(Message).filter(Message.conversation_id == conv_id)\
-        .order_by(Message.created_at.asc()).limit(limit).all()
+    q = db.query(Message).filter(Message.conversation_id == conv_id)
+    clause, order = created_keyset(db, Message.created_at, Message.id, cursor)
+    if clause is not None:
+        q = q.filter(clause)
+    msgs, next_cursor = cut_page(q.order_by(*order).limit(limit + 1).all(), limit, lambda m: (m.created_at, m.id))
+    msgs.reverse()
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     # Marcar como leídos
-    for m in msgs:
-        if m.sender_id != me.id and not m.read:
-            m.read = True
+    inbox.mark_read(db, conv, me.id, msgs)
     db.commit()
     return [{"id": m.id, "sender_id": m.sender_id, "body": m.body, "read": m.read, "created_at": str(m.created_at)} for m in msgs]
 
 
 @router.get("/messages/unread-count")
 def unread_count(db: Session = Depends(get_db), me: User = Depends(get_current_user)):
-    count = db.query(Message).join(Conversation).filter(
-        or_(Conversation.user1_id == me.id, Conversation.user2_id == me.id),
-        Message.sender_id != me.id,
-        Message.read == False,
-    ).count()
-    return {"unread": count}
+    return {"unread": inbox.unread_total(db, me.id)}
 
 
 @router.post("/messages/start/{username}")
@@ -116,7 +111,8 @@ def start_conversation(username: str, db: Session = Depends(get_db), me: User =
     if other.id == me.id:
         raise HTTPException(status_code=400, detail="Cannot message yourself")
     conv = _get_or_create_conversation(db, me.id, other.id)
-    return _conv_dict(conv, me.id, db)
+    unread = conv.user1_unread if conv.user1_id == me.id else conv.user2_unread
+    return inbox.conversation_dict(conv, other, unread or 0)
 
 
 # ── WebSocket ────────────────────────────────────────────────────
@@ -150,15 +146,7 @@ async def websocket_chat(conv_id: int, ws: WebSocket, token: str = Query(...), d
             if not body:
                 continue
 
-            msg = Message(
-                conversation_id=conv_id,
-                sender_id=me.id,
-                body=body[:2000],
-                read=False,
-            )
-            db.add(msg)
-            conv.last_message_preview = body[:100]
-            conv.last_message_at = datetime.utcnow()
+            msg = inbox.record_message(db, conv, me.id, body)
             db.commit()
             db.refresh(msg)
 
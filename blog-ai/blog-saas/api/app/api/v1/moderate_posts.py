@@ -5,6 +5,7 @@ from typing import List
 from app.database import get_db
 from app.models.post import Post
 from app.services.post_moderation_adapter import PostModerationAdapter
+from app.services.job_queue import enqueue, queue_enabled
 
 router = APIRouter(prefix="/moderate-posts", tags=["moderation"])
 
@@ -16,6 +17,14 @@ def run_moderation(limit: int = 20, db: Session = Depends(get_db)):
         Post.status == "needs_review",
         Post.policy_score.is_(None)
     ).limit(limit).all()
+
+    if queue_enabled():
+        queued = sum(
+            enqueue(db, "moderate_post", {"post_id": p.id}, dedupe_key=f"moderate:{p.id}", commit=False)
+            for p in posts
+        )
+        db.commit()
+        return {"total": len(posts), "moderated": 0, "queued": queued, "results": []}
     
     results = []
     for post in posts:
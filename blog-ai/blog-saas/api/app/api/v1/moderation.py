@@ -9,6 +9,7 @@ from app.models.agent_action import AgentAction
 from app.models.comment import Comment
 from app.models.post import Post
 from app.api.v1.schemas.agents import AgentActionOut
+from app.services.engagement_counters import record_comment_created
 
 router = APIRouter(tags=["moderation"])
 
@@ -75,6 +76,7 @@ def approve_action(
                 status="published",
             )
             db.add(c)
+            record_comment_created(db, c)
 
         elif a.target_type == "comment":
             parent = db.query(Comment).filter(Comment.org_id == org_id, Comment.id == a.target_id).one_or_none()
@@ -92,6 +94,7 @@ def approve_action(
                 status="published",
             )
             db.add(c)
+            record_comment_created(db, c)
     a.status = "published"
     a.published_at = datetime.now(timezone.utc)
 
@@ -8,11 +8,11 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from typing import Optional
 
+from app.core import identity
 from app.core.db import get_db
 from app.core.deps import get_current_user
 from app.core.plan_enforcement import check_agent_limit, get_plan_summary
 from app.models.agent_profile import AgentProfile
-from app.models.org_member import OrgMember
 
 router = APIRouter(prefix="/my-agents", tags=["my-agents"])
 
@@ -36,7 +36,7 @@ class AgentUpdate(BaseModel):
 
 
 def get_user_org_id(db: Session, user_id: int) -> int:
-    member = db.query(OrgMember).filter(OrgMember.user_id == user_id).first()
+    member = identity.get_primary_membership(db, user_id)
     if not member:
         raise HTTPException(403, detail="No organization found")
     return member.org_id
@@ -1,32 +1,53 @@
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy import Boolean, DateTime, Integer, String, column, select, table
 from sqlalchemy.orm import Session
 from app.core.db import get_db
 from app.core.deps import get_current_user
+from app.core.pagination import created_keyset, cut_page
 from app.models.user import User
 
 router = APIRouter(tags=["notifications"])
 
+# notifications has no ORM model; enough of it for the paged query
+_notifications = table(
+    "notifications",
+    column("id", Integer),
+    column("user_id", Integer),
+    column("type", String),
+    column("comment_id", Integer),
+    column("actor_name", String),
+    column("post_id", Integer),
+    column("post_title", String),
+    column("read", Boolean),
+    column("created_at", DateTime(timezone=True)),
+)
+
 
 @router.get("/notifications")
 def list_notifications(
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: str | None = None,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
-    from sqlalchemy import text
-    rows = db.execute(
-        text(
-            "SELECT id, type, comment_id, actor_name, post_id, post_title, read, created_at "
-            "FROM notifications WHERE user_id=:uid ORDER BY id DESC "
-            "LIMIT :limit OFFSET :offset"
-        ),
-        {"uid": user.id, "limit": limit, "offset": offset},
-    ).fetchall()
+    """Newest first, keyset-paged on (created_at, id); `offset` is only
+    honoured without a cursor."""
+    n = _notifications.c
+    stmt = select(n.id, n.type, n.comment_id, n.actor_name, n.post_id, n.post_title, n.read, n.created_at)
+    stmt = stmt.where(n.user_id == user.id)
+    clause, order = created_keyset(db, n.created_at, n.id, cursor)
+    if clause is not None:
+        stmt = stmt.where(clause)
+    elif offset:
+        stmt = stmt.offset(offset)
+    rows = db.execute(stmt.order_by(*order).limit(limit + 1)).fetchall()
+    rows, next_cursor = cut_page(rows, limit, lambda r: (r.created_at, r.id))
 
     return {
         "unread": sum(1 for r in rows if not r.read),
         "notifications": [dict(r._mapping) for r in rows],
+        "next_cursor": next_cursor,
     }
 
 
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 
@@ -9,11 +9,14 @@ from app.models.user import User
 
 log = get_logger(__name__)
 from app.models.post import Post
-from app.models.comment import Comment
-from app.models.vote import Vote
 from app.models.agent_profile import AgentProfile
+from app.models.post_rank import PostRank
 from app.api.v1.schemas.posts import PostCreateIn, PostPatchIn, PostOut
-from sqlalchemy import func
+from app.services.engagement_counters import load_post_stats, record_post_vote
+from app.services.ranking import SORT_KEYS, load_ranked_posts, ranked_post_ids
+from app.services.search import post_match_clause
+from app.core.pagination import cached_count, created_keyset, cut_page, decode_cursor, encode_cursor
+from sqlalchemy import and_, func, or_
 
 router = APIRouter(tags=["posts"])
 
@@ -27,8 +30,8 @@ def list_posts(
     offset: int = Query(default=0, ge=0),
     sort: str = Query(default="recent"),
     tag: str | None = Query(default=None),
+    cursor: str | None = Query(default=None),
 ):
-    import datetime as _dt
     from sqlalchemy import text as _text
 
     query = db.query(Post).filter(Post.org_id == org_id)
@@ -36,8 +39,10 @@ def list_posts(
         query = query.filter(Post.status == status)
     if q:
         q = q[:100]  # limit search query length
-        like = f"%{q}%"
-        query = query.filter((Post.title.ilike(like)) | (Post.body_md.ilike(like)))
+        match = post_match_clause(db, q)
+        if match is None:
+            return {"posts": [], "total": 0, "next_cursor": None}
+        query = query.filter(match)
     if tag:
         tag_ids = [r[0] for r in db.execute(_text(
             "SELECT post_id FROM post_tags WHERE tag = :tag"
@@ -46,57 +51,63 @@ def list_posts(
             return []
         query = query.filter(Post.id.in_(tag_ids))
 
-    if sort == "commented":
-        comment_sub = (
-            db.query(Comment.post_id, func.count(Comment.id).label("cnt"))
-            .filter(Comment.status == "published")
-            .group_by(Comment.post_id).subquery()
+    next_cursor = None
+    if sort in SORT_KEYS and not q and not tag and status == "published":
+        # Precomputed ranking (post_rank) — one index range scan per page
+        ranked_ids, next_cursor = ranked_post_ids(
+            db, org_id, sort, limit, cursor=cursor, offset=offset, status=status,
         )
-        rows = (
-            query.outerjoin(comment_sub, Post.id == comment_sub.c.post_id)
-            .order_by(desc(func.coalesce(comment_sub.c.cnt, 0)), desc(Post.created_at))
-            .offset(offset).limit(limit).all()
+        rows = load_ranked_posts(db, ranked_ids)
+    elif sort in SORT_KEYS:
+        # Filtered ranked sorts (search / tag / drafts / no status filter)
+        # order the filtered set by the same precomputed key, keyset-paged
+        # on (key, id)
+        key = func.coalesce(SORT_KEYS[sort], 0)
+        ranked = (
+            query.outerjoin(PostRank, PostRank.post_id == Post.id)
+            .add_columns(key)
+            .order_by(desc(key), desc(Post.id))
         )
-    elif sort == "hot":
-        all_rows = query.order_by(desc(Post.created_at)).limit(limit * 3).all()
-        cc = dict(
-            db.query(Comment.post_id, func.count(Comment.id))
-            .filter(Comment.post_id.in_([p.id for p in all_rows]), Comment.status == "published")
-            .group_by(Comment.post_id).all()
-        )
-        now = _dt.datetime.now(_dt.timezone.utc)
-        def _score(p):
-            age = max((now - p.created_at.replace(tzinfo=_dt.timezone.utc)).total_seconds() / 3600, 0.1)
-            return (cc.get(p.id, 0) * 5) / (age + 2) ** 1.5
-        rows = sorted(all_rows, key=_score, reverse=True)[:limit]
+        after = decode_cursor(cursor)
+        if after is not None:
+            try:
+                score, last_id = after["s"], int(after["id"])
+            except (KeyError, TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            ranked = ranked.filter(or_(key < score, and_(key == score, Post.id < last_id)))
+        elif offset:
+            ranked = ranked.offset(offset)
+        pairs = ranked.limit(limit + 1).all()
+        if len(pairs) > limit:
+            pairs = pairs[:limit]
+            next_cursor = encode_cursor({"s": pairs[-1][1], "id": pairs[-1][0].id})
+        rows = [p for p, _ in pairs]
     else:
-        rows = query.order_by(desc(Post.created_at)).offset(offset).limit(limit).all()
+        clause, order = created_keyset(db, Post.created_at, Post.id, cursor)
+        query = query.order_by(*order)
+        if clause is not None:
+            query = query.filter(clause)
+        elif offset:
+            query = query.offset(offset)
+        rows, next_cursor = cut_page(query.limit(limit + 1).all(), limit, lambda p: (p.created_at, p.id))
     post_ids = [p.id for p in rows]
 
     # Agent lookup (single query)
     agent_ids = {p.author_agent_id for p in rows if p.author_agent_id}
     agents = {a.id: a for a in db.query(AgentProfile).filter(AgentProfile.id.in_(agent_ids)).all()} if agent_ids else {}
 
-    # Comment counts
-    comment_counts = dict(
-        db.query(Comment.post_id, func.count(Comment.id))
-        .filter(Comment.post_id.in_(post_ids), Comment.status == "published")
-        .group_by(Comment.post_id).all()
-    ) if post_ids else {}
-
-    # Upvote counts
-    upvote_counts = dict(
-        db.query(Comment.post_id, func.count(Vote.id))
-        .join(Vote, Vote.comment_id == Comment.id)
-        .filter(Comment.post_id.in_(post_ids), Vote.value == 1)
-        .group_by(Comment.post_id).all()
-    ) if post_ids else {}
-
-    # Contar total para paginación
-    total_query = db.query(func.count(Post.id)).filter(Post.org_id == org_id)
-    if status:
-        total_query = total_query.filter(Post.status == status)
-    total = total_query.scalar() or 0
+    # Comment / upvote counts (materialized in post_stats)
+    stats = load_post_stats(db, post_ids)
+    comment_counts = {pid: st["comment_count"] for pid, st in stats.items()}
+    upvote_counts = {pid: st["comment_upvotes"] for pid, st in stats.items()}
+
+    # Total for the pager — cached, not recounted on every page
+    def _count():
+        total_query = db.query(func.count(Post.id)).filter(Post.org_id == org_id)
+        if status:
+            total_query = total_query.filter(Post.status == status)
+        return total_query.scalar()
+    total = cached_count(("posts", org_id, status), _count)
     # Cargar usuarios humanos
     user_ids = [p.author_user_id for p in rows if p.author_user_id]
     user_rows = db.query(User).filter(User.id.in_(user_ids)).all() if user_ids else []
@@ -129,7 +140,7 @@ def list_posts(
         )
         for p in rows
     ]
-    return {"posts": [p.model_dump() for p in post_list], "total": total}
+    return {"posts": [p.model_dump() for p in post_list], "total": total, "next_cursor": next_cursor}
 
 @router.post("/orgs/{org_id}/posts", response_model=PostOut)
 def create_post(
@@ -273,19 +284,23 @@ def vote_post(
         if existing.value == value:
             db.execute(text("DELETE FROM post_votes WHERE user_id=:uid AND post_id=:pid"),
                       {"uid": user.id, "pid": post_id})
+            record_post_vote(db, post_id, org_id, old=existing.value, new=0)
             action = "removed"
         else:
             db.execute(text("UPDATE post_votes SET value=:v WHERE user_id=:uid AND post_id=:pid"),
                       {"v": value, "uid": user.id, "pid": post_id})
+            record_post_vote(db, post_id, org_id, old=existing.value, new=value)
             action = "changed"
     else:
         db.execute(text("INSERT INTO post_votes (user_id, post_id, value) VALUES (:uid, :pid, :v)"),
                   {"uid": user.id, "pid": post_id, "v": value})
+        record_post_vote(db, post_id, org_id, old=0, new=value)
         action = "added"
     db.commit()
 
-    ups = db.execute(text("SELECT COUNT(*) FROM post_votes WHERE post_id=:pid AND value=1"), {"pid": post_id}).scalar()
-    downs = db.execute(text("SELECT COUNT(*) FROM post_votes WHERE post_id=:pid AND value=-1"), {"pid": post_id}).scalar()
+    stats = load_post_stats(db, [post_id]).get(post_id, {})
+    ups = stats.get("upvotes", 0)
+    downs = stats.get("downvotes", 0)
     # Notificar al autor del post si recibe upvote
     try:
         from sqlalchemy import text as sql_text
@@ -311,8 +326,9 @@ def vote_post(
 @router.get("/orgs/{org_id}/posts/{post_id}/votes")
 def get_post_votes(org_id: int, post_id: int, db: Session = Depends(get_db), current_user: User = Depends(__import__("app.core.deps", fromlist=["get_current_user"]).get_current_user)) -> dict:
     from sqlalchemy import text
-    ups = db.execute(text("SELECT COUNT(*) FROM post_votes WHERE post_id=:pid AND value=1"), {"pid": post_id}).scalar()
-    downs = db.execute(text("SELECT COUNT(*) FROM post_votes WHERE post_id=:pid AND value=-1"), {"pid": post_id}).scalar()
+    stats = load_post_stats(db, [post_id]).get(post_id, {})
+    ups = stats.get("upvotes", 0)
+    downs = stats.get("downvotes", 0)
     user_vote = db.execute(text("SELECT value FROM post_votes WHERE post_id=:pid AND user_id=:uid"), {"pid": post_id, "uid": current_user.id}).scalar()
     return {"upvotes": ups, "downvotes": downs, "user_vote": user_vote or 0}
 
@@ -320,60 +336,29 @@ def get_post_votes(org_id: int, post_id: int, db: Session = Depends(get_db), cur
 @router.get("/orgs/{org_id}/feed")
 def get_feed(
     org_id: int,
+    response: Response,
     limit: int = Query(default=20, ge=1, le=50),
+    cursor: str | None = Query(default=None),
     db: Session = Depends(get_db),
 ) -> list:
-    from sqlalchemy import text
-    import math
-    from datetime import datetime, timezone
-
-    rows = db.query(Post).filter(
-        Post.org_id == org_id,
-        Post.status == "published",
-    ).order_by(desc(Post.created_at)).limit(100).all()
-
-    post_ids = [p.id for p in rows]
-    if not post_ids:
+    # Ranked by the precomputed feed_score in post_rank; the next-page cursor
+    # goes in a header so the body stays a plain list for existing clients.
+    ranked_ids, next_cursor = ranked_post_ids(db, org_id, "feed", limit, cursor=cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    scored = load_ranked_posts(db, ranked_ids)
+    if not scored:
         return []
 
-    # Comment counts
-    comment_counts = dict(
-        db.query(Comment.post_id, func.count(Comment.id))
-        .filter(Comment.post_id.in_(post_ids), Comment.status == "published")
-        .group_by(Comment.post_id).all()
-    )
-
-    # Human comment counts (más valiosos)
-    human_counts = dict(
-        db.query(Comment.post_id, func.count(Comment.id))
-        .filter(Comment.post_id.in_(post_ids), Comment.status == "published", Comment.author_type == "user")
-        .group_by(Comment.post_id).all()
-    )
-
-    # Upvote counts post
-    placeholders = ",".join(str(i) for i in post_ids)
-    upvote_counts = dict(
-        db.execute(text(
-            f"SELECT post_id, COUNT(*) as c FROM post_votes WHERE post_id IN ({placeholders}) AND value=1 GROUP BY post_id"
-        )).fetchall()
-    ) if post_ids else {}
+    # Comment / post upvote counts (materialized in post_stats)
+    stats = load_post_stats(db, ranked_ids)
+    comment_counts = {pid: st["comment_count"] for pid, st in stats.items()}
+    upvote_counts = {pid: st["upvotes"] for pid, st in stats.items()}
 
     # Agentes
-    agent_ids = {p.author_agent_id for p in rows if p.author_agent_id}
+    agent_ids = {p.author_agent_id for p in scored if p.author_agent_id}
     agents = {a.id: a for a in db.query(AgentProfile).filter(AgentProfile.id.in_(agent_ids)).all()} if agent_ids else {}
 
-    now = datetime.now(timezone.utc)
-
-    def score(p):
-        age_hours = max((now - p.created_at.replace(tzinfo=timezone.utc)).total_seconds() / 3600, 0.1)
-        ups = upvote_counts.get(p.id, 0)
-        comments = comment_counts.get(p.id, 0)
-        humans = human_counts.get(p.id, 0)
-        raw = (ups * 3) + (humans * 5) + (comments * 1)
-        return raw / math.pow(age_hours + 2, 1.5)
-
-    scored = sorted(rows, key=score, reverse=True)[:limit]
-
     return [
         {
             "id": p.id,
@@ -439,7 +424,7 @@ def get_post_og_image(org_id: int, post_id: int, db: Session = Depends(get_db)):
     p = db.query(Post).filter(Post.org_id == org_id, Post.id == post_id).first()
     raw_title = (p.title or "Scouta Debate") if p else "Scouta — AI Debates"
     excerpt = (getattr(p, "excerpt", None) or "")[:120] if p else ""
-    comments = getattr(p, "comment_count", 0) or 0 if p else 0
+    comments = load_post_stats(db, [p.id]).get(p.id, {}).get("comment_count", 0) if p else 0
     debate_status = getattr(p, "debate_status", "none") if p else "none"
 
     def esc(s): return s.replace("&","&amp;").replace("<","&lt;").replace(">","&gt;").replace('"',"&quot;")
@@ -4,17 +4,24 @@ from app.core.db import get_db
 from app.core.deps import get_current_user
 from app.models.user import User
 from app.models.saved_post import SavedPost
+from app.models.post import Post
+from app.services.engagement_counters import record_save
 
 router = APIRouter()
 
 @router.post("/posts/{post_id}/save")
 def save_post(post_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    post = db.query(Post).filter(Post.id == post_id).first()
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
     existing = db.query(SavedPost).filter_by(user_id=user.id, post_id=post_id).first()
     if existing:
         db.delete(existing)
+        record_save(db, post_id, post.org_id, -1)
         db.commit()
         return {"saved": False}
     db.add(SavedPost(user_id=user.id, post_id=post_id))
+    record_save(db, post_id, post.org_id, 1)
     db.commit()
     return {"saved": True}
 
@@ -1,73 +1,55 @@
 """
 Global search — posts, debates, agents
+
+Full-text (see app.services.search): ranked, prefix-matched, highlighted.
+Posts and debates come from one ranked query; "debates" lists the debate
+hits that didn't make the top `limit` posts.
 """
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, or_
 
 from app.core.db import get_db
-from app.models.post import Post
-from app.models.agent_profile import AgentProfile
+from app.services.search import search_agents, search_posts
 
 router = APIRouter(prefix="/search", tags=["search"])
 
 
+def _iso(value):
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _post_out(h):
+    return {
+        "id": h.id,
+        "title": h.title,
+        "title_highlight": h.title_hl,
+        "excerpt": (h.excerpt or "")[:150],
+        "snippet": h.snippet,
+        "published_at": _iso(h.published_at),
+        "debate_status": h.debate_status,
+    }
+
+
 @router.get("")
 def global_search(
     q: str = Query(..., min_length=2, max_length=100),
-    limit: int = 10,
+    limit: int = Query(default=10, ge=1, le=50),
     db: Session = Depends(get_db),
 ):
-    like = f"%{q}%"
-
-    # Posts
-    posts = db.query(Post).filter(
-        Post.status == "published",
-        or_(Post.title.ilike(like), Post.excerpt.ilike(like)),
-    ).order_by(desc(Post.published_at)).limit(limit).all()
+    # Posts + debates in a single ranked query; over-fetch so the debates
+    # list still has room after the top `limit` posts are taken
+    hits = search_posts(db, q, limit=limit * 3)
+    posts = hits[:limit]
+    debates = [h for h in hits[limit:] if h.is_debate][:limit]
 
-    # Debates
-    debates = db.query(Post).filter(
-        Post.status == "published",
-        Post.debate_status.in_(["open", "closed"]),
-        or_(Post.title.ilike(like), Post.excerpt.ilike(like)),
-    ).order_by(desc(Post.published_at)).limit(limit).all()
-
-    # Agents
-    agents = db.query(AgentProfile).filter(
-        AgentProfile.is_public == True,
-        AgentProfile.is_enabled == True,
-        or_(
-            AgentProfile.display_name.ilike(like),
-            AgentProfile.handle.ilike(like),
-            AgentProfile.topics.ilike(like),
-            AgentProfile.bio.ilike(like),
-        ),
-    ).order_by(desc(AgentProfile.reputation_score)).limit(limit).all()
+    agents = search_agents(db, q, limit=limit)
 
     return {
         "query": q,
-        "posts": [
-            {
-                "id": p.id,
-                "title": p.title,
-                "excerpt": (p.excerpt or "")[:150],
-                "published_at": p.published_at.isoformat() if p.published_at else None,
-                "debate_status": p.debate_status,
-            }
-            for p in posts
-        ],
-        "debates": [
-            {
-                "id": p.id,
-                "title": p.title,
-                "excerpt": (p.excerpt or "")[:150],
-                "published_at": p.published_at.isoformat() if p.published_at else None,
-                "debate_status": p.debate_status,
-            }
-            for p in debates
-            if p.id not in {pp.id for pp in posts}
-        ],
+        "posts": [_post_out(h) for h in posts],
+        "debates": [_post_out(h) for h in debates],
         "agents": [
             {
                 "id": a.id,
@@ -76,6 +58,7 @@ def global_search(
                 "topics": a.topics or "",
                 "reputation_score": a.reputation_score,
                 "avatar_url": a.avatar_url or "",
+                "snippet": a.snippet,
             }
             for a in agents
         ],
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from app.core.rate_limit import limiter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from app.core.rate_limit import LLM_ROUTE_LIMIT, limiter, user_or_ip
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_db, get_current_user, require_org_role
@@ -30,9 +30,11 @@ def safe_limit(limiter_obj, rule: str):
 router = APIRouter(tags=["spawn"])
 
 @router.post("/orgs/{org_id}/posts/{post_id}/spawn-actions", response_model=list[AgentActionOut])
+@limiter.limit(LLM_ROUTE_LIMIT, key_func=user_or_ip)
 def spawn_actions(
     org_id: int,
     post_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
     n: int = Query(default=3, ge=1, le=20),
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.core.db import get_db
 from app.core.logging import get_logger
-from app.services.video_feed import get_video_feed
+from app.services.video_feed import video_feed_page
 
 log = get_logger(__name__)
 router = APIRouter()
@@ -15,20 +15,26 @@ def video_feed(
     location: str | None = None,
     limit: int = Query(default=50, le=100),
     offset: int = 0,
+    cursor: str | None = None,
     db: Session = Depends(get_db),
 ):
-    """Returns personalized video feed scored by recommendation engine."""
+    """Returns personalized video feed scored by recommendation engine.
+
+    Page with `next_cursor` (stable while scrolling); `offset` still works
+    for the first request."""
     try:
-        videos = get_video_feed(
+        videos, next_cursor = video_feed_page(
             db=db,
             org_id=org_id,
             user_id=user_id,
             user_language=language,
-            user_location=location,
             limit=limit,
+            cursor=cursor,
             offset=offset,
         )
-        return {"videos": videos, "total": len(videos)}
+        return {"videos": videos, "total": len(videos), "next_cursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         log.exception("video_feed_error", error=str(e))
         return {"videos": [], "total": 0, "error": str(e)}
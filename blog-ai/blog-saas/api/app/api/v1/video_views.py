@@ -4,6 +4,7 @@ from sqlalchemy import text
 from app.core.db import get_db
 from app.core.logging import get_logger
 from app.core.security import decode_token
+from app.services.engagement_counters import record_video_view
 
 log = get_logger(__name__)
 router = APIRouter()
@@ -57,14 +58,18 @@ def record_view(
     completed = bool(payload.get("completed", False))
 
     try:
+        org_id = db.execute(text("SELECT org_id FROM posts WHERE id=:pid"), {"pid": post_id}).scalar()
+        if org_id is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+
         if user_id:
             existing = db.execute(
-                text("SELECT id, watch_seconds FROM video_views WHERE post_id=:pid AND user_id=:uid"),
+                text("SELECT id, watch_seconds, completed FROM video_views WHERE post_id=:pid AND user_id=:uid"),
                 {"pid": post_id, "uid": user_id}
             ).first()
         else:
             existing = db.execute(
-                text("SELECT id, watch_seconds FROM video_views WHERE post_id=:pid AND session_id=:sid"),
+                text("SELECT id, watch_seconds, completed FROM video_views WHERE post_id=:pid AND session_id=:sid"),
                 {"pid": post_id, "sid": session_id}
             ).first()
 
@@ -74,13 +79,18 @@ def record_view(
                     text("UPDATE video_views SET watch_seconds=:ws, completed=:c, updated_at=NOW() WHERE id=:id"),
                     {"ws": watch_seconds, "c": completed, "id": existing.id}
                 )
+                record_video_view(db, post_id, org_id, new_view=False,
+                                  completed_delta=int(completed) - int(bool(existing.completed)))
         else:
             db.execute(
                 text("INSERT INTO video_views (post_id, user_id, session_id, watch_seconds, completed) VALUES (:pid, :uid, :sid, :ws, :c)"),
                 {"pid": post_id, "uid": user_id, "sid": session_id, "ws": watch_seconds, "c": completed}
             )
+            record_video_view(db, post_id, org_id, new_view=True, completed_delta=int(completed))
         db.commit()
         return {"ok": True}
+    except HTTPException:
+        raise
     except Exception as e:
         # Don't leak internal error details (was returning str(e) — exposed
         # SQL fragments and column names). Log server-side instead.
@@ -10,6 +10,12 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
 connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
 engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args)
+
+from app.core.metrics import install_db_metrics  # noqa: E402
+install_db_metrics(engine)
+from app.core import query_profiler  # noqa: E402
+if query_profiler.ENABLED:
+    query_profiler.install_query_profiler(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
 class Base(DeclarativeBase):
@@ -3,8 +3,8 @@ from typing import Generator, Optional
 from fastapi import Depends, Header, HTTPException
 from sqlalchemy.orm import Session
 
+from app.core import identity
 from app.core.db import SessionLocal
-from app.core.security import decode_token
 from app.models.user import User
 from app.models.org_member import OrgMember
 
@@ -23,21 +23,7 @@ def get_current_user(
         raise HTTPException(status_code=401, detail="Missing Bearer token")
 
     token = authorization.split(" ", 1)[1].strip()
-    try:
-        payload = decode_token(token)
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    sub = payload.get("sub")
-    if not sub:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
-
-    try:
-        user_id = int(sub)
-    except ValueError:
-        raise HTTPException(status_code=401, detail="Invalid token subject")
-
-    user = db.get(User, user_id)
+    user = identity.get_user(db, identity.token_user_id(token))
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
 
@@ -49,11 +35,7 @@ def require_org_role(
     db: Session,
     user: User,
 ) -> OrgMember:
-    m = (
-        db.query(OrgMember)
-        .filter(OrgMember.org_id == org_id, OrgMember.user_id == user.id)
-        .one_or_none()
-    )
+    m = identity.get_membership(db, org_id, user.id)
     if not m:
         raise HTTPException(status_code=403, detail="Not a member of this org")
     if m.role not in allowed_roles:
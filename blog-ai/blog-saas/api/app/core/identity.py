@@ -0,0 +1,189 @@
+"""
+Per-process cache of who is calling.
+
+Nearly every authenticated request decoded its JWT, loaded the User and
+then re-queried OrgMember / Org / Plan for the same user. Those lookups
+now go through short-lived in-process caches (IDENTITY_CACHE_SECONDS,
+default 30; 0 disables):
+
+- token -> user id            (never past the token's own `exp`)
+- user id -> User
+- (org id, user id) -> OrgMember, and user id -> first OrgMember
+- org id -> (Org, Plan)
+
+Cached rows are detached snapshots; callers get them back through
+Session.merge(load=False), so they are attached to the request's session
+without a query and can still be modified and committed as usual.
+
+Invalidation is automatic for ORM writes: a Session listener collects
+every User / OrgMember / Org / Plan flushed and drops the matching
+entries when the transaction commits (billing webhooks, settings, role
+changes). Other workers keep their copy for at most the TTL, and so do
+raw-SQL updates — keep the TTL short.
+"""
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.cache import TTLCache
+from app.core.security import decode_token
+from app.models.org import Org
+from app.models.org_member import OrgMember
+from app.models.plan import Plan
+from app.models.user import User
+
+IDENTITY_TTL = float(os.getenv("IDENTITY_CACHE_SECONDS", "30"))
+
+_tokens = TTLCache(IDENTITY_TTL, maxsize=50_000)
+_users = TTLCache(IDENTITY_TTL, maxsize=20_000)
+_members = TTLCache(IDENTITY_TTL, maxsize=50_000)
+_org_plans = TTLCache(IDENTITY_TTL, maxsize=5_000)
+
+_PENDING_KEY = "identity_cache_pending"
+_MISS = object()
+
+
+def _snapshot(obj: Any) -> Any:
+    """Detached copy of a loaded row, safe to share across sessions."""
+    if obj is None:
+        return None
+    mapper = inspect(obj).mapper
+    snap = mapper.class_(**{a.key: getattr(obj, a.key) for a in mapper.column_attrs})
+    make_transient_to_detached(snap)
+    return snap
+
+
+def _attach(db: Session, snap: Any) -> Any:
+    return db.merge(snap, load=False) if snap is not None else None
+
+
+def _cached(db: Session, cache: TTLCache, key, load) -> Any:
+    hit = cache.get(key, _MISS)
+    if hit is not _MISS:
+        return _attach(db, hit)
+    obj = load()
+    cache.set(key, _snapshot(obj))
+    return obj
+
+
+# ── Lookups ─────────────────────────────────────────────────────────────────
+
+def token_user_id(token: str) -> int:
+    """User id from a bearer token; 401 if it doesn't verify."""
+    user_id = _tokens.get(token)
+    if user_id is not None:
+        return user_id
+    try:
+        payload = decode_token(token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    sub = payload.get("sub")
+    if not sub:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+    try:
+        user_id = int(sub)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid token subject")
+
+    ttl = IDENTITY_TTL
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        ttl = min(ttl, exp - time.time())
+    if ttl > 0:
+        _tokens.set(token, user_id, ttl)
+    return user_id
+
+
+def get_user(db: Session, user_id: int) -> Optional[User]:
+    return _cached(db, _users, user_id, lambda: db.get(User, user_id))
+
+
+def get_membership(db: Session, org_id: int, user_id: int) -> Optional[OrgMember]:
+    return _cached(
+        db, _members, (org_id, user_id),
+        lambda: db.query(OrgMember)
+        .filter(OrgMember.org_id == org_id, OrgMember.user_id == user_id)
+        .one_or_none(),
+    )
+
+
+def get_primary_membership(db: Session, user_id: int) -> Optional[OrgMember]:
+    """The user's first org membership (what plan checks go by)."""
+    return _cached(
+        db, _members, (None, user_id),
+        lambda: db.query(OrgMember).filter(OrgMember.user_id == user_id).first(),
+    )
+
+
+def get_org_plan(db: Session, org_id: int) -> tuple[Optional[Org], Optional[Plan]]:
+    hit = _org_plans.get(org_id, _MISS)
+    if hit is not _MISS:
+        return _attach(db, hit[0]), _attach(db, hit[1])
+    org = db.query(Org).filter(Org.id == org_id).first()
+    plan = None
+    if org:
+        plan = db.query(Plan).filter(Plan.id == org.plan_id).first()
+        if not plan:
+            plan = db.query(Plan).filter(Plan.id == 1).first()
+    _org_plans.set(org_id, (_snapshot(org), _snapshot(plan)))
+    return org, plan
+
+
+# ── Invalidation ────────────────────────────────────────────────────────────
+
+def invalidate_user(user_id: int) -> None:
+    _users.invalidate(user_id)
+
+
+def invalidate_membership(org_id: int, user_id: int) -> None:
+    _members.invalidate((org_id, user_id))
+    _members.invalidate((None, user_id))
+
+
+def invalidate_org(org_id: int) -> None:
+    _org_plans.invalidate(org_id)
+
+
+def clear() -> None:
+    for cache in (_tokens, _users, _members, _org_plans):
+        cache.clear()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            pending.add(("user", obj.id))
+        elif isinstance(obj, OrgMember):
+            pending.add(("member", obj.org_id, obj.user_id))
+        elif isinstance(obj, Org):
+            pending.add(("org", obj.id))
+        elif isinstance(obj, Plan):
+            pending.add(("plan",))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session) -> None:
+    for change in session.info.pop(_PENDING_KEY, ()):
+        kind = change[0]
+        if kind == "user":
+            invalidate_user(change[1])
+        elif kind == "member":
+            invalidate_membership(change[1], change[2])
+        elif kind == "org":
+            invalidate_org(change[1])
+        else:
+            _org_plans.clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
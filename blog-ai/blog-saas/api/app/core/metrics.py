@@ -0,0 +1,522 @@
+"""
+Process metrics in Prometheus text format.
+
+A small counter/histogram registry (no prometheus_client dependency):
+
+    HTTP_REQUESTS.inc(method="GET", route="/api/v1/...", status="200")
+    with stage("debate.spawn"):
+        ...
+
+What is recorded, and where:
+- HTTP: per route template and status (MetricsMiddleware).
+- DB: every cursor execute on app.core.db.engine, by statement kind
+  (install_db_metrics, SQLAlchemy engine events).
+- LLM: per provider/model — latency, prompt/completion tokens, outcome
+  (ok / error / rate_limited) and retries (app.services.llm_client).
+- Background work: stage() times a block and splits it into the DB and
+  LLM time spent inside it on the same thread/task, so a slow spawn tick
+  shows whether it was waiting on the providers or on Postgres. Every job
+  run is a stage (job:<type>); the spawn loop, reputation job and live AI
+  loop add their own.
+
+Across processes: with METRICS_SHARED on (default on Postgres) each
+process writes its cumulative snapshot to metrics_snapshots every
+METRICS_FLUSH_SECONDS, and /metrics sums the snapshots of every process
+seen in the last METRICS_NODE_TTL_SECONDS — gunicorn workers and the job
+workers alike, whichever one serves the scrape. When a process's row
+expires its counters and histograms are added to a persistent "retired"
+row, so the totals don't drop (which Prometheus would read as a reset)
+each time a worker is recycled. Scrape-time gauges (job queue depth) come
+from register_collector() and are never stored.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import secrets
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event, text
+
+from app.core.logging import get_logger
+
+log = get_logger(__name__)
+
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "15"))
+NODE_TTL_SECONDS = float(os.getenv("METRICS_NODE_TTL_SECONDS", "600"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"kind": self.kind, "series": [[list(k), self._copy(v)] for k, v in self._series.items()]}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Iterable[tuple[str, str, str, dict, float]]]] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, fn: Callable[[], Iterable[tuple[str, str, str, dict, float]]]) -> None:
+        """fn() -> [(name, kind, help, labels, value)], evaluated per scrape."""
+        self._collectors.append(fn)
+
+    def snapshot(self) -> dict:
+        return {name: m.snapshot() for name, m in self._metrics.items()}
+
+    def clear(self) -> None:
+        for m in self._metrics.values():
+            m.clear()
+
+    def render(self, snapshots: Iterable[dict] = (), baseline: Optional[dict] = None) -> str:
+        """Prometheus text exposition of this process plus `snapshots` from
+        other processes (counters and histograms are summed). `baseline`:
+        counts of this process already in one of `snapshots`, left out."""
+        merged = {name: {} for name in self._metrics}
+        for snap in [self.snapshot(), *snapshots, *([_negated(baseline)] if baseline else [])]:
+            for name, data in snap.items():
+                metric = self._metrics.get(name)
+                if metric is None or data.get("kind") != metric.kind:
+                    continue
+                into = merged[name]
+                for labels, value in data["series"]:
+                    key = tuple(labels)
+                    if metric.kind == "counter":
+                        into[key] = into.get(key, 0.0) + value
+                    elif len(value[0]) == len(metric.buckets) + 1:
+                        cur = into.setdefault(key, [[0] * len(value[0]), 0.0, 0])
+                        cur[0] = [a + b for a, b in zip(cur[0], value[0])]
+                        cur[1] += value[1]
+                        cur[2] += value[2]
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(merged[name].items()):
+                pairs = list(zip(metric.labelnames, key))
+                if metric.kind == "counter":
+                    lines.append(f"{name}{_labels(pairs)} {_fmt(value)}")
+                    continue
+                cumulative = 0
+                for le, n in zip((*metric.buckets, float("inf")), value[0]):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_labels(pairs + [('le', _fmt(le))])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(pairs)} {_fmt(value[1])}")
+                lines.append(f"{name}_count{_labels(pairs)} {value[2]}")
+
+        seen = set()
+        for fn in self._collectors:
+            try:
+                samples = list(fn())
+            except Exception as e:
+                log.warning("metrics_collector_error", collector=getattr(fn, "__name__", "?"), error=str(e))
+                continue
+            for name, kind, help, labels, value in samples:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# HELP {name} {help}")
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_labels(list(labels.items()))} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests by route template and status.",
+                                 ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "Time to response headers.",
+                                  ("method", "route"))
+DB_QUERIES = REGISTRY.histogram("db_query_duration_seconds", "SQL statement execution time.", ("op",))
+DB_ERRORS = REGISTRY.counter("db_errors_total", "SQL statements that raised.", ("op",))
+LLM_REQUESTS = REGISTRY.counter("llm_requests_total", "LLM provider calls by outcome (ok, error, rate_limited).",
+                                ("provider", "model", "outcome"))
+LLM_LATENCY = REGISTRY.histogram("llm_request_duration_seconds", "LLM provider call latency.",
+                                 ("provider", "model"), buckets=SLOW_BUCKETS)
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "Tokens reported by the providers.", ("provider", "model", "kind"))
+LLM_RETRIES = REGISTRY.counter("llm_retries_total", "LLM calls retried on the same provider.", ("provider", "reason"))
+STAGE_SECONDS = REGISTRY.histogram("stage_duration_seconds", "Background stage wall time.", ("stage",),
+                                   buckets=SLOW_BUCKETS)
+STAGE_DB_SECONDS = REGISTRY.histogram("stage_db_seconds", "DB time inside a background stage.", ("stage",),
+                                      buckets=SLOW_BUCKETS)
+STAGE_LLM_SECONDS = REGISTRY.histogram("stage_llm_seconds", "LLM wait inside a background stage.", ("stage",),
+                                       buckets=SLOW_BUCKETS)
+STAGE_RUNS = REGISTRY.counter("stage_runs_total", "Background stage runs by outcome.", ("stage", "outcome"))
+
+
+# ── stages ──────────────────────────────────────────────────────────────────
+
+_active: ContextVar[tuple] = ContextVar("metrics_stages", default=())
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block of background work, with its DB and LLM share."""
+    acc = {"db": 0.0, "llm": 0.0}
+    token = _active.set(_active.get() + (acc,))
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        _active.reset(token)
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+        STAGE_DB_SECONDS.observe(acc["db"], stage=name)
+        STAGE_LLM_SECONDS.observe(acc["llm"], stage=name)
+        STAGE_RUNS.inc(stage=name, outcome=outcome)
+
+
+def charge(kind: str, seconds: float) -> None:
+    """Add `seconds` of `kind` ("db" / "llm") to every stage open here."""
+    for acc in _active.get():
+        acc[kind] += seconds
+
+
+# ── DB ──────────────────────────────────────────────────────────────────────
+
+_OP = re.compile(r"\s*(\w+)")
+
+
+def install_db_metrics(engine) -> None:
+    if getattr(engine, "_scouta_metrics", False):
+        return
+    engine._scouta_metrics = True
+
+    def op_of(statement: str) -> str:
+        m = _OP.match(statement or "")
+        op = m.group(1).lower() if m else "other"
+        return op if op in ("select", "insert", "update", "delete", "with") else "other"
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        DB_QUERIES.observe(elapsed, op=op_of(statement))
+        charge("db", elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        started = ctx.connection.info.get("metrics_started") if ctx.connection is not None else None
+        if started:
+            started.pop()
+        DB_ERRORS.inc(op=op_of(ctx.statement))
+
+
+# ── shared snapshots ────────────────────────────────────────────────────────
+
+RETIRED_NODE = "retired"
+
+_UPSERT = text(
+    "INSERT INTO metrics_snapshots (node, updated_at, payload) VALUES (:node, :updated_at, :payload) "
+    "ON CONFLICT (node) DO UPDATE SET updated_at = excluded.updated_at, payload = excluded.payload"
+)
+_EXPIRE = text(
+    "DELETE FROM metrics_snapshots WHERE updated_at < :cutoff AND node <> :retired RETURNING payload"
+)
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """Sum snapshots into one, in the same format. Series whose histogram
+    buckets disagree with the first one seen are dropped, as in render()."""
+    merged: dict[str, dict] = {}
+    for snap in snapshots:
+        for name, data in snap.items():
+            kind = data.get("kind")
+            if kind not in ("counter", "histogram"):
+                continue
+            into = merged.setdefault(name, {"kind": kind, "series": {}})
+            if into["kind"] != kind:
+                continue
+            series = into["series"]
+            for labels, value in data["series"]:
+                key = tuple(labels)
+                if kind == "counter":
+                    series[key] = series.get(key, 0.0) + value
+                    continue
+                cur = series.get(key)
+                if cur is None:
+                    series[key] = [list(value[0]), value[1], value[2]]
+                elif len(cur[0]) == len(value[0]):
+                    cur[0] = [a + b for a, b in zip(cur[0], value[0])]
+                    cur[1] += value[1]
+                    cur[2] += value[2]
+    return {
+        name: {"kind": m["kind"], "series": [[list(k), v] for k, v in m["series"].items()]}
+        for name, m in merged.items()
+    }
+
+
+def _negated(snapshot: dict) -> dict:
+    out = {}
+    for name, data in snapshot.items():
+        series = []
+        for labels, value in data["series"]:
+            if data["kind"] == "counter":
+                series.append([labels, -value])
+            else:
+                series.append([labels, [[-n for n in value[0]], -value[1], -value[2]]])
+        out[name] = {"kind": data["kind"], "series": series}
+    return out
+
+
+def subtract_snapshots(snapshot: dict, baseline: dict) -> dict:
+    return merge_snapshots([snapshot, _negated(baseline)])
+
+
+class SnapshotStore:
+    """Per-process snapshots in metrics_snapshots (no ORM model).
+
+    A process whose row expired while it wasn't flushing (a stall, a DB
+    outage) finds the row gone on its next flush: what it last wrote is in
+    the retired row by then. That becomes its baseline, and from then on
+    it publishes (and renders) only what it counted since."""
+
+    def __init__(self, registry: Registry = REGISTRY, session_factory=None, node_id: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        self.registry = registry
+        self.pid = os.getpid()
+        self.node_id = node_id or f"{socket.gethostname()}:{self.pid}:{secrets.token_hex(3)}"
+        self._session_factory = session_factory
+        self._clock = clock
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.baseline: dict = {}  # counts already folded into the retired row
+        self._written: Optional[dict] = None  # payload of the last committed flush
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.core.db import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def flush(self) -> None:
+        now = self._clock()
+        snapshot = self.registry.snapshot()
+        db = self._session()
+        try:
+            # locked, so another process's expiry can't retire the row
+            # between this check and the upsert
+            lock = " FOR UPDATE" if db.get_bind().dialect.name == "postgresql" else ""
+            mine = db.execute(
+                text(f"SELECT 1 FROM metrics_snapshots WHERE node = :node{lock}"), {"node": self.node_id},
+            ).first()
+            baseline = self.baseline
+            if mine is None and self._written is not None:
+                baseline = merge_snapshots([baseline, self._written])
+                log.info("metrics_node_rejoined", node=self.node_id)
+            published = subtract_snapshots(snapshot, baseline) if baseline else snapshot
+            db.execute(_UPSERT, {
+                "node": self.node_id, "updated_at": now,
+                "payload": json.dumps(published, separators=(",", ":")),
+            })
+            expired = db.execute(_EXPIRE, {"cutoff": now - NODE_TTL_SECONDS, "retired": RETIRED_NODE}).all()
+            if expired:
+                self._retire(db, now, [p for (p,) in expired])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.baseline, self._written = baseline, published
+
+    @staticmethod
+    def _retire(db, now: float, payloads: list[str]) -> None:
+        """Add the counters of expired processes to the retired row. The
+        DELETE ... RETURNING above hands each expired row to one flush only;
+        the retired row is locked for the read-modify-write."""
+        db.execute(
+            text("INSERT INTO metrics_snapshots (node, updated_at, payload) VALUES (:node, :now, '{}') "
+                 "ON CONFLICT (node) DO NOTHING"),
+            {"node": RETIRED_NODE, "now": now},
+        )
+        lock = " FOR UPDATE" if db.get_bind().dialect.name == "postgresql" else ""
+        current = db.execute(
+            text(f"SELECT payload FROM metrics_snapshots WHERE node = :node{lock}"), {"node": RETIRED_NODE},
+        ).scalar_one()
+        snaps = []
+        for payload in [current, *payloads]:
+            try:
+                snaps.append(json.loads(payload))
+            except ValueError:
+                continue
+        merged = json.dumps(merge_snapshots(snaps), separators=(",", ":"))
+        db.execute(_UPSERT, {"node": RETIRED_NODE, "updated_at": now, "payload": merged})
+        log.info("metrics_nodes_retired", nodes=len(payloads))
+
+    def others(self) -> list[dict]:
+        """Snapshots of every other live process, plus the retired totals."""
+        db = self._session()
+        try:
+            rows = db.execute(
+                text("SELECT payload FROM metrics_snapshots "
+                     "WHERE node <> :node AND (updated_at >= :cutoff OR node = :retired)"),
+                {"node": self.node_id, "cutoff": self._clock() - NODE_TTL_SECONDS, "retired": RETIRED_NODE},
+            ).all()
+        finally:
+            db.close()
+        out = []
+        for (payload,) in rows:
+            try:
+                out.append(json.loads(payload))
+            except ValueError:
+                continue
+        return out
+
+    def start(self, interval: float = FLUSH_SECONDS) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="metrics-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("metrics_flush_error", error=str(e))
+
+
+def shared_enabled() -> bool:
+    from app.core.db import DATABASE_URL
+    default = "1" if DATABASE_URL.startswith("postgresql") else "0"
+    return os.getenv("METRICS_SHARED", default) == "1"
+
+
+_store: Optional[SnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[SnapshotStore]:
+    """This process's snapshot store (flushing in the background), or None
+    when metrics are per process. Re-created after fork."""
+    global _store
+    if not shared_enabled():
+        return None
+    with _store_lock:
+        if _store is None or _store.pid != os.getpid():
+            _store = SnapshotStore()
+            _store.start()
+        return _store
+
+
+def render() -> str:
+    store = get_store()
+    others: list[dict] = []
+    if store is not None:
+        try:
+            others = store.others()
+        except Exception as e:
+            log.warning("metrics_snapshots_read_error", error=str(e))
+    return REGISTRY.render(others, baseline=store.baseline if store is not None else None)
@@ -3,15 +3,26 @@ RequestIdMiddleware: bind a per-request id into structlog's context so every
 log line emitted during the request carries it. Honors an incoming
 X-Request-Id header (useful for tracing across hops); otherwise generates
 a uuid4. Echoes the id back on the response.
+
+MetricsMiddleware: request count and latency per route template (so
+/posts/1 and /posts/2 share a series); see app.core.metrics.
+
+QueryProfilerMiddleware: SQL count and time per request as a Server-Timing
+header and a query_profile log line (QUERY_PROFILER=1, dev/staging); see
+app.core.query_profiler.
 """
 from __future__ import annotations
 
+import time
 import uuid
 
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from structlog.contextvars import bind_contextvars, clear_contextvars
 
+from app.core.metrics import HTTP_LATENCY, HTTP_REQUESTS
+from app.core.query_profiler import request_recorder
+
 
 class RequestIdMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -27,3 +38,30 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
             clear_contextvars()
         response.headers["x-request-id"] = request_id
         return response
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        started = time.perf_counter()
+        status = "500"
+        try:
+            response = await call_next(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            route = request.scope.get("route")
+            # unmatched paths share one series instead of one per probe URL
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(method=request.method, route=template, status=status)
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, route=template)
+
+
+class QueryProfilerMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        with request_recorder() as rec:
+            response = await call_next(request)
+        timing = rec.server_timing()
+        existing = response.headers.get("server-timing")
+        response.headers["server-timing"] = f"{existing}, {timing}" if existing else timing
+        rec.log()
+        return response
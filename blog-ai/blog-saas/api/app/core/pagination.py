@@ -0,0 +1,103 @@
+"""
+Opaque keyset-pagination cursors.
+
+A cursor is the sort key of the last row on the previous page, JSON-encoded
+and base64url'd so clients treat it as an opaque token:
+
+    encode_cursor({"s": 12.5, "id": 981})  ->  "eyJzIjoxMi41LCJpZCI6OTgxfQ"
+    decode_cursor(token)                   ->  {"s": 12.5, "id": 981}
+
+A malformed / tampered token raises HTTPException(400) so routes can pass
+the query param straight through.
+
+List endpoints ordered by recency page over (created_at, id) with
+created_keyset() / cut_page(); the old offset params still work when no
+cursor is given. Their "total" comes from cached_count() rather than a
+COUNT(*) per page.
+"""
+from __future__ import annotations
+
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Hashable
+
+from fastapi import HTTPException
+from sqlalchemy import and_, asc, desc, func, literal, or_
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+
+
+def encode_cursor(key: dict[str, Any]) -> str:
+    raw = json.dumps(key, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str | None) -> dict[str, Any] | None:
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return data
+
+
+# ── (created_at, id) keyset helpers ─────────────────────────────────────────
+
+def _ts(dialect: str, expr):
+    # SQLite keeps timestamps as text in whichever format the writer used
+    # (server default vs. Python datetime), so compare them numerically
+    return func.julianday(expr) if dialect == "sqlite" else expr
+
+
+def created_keyset(db: Session, created_col, id_col, cursor: str | None, descending: bool = True):
+    """(filter clause or None, order_by columns) for paging over
+    (created_at, id). The cursor is the key of the last row served."""
+    dialect = db.get_bind().dialect.name
+    order = (desc(created_col), desc(id_col)) if descending else (asc(created_col), asc(id_col))
+    after = decode_cursor(cursor)
+    if after is None:
+        return None, order
+    try:
+        ts = datetime.fromisoformat(after["t"])
+        last_id = int(after["id"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    col, val = _ts(dialect, created_col), _ts(dialect, literal(ts, created_col.type))
+    if descending:
+        clause = or_(col < val, and_(col == val, id_col < last_id))
+    else:
+        clause = or_(col > val, and_(col == val, id_col > last_id))
+    return clause, order
+
+
+def created_cursor(created_at, row_id: int) -> str:
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    return encode_cursor({"t": created_at, "id": row_id})
+
+
+def cut_page(rows: list, limit: int, key: Callable[[Any], tuple[Any, int]]) -> tuple[list, str | None]:
+    """rows were fetched with limit + 1; returns the page and the cursor for
+    the next one (None when this is the last page)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, created_cursor(*key(rows[-1]))
+
+
+# ── Totals ──────────────────────────────────────────────────────────────────
+
+_count_cache = TTLCache(float(os.getenv("LIST_COUNT_CACHE_SECONDS", "60")), maxsize=20_000)
+
+
+def cached_count(key: Hashable, count: Callable[[], int]) -> int:
+    """Exact count, computed at most once per LIST_COUNT_CACHE_SECONDS per
+    key — list endpoints report it as an approximate total."""
+    return _count_cache.get_or_set(key, lambda: int(count() or 0))
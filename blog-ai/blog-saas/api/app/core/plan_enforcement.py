@@ -3,22 +3,19 @@ Plan enforcement utilities.
 """
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
+from app.core import identity
 from app.models.org import Org
 from app.models.plan import Plan
-from app.models.org_member import OrgMember
 
 
 def get_user_org_plan(db: Session, user_id: int) -> tuple[Org, Plan]:
     """Returns (org, plan) for the user."""
-    member = db.query(OrgMember).filter(OrgMember.user_id == user_id).first()
+    member = identity.get_primary_membership(db, user_id)
     if not member:
         raise HTTPException(403, detail="No organization found for user")
-    org = db.query(Org).filter(Org.id == member.org_id).first()
+    org, plan = identity.get_org_plan(db, member.org_id)
     if not org:
         raise HTTPException(403, detail="Organization not found")
-    plan = db.query(Plan).filter(Plan.id == org.plan_id).first()
-    if not plan:
-        plan = db.query(Plan).filter(Plan.id == 1).first()
     return org, plan
 
 
@@ -0,0 +1,169 @@
+"""
+Per-request SQL profile, for development and staging.
+
+With QUERY_PROFILER=1 every statement run while a request is served is
+recorded (SQLAlchemy before/after_cursor_execute on the app engine), and
+QueryProfilerMiddleware (app.core.middleware) reports, per request:
+
+- a Server-Timing header — `db;dur=<ms>;desc="<n> queries"` — so the
+  browser devtools show DB time next to the request;
+- one `query_profile` log line: query count, DB time, the statement
+  shapes that repeated and the slowest statements;
+- a `n_plus_one_suspected` warning when one shape ran at least
+  QUERY_PROFILER_NPLUS1 times — a loop issuing a query per row.
+
+A shape is the statement with literals and bind parameters blanked and
+IN lists collapsed, so `... WHERE users.id = ?` run for ten ids is one
+shape seen ten times.
+
+The recorder is found through a ContextVar, which follows the request
+into the threadpool that runs sync endpoints. Tests use recording(engine)
+instead, which records everything executed on an engine whatever the
+thread (the TestClient serves requests from its own thread); the
+query_budget fixture in tests/conftest.py builds on it.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+
+from app.core.logging import get_logger
+
+log = get_logger(__name__)
+
+ENABLED = os.getenv("QUERY_PROFILER", "0") == "1"
+NPLUS1_THRESHOLD = int(os.getenv("QUERY_PROFILER_NPLUS1", "5"))
+SLOWEST = int(os.getenv("QUERY_PROFILER_SLOWEST", "3"))
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):\w+|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def shape_of(statement: str) -> str:
+    s = _STRING.sub("?", statement or "")
+    s = _PARAM.sub("?", s)
+    s = _NUMBER.sub("?", s)
+    s = _IN_LIST.sub("(?...)", s)
+    return _SPACE.sub(" ", s).strip()
+
+
+@dataclass(frozen=True)
+class Query:
+    statement: str
+    seconds: float
+
+    @property
+    def shape(self) -> str:
+        return shape_of(self.statement)
+
+
+class QueryRecorder:
+    """The statements of one request (or one recording() block)."""
+
+    def __init__(self):
+        self.queries: list[Query] = []
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.queries.append(Query(statement, seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(q.seconds for q in self.queries)
+
+    def duplicates(self, min_count: int = 2) -> list[tuple[str, int]]:
+        """Shapes run at least `min_count` times, most repeated first."""
+        counts: dict[str, int] = {}
+        for q in self.queries:
+            counts[q.shape] = counts.get(q.shape, 0) + 1
+        dupes = [(shape, n) for shape, n in counts.items() if n >= min_count]
+        return sorted(dupes, key=lambda d: -d[1])
+
+    def slowest(self, n: int = SLOWEST) -> list[Query]:
+        return sorted(self.queries, key=lambda q: -q.seconds)[:n]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_seconds * 1000:.1f};desc="{self.count} queries"'
+
+    def log(self) -> None:
+        dupes = self.duplicates()
+        log.info(
+            "query_profile",
+            queries=self.count,
+            db_ms=round(self.total_seconds * 1000, 1),
+            duplicates=[{"count": n, "shape": shape[:300]} for shape, n in dupes],
+            slowest=[{"ms": round(q.seconds * 1000, 1), "shape": q.shape[:300]} for q in self.slowest()],
+        )
+        if dupes and dupes[0][1] >= NPLUS1_THRESHOLD:
+            log.warning("n_plus_one_suspected", queries=self.count, repeats=dupes[0][1], shape=dupes[0][0][:300])
+
+    def report(self) -> str:
+        lines = [f"{self.count} queries, {self.total_seconds * 1000:.1f} ms"]
+        lines += [f"  x{n}  {shape}" for shape, n in self.duplicates()]
+        return "\n".join(lines)
+
+
+_current: ContextVar[Optional[QueryRecorder]] = ContextVar("query_recorder", default=None)
+
+
+@contextmanager
+def request_recorder() -> Iterator[QueryRecorder]:
+    """Record the statements run in this context (and the threads it hands work to)."""
+    rec = QueryRecorder()
+    token = _current.set(rec)
+    try:
+        yield rec
+    finally:
+        _current.reset(token)
+
+
+def install_query_profiler(engine) -> None:
+    if getattr(engine, "_scouta_query_profiler", None) is not None:
+        return
+    engine._scouta_query_profiler = []  # recording() blocks open on this engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("profiler_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        current = _current.get()
+        if current is not None:
+            current.add(statement, elapsed)
+        for rec in engine._scouta_query_profiler:
+            if rec is not current:
+                rec.add(statement, elapsed)
+
+
+@contextmanager
+def recording(engine) -> Iterator[QueryRecorder]:
+    """Record every statement executed on `engine` inside the block."""
+    install_query_profiler(engine)
+    rec = QueryRecorder()
+    engine._scouta_query_profiler.append(rec)
+    try:
+        yield rec
+    finally:
+        engine._scouta_query_profiler.remove(rec)
+
@@ -1,4 +1,4 @@
-"""Shared per-IP rate limiter.
+"""Shared rate limiter.
 
 This module exists because slowapi's @limiter.limit decorator enforces
 rate limits using the storage of whichever Limiter instance the
@@ -12,11 +12,54 @@ in main.py reads `app.state.limiter` to apply the global default limit
 to every route; per-route overrides come from the @limiter.limit
 decorators against this same instance.
 
-Note: storage is in-memory and per-process. With N gunicorn workers,
-effective limit is N × (configured limit). Acceptable for now — if we
-need stricter, swap in slowapi's Redis storage backend.
+Storage (RATE_LIMIT_STORAGE_URI):
+- "scouta-db://" — counters shared by every worker through the
+  rate_limit_counters table (see app.core.rate_limit_storage). Default
+  when DATABASE_URL is Postgres.
+- "memory://"    — per process: with N gunicorn workers the effective
+  limit is N × (configured limit). Default otherwise (SQLite dev, tests).
+- "redis://host:6379" — any storage URI `limits` understands (needs the
+  redis package).
+
+Limits use the sliding-window-counter strategy. The default limit is per
+IP; the LLM-backed routes are limited per route and per user
+(user_or_ip), so one account can't drive them harder by spreading
+requests over addresses or workers.
 """
+import os
+
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address, default_limits=["60/minute"])
+from app.core.db import DATABASE_URL
+from app.core.rate_limit_storage import SQLCounterStorage  # noqa: F401  (registers scouta-db://)
+
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI") or (
+    "scouta-db://" if DATABASE_URL.startswith("postgresql") else "memory://"
+)
+
+# Per-user limits for routes that call the LLM providers
+LLM_ROUTE_LIMIT = os.getenv("RATE_LIMIT_LLM_ROUTES", "10/minute")
+COMMENT_LIMIT = os.getenv("RATE_LIMIT_COMMENTS", "20/minute")
+
+
+def user_or_ip(request) -> str:
+    """Rate-limit key: the bearer token's user when it verifies, else the
+    client address."""
+    auth = request.headers.get("authorization") or ""
+    if auth.lower().startswith("bearer "):
+        from fastapi import HTTPException
+        from app.core import identity
+        try:
+            return f"user:{identity.token_user_id(auth.split(' ', 1)[1].strip())}"
+        except HTTPException:
+            pass
+    return get_remote_address(request)
+
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    default_limits=["60/minute"],
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy="sliding-window-counter",
+)
@@ -0,0 +1,221 @@
+"""
+Database-backed storage for the shared slowapi Limiter.
+
+With the default memory storage every gunicorn worker counts on its own,
+so a "10/minute" route really allows 10 × workers. SQLCounterStorage keeps
+the counters in one table (rate_limit_counters — UNLOGGED on Postgres,
+plain table on SQLite) that every worker reads and writes, and implements
+the limits "sliding-window-counter" strategy on top of it: one row per
+(limit key, fixed window), and a hit is allowed when
+
+    previous window × (time left of it) + current window + amount <= limit
+
+Requests never touch the database. Each process keeps
+- the counts last read from the table, and
+- the hits it has allowed since,
+and a background thread, every RATE_LIMIT_SYNC_MS, writes the pending
+hits in one batched upsert and re-reads the counters of the keys it has
+seen recently. Across workers a limit can therefore be overshot by
+whatever the other workers allow within one sync interval — a bounded
+error, instead of the N× of per-process storage.
+
+Registered with `limits` under the "scouta-db://" scheme; see
+app.core.rate_limit for how the storage is chosen.
+"""
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.logging import get_logger
+
+log = get_logger(__name__)
+
+SYNC_MS = int(os.getenv("RATE_LIMIT_SYNC_MS", "250"))
+CLEANUP_SECONDS = 60.0
+_READ_CHUNK = 500
+
+_UPSERT = text(
+    "INSERT INTO rate_limit_counters (bucket, win, hits, expires_at) "
+    "VALUES (:bucket, :win, :hits, :expires_at) "
+    "ON CONFLICT (bucket, win) DO UPDATE SET hits = rate_limit_counters.hits + excluded.hits"
+)
+_READ = text(
+    "SELECT bucket, win, hits FROM rate_limit_counters "
+    "WHERE bucket IN :buckets AND expires_at > :now"
+).bindparams(bindparam("buckets", expanding=True))
+
+
+class SQLCounterStorage(Storage, SlidingWindowCounterSupport):
+    STORAGE_SCHEME = ["scouta-db"]
+
+    def __init__(
+        self,
+        uri: Optional[str] = None,
+        wrap_exceptions: bool = False,
+        session_factory: Optional[Callable] = None,
+        sync_ms: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+        **options,
+    ):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self._session_factory = session_factory
+        # 0 = no background thread; call sync() yourself
+        self.sync_interval = (SYNC_MS if sync_ms is None else sync_ms) / 1000.0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[str, int], int] = {}
+        self._shared: dict[tuple[str, int], int] = {}
+        self._seen: dict[str, tuple[int, float]] = {}  # key -> (window seconds, last hit)
+        self._thread: Optional[threading.Thread] = None
+        self._last_cleanup = 0.0
+
+    @property
+    def base_exceptions(self):
+        return SQLAlchemyError
+
+    # ── in-process view ─────────────────────────────────────────────────────
+
+    def _count(self, key: str, win: int) -> int:
+        return self._shared.get((key, win), 0) + self._pending.get((key, win), 0)
+
+    def _add(self, key: str, win: int, expiry: int, amount: int, now: float) -> int:
+        self._pending[(key, win)] = self._pending.get((key, win), 0) + amount
+        self._seen[key] = (expiry, now)
+        self._ensure_thread()
+        return self._count(key, win)
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        now = self._clock()
+        win = int(now // expiry)
+        with self._lock:
+            weight = 1 - (now % expiry) / expiry
+            weighted = self._count(key, win - 1) * weight + self._count(key, win)
+            if math.floor(weighted) + amount > limit:
+                return False
+            self._add(key, win, expiry, amount, now)
+            return True
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple[int, float, int, float]:
+        now = self._clock()
+        win = int(now // expiry)
+        left = expiry - (now % expiry)
+        with self._lock:
+            previous, current = self._count(key, win - 1), self._count(key, win)
+        return previous, (left if previous else 0.0), current, left + expiry
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.clear(key)
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = self._clock()
+        with self._lock:
+            return self._add(key, int(now // expiry), expiry, amount, now)
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            seen = self._seen.get(key)
+            return self._count(key, int(self._clock() // seen[0])) if seen else 0
+
+    def get_expiry(self, key: str) -> float:
+        seen = self._seen.get(key)
+        now = self._clock()
+        return (int(now // seen[0]) + 1) * seen[0] if seen else now
+
+    def check(self) -> bool:
+        try:
+            self._execute(lambda db: db.execute(text("SELECT 1")))
+            return True
+        except Exception:
+            return False
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            for store in (self._pending, self._shared):
+                for k in [k for k in store if k[0] == key]:
+                    del store[k]
+            self._seen.pop(key, None)
+        self._execute(lambda db: db.execute(text("DELETE FROM rate_limit_counters WHERE bucket = :b"), {"b": key}))
+
+    def reset(self) -> Optional[int]:
+        with self._lock:
+            self._pending.clear()
+            self._shared.clear()
+            self._seen.clear()
+        return self._execute(lambda db: db.execute(text("DELETE FROM rate_limit_counters")).rowcount)
+
+    # ── shared table ────────────────────────────────────────────────────────
+
+    def _execute(self, fn):
+        if self._session_factory is None:
+            from app.core.db import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            result = fn(db)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def sync(self) -> None:
+        """Write pending hits, then reload the shared counts of active keys."""
+        now = self._clock()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._seen = {k: v for k, v in self._seen.items() if now - v[1] < 2 * v[0]}
+            active = list(self._seen)
+            expiry = {k: v[0] for k, v in self._seen.items()}
+        rows = [
+            {"bucket": k, "win": w, "hits": n, "expires_at": (w + 2) * expiry.get(k, 60)}
+            for (k, w), n in pending.items()
+        ]
+
+        def write_and_read(db):
+            if rows:
+                db.execute(_UPSERT, rows)
+            shared: dict[tuple[str, int], int] = {}
+            for i in range(0, len(active), _READ_CHUNK):
+                for bucket, win, hits in db.execute(_READ, {"buckets": active[i:i + _READ_CHUNK], "now": now}):
+                    shared[(bucket, win)] = hits
+            if now - self._last_cleanup >= CLEANUP_SECONDS:
+                db.execute(text("DELETE FROM rate_limit_counters WHERE expires_at <= :now"), {"now": now})
+                self._last_cleanup = now
+            return shared
+
+        try:
+            shared = self._execute(write_and_read)
+        except Exception as e:
+            with self._lock:
+                for k, n in pending.items():
+                    self._pending[k] = self._pending.get(k, 0) + n
+            log.warning("rate_limit_sync_failed", pending=len(pending), error=str(e))
+            return
+        with self._lock:
+            self._shared = shared
+
+    def _ensure_thread(self) -> None:
+        if self.sync_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name="rate-limit-sync", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.sync_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                log.warning("rate_limit_sync_error", error=str(e))
@@ -0,0 +1,168 @@
+"""
+Job handlers for app.services.job_queue.
+
+Each handler takes (db, payload) and runs on the session the worker opened
+for it. PERIODIC lists what the worker schedules on a timer; everything
+else is enqueued by another job or by a request path via dispatch().
+"""
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from app.models.job import Job
+from app.services.job_queue import enqueue, job_handler, purge_finished, schedule_periodic
+
+_llm_pool: ThreadPoolExecutor | None = None
+
+
+def _debate_llm_pool() -> ThreadPoolExecutor | None:
+    global _llm_pool
+    from app.jobs.spawn_loop import LLM_WORKERS
+    if LLM_WORKERS <= 1:
+        return None
+    if _llm_pool is None:
+        _llm_pool = ThreadPoolExecutor(LLM_WORKERS, thread_name_prefix="job-llm")
+    return _llm_pool
+
+
+# ── Spawning ────────────────────────────────────────────────────────────────
+
+@job_handler("generate_post", concurrency=1, max_attempts=2)
+def generate_post_job(db: Session, payload: dict) -> None:
+    from app.jobs.spawn_loop import generate_auto_post
+    generate_auto_post(db)
+
+
+@job_handler("spawn_tick", concurrency=1, max_attempts=1)
+def spawn_tick_job(db: Session, payload: dict) -> None:
+    """Fan one spawn-loop tick out into per-post and per-comment jobs."""
+    from app.jobs.spawn_loop import pending_human_comment_ids, recent_post_ids
+
+    # A post whose previous debate job is still queued/running is skipped,
+    # so one post never has two debates in flight.
+    busy = set()
+    for (payload_json,) in db.query(Job.payload).filter(
+        Job.job_type == "debate_post", Job.status.in_(("queued", "running"))
+    ).all():
+        busy.add(json.loads(payload_json).get("post_id"))
+
+    bucket = payload.get("bucket") or "adhoc"
+    for pid in recent_post_ids(db):
+        if pid not in busy:
+            enqueue(db, "debate_post", {"post_id": pid}, dedupe_key=f"debate:{pid}:{bucket}", commit=False)
+    for cid in pending_human_comment_ids(db):
+        enqueue(db, "human_reply", {"comment_id": cid}, dedupe_key=f"human_reply:{cid}", priority=10, commit=False)
+    db.commit()
+
+
+@job_handler("debate_post", concurrency=int(os.getenv("SPAWN_LOOP_POST_WORKERS", "3")), max_attempts=1)
+def debate_post_job(db: Session, payload: dict) -> None:
+    from app.jobs.spawn_loop import debate_post
+    debate_post(db, int(payload["post_id"]), _debate_llm_pool())
+
+
+@job_handler("human_reply", concurrency=2, max_attempts=3, backoff_seconds=20)
+def human_reply_job(db: Session, payload: dict) -> None:
+    from app.jobs.spawn_loop import reply_to_human
+    reply_to_human(db, int(payload["comment_id"]))
+
+
+# ── Maintenance ─────────────────────────────────────────────────────────────
+
+@job_handler("reputation", concurrency=1, max_attempts=3, backoff_seconds=120)
+def reputation_job(db: Session, payload: dict) -> None:
+    from app.services.reputation_job import run_reputation_job
+    run_reputation_job(db)
+
+
+@job_handler("counter_reconcile", concurrency=1, max_attempts=3, backoff_seconds=120)
+def counter_reconcile_job(db: Session, payload: dict) -> None:
+    from app.services.engagement_counters import reconcile_counters
+    from app.services.inbox import reconcile_unread
+    reconcile_counters(db)
+    reconcile_unread(db)
+
+
+@job_handler("rank_refresh", concurrency=1, max_attempts=2, backoff_seconds=30)
+def rank_refresh_job(db: Session, payload: dict) -> None:
+    from app.services.ranking import refresh_post_ranks
+    refresh_post_ranks(db)
+
+
+@job_handler("video_candidates", concurrency=1, max_attempts=2, backoff_seconds=60)
+def video_candidates_job(db: Session, payload: dict) -> None:
+    from app.services.video_feed import refresh_video_candidates
+    refresh_video_candidates(db)
+
+
+@job_handler("llm_cache_purge", concurrency=1, max_attempts=1)
+def llm_cache_purge_job(db: Session, payload: dict) -> None:
+    from app.services.llm_cache import purge_expired
+    purge_expired(db)
+
+
+@job_handler("job_purge", concurrency=1, max_attempts=1)
+def job_purge_job(db: Session, payload: dict) -> None:
+    purge_finished(db, int(os.getenv("JOB_RETENTION_HOURS", "72")))
+
+
+# ── Content ─────────────────────────────────────────────────────────────────
+
+@job_handler("extract_tags", concurrency=4, max_attempts=3, backoff_seconds=10)
+def extract_tags_job(db: Session, payload: dict) -> None:
+    from app.models.post import Post
+    from app.services.tag_extractor import save_tags_for_post
+    post = db.get(Post, int(payload["post_id"]))
+    if post is not None:
+        save_tags_for_post(db, post.id, post.title, post.body_md or "")
+
+
+@job_handler("moderate_post", concurrency=2, max_attempts=3, backoff_seconds=60)
+def moderate_post_job(db: Session, payload: dict) -> None:
+    from app.services.post_moderation_adapter import PostModerationAdapter
+    PostModerationAdapter().moderate_post(db, int(payload["post_id"]))
+
+
+@job_handler("moderate_batch", concurrency=2, max_attempts=3, backoff_seconds=60)
+def moderate_batch_job(db: Session, payload: dict) -> None:
+    from app.services.post_moderation_adapter import PostModerationAdapter
+    PostModerationAdapter().moderate_posts(db, [int(pid) for pid in payload["post_ids"]])
+
+
+@job_handler("moderation_sweep", concurrency=1, max_attempts=1)
+def moderation_sweep_job(db: Session, payload: dict) -> None:
+    """Queue moderation for every post still waiting on a score, a
+    MODERATION_BATCH_SIZE batch per job."""
+    from app.models.post import Post
+    from app.services.moderation_batch import BATCH_SIZE
+    ids = [pid for (pid,) in db.query(Post.id).filter(
+        Post.status == "needs_review", Post.policy_score.is_(None)
+    ).order_by(Post.id).limit(int(os.getenv("MODERATION_SWEEP_LIMIT", "100"))).all()]
+    for i in range(0, len(ids), BATCH_SIZE):
+        batch = ids[i:i + BATCH_SIZE]
+        enqueue(db, "moderate_batch", {"post_ids": batch},
+                dedupe_key=f"moderate_batch:{batch[0]}-{batch[-1]}", commit=False)
+    db.commit()
+
+
+# job_type -> interval seconds (env-overridable like the old schedulers)
+PERIODIC = {
+    "spawn_tick": int(os.getenv("SPAWN_LOOP_SECONDS", "60")),
+    "generate_post": int(os.getenv("POST_INTERVAL_MINUTES", "2")) * 60,
+    "reputation": int(os.getenv("REPUTATION_SECONDS", "3600")),
+    "counter_reconcile": int(os.getenv("COUNTER_RECONCILE_SECONDS", "3600")),
+    "rank_refresh": int(os.getenv("RANK_REFRESH_SECONDS", "120")),
+    "video_candidates": int(os.getenv("VIDEO_CANDIDATES_REFRESH_SECONDS", "300")),
+    "moderation_sweep": int(os.getenv("MODERATION_SWEEP_SECONDS", "300")),
+    "llm_cache_purge": 3600,
+    "job_purge": 3600,
+}
+
+
+def schedule_all_periodic(db: Session) -> None:
+    for job_type, every in PERIODIC.items():
+        schedule_periodic(db, job_type, every)
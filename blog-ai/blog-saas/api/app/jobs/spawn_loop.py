@@ -1,6 +1,8 @@
 import os
 import time
 import random
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional
 try:
     from dotenv import load_dotenv
     load_dotenv()
@@ -11,8 +13,9 @@ from sqlalchemy import desc
 from app.core.db import SessionLocal
 from app.models.post import Post
 from app.models.comment import Comment
-from app.models.agent_profile import AgentProfile
+from app.services.agent_roster import get_roster
 from app.services.comment_spawner import spawn_debate_for_post
+from app.services.spawn_writer import SpawnWriter
 from app.services.agent_post_generator import generate_post_for_agent
 try:
     from app.services.news_post_generator import generate_news_post
@@ -21,6 +24,7 @@ except Exception:
     HAS_NEWS = False
 from app.services.agent_selector import select_agent_for_post, select_agents_for_debate
 from app.services.human_reply_spawner import spawn_agent_replies_to_human
+from app.core import metrics
 from app.core.logging import get_logger
 
 log = get_logger(__name__)
@@ -31,6 +35,10 @@ MAX_POSTS      = int(os.getenv("SPAWN_LOOP_MAX_POSTS", "5"))
 DEBATE_ROUNDS  = int(os.getenv("DEBATE_ROUNDS", "2"))
 AGENTS_PER_POST = int(os.getenv("AGENTS_PER_POST", "6"))
 POST_INTERVAL_MIN = int(os.getenv("POST_INTERVAL_MINUTES", "2"))  # generar post cada 2 min (debug)
+# Concurrency: posts handled in parallel (each worker has its own session)
+# and LLM calls in flight per debate round. 1 / 1 = the old serial loop.
+POST_WORKERS   = max(1, int(os.getenv("SPAWN_LOOP_POST_WORKERS", "3")))
+LLM_WORKERS    = max(1, int(os.getenv("SPAWN_LOOP_LLM_WORKERS", "6")))
 
 
 def pick_agents_for_post(db, org_id: int, post: Post, n: int) -> list[int]:
@@ -38,35 +46,22 @@ def pick_agents_for_post(db, org_id: int, post: Post, n: int) -> list[int]:
     Selecciona agentes relevantes para un post según sus topics.
     Mezcla agentes con topics relevantes + agentes aleatorios para variedad.
     """
-    all_agents = db.query(AgentProfile).filter(
-        AgentProfile.org_id == org_id,
-        AgentProfile.is_enabled == True,
-        AgentProfile.is_shadow_banned == False,
-    ).all()
-
-    if not all_agents:
+    roster = get_roster(db, org_id)
+    if not roster.active:
         return []
 
-    # Extraer keywords del título del post
-    post_words = set((post.title or "").lower().split())
-
-    # Puntuar agentes por relevancia de topics
-    scored = []
-    for agent in all_agents:
-        agent_topics = set(t.strip().lower() for t in (agent.topics or "").split(","))
-        overlap = len(agent_topics & post_words)
-        scored.append((overlap, agent.id))
-
-    scored.sort(reverse=True)
+    # Agentes cuyos topics coinciden con palabras del título (índice invertido)
+    overlap = roster.topic_overlap((post.title or "").lower().split())
+    ranked = sorted(overlap, key=lambda a_id: (overlap[a_id], a_id), reverse=True)
 
     # Top 50% relevantes + aleatorios del resto
     top_n = max(n // 2, 1)
-    top_agents = [a_id for _, a_id in scored[:top_n * 3]][:top_n]
-    rest = [a_id for _, a_id in scored[top_n * 3:]]
-    random.shuffle(rest)
-    random_agents = rest[:n - len(top_agents)]
+    top_agents = ranked[:top_n]
+    taken = set(top_agents)
+    rest = [a.id for a in roster.active if a.id not in taken]
+    random_agents = random.sample(rest, min(n - len(top_agents), len(rest)))
 
-    selected = list(set(top_agents + random_agents))
+    selected = top_agents + random_agents
     random.shuffle(selected)
     return selected[:n]
 
@@ -77,7 +72,6 @@ def agent_vote_comments(db, org_id: int, post_id: int) -> None:
     Cada agente vota 1-3 comentarios recientes que no son suyos.
     """
     from app.models.comment import Comment
-    from sqlalchemy import text
 
     # Comentarios recientes del post (últimas 2h)
     cutoff = datetime.now(timezone.utc) - timedelta(hours=2)
@@ -93,13 +87,11 @@ def agent_vote_comments(db, org_id: int, post_id: int) -> None:
         return
 
     # Agentes activos — muestra aleatoria
-    agents = db.query(AgentProfile).filter(
-        AgentProfile.org_id == org_id,
-        AgentProfile.is_enabled == True,
-    ).order_by(AgentProfile.id).all()
+    agents = get_roster(db, org_id).enabled
 
     voter_sample = random.sample(agents, min(10, len(agents)))
 
+    writer = SpawnWriter(db)
     votes_added = 0
     for voter in voter_sample:
         # Comentarios de otros agentes
@@ -110,147 +102,194 @@ def agent_vote_comments(db, org_id: int, post_id: int) -> None:
         for comment in to_vote:
             # 70% upvote, 30% downvote — agentes tienden a ser positivos
             value = 1 if random.random() < 0.7 else -1
-            try:
-                db.execute(text(
-                    "INSERT INTO agent_votes (org_id, agent_id, comment_id, value, created_at) "
-                    "VALUES (:org_id, :agent_id, :comment_id, :value, :now) "
-                    "ON CONFLICT DO NOTHING"
-                ), {
-                    "org_id": org_id,
-                    "agent_id": voter.id,
-                    "comment_id": comment.id,
-                    "value": value,
-                    "now": datetime.now(timezone.utc).isoformat(),
-                })
-                votes_added += 1
-            except Exception:
-                pass
+            votes_added += writer.vote(org_id, voter.id, comment.id, value)
 
+    # un solo INSERT ... ON CONFLICT (executemany) para todos los votos
     if votes_added:
-        db.commit()
+        writer.commit()
         log.info("vote_loop_added", post_id=post_id, votes=votes_added)
 
 
+def debate_post(db, post_id: int, llm_pool: Optional[Executor] = None) -> None:
+    """Debate + agent votes for one post. Errors are logged, not raised,
+    matching the loop: the next tick simply tries again."""
+    p = db.get(Post, post_id)
+    if p is None:
+        return
+    debate_status = getattr(p, "debate_status", "none")
+
+    agent_ids_objs = select_agents_for_debate(db, ORG_ID, p, AGENTS_PER_POST)
+    agent_ids = [a.id for a in agent_ids_objs]
+    if not agent_ids:
+        return
+    try:
+        with metrics.stage("debate.spawn"):
+            comments = spawn_debate_for_post(
+                db=db,
+                org_id=ORG_ID,
+                post_id=p.id,
+                agent_ids=agent_ids,
+                rounds=1 if debate_status == "open" else DEBATE_ROUNDS,
+                publish=True,
+                source="debate",
+                llm_pool=llm_pool,
+            )
+        if comments:
+            if debate_status == "none":
+                p.debate_status = "open"
+                db.add(p)
+                db.commit()
+            log.info("debate_spawned", post_id=p.id, agents=agent_ids, comments=len(comments))
+    except Exception as de:
+        db.rollback()
+        log.error("debate_loop_error", post_id=p.id, error=repr(de))
+
+    # 2. Agentes votan comentarios existentes
+    try:
+        with metrics.stage("debate.votes"):
+            agent_vote_comments(db, ORG_ID, p.id)
+    except Exception as ve:
+        db.rollback()
+        log.error("vote_loop_error", post_id=p.id, error=repr(ve))
+
+
+def process_post(post_id: int, llm_pool: Optional[Executor] = None) -> None:
+    """debate_post() on its own session. One post is only ever handled by
+    one worker per tick, so its debate rounds and the votes that follow
+    keep their order."""
+    db = SessionLocal()
+    try:
+        debate_post(db, post_id, llm_pool)
+    finally:
+        db.close()
+
+
+def run_debates(post_ids: list[int], post_pool: Optional[Executor], llm_pool: Optional[Executor]) -> None:
+    if post_pool is None:
+        for pid in post_ids:
+            process_post(pid, llm_pool)
+        return
+    futures = [post_pool.submit(process_post, pid, llm_pool) for pid in post_ids]
+    for pid, fut in zip(post_ids, futures):
+        try:
+            fut.result()
+        except Exception as e:
+            log.error("debate_worker_error", post_id=pid, error=repr(e))
+
+
+def generate_auto_post(db) -> None:
+    """One auto-generated post from a random eligible agent."""
+    agents = get_roster(db, ORG_ID).active
+    if agents:
+        agent = random.choice(agents)
+        with metrics.stage("auto_post"):
+            post = generate_post_for_agent(
+                db, org_id=ORG_ID, agent_id=agent.id,
+                publish=True, source="auto"
+            )
+        log.info("post_generated", agent=agent.handle, post_id=post.id, title=post.title[:60])
+
+
+def recent_post_ids(db) -> list[int]:
+    rows = (
+        db.query(Post.id)
+        .filter(Post.org_id == ORG_ID, Post.status == "published")
+        .order_by(desc(Post.published_at), desc(Post.created_at))
+        .limit(MAX_POSTS)
+        .all()
+    )
+    return [r[0] for r in rows]
+
+
+def pending_human_comment_ids(db) -> list[int]:
+    """Recent human comments (last 10 min) that no agent has replied to."""
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=10)
+    human_comments = (
+        db.query(Comment.id)
+        .filter(
+            Comment.org_id == ORG_ID,
+            Comment.author_type == "user",
+            Comment.source == "human",
+            Comment.created_at >= cutoff,
+        )
+        .order_by(Comment.id.desc())
+        .limit(5)
+        .all()
+    )
+    ids = [cid for (cid,) in human_comments]
+    if not ids:
+        return []
+    answered = {
+        pid for (pid,) in db.query(Comment.parent_comment_id)
+        .filter(Comment.parent_comment_id.in_(ids), Comment.author_type == "agent")
+        .distinct()
+    }
+    return [cid for cid in ids if cid not in answered]
+
+
+def reply_to_human(db, comment_id: int) -> None:
+    hc = db.get(Comment, comment_id)
+    if hc is None:
+        return
+    _reply_post = db.get(Post, hc.post_id)
+    reply_agents_objs = select_agents_for_debate(db, ORG_ID, _reply_post, 3) if _reply_post else []
+    reply_agents = [a.id for a in reply_agents_objs]
+    with metrics.stage("human_reply"):
+        replies = spawn_agent_replies_to_human(
+            db=db,
+            org_id=ORG_ID,
+            post_id=hc.post_id,
+            human_comment_id=hc.id,
+            agent_ids=reply_agents or [1, 3, 7],
+            max_replies=2,
+        )
+    if replies:
+        log.info("human_reply_spawned", comment_id=hc.id, replies=len(replies))
+
+
 def main() -> None:
     log.info(
         "spawn_loop_started",
         org_id=ORG_ID,
         sleep_seconds=SLEEP_SECONDS,
         agents_per_post=AGENTS_PER_POST,
+        post_workers=POST_WORKERS,
+        llm_workers=LLM_WORKERS,
     )
 
     last_post_time = 0
+    post_pool = ThreadPoolExecutor(POST_WORKERS, thread_name_prefix="spawn-post") if POST_WORKERS > 1 else None
+    llm_pool = ThreadPoolExecutor(LLM_WORKERS, thread_name_prefix="spawn-llm") if LLM_WORKERS > 1 else None
 
     while True:
-        db = SessionLocal()
-        try:
-            # 0. Generar nuevo post si pasaron POST_INTERVAL_MIN minutos
-            import time as _time
-            if _time.time() - last_post_time > POST_INTERVAL_MIN * 60:
-                try:
-                    agents = db.query(AgentProfile).filter(
-                        AgentProfile.org_id == ORG_ID,
-                        AgentProfile.is_enabled == True,
-                        AgentProfile.is_shadow_banned == False,
-                    ).all()
-                    if agents:
-                        import random as _random
-                        agent = _random.choice(agents)
-                        post = generate_post_for_agent(
-                            db, org_id=ORG_ID, agent_id=agent.id,
-                            publish=True, source="auto"
-                        )
-                        last_post_time = _time.time()
-                        log.info("post_generated", agent=agent.handle, post_id=post.id, title=post.title[:60])
-                except Exception as pe:
-                    log.error("post_gen_error", error=repr(pe))
-
-            # 1. Debates en posts recientes
-            posts = (
-                db.query(Post)
-                .filter(Post.org_id == ORG_ID, Post.status == "published")
-                .order_by(desc(Post.published_at), desc(Post.created_at))
-                .limit(MAX_POSTS)
-                .all()
-            )
+        # stage_db/stage_llm of the tick cover this thread only; debates
+        # on the post pool report their own debate.* stages
+        with metrics.stage("spawn_tick"):
+            db = SessionLocal()
+            try:
+                # 0. Generar nuevo post si pasaron POST_INTERVAL_MIN minutos
+                if time.time() - last_post_time > POST_INTERVAL_MIN * 60:
+                    try:
+                        generate_auto_post(db)
+                        last_post_time = time.time()
+                    except Exception as pe:
+                        log.error("post_gen_error", error=repr(pe))
 
-            for p in posts:
-                debate_status = getattr(p, "debate_status", "none")
-
-                agent_ids_objs = select_agents_for_debate(db, ORG_ID, p, AGENTS_PER_POST)
-                agent_ids = [a.id for a in agent_ids_objs]
-                if not agent_ids:
-                    continue
-                try:
-                    comments = spawn_debate_for_post(
-                        db=db,
-                        org_id=ORG_ID,
-                        post_id=p.id,
-                        agent_ids=agent_ids,
-                        rounds=1 if debate_status == "open" else DEBATE_ROUNDS,
-                        publish=True,
-                        source="debate",
-                    )
-                    if comments:
-                        if debate_status == "none":
-                            p.debate_status = "open"
-                            db.add(p)
-                            db.commit()
-                        log.info("debate_spawned", post_id=p.id, agents=agent_ids, comments=len(comments))
-                except Exception as de:
-                    log.error("debate_loop_error", post_id=p.id, error=repr(de))
-
-                # 2. Agentes votan comentarios existentes
-                try:
-                    agent_vote_comments(db, ORG_ID, p.id)
-                except Exception as ve:
-                    log.error("vote_loop_error", post_id=p.id, error=repr(ve))
-
-            # 3. Responder a comentarios humanos recientes
-            cutoff = datetime.now(timezone.utc) - timedelta(minutes=10)
-            human_comments = (
-                db.query(Comment)
-                .filter(
-                    Comment.org_id == ORG_ID,
-                    Comment.author_type == "user",
-                    Comment.source == "human",
-                    Comment.created_at >= cutoff,
-                )
-                .order_by(Comment.id.desc())
-                .limit(5)
-                .all()
-            )
+                # 1. Debates en posts recientes (+ 2. votos de agentes)
+                run_debates(recent_post_ids(db), post_pool, llm_pool)
 
-            for hc in human_comments:
-                existing_reply = (
-                    db.query(Comment)
-                    .filter(
-                        Comment.parent_comment_id == hc.id,
-                        Comment.author_type == "agent",
-                    ).first()
-                )
-                if not existing_reply:
-                    _reply_post = db.query(Post).get(hc.post_id)
-                    reply_agents_objs = select_agents_for_debate(db, ORG_ID, _reply_post, 3) if _reply_post else []
-                    reply_agents = [a.id for a in reply_agents_objs]
+                # 3. Responder a comentarios humanos recientes
+                for cid in pending_human_comment_ids(db):
                     try:
-                        replies = spawn_agent_replies_to_human(
-                            db=db,
-                            org_id=ORG_ID,
-                            post_id=hc.post_id,
-                            human_comment_id=hc.id,
-                            agent_ids=reply_agents or [1, 3, 7],
-                            max_replies=2,
-                        )
-                        if replies:
-                            log.info("human_reply_spawned", comment_id=hc.id, replies=len(replies))
+                        reply_to_human(db, cid)
                     except Exception as e:
-                        log.error("human_reply_error", comment_id=hc.id, error=repr(e))
+                        db.rollback()
+                        log.error("human_reply_error", comment_id=cid, error=repr(e))
 
-        except Exception as e:
-            log.error("spawn_loop_error", error=repr(e))
-        finally:
-            db.close()
+            except Exception as e:
+                log.error("spawn_loop_error", error=repr(e))
+            finally:
+                db.close()
 
         time.sleep(SLEEP_SECONDS)
 
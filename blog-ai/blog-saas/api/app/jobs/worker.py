@@ -0,0 +1,115 @@
+"""
+Standalone job worker.
+
+    python -m app.jobs.worker
+
+Drains the `jobs` table (see app.services.job_queue) with a pool of
+JOB_WORKER_THREADS threads, each job on its own session. Every worker also
+schedules the periodic jobs and reaps expired leases, so running one or
+many of these processes needs no coordination beyond Postgres. This is
+what Dockerfile.scheduler runs; set JOB_QUEUE_ENABLED=true on the web
+service so it stops starting its own background threads.
+"""
+from __future__ import annotations
+
+import os
+import signal
+import socket
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+from app.core.db import SessionLocal
+from app.core.logging import get_logger
+from app.jobs.handlers import schedule_all_periodic
+from app.services.job_queue import claim_jobs, reap_stale, run_job
+
+log = get_logger(__name__)
+
+THREADS = max(1, int(os.getenv("JOB_WORKER_THREADS", "8")))
+POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+HOUSEKEEPING_SECONDS = int(os.getenv("JOB_HOUSEKEEPING_SECONDS", "15"))
+
+
+class Worker:
+    def __init__(self, session_factory=SessionLocal, threads: int = THREADS):
+        self.session_factory = session_factory
+        self.threads = threads
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix="job")
+        self._inflight: set[Future] = set()
+        self._last_housekeeping = 0.0
+        self._stopping = False
+
+    def stop(self, *_args) -> None:
+        log.info("job_worker_stopping", worker_id=self.worker_id, inflight=len(self._inflight))
+        self._stopping = True
+
+    def housekeeping(self) -> None:
+        db = self.session_factory()
+        try:
+            schedule_all_periodic(db)
+            reap_stale(db)
+        finally:
+            db.close()
+
+    def tick(self) -> int:
+        """Claim as many jobs as there are free threads. Returns how many
+        were started."""
+        if time.monotonic() - self._last_housekeeping >= HOUSEKEEPING_SECONDS:
+            try:
+                self.housekeeping()
+            except Exception as e:
+                log.error("job_housekeeping_error", error=repr(e))
+            self._last_housekeeping = time.monotonic()
+
+        self._inflight = {f for f in self._inflight if not f.done()}
+        free = self.threads - len(self._inflight)
+        if free <= 0:
+            return 0
+
+        db = self.session_factory()
+        try:
+            jobs = claim_jobs(db, self.worker_id, free)
+        finally:
+            db.close()
+
+        for job in jobs:
+            log.info("job_started", job_id=job.id, job_type=job.job_type, attempt=job.attempts)
+            self._inflight.add(
+                self._pool.submit(run_job, self.session_factory, job.id, job.job_type, job.payload, self.worker_id)
+            )
+        return len(jobs)
+
+    def run_forever(self) -> None:
+        log.info("job_worker_started", worker_id=self.worker_id, threads=self.threads)
+        while not self._stopping:
+            try:
+                started = self.tick()
+            except Exception as e:
+                log.error("job_worker_error", error=repr(e))
+                started = 0
+            if not started:
+                time.sleep(POLL_SECONDS)
+        # let running jobs finish; anything cut off is reaped via its lease
+        self._pool.shutdown(wait=True)
+        log.info("job_worker_stopped", worker_id=self.worker_id)
+
+
+def main() -> None:
+    from app.core.metrics import get_store
+    get_store()  # job stages show up on the web service's /metrics
+    worker = Worker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
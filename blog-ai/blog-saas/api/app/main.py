@@ -42,16 +42,16 @@ from app.api.v1.auth import router as auth_router
 FastAPI app - VERSIÓN SIMPLE QUE FUNCIONA
 """
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.v1.api import api_router
-from fastapi import Depends, HTTPException
+from fastapi import Depends, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 import uvicorn
 
 from app.core.db import SessionLocal, engine, Base
 from app.core.deps import require_superuser
-from app.core.rate_limit import limiter
+from app.core.rate_limit import LLM_ROUTE_LIMIT, limiter, user_or_ip
 from app.models.post import Post
 from app.models.user import User
 from app.models.org import Org
@@ -89,6 +89,39 @@ def _reputation_scheduler():
         _time.sleep(3600)
 
 
+def _counter_reconcile_scheduler():
+    _time.sleep(60)
+    while True:
+        try:
+            from app.services.engagement_counters import run_counter_reconcile_job
+            run_counter_reconcile_job()
+        except Exception as e:
+            _log.error("counter_reconcile_error", error=str(e))
+        _time.sleep(int(_os.getenv("COUNTER_RECONCILE_SECONDS", "3600")))
+
+
+def _rank_refresh_scheduler():
+    _time.sleep(20)
+    while True:
+        try:
+            from app.services.ranking import run_rank_refresh_job
+            run_rank_refresh_job()
+        except Exception as e:
+            _log.error("rank_refresh_error", error=str(e))
+        _time.sleep(int(_os.getenv("RANK_REFRESH_SECONDS", "120")))
+
+
+def _video_candidates_scheduler():
+    _time.sleep(25)
+    while True:
+        try:
+            from app.services.video_feed import run_video_candidates_job
+            run_video_candidates_job()
+        except Exception as e:
+            _log.error("video_candidates_error", error=str(e))
+        _time.sleep(int(_os.getenv("VIDEO_CANDIDATES_REFRESH_SECONDS", "300")))
+
+
 _leader_lock_fd = None
 
 def _try_become_leader() -> bool:
@@ -154,16 +187,40 @@ app.add_middleware(
 # Request-id correlation: bound LAST so it runs FIRST (Starlette executes
 # middleware in reverse-add order). Every log emitted inside the request
 # inherits the bound contextvars (request_id, method, path).
-from app.core.middleware import RequestIdMiddleware
+from app.core import query_profiler
+from app.core.middleware import MetricsMiddleware, QueryProfilerMiddleware, RequestIdMiddleware
+if query_profiler.ENABLED:
+    app.add_middleware(QueryProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(RequestIdMiddleware)
 
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # write out buffered live chat before the worker goes away
+    from app.services.live_chat import get_chat_writer
+    from app.services.live_broker import get_hub
+    try:
+        await get_chat_writer().close()
+        await get_hub().close()
+    except Exception as e:
+        _log.error("live_shutdown_error", error=str(e))
+
+
 @app.on_event("startup")
 async def startup_event():
+    from app.core.metrics import get_store
+    get_store()  # start flushing this worker's metrics snapshot, if shared
+
     if _os.getenv("ENABLE_BG_JOBS", "true").strip().lower() in ("0", "false", "no", "off"):
         _log.info("bg_jobs_skipped", reason="ENABLE_BG_JOBS is off")
         return
+    from app.services.job_queue import queue_enabled
+    if queue_enabled():
+        # app.jobs.worker processes own all background work
+        _log.info("bg_jobs_skipped", reason="JOB_QUEUE_ENABLED, handled by app.jobs.worker")
+        return
     if not _try_become_leader():
         _log.info("bg_jobs_skipped", reason="not leader", pid=_os.getpid())
         return
@@ -175,6 +232,18 @@ async def startup_event():
     t1.start()
     _log.info("reputation_scheduler_started")
 
+    t3 = threading.Thread(target=_counter_reconcile_scheduler, daemon=True)
+    t3.start()
+    _log.info("counter_reconcile_scheduler_started")
+
+    t4 = threading.Thread(target=_rank_refresh_scheduler, daemon=True)
+    t4.start()
+    _log.info("rank_refresh_scheduler_started")
+
+    t5 = threading.Thread(target=_video_candidates_scheduler, daemon=True)
+    t5.start()
+    _log.info("video_candidates_scheduler_started")
+
     def _spawn_loop():
         import time as _t
         _t.sleep(15)
@@ -200,6 +269,18 @@ async def health_check():
     return {"status": "healthy", "service": "scouta-api"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: str | None = Header(default=None)):
+    """Prometheus scrape endpoint: every live process's counters summed
+    (see app.core.metrics). With METRICS_TOKEN set, requires
+    `Authorization: Bearer <token>`."""
+    from app.core.metrics import render
+    token = _os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/health/ready")
 async def health_ready():
     """Readiness probe — fails fast (503) if the database is unreachable."""
@@ -232,8 +313,10 @@ async def root():
 from fastapi.security import OAuth2PasswordRequestForm
 
 @app.post("/api/v1/orgs/{org_id}/generate-post")
+@limiter.limit(LLM_ROUTE_LIMIT, key_func=user_or_ip)
 async def generate_post(
     org_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     _: User = Depends(require_superuser),
 ):
@@ -304,61 +387,14 @@ async def get_posts(org_id: int, db: Session = Depends(get_db), limit: int = 50,
         cols = [c.key for c in _inspect(Post).columns]
         posts = [dict(zip(cols, r)) for r in rows]
         return posts
-    from sqlalchemy import text as _text2
     from sqlalchemy import inspect as _insp
-    def rows_to_posts(rows):
+
+    if sort in ("top", "hot", "commented"):
+        from app.services.ranking import load_ranked_posts, ranked_post_ids
+        ranked_ids, _ = ranked_post_ids(db, org_id, sort, limit, status=status)
         cols = [c.key for c in _insp(Post).columns]
-        result = []
-        for r in rows:
-            d = {}
-            for i, col in enumerate(cols):
-                try:
-                    d[col] = r[i]
-                except:
-                    d[col] = None
-            result.append(d)
-        return result
-
-    if sort == "top":
-        rows = db.execute(_text2("""
-            SELECT p.* FROM posts p
-            LEFT JOIN post_votes pv ON pv.post_id = p.id
-            WHERE p.org_id = :org_id AND p.status = :status
-            GROUP BY p.id
-            ORDER BY COALESCE(SUM(pv.value),0) DESC, p.created_at DESC
-            LIMIT :limit
-        """), {"org_id": org_id, "status": status, "limit": limit}).fetchall()
-        return rows_to_posts(rows)
-    elif sort == "hot":
-        rows = db.execute(_text2("""
-            SELECT p.*
-            FROM posts p
-            LEFT JOIN (
-              SELECT post_id, COUNT(*) as comment_cnt
-              FROM comments WHERE status = 'published'
-              GROUP BY post_id
-            ) c ON c.post_id = p.id
-            WHERE p.org_id = :org_id AND p.status = :status
-            ORDER BY
-              (COALESCE(c.comment_cnt, 0) * 5.0) /
-              POWER(EXTRACT(EPOCH FROM (NOW() - p.created_at))/3600.0 + 2, 1.5) DESC
-            LIMIT :limit
-        """), {"org_id": org_id, "status": status, "limit": limit}).fetchall()
-        return rows_to_posts(rows)
-    elif sort == "commented":
-        rows = db.execute(_text2("""
-            SELECT p.* FROM posts p
-            LEFT JOIN (
-              SELECT post_id, COUNT(*) as cnt FROM comments
-              WHERE status = 'published' GROUP BY post_id
-            ) c ON c.post_id = p.id
-            WHERE p.org_id = :org_id AND p.status = :status
-            ORDER BY COALESCE(c.cnt, 0) DESC, p.created_at DESC
-            LIMIT :limit
-        """), {"org_id": org_id, "status": status, "limit": limit}).fetchall()
-        return rows_to_posts(rows)
-    else:
-        posts = db.query(Post).filter(Post.org_id == org_id, Post.status == status).order_by(Post.created_at.desc()).limit(limit).all()
+        return [{col: getattr(p, col, None) for col in cols} for p in load_ranked_posts(db, ranked_ids)]
+    posts = db.query(Post).filter(Post.org_id == org_id, Post.status == status).order_by(Post.created_at.desc()).limit(limit).all()
     return {"posts": [
         {
             "id": p.id,
@@ -29,3 +29,11 @@ from app.models.platform_earnings import PlatformEarnings
 from app.models.withdrawal_request import WithdrawalRequest
 from app.models.vip_list import VipList
 from app.models.user_subscription import UserSubscription
+from app.models.post_stats import PostStats, CommentStats
+from app.models.post_rank import PostRank
+from app.models.job import Job
+from app.models.video_candidate import VideoCandidate
+from app.models.live_room import LiveJoinRequest, LiveRoomBlock, LiveRoomLease
+from app.models.llm_cache_entry import LLMCacheEntry
+from app.models.post_context import PostContext
+from app.models import search_index  # noqa: F401  (FTS DDL hooks)
@@ -0,0 +1,39 @@
+"""
+Durable background job.
+
+Rows are claimed by app.jobs.worker processes with SELECT ... FOR UPDATE
+SKIP LOCKED, so any number of workers can drain the table concurrently.
+`dedupe_key` is unique: periodic jobs use one key per time bucket so only
+one worker schedules each run, event jobs use one key per subject.
+"""
+from sqlalchemy import DateTime, Integer, String, Text, func, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_type: Mapped[str] = mapped_column(String(60), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+
+    # queued | running | done | dead
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued", server_default="queued")
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=5, server_default="5")
+    run_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    dedupe_key: Mapped[str] = mapped_column(String(200), nullable=True, unique=True)
+    locked_by: Mapped[str] = mapped_column(String(120), nullable=True)
+    locked_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+# claim scan: WHERE status='queued' AND job_type=? AND run_at<=now ORDER BY priority, run_at
+Index("ix_jobs_claim", Job.status, Job.job_type, Job.run_at)
@@ -0,0 +1,40 @@
+"""
+Shared live-room state.
+
+Pending co-host join requests, per-room chat blocks and short leases
+(e.g. which process runs a room's AI commenter) used to live in
+module-level dicts in app/api/v1/live.py, so every gunicorn worker had its
+own copy. They live here now so all workers and nodes see the same state;
+see app/services/live_rooms.py.
+"""
+from sqlalchemy import DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class LiveJoinRequest(Base):
+    __tablename__ = "live_join_requests"
+
+    room_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    username: Mapped[str] = mapped_column(String(60), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    display_name: Mapped[str] = mapped_column(String(120), nullable=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class LiveRoomBlock(Base):
+    __tablename__ = "live_room_blocks"
+
+    room_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    username: Mapped[str] = mapped_column(String(60), primary_key=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class LiveRoomLease(Base):
+    __tablename__ = "live_room_leases"
+
+    room_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    lease: Mapped[str] = mapped_column(String(40), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(120), nullable=False)
+    expires_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,28 @@
+"""
+Persistent tier of the LLM response cache.
+
+One row per distinct prompt, keyed by the sha256 of (candidate providers
+and models, system, user, temperature, max_tokens) — see
+app.services.llm_cache. Rows past expires_at are ignored on read and
+deleted by the llm_cache_purge job.
+"""
+from sqlalchemy import DateTime, Index, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # call-site policy name ("moderation", ...)
+    site: Mapped[str] = mapped_column(String(40), nullable=False)
+    provider: Mapped[str] = mapped_column(String(40), nullable=False)
+    model: Mapped[str] = mapped_column(String(120), nullable=False)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+Index("ix_llm_cache_expires", LLMCacheEntry.expires_at)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.core.db import Base
 
@@ -10,6 +10,12 @@ class Conversation(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_message_at = Column(DateTime(timezone=True), server_default=func.now())
     last_message_preview = Column(String(200), nullable=True)
+    # per participant: unread messages from the other side, newest message
+    # id read — maintained by app.services.inbox
+    user1_unread = Column(Integer, nullable=False, default=0, server_default="0")
+    user2_unread = Column(Integer, nullable=False, default=0, server_default="0")
+    user1_last_read_id = Column(Integer, nullable=True)
+    user2_last_read_id = Column(Integer, nullable=True)
 
 class Message(Base):
     __tablename__ = "messages"
@@ -19,3 +25,10 @@ class Message(Base):
     body = Column(Text, nullable=False)
     read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# the inbox: a user's conversations by recent activity, either side
+Index("ix_conversations_user1_activity", Conversation.user1_id, Conversation.last_message_at, Conversation.id)
+Index("ix_conversations_user2_activity", Conversation.user2_id, Conversation.last_message_at, Conversation.id)
+
+# keyset paging of a conversation, newest first
+Index("ix_messages_conv_created", Message.conversation_id, Message.created_at, Message.id)
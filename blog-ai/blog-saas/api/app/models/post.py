@@ -2,7 +2,7 @@
 """
 Post Model - VERSIÓN CORREGIDA con autoincrement
 """
-from sqlalchemy import DateTime, ForeignKey, String, Text, func, Index
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from typing import Optional
 
@@ -39,6 +39,9 @@ class Post(Base):
 
     # Estado
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="draft")
+    # Moderación (0 = seguro, 100 = rechazar); None = aún sin score
+    policy_score: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    policy_reason: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
 
     # Fechas
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
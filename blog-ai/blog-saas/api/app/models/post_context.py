@@ -0,0 +1,30 @@
+"""
+Compact LLM context per post — see app/services/debate_context.py.
+
+digest is a short version of the post, valid while body_hash matches the
+post's title + body; summary folds in the post's comments up to
+summarized_through_id, and is advanced a batch of comments at a time.
+"""
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class PostContext(Base):
+    __tablename__ = "post_contexts"
+
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    org_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # sha256 of the title + body the digest was made from
+    body_hash: Mapped[str] = mapped_column(String(64), nullable=False, default="", server_default="")
+    digest: Mapped[str] = mapped_column(Text, nullable=False, default="", server_default="")
+
+    summary: Mapped[str] = mapped_column(Text, nullable=False, default="", server_default="")
+    summarized_through_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    summarized_comments: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False,
+    )
@@ -0,0 +1,36 @@
+"""
+Precomputed feed ranking.
+
+One row per published post holding every sort key the feeds page over.
+hot_score / feed_score decay with age so they are rewritten by the
+periodic refresh in app/services/ranking.py; each sort has an
+(org_id, key, post_id) index so a page is a single index range scan
+regardless of how many posts exist.
+"""
+from sqlalchemy import DateTime, Float, ForeignKey, Integer, func, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class PostRank(Base):
+    __tablename__ = "post_rank"
+
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    org_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    # (comments * 5) / (age_h + 2) ^ 1.5
+    hot_score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    # (post_upvotes * 3 + human_comments * 5 + comments) / (age_h + 2) ^ 1.5
+    feed_score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    # post upvotes - downvotes
+    top_score: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    comment_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    refreshed_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+Index("ix_post_rank_org_hot", PostRank.org_id, PostRank.hot_score, PostRank.post_id)
+Index("ix_post_rank_org_feed", PostRank.org_id, PostRank.feed_score, PostRank.post_id)
+Index("ix_post_rank_org_top", PostRank.org_id, PostRank.top_score, PostRank.post_id)
+Index("ix_post_rank_org_commented", PostRank.org_id, PostRank.comment_count, PostRank.post_id)
@@ -0,0 +1,56 @@
+"""
+Materialized engagement counters.
+
+One row per post / per comment, bumped incrementally by the write paths
+(see app/services/engagement_counters.py) so feed endpoints can read
+comment / vote / save / view counts without a GROUP BY over the source
+tables on every request.
+"""
+from sqlalchemy import DateTime, ForeignKey, Integer, func, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class PostStats(Base):
+    __tablename__ = "post_stats"
+
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    org_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+
+    # published comments only
+    comment_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    human_comment_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # post_votes
+    upvotes: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    downvotes: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # upvotes received by the post's comments (what list_posts shows as upvote_count)
+    comment_upvotes: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    saves: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # video_views
+    views: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    completed_views: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class CommentStats(Base):
+    __tablename__ = "comment_stats"
+
+    comment_id: Mapped[int] = mapped_column(ForeignKey("comments.id", ondelete="CASCADE"), primary_key=True)
+    post_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+
+    upvotes: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    downvotes: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+Index("ix_post_stats_org_comments", PostStats.org_id, PostStats.comment_count)
+Index("ix_post_stats_org_upvotes", PostStats.org_id, PostStats.upvotes)
+# incremental reputation: comments whose votes changed since the last run
+Index("ix_comment_stats_updated_at", CommentStats.updated_at)
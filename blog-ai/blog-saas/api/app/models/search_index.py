@@ -0,0 +1,105 @@
+"""
+Full-text search schema for posts and agent_profiles.
+
+Postgres: a plain `search_vector` tsvector column on each table (weighted
+A/B/C), filled by a BEFORE INSERT/UPDATE trigger, with a GIN index. Not a
+STORED generated column: adding one rewrites the whole table under an
+ACCESS EXCLUSIVE lock, while adding a nullable column is a catalog change
+and the existing rows are backfilled in batches by the
+m20261018_search_index migration. Databases built with create_all get
+the same objects from the after_create hooks below.
+
+SQLite (local dev / tests): external-content FTS5 tables posts_fts and
+agents_fts kept in sync by triggers, created right after the base tables.
+
+Neither column/table is mapped on the ORM models; app.services.search
+queries them directly.
+"""
+from sqlalchemy import DDL, event
+
+from app.models.agent_profile import AgentProfile
+from app.models.post import Post
+
+# 'simple' — content is multilingual, so no language-specific stemming
+TS_CONFIG = "simple"
+
+
+def posts_tsvector(row: str = "") -> str:
+    """The posts vector over the columns of `row` ("new." in the trigger)."""
+    return (
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({row}title, '')), 'A') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({row}excerpt, '')), 'B') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({row}body_md, '')), 'C')"
+    )
+
+
+def agents_tsvector(row: str = "") -> str:
+    return (
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({row}display_name, '') || ' ' || "
+        f"coalesce({row}handle, '')), 'A') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({row}topics, '')), 'B') || "
+        f"setweight(to_tsvector('{TS_CONFIG}', coalesce({row}bio, '')), 'C')"
+    )
+
+
+def _pg_ddl(table: str, vector, cols: list[str]) -> list[str]:
+    fn = f"{table}_search_vector_fill"
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector",
+        f"CREATE OR REPLACE FUNCTION {fn}() RETURNS trigger LANGUAGE plpgsql AS $$ "
+        f"BEGIN NEW.search_vector := {vector('NEW.')}; RETURN NEW; END $$",
+        f"DROP TRIGGER IF EXISTS {fn} ON {table}",
+        f"CREATE TRIGGER {fn} BEFORE INSERT OR UPDATE OF {', '.join(cols)} ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {fn}()",
+    ]
+
+
+# column, function and trigger; the GIN index is separate so the migration
+# can build it CONCURRENTLY
+POSTGRES_DDL = {
+    "posts": _pg_ddl("posts", posts_tsvector, ["title", "excerpt", "body_md"]),
+    "agent_profiles": _pg_ddl("agent_profiles", agents_tsvector, ["display_name", "handle", "topics", "bio"]),
+}
+POSTGRES_INDEXES = {
+    "posts": "ix_posts_search_vector",
+    "agent_profiles": "ix_agent_profiles_search_vector",
+}
+
+
+def postgres_index_ddl(table: str, concurrently: bool = False) -> str:
+    how = "CONCURRENTLY " if concurrently else ""
+    return f"CREATE INDEX {how}IF NOT EXISTS {POSTGRES_INDEXES[table]} ON {table} USING GIN (search_vector)"
+
+
+def _fts5_ddl(fts: str, table: str, cols: list[str]) -> list[str]:
+    col_list = ", ".join(cols)
+    new_vals = ", ".join(f"coalesce(new.{c}, '')" for c in cols)
+    old_vals = ", ".join(f"coalesce(old.{c}, '')" for c in cols)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({col_list}, content='{table}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', old.id, {old_vals}); "
+        f"INSERT INTO {fts}(rowid, {col_list}) VALUES (new.id, {new_vals}); END",
+    ]
+
+
+SQLITE_DDL = {
+    "posts": _fts5_ddl("posts_fts", "posts", ["title", "excerpt", "body_md"]),
+    "agent_profiles": _fts5_ddl("agents_fts", "agent_profiles", ["display_name", "handle", "topics", "bio"]),
+}
+
+
+def _register(table, name: str) -> None:
+    for stmt in [*POSTGRES_DDL[name], postgres_index_ddl(name)]:
+        event.listen(table, "after_create", DDL(stmt).execute_if(dialect="postgresql"))
+    for stmt in SQLITE_DDL[name]:
+        event.listen(table, "after_create", DDL(stmt).execute_if(dialect="sqlite"))
+
+
+_register(Post.__table__, "posts")
+_register(AgentProfile.__table__, "agent_profiles")
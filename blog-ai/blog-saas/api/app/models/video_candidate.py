@@ -0,0 +1,38 @@
+"""
+Precomputed global signals for the video feed.
+
+One row per recent published video post, rewritten by
+app.services.video_feed.refresh_video_candidates(). Holds everything the
+feed scores on that doesn't depend on the viewer — decayed trending score,
+save and watch scores, detected language, tags — so a feed request never
+scans saved_posts / video_views or regexes post bodies.
+"""
+from sqlalchemy import DateTime, Float, ForeignKey, Integer, String, Text, func, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class VideoCandidate(Base):
+    __tablename__ = "video_candidates"
+
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    org_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    author_user_id: Mapped[int] = mapped_column(Integer, nullable=True)
+
+    language: Mapped[str] = mapped_column(String(8), nullable=False, default="en", server_default="en")
+    # comma-separated post_tags.tag
+    tags: Mapped[str] = mapped_column(Text, nullable=False, default="", server_default="")
+
+    # min((upvotes*2 + comments) / (age_h + 2)^1.5 / 10, 1)
+    trending: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    # min(saves / 10, 1)
+    save_score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    # min(completion * 0.6 + min(views / 100, 1) * 0.4, 1)
+    watch_score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+
+    post_created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=True)
+    refreshed_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+Index("ix_video_candidates_org_created", VideoCandidate.org_id, VideoCandidate.post_created_at)
@@ -13,9 +13,9 @@ def _make_idempotency_key(org_id: int, post_id: int, n: int, force: bool) -> str
     return f"spawn:org={org_id}:post={post_id}:n={n}:force={int(force)}"
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import desc
+from sqlalchemy import desc, inspect
 
-from app.models.agent_profile import AgentProfile
+from app.services.agent_roster import get_roster, load_agents
 from app.models.agent_action import AgentAction
 from app.models.org_settings import OrgSettings
 from app.models.agent_policy import AgentPolicy
@@ -24,16 +24,19 @@ from app.models.comment import Comment
 from app.models.org_usage_daily import OrgUsageDaily
 from app.services.persona_writer import Persona, write_comment
 from app.services.llm_client import LLMClient  # ✅ Cambiado de deepseek_client
-from app.services.moderation_scorer_patch import score_text_with_llm  # ✅ Cambiado de moderation_scorer
+from app.services.moderation_batch import score_texts
+from app.services.comment_spawner import _comment_hash
+from app.services.spawn_writer import SpawnWriter
 
-def _materialize_published_comment_action(db, action) -> None:
+def _materialize_published_comment_action(writer: SpawnWriter, action) -> None:
     """
-    If action is a published 'comment' action, create a real Comment row (idempotent).
+    If action is a published 'comment' action, queue a real Comment row on
+    `writer` (idempotent by comment_hash). Caller commits the writer.
     Supports:
       - target_type='post'   -> creates top-level comment on that post
       - target_type='comment'-> creates reply to an existing comment
     """
-    if getattr(action, "action_type", None) != "comment":
+    if getattr(action, "action_type", None) not in ("comment", "reply"):
         return
     if getattr(action, "status", None) != "published":
         return
@@ -47,7 +50,7 @@ def _materialize_published_comment_action(db, action) -> None:
     if getattr(action, "target_type", None) == "post":
         post_id = int(action.target_id)
     elif getattr(action, "target_type", None) == "comment":
-        parent = db.query(Comment).filter(Comment.id == int(action.target_id)).one_or_none()
+        parent = writer.db.get(Comment, int(action.target_id))
         if not parent:
             return
         post_id = int(parent.post_id)
@@ -55,36 +58,21 @@ def _materialize_published_comment_action(db, action) -> None:
     else:
         return
 
-    # Idempotency: avoid duplicates if same agent posted same body on same post
-    exists = (
-        db.query(Comment)
-          .filter(Comment.post_id == post_id)
-          .filter(Comment.author_type == "agent")
-          .filter(Comment.author_agent_id == int(action.agent_id))
-          .filter(Comment.body == body)
-          .one_or_none()
-    )
-    if exists:
-        return
-
-    c = Comment(
-        org_id=int(action.org_id),
-        post_id=post_id,
-        parent_comment_id=parent_comment_id,
-        author_type="agent",
-        author_user_id=None,
-        author_agent_id=int(action.agent_id),
-        body=body,
-        status="published",
+    org_id, agent_id = int(action.org_id), int(action.agent_id)
+    writer.comment(
+        Comment(
+            org_id=org_id,
+            post_id=post_id,
+            author_type="agent",
+            author_user_id=None,
+            author_agent_id=agent_id,
+            body=body,
+            status="published",
+            source="action",
+            comment_hash=_comment_hash(org_id, post_id, agent_id, body, "action"),
+        ),
+        parent=parent_comment_id,
     )
-    db.add(c)
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
-        # if unique index exists, fetch existing by idempotency_key
-        # Note: creation of Comment succeeded, idempotency is handled by the unique query above
-        pass  # TODO: Revisar lógica de idempotencia aquí
 
 
 def _idempotency_key(*parts: str) -> str:
@@ -208,12 +196,7 @@ def spawn_actions_for_post(db: Session, org_id: int, post_id: int, max_n: int, f
     if usage.actions_spawned >= int(settings.max_actions_per_day):
         return []
 
-    agents = (
-        db.query(AgentProfile)
-        .filter(AgentProfile.org_id == org_id, AgentProfile.is_enabled == True)  # noqa: E712
-        .order_by(AgentProfile.id.asc())
-        .all()
-    )
+    agents = get_roster(db, org_id).enabled
     if not agents:
         return []
 
@@ -231,7 +214,7 @@ def spawn_actions_for_post(db: Session, org_id: int, post_id: int, max_n: int, f
         .all()
     }
 
-    available = [a for a in agents if a.id not in recent_agent_ids] or agents[:]
+    available = [a for a in agents if a.id not in recent_agent_ids] or list(agents)
 
     n = min(int(max_n), int(settings.max_agents_per_post), len(available))
     if n <= 0:
@@ -247,7 +230,7 @@ def spawn_actions_for_post(db: Session, org_id: int, post_id: int, max_n: int, f
     )
     do_replies = bool(published_comments) and (random.random() < 0.30)
 
-    chosen = random.sample(available, k=n)
+    chosen = load_agents(db, [a.id for a in random.sample(available, k=n)])
 
     existing_hashes = {
         r[0]
@@ -257,9 +240,10 @@ def spawn_actions_for_post(db: Session, org_id: int, post_id: int, max_n: int, f
         if r[0]
     }
 
-    created: list[AgentAction] = []
+    candidates: list[AgentAction] = []
     llm = LLMClient()  # ✅ Cliente unificado
 
+    drafts = []
     for agent in chosen:
         persona = Persona(
             display_name=agent.display_name,
@@ -267,19 +251,21 @@ def spawn_actions_for_post(db: Session, org_id: int, post_id: int, max_n: int, f
             topics=agent.topics or "",
             persona_seed=agent.persona_seed or "",
         )
+        drafts.append((agent, write_comment(persona, post_title=post.title, post_body=post.body_md)))
 
-        content = write_comment(persona, post_title=post.title, post_body=post.body_md)
-
-        # policy scoring usando LLM unificado
-        policy_score = 0
-        policy_reason = "persona_template"
-        try:
-            # ✅ Usar score_text_with_llm en lugar de score_text_with_deepseek
-            res = score_text_with_llm(content)
+    # policy scoring: every draft in one batched moderation call
+    try:
+        scores = score_texts((i, content) for i, (_, content) in enumerate(drafts))
+    except Exception as e:
+        log.warning("action_spawner_scoring_error", error=str(e))
+        scores = {}
+
+    for i, (agent, content) in enumerate(drafts):
+        res = scores.get(i)
+        if res is not None:
             policy_score = int(res.score)
             policy_reason = res.reason or "llm"
-        except Exception as e:
-            log.warning("action_spawner_scoring_error", error=str(e))
+        else:
             policy_score = 50
             policy_reason = "llm_error"
 
@@ -320,17 +306,7 @@ def spawn_actions_for_post(db: Session, org_id: int, post_id: int, max_n: int, f
             content,
         )
 
-        # If not forcing, skip if already exists
-        if not force:
-            existing = (
-                db.query(AgentAction)
-                .filter(AgentAction.org_id == org_id, AgentAction.idempotency_key == idem)
-                .first()
-            )
-            if existing:
-                created.append(existing)
-                continue
-        else:
+        if force:
             # force=true => allow a legit variant by salting idempotency
             # keep your "(variant)" marker if you want, but now it's real idempotency separation
             content = content + "(variant)"
@@ -356,28 +332,24 @@ def spawn_actions_for_post(db: Session, org_id: int, post_id: int, max_n: int, f
             prompt_hash=ph,
             published_at=published_at,
         )
-        try:
-            db.add(aa)
-            created.append(aa)
-        except IntegrityError:
-            db.rollback()
-            existing = (
-                db.query(AgentAction)
-                .filter(
-                    AgentAction.org_id == org_id,
-                    AgentAction.idempotency_key == idem
-                )
-                .first()
-            )
-            if existing:
-                created.append(existing)
-                continue
-            raise
-
+        candidates.append(aa)
+
+    # If not forcing, reuse the actions that already exist (one lookup for
+    # every key); the rest go out in one flush, with the usage bump, in
+    # one transaction
+    existing = {} if force else {
+        a.idempotency_key: a
+        for a in db.query(AgentAction).filter(
+            AgentAction.org_id == org_id,
+            AgentAction.idempotency_key.in_([aa.idempotency_key for aa in candidates]),
+        )
+    }
+    writer = SpawnWriter(db)
+    created = [existing.get(aa.idempotency_key) or writer.action(aa) for aa in candidates]
     try:
-        db.commit()
+        writer.flush()
     except IntegrityError:
-        db.rollback()
+        writer.rollback()
         # In rare concurrent race, re-fetch all by idempotency keys
         created = (
             db.query(AgentAction)
@@ -387,115 +359,12 @@ def spawn_actions_for_post(db: Session, org_id: int, post_id: int, max_n: int, f
             .all()
         )
 
-    for x in created:
-        db.refresh(x)
-
     usage.actions_spawned += len(created)
     usage.actions_published += sum(1 for x in created if x.status == "published")
     db.add(usage)
-    db.commit()
+    ids = [inspect(x).identity[0] for x in created]
+    writer.commit()
 
+    # one SELECT reloads every expired action for the caller
+    db.query(AgentAction).filter(AgentAction.id.in_(ids)).all()
     return created
-
-
-
-def _materialize_published_comment_from_action(db, action) -> None:
-    """
-    MVP: If an agent action is published and represents a comment/reply,
-    persist a Comment row so the public blog can render it.
-    This function adapts to the current Comment schema (only sets existing columns).
-    """
-    try:
-        # late import safety
-        from sqlalchemy import inspect as sa_inspect
-        comment_cols = {c.name for c in Comment.__table__.columns}
-    except Exception:
-        return
-
-    # Only materialize published comment-like actions
-    if getattr(action, "status", None) != "published":
-        return
-    if getattr(action, "action_type", None) not in ("comment", "reply"):
-        return
-
-    org_id = getattr(action, "org_id", None)
-    agent_id = getattr(action, "agent_id", None)
-    target_type = getattr(action, "target_type", None)
-    target_id = getattr(action, "target_id", None)
-    content = getattr(action, "content", None)
-
-    # Determine post_id / parent_comment_id depending on target_type
-    post_id = None
-    parent_comment_id = None
-
-    if target_type == "post":
-        post_id = target_id
-    elif target_type == "comment":
-        parent_comment_id = target_id
-        # try to resolve post_id from parent comment if possible
-        try:
-            parent = db.query(Comment).filter(Comment.id == parent_comment_id).one_or_none()
-            if parent is not None and hasattr(parent, "post_id"):
-                post_id = parent.post_id
-        except Exception:
-            pass
-    else:
-        return
-
-    # Build kwargs only for existing columns
-    data = {}
-    for k, v in {
-        "org_id": org_id,
-        "post_id": post_id,
-        "parent_comment_id": parent_comment_id,
-        "agent_id": agent_id,
-        "author_agent_id": agent_id,
-        "author_type": "agent",
-        "content": content,
-        "body": content,
-        "text": content,
-        "status": "published",
-        "published_at": getattr(action, "published_at", None),
-        "created_at": getattr(action, "created_at", None),
-    }.items():
-        if k in comment_cols and v is not None:
-            data[k] = v
-        elif k in comment_cols and v is None and k in ("published_at", "created_at"):
-            # allow nullable timestamps if schema expects them
-            data[k] = None
-
-    # Idempotency (best-effort without schema changes):
-    # If schema has source_action_id, use it. Otherwise dedupe by core fields.
-    if "source_action_id" in comment_cols:
-        data["source_action_id"] = getattr(action, "id", None)
-        exists = db.query(Comment).filter(Comment.source_action_id == data["source_action_id"]).one_or_none()
-        if exists:
-            return
-    else:
-        q = db.query(Comment)
-        if "org_id" in comment_cols and org_id is not None:
-            q = q.filter(Comment.org_id == org_id)
-        if "post_id" in comment_cols and post_id is not None:
-            q = q.filter(Comment.post_id == post_id)
-        if "author_agent_id" in comment_cols and agent_id is not None:
-            q = q.filter(Comment.author_agent_id == agent_id)
-        if "agent_id" in comment_cols and agent_id is not None:
-            q = q.filter(Comment.agent_id == agent_id)
-        # content/body/text whichever exists
-        if "content" in comment_cols and content is not None:
-            q = q.filter(Comment.content == content)
-        elif "body" in comment_cols and content is not None:
-            q = q.filter(Comment.body == content)
-        elif "text" in comment_cols and content is not None:
-            q = q.filter(Comment.text == content)
-
-        if q.first() is not None:
-            return
-
-    try:
-        c = Comment(**data)
-        db.add(c)
-        db.commit()
-    except Exception:
-        db.rollback()
-        return
\ No newline at end of file
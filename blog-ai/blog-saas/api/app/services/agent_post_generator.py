@@ -409,6 +409,8 @@ def generate_post_for_agent(
         excerpt=excerpt,
         post_metadata=post_metadata,
         status=status,
+        policy_score=policy_score,
+        policy_reason=policy_reason[:500],
         published_at=published_at,
           source=source,
     )
@@ -417,10 +419,10 @@ def generate_post_for_agent(
     db.commit()
     db.refresh(post)
 
-    # Extraer y guardar tags
+    # Extraer y guardar tags (job when the queue is on, inline otherwise)
     try:
-        from app.services.tag_extractor import save_tags_for_post
-        save_tags_for_post(db, post.id, post.title, post.body_md or "")
+        from app.services.job_queue import dispatch
+        dispatch(db, "extract_tags", {"post_id": post.id}, dedupe_key=f"tags:{post.id}")
     except Exception as te:
         log.warning("tag_extractor_error", error=str(te))
 
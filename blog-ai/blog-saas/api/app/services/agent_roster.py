@@ -0,0 +1,198 @@
+"""
+Per-process registry of each org's enabled agents.
+
+Agent selection (spawn loop, agent_selector, action_spawner, live AI
+chat) used to query and materialize every enabled AgentProfile of the
+org on every call and re-split each agent's comma-separated topics.
+get_roster() returns an immutable Roster instead:
+
+- compact AgentRecords (no persona_seed / bio — load the chosen agents'
+  rows when those are needed), in id order;
+- a topic -> agent ids inverted index, so matching a post's words only
+  touches the agents that share one;
+- a version, bumped each time the org's roster is rebuilt.
+
+Freshness: a Session listener drops an org's roster when an AgentProfile
+of it is committed in this process (create, update, ban). Other
+processes notice within AGENT_ROSTER_CHECK_SECONDS: past that, the next
+call compares COUNT(*) / MAX(updated_at) of the org's agents with the
+stamp the roster was built from and rebuilds only if they differ. Raw
+SQL that changes agent_profiles without touching updated_at is only seen
+after invalidate().
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+from app.models.agent_profile import AgentProfile
+
+log = get_logger(__name__)
+
+CHECK_SECONDS = float(os.getenv("AGENT_ROSTER_CHECK_SECONDS", "5"))
+
+_PENDING_KEY = "agent_roster_pending"
+
+
+def split_topics(topics: Optional[str]) -> frozenset[str]:
+    return frozenset(t.strip().lower() for t in (topics or "").split(",") if t.strip())
+
+
+@dataclass(frozen=True)
+class AgentRecord:
+    id: int
+    org_id: int
+    handle: str
+    display_name: str
+    style: str
+    topics: frozenset[str]
+    reputation_score: int
+    is_shadow_banned: bool
+
+    @property
+    def kind(self) -> str:
+        """The persona type encoded in the handle (`xx_skeptic_01` -> skeptic)."""
+        parts = (self.handle or "").split("_")
+        return parts[1] if len(parts) > 1 else "unknown"
+
+
+@dataclass(frozen=True)
+class Roster:
+    org_id: int
+    version: int
+    stamp: tuple
+    enabled: tuple[AgentRecord, ...]
+    by_id: dict[int, AgentRecord] = field(repr=False)
+    active: tuple[AgentRecord, ...] = field(repr=False)  # enabled and not shadow-banned
+    topic_index: dict[str, frozenset[int]] = field(repr=False)
+
+    @classmethod
+    def build(cls, org_id: int, version: int, stamp: tuple, records: Iterable[AgentRecord]) -> "Roster":
+        enabled = tuple(sorted(records, key=lambda r: r.id))
+        active = tuple(r for r in enabled if not r.is_shadow_banned)
+        index: dict[str, set[int]] = {}
+        for r in active:
+            for t in r.topics:
+                index.setdefault(t, set()).add(r.id)
+        return cls(
+            org_id=org_id, version=version, stamp=stamp, enabled=enabled,
+            by_id={r.id: r for r in enabled}, active=active,
+            topic_index={t: frozenset(ids) for t, ids in index.items()},
+        )
+
+    def topic_overlap(self, words: Iterable[str]) -> dict[int, int]:
+        """Active agent id -> how many of `words` are among its topics, for
+        the agents with at least one."""
+        hits: dict[int, int] = {}
+        for w in set(words):
+            for agent_id in self.topic_index.get(w, ()):
+                hits[agent_id] = hits.get(agent_id, 0) + 1
+        return hits
+
+
+def _stamp(db: Session, org_id: int) -> tuple:
+    count, updated = db.query(func.count(AgentProfile.id), func.max(AgentProfile.updated_at)).filter(
+        AgentProfile.org_id == org_id
+    ).one()
+    return int(count or 0), str(updated)
+
+
+def _load(db: Session, org_id: int) -> list[AgentRecord]:
+    rows = db.query(
+        AgentProfile.id, AgentProfile.handle, AgentProfile.display_name, AgentProfile.style,
+        AgentProfile.topics, AgentProfile.reputation_score, AgentProfile.is_shadow_banned,
+    ).filter(AgentProfile.org_id == org_id, AgentProfile.is_enabled == True).all()  # noqa: E712
+    return [
+        AgentRecord(
+            id=r.id, org_id=org_id, handle=r.handle or "", display_name=r.display_name or "",
+            style=r.style or "concise", topics=split_topics(r.topics),
+            reputation_score=int(r.reputation_score or 0), is_shadow_banned=bool(r.is_shadow_banned),
+        )
+        for r in rows
+    ]
+
+
+class AgentRegistry:
+    def __init__(self, check_seconds: float = CHECK_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.check_seconds = check_seconds
+        self._clock = clock
+        self._rosters: dict[int, Roster] = {}
+        self._checked: dict[int, float] = {}
+        self._versions: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def roster(self, db: Session, org_id: int) -> Roster:
+        now = self._clock()
+        with self._lock:
+            current = self._rosters.get(org_id)
+            if current is not None and now - self._checked.get(org_id, 0.0) < self.check_seconds:
+                return current
+        stamp = _stamp(db, org_id)
+        if current is not None and stamp == current.stamp:
+            with self._lock:
+                self._checked[org_id] = now
+            return current
+        records = _load(db, org_id)
+        with self._lock:
+            version = self._versions.get(org_id, 0) + 1
+            self._versions[org_id] = version
+            roster = Roster.build(org_id, version, stamp, records)
+            self._rosters[org_id] = roster
+            self._checked[org_id] = now
+        log.info("agent_roster_loaded", org_id=org_id, version=version, agents=len(roster.enabled))
+        return roster
+
+    def invalidate(self, org_id: Optional[int] = None) -> None:
+        with self._lock:
+            if org_id is None:
+                self._rosters.clear()
+                self._checked.clear()
+            else:
+                self._rosters.pop(org_id, None)
+                self._checked.pop(org_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rosters.clear()
+            self._checked.clear()
+            self._versions.clear()
+
+
+registry = AgentRegistry()
+
+
+def get_roster(db: Session, org_id: int) -> Roster:
+    return registry.roster(db, org_id)
+
+
+def load_agents(db: Session, ids: list[int]) -> list[AgentProfile]:
+    """The AgentProfile rows for `ids`, in that order (one query)."""
+    if not ids:
+        return []
+    rows = {a.id: a for a in db.query(AgentProfile).filter(AgentProfile.id.in_(ids)).all()}
+    return [rows[i] for i in ids if i in rows]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    orgs = {obj.org_id for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, AgentProfile)}
+    if orgs:
+        session.info.setdefault(_PENDING_KEY, set()).update(orgs)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session) -> None:
+    for org_id in session.info.pop(_PENDING_KEY, ()):
+        registry.invalidate(org_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -3,8 +3,11 @@ from __future__ import annotations
 import hashlib
 import json
 import re
+import time
+from concurrent.futures import Executor
+from functools import partial
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Callable, Optional
 
 from sqlalchemy import select
 from sqlalchemy.orm import Session
@@ -13,7 +16,10 @@ from app.models.agent_profile import AgentProfile
 from app.models.comment import Comment
 from app.models.post import Post
 from app.services.llm_client import LLMClient  # ✅ Cambiado de DeepSeekClient a LLMClient
+from app.services.debate_context import comment_line, context_for
+from app.services.spawn_writer import SpawnWriter
 
+from app.core import metrics
 from app.core.logging import get_logger
 
 log = get_logger(__name__)
@@ -77,16 +83,15 @@ def _set_if_has(obj, field: str, value) -> None:
         setattr(obj, field, value)
 
 
-def generate_comment_for_agent(
+def _build_comment_prompt(
     db: Session,
     org_id: int,
     post_id: int,
     agent_id: int,
-    parent_comment_id: Optional[int] = None,
     stance: str = "neutral",
-    source: str = "debate",
-    publish: bool = True,
-) -> Comment:
+) -> tuple[str, str]:
+    """DB half of a generation: load post, agent and recent context and
+    return the (system, user) prompt. No LLM call."""
     post = db.execute(select(Post).where(Post.id == post_id, Post.org_id == org_id)).scalar_one_or_none()
     if post is None:
         raise ValueError("Post not found")
@@ -99,31 +104,11 @@ def generate_comment_for_agent(
     ):
         raise ValueError("Agent not eligible")
 
-    # Last comments context
-    recent = (
-        db.execute(
-            select(Comment)
-            .where(Comment.org_id == org_id, Comment.post_id == post_id)
-            .order_by(Comment.id.desc())
-            .limit(6)
-        )
-        .scalars()
-        .all()
-    )
-    recent = list(reversed(recent))
-
-    ctx_lines = []
-    for c in recent:
-        who = f"{c.author_type}:{c.author_agent_id or c.author_user_id or 'n/a'}"
-        ctx_lines.append(f"- [{who}] {(c.body or '')[:400]}")
-    ctx = "\n".join(ctx_lines) if ctx_lines else "(no prior comments)"
-
+    # Post digest, debate summary and the comments since it, instead of the
+    # raw body and the last 6 comments
+    ctx = context_for(db, post, tail_limit=6)
+    recent = "\n".join(comment_line(c) for c in ctx.tail) or "(no prior comments)"
     title = getattr(post, "title", "") or ""
-    body_md = getattr(post, "body_md", None)
-    if body_md is None:
-        body_md = getattr(post, "body", "") or ""
-
-    llm = LLMClient()  # ✅ Cambiado de DeepSeekClient() a LLMClient()
 
     system = f"""
 You are an expert commenter.
@@ -138,14 +123,22 @@ Return JSON object:
 
     user = f"""
 POST_TITLE: {title}
-POST_BODY_MD: {body_md[:3500]}
+POST_BODY_MD: {ctx.digest[:3500]}
+
+DEBATE_SO_FAR: {ctx.summary or "(none)"}
 
 RECENT_COMMENTS:
-{ctx}
+{recent}
 
 Write ONE comment as this agent. Make it distinct, specific, and non-repetitive.
 """
+    return system, user
+
 
+def _generate_comment_body(system: str, user: str) -> str:
+    """LLM half of a generation. Touches no DB state, so it is safe to run
+    on a worker thread."""
+    llm = LLMClient()  # ✅ Cambiado de DeepSeekClient() a LLMClient()
     try:
         data = _must_json(system=system, user=user, llm=llm)  # ✅ Cambiado ds -> llm
     except Exception as e:
@@ -156,24 +149,22 @@ Write ONE comment as this agent. Make it distinct, specific, and non-repetitive.
     body = (data.get("body") or "").strip()
     if not body:
         raise ValueError("Empty body from model")
+    return body
 
-    ch = _comment_hash(org_id, post_id, agent_id, body, source)
-
-    # dedupe (support either content_hash or comment_hash, depending on your model)
-    hash_field = "content_hash" if hasattr(Comment, "content_hash") else ("comment_hash" if hasattr(Comment, "comment_hash") else None)
-    if hash_field:
-        exists = db.execute(
-            select(Comment.id).where(Comment.org_id == org_id, Comment.post_id == post_id, getattr(Comment, hash_field) == ch)
-        ).first()
-        if exists:
-            return db.get(Comment, exists[0])  # type: ignore[arg-type]
 
+def _agent_comment(
+    org_id: int,
+    post_id: int,
+    agent_id: int,
+    body: str,
+    source: str = "debate",
+    publish: bool = True,
+) -> Comment:
     status = "published" if publish else "draft"
 
     row = Comment(
         org_id=org_id,
         post_id=post_id,
-        parent_comment_id=parent_comment_id,
         author_user_id=None,
         author_agent_id=agent_id,
         author_type="agent",
@@ -182,16 +173,93 @@ Write ONE comment as this agent. Make it distinct, specific, and non-repetitive.
         created_at=_utcnow(),
     )
     _set_if_has(row, "source", source)
-    if hash_field:
-        _set_if_has(row, hash_field, ch)
+    _set_if_has(row, "comment_hash", _comment_hash(org_id, post_id, agent_id, body, source))
     _set_if_has(row, "published_at", _utcnow() if publish else None)
-
-    db.add(row)
-    db.commit()
-    db.refresh(row)
     return row
 
 
+def generate_comment_for_agent(
+    db: Session,
+    org_id: int,
+    post_id: int,
+    agent_id: int,
+    parent_comment_id: Optional[int] = None,
+    stance: str = "neutral",
+    source: str = "debate",
+    publish: bool = True,
+) -> Comment:
+    system, user = _build_comment_prompt(db, org_id, post_id, agent_id, stance)
+    body = _generate_comment_body(system, user)
+    writer = SpawnWriter(db)
+    c = writer.comment(_agent_comment(org_id, post_id, agent_id, body, source, publish), parent=parent_comment_id)
+    writer.commit()
+    return c
+
+
+def _run_round_serial(
+    db: Session,
+    writer: SpawnWriter,
+    org_id: int,
+    post_id: int,
+    agent_ids: list[int],
+    stances: list[str],
+    parent_for: Callable[[int], Optional[Comment]],
+    source: str,
+    publish: bool,
+    last_comment_by_agent: dict[int, Comment],
+) -> list[Comment]:
+    out: list[Comment] = []
+    for idx, (aid, stance) in enumerate(zip(agent_ids, stances)):
+        system, user = _build_comment_prompt(db, org_id, post_id, aid, stance)
+        body = _generate_comment_body(system, user)
+        c = writer.comment(_agent_comment(org_id, post_id, aid, body, source, publish), parent=parent_for(idx))
+        # flushed, not committed: the next agent's prompt reads it
+        writer.flush()
+        last_comment_by_agent[aid] = c
+        out.append(c)
+    return out
+
+
+def _run_round_parallel(
+    db: Session,
+    writer: SpawnWriter,
+    llm_pool: Executor,
+    org_id: int,
+    post_id: int,
+    agent_ids: list[int],
+    stances: list[str],
+    parent_for: Callable[[int], Optional[Comment]],
+    source: str,
+    publish: bool,
+    last_comment_by_agent: dict[int, Comment],
+) -> list[Comment]:
+    prompts = [
+        _build_comment_prompt(db, org_id, post_id, aid, stance)
+        for aid, stance in zip(agent_ids, stances)
+    ]
+    futures = [llm_pool.submit(_generate_comment_body, system, user) for system, user in prompts]
+
+    # Queue in agent order so parents resolve exactly as in the serial
+    # path; stop at the first failure like it does too (comments before it
+    # are still written, the error propagates).
+    out: list[Comment] = []
+    for idx, (aid, fut) in enumerate(zip(agent_ids, futures)):
+        waited = time.perf_counter()
+        try:
+            body = fut.result()
+        except Exception:
+            for f in futures:
+                f.cancel()
+            raise
+        finally:
+            # the pool threads aren't in this stage; charge the wait here
+            metrics.charge("llm", time.perf_counter() - waited)
+        c = writer.comment(_agent_comment(org_id, post_id, aid, body, source, publish), parent=parent_for(idx))
+        last_comment_by_agent[aid] = c
+        out.append(c)
+    return out
+
+
 def spawn_debate_for_post(
     db: Session,
     org_id: int,
@@ -200,7 +268,14 @@ def spawn_debate_for_post(
     rounds: int = 1,
     source: str = "debate",
     publish: bool = True,
+    llm_pool: Optional[Executor] = None,
 ) -> list[Comment]:
+    """Run `rounds` of round-robin debate on a post.
+
+    With `llm_pool`, the LLM calls of one round are fanned out to the pool
+    while prompts are built and comments persisted on the caller's session,
+    in agent order. Agents in the same round then see the thread as it was
+    at the start of the round rather than each other's fresh comments."""
     ids = _norm_agent_ids(agent_ids)
     if not ids or rounds <= 0:
         return []
@@ -235,38 +310,38 @@ def spawn_debate_for_post(
     # last_comment_by_agent: tracks the last Comment each agent produced this debate
     last_comment_by_agent: dict[int, Comment] = {}
 
+    def parent_for(r: int, idx: int) -> Optional[Comment]:
+        # round-robin: respond to previous agent's last comment (or None in round 1)
+        if r == 1:
+            return None
+        prev_aid = ordered_ids[(idx - 1) % len(ordered_ids)]
+        return last_comment_by_agent.get(prev_aid)
+
+    # one transaction per round: the round's comments, their parent links
+    # and counter bumps are written together by the SpawnWriter
+    writer = SpawnWriter(db)
     for r in range(1, rounds + 1):
-        round_comments: list[Comment] = []
-        for idx, aid in enumerate(ordered_ids):
-            stance = stances[(r + idx) % len(stances)]
-
-            # round-robin: respond to previous agent's last comment (or None in round 1)
-            if r == 1:
-                parent_id = None
-            else:
-                prev_aid = ordered_ids[(idx - 1) % len(ordered_ids)]
-                prev_comment = last_comment_by_agent.get(prev_aid)
-                parent_id = prev_comment.id if prev_comment else None
-
-            c = generate_comment_for_agent(
-                db=db,
-                org_id=org_id,
-                post_id=post_id,
-                agent_id=aid,
-                parent_comment_id=parent_id,
-                stance=stance,
-                source=source,
-                publish=publish,
+        round_stances = [stances[(r + idx) % len(stances)] for idx in range(len(ordered_ids))]
+        run_round = _run_round_serial if llm_pool is None else partial(_run_round_parallel, llm_pool=llm_pool)
+        try:
+            round_comments = run_round(
+                db=db, writer=writer, org_id=org_id, post_id=post_id, agent_ids=ordered_ids,
+                stances=round_stances, parent_for=lambda idx, r=r: parent_for(r, idx),
+                source=source, publish=publish, last_comment_by_agent=last_comment_by_agent,
             )
-            last_comment_by_agent[aid] = c
-            round_comments.append(c)
+        except Exception:
+            # keep what the round wrote before the failure, as the
+            # per-comment commits did
+            try:
+                writer.commit()
+            except Exception:
+                writer.rollback()
+            raise
 
         created.extend(round_comments)
+        # Marcar debate como open (no cerramos aquí, el cierre es explícito)
+        if r == rounds and created and hasattr(post, "debate_status"):
+            post.debate_status = "open"
+        writer.commit()
 
-    # Marcar debate como open (no cerramos aquí, el cierre es explícito)
-    if created and hasattr(post, "debate_status"):
-        post.debate_status = "open"
-        db.add(post)
-        db.commit()
-
-    return created
\ No newline at end of file
+    return created
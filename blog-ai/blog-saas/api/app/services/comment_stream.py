@@ -0,0 +1,194 @@
+"""
+Live agent replies, token by token.
+
+Agent replies are generated in job workers, but the clients watching a
+debate are connected to API workers. The generating side publishes
+events for the post on a LiveBroker (same transport as the live rooms,
+on its own COMMENT_STREAM_CHANNEL); every API process's CommentStreamHub
+receives them and hands them to its local subscribers — the SSE
+endpoint GET /orgs/{org_id}/posts/{post_id}/comments/stream.
+
+One reply is one stream:
+
+    {"type": "comment_start", "stream_id", "post_id", "agent_id", "parent_comment_id"}
+    {"type": "comment_delta", "stream_id", "post_id", "text"}          (repeated)
+    {"type": "comment_done",  "stream_id", "post_id", "comment": {...}} (persisted row)
+    {"type": "comment_abort", "stream_id", "post_id", "reason"}
+
+Deltas are coalesced for COMMENT_STREAM_FLUSH_MS so a NOTIFY isn't sent per
+token. Nothing is stored until comment_done: the comment is committed in
+one transaction as before, and comment_done carries the final body, so a
+client that missed deltas (full queue, reconnect) still ends up correct.
+
+The hub runs the broker on its own daemon event loop, so publish() can be
+called from the sync job code and subscribers can live on any loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from app.core.logging import get_logger
+from app.services.live_broker import LiveBroker, make_broker
+
+log = get_logger(__name__)
+
+STREAM_CHANNEL = os.getenv("COMMENT_STREAM_CHANNEL", "comment_streams")
+ENABLED = os.getenv("COMMENT_STREAMING", "1") == "1"
+FLUSH_MS = int(os.getenv("COMMENT_STREAM_FLUSH_MS", "100"))
+QUEUE_SIZE = int(os.getenv("COMMENT_STREAM_QUEUE_SIZE", "512"))
+
+
+class CommentStreamHub:
+    """This process's stream subscribers per post, wired to a broker."""
+
+    def __init__(self, broker: LiveBroker):
+        self.broker = broker
+        self.pid = os.getpid()
+        self._subs: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started: Optional[asyncio.Future] = None
+
+    def _runtime_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="comment-stream", daemon=True).start()
+            return self._loop
+
+    def _ensure_started(self):
+        # the listener is only needed where someone subscribes; publishing
+        # processes (job workers) never start it
+        loop = self._runtime_loop()
+        with self._lock:
+            if self._started is None:
+                self._started = asyncio.run_coroutine_threadsafe(self.broker.start(self._deliver), loop)
+            return self._started
+
+    def publish(self, post_id: int, event: dict) -> None:
+        """Fire-and-forget from any thread; delivery order per publisher is kept."""
+        event = {**event, "post_id": post_id}
+        fut = asyncio.run_coroutine_threadsafe(
+            self.broker.publish(str(post_id), event["type"], json.dumps(event)), self._runtime_loop(),
+        )
+        fut.add_done_callback(_log_publish_error)
+
+    @asynccontextmanager
+    async def subscribe(self, post_id: int) -> AsyncIterator[asyncio.Queue]:
+        """A queue receiving the events for `post_id` published while the
+        context is open."""
+        await asyncio.wrap_future(self._ensure_started())
+        entry = (asyncio.get_running_loop(), asyncio.Queue(QUEUE_SIZE))
+        room = str(post_id)
+        with self._lock:
+            self._subs.setdefault(room, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                subs = self._subs.get(room)
+                if subs is not None:
+                    subs.discard(entry)
+                    if not subs:
+                        del self._subs[room]
+
+    def subscribers(self, post_id: int) -> int:
+        return len(self._subs.get(str(post_id), ()))
+
+    async def _deliver(self, room: str, kind: str, text: str) -> None:
+        with self._lock:
+            subs = list(self._subs.get(room, ()))
+        if not subs:
+            return
+        event = json.loads(text)
+        for loop, q in subs:
+            loop.call_soon_threadsafe(_offer, q, event)
+
+
+def _offer(q: asyncio.Queue, event: dict) -> None:
+    if q.full():
+        # drop the oldest; comment_done repairs any text lost this way
+        q.get_nowait()
+    q.put_nowait(event)
+
+
+def _log_publish_error(fut) -> None:
+    if not fut.cancelled() and fut.exception() is not None:
+        log.warning("comment_stream_publish_error", error=str(fut.exception()))
+
+
+class ReplyStream:
+    """The events of one agent reply; write() coalesces deltas."""
+
+    def __init__(
+        self,
+        hub: CommentStreamHub,
+        post_id: int,
+        agent_id: int,
+        parent_comment_id: Optional[int] = None,
+        flush_ms: int = FLUSH_MS,
+        clock=time.monotonic,
+    ):
+        self.hub = hub
+        self.post_id = post_id
+        self.agent_id = agent_id
+        self.parent_comment_id = parent_comment_id
+        self.stream_id = secrets.token_hex(8)
+        self.started = False
+        self._flush_s = flush_ms / 1000.0
+        self._clock = clock
+        self._buf: list[str] = []
+        self._last_flush = 0.0
+
+    def _publish(self, type_: str, **fields) -> None:
+        self.hub.publish(self.post_id, {"type": type_, "stream_id": self.stream_id, **fields})
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        if not self.started:
+            self.started = True
+            self._publish("comment_start", agent_id=self.agent_id, parent_comment_id=self.parent_comment_id)
+        self._buf.append(text)
+        if self._clock() - self._last_flush >= self._flush_s:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buf:
+            self._publish("comment_delta", text="".join(self._buf))
+            self._buf = []
+        self._last_flush = self._clock()
+
+    def done(self, comment: dict) -> None:
+        """The reply was committed; `comment` is what clients should keep."""
+        self._buf = []
+        if not self.started:
+            self.started = True
+            self._publish("comment_start", agent_id=self.agent_id, parent_comment_id=self.parent_comment_id)
+        self._publish("comment_done", comment=comment)
+
+    def abort(self, reason: str) -> None:
+        """Drop what was streamed; a no-op if nothing was."""
+        self._buf = []
+        if self.started:
+            self._publish("comment_abort", reason=reason)
+
+
+_hub: Optional[CommentStreamHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_stream_hub() -> CommentStreamHub:
+    """Re-created after fork, like the LLM engine loop."""
+    global _hub
+    with _hub_lock:
+        if _hub is None or _hub.pid != os.getpid():
+            _hub = CommentStreamHub(make_broker(STREAM_CHANNEL))
+        return _hub
@@ -0,0 +1,125 @@
+"""
+Threaded comment loader.
+
+Clients used to rebuild a debate's threads from the flat comment list,
+with a follow-up request per branch. load_thread() returns one page of
+the tree from a single recursive CTE:
+
+- `roots` top-level comments, oldest first and keyset-paged like
+  list_comments — or, to expand a subtree, the replies of `parent_id`;
+- under each node its first `replies` children, down to `depth` levels;
+- a node with more children than were returned has more_replies=True and
+  a replies_cursor; the rest come from parent_id=<node>&cursor=<that>
+  (a node at the depth limit has no cursor: expand it from the start).
+
+The CTE walks the page's subtrees one level past `depth`; ROW_NUMBER()
+per parent trims every sibling list to replies + 1 rows before anything
+leaves the database — the extra row only tells us there are more.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import Integer, and_, func, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.pagination import created_cursor, created_keyset, cut_page
+from app.models.comment import Comment
+
+
+@dataclass
+class ThreadNode:
+    comment: Comment
+    replies: list["ThreadNode"] = field(default_factory=list)
+    more_replies: bool = False
+    replies_cursor: Optional[str] = None
+
+
+def load_thread(
+    db: Session,
+    org_id: int,
+    post_id: int,
+    *,
+    parent_id: Optional[int] = None,
+    roots: int = 20,
+    replies: int = 3,
+    depth: int = 4,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+) -> tuple[list[ThreadNode], Optional[str]]:
+    """(top-level nodes, cursor for the next page of them)."""
+    scope = [Comment.org_id == org_id, Comment.post_id == post_id]
+    if status:
+        scope.append(Comment.status == status)
+
+    clause, order = created_keyset(db, Comment.created_at, Comment.id, cursor, descending=False)
+    top = select(
+        Comment.id,
+        Comment.parent_comment_id.label("parent_id"),
+        func.row_number().over(order_by=order).label("pos"),
+    ).where(
+        *scope,
+        Comment.parent_comment_id.is_(None) if parent_id is None else Comment.parent_comment_id == parent_id,
+    )
+    if clause is not None:
+        top = top.where(clause)
+    # one root past the page, only to know whether there is a next page
+    top = top.order_by(*order).limit(roots + 1).subquery()
+
+    tree = select(
+        top.c.id, top.c.parent_id, literal_column("0", Integer).label("depth"), top.c.pos,
+    ).cte("thread", recursive=True)
+    child = Comment.__table__.alias("child")
+    tree = tree.union_all(
+        select(child.c.id, child.c.parent_comment_id, tree.c.depth + 1, tree.c.pos)
+        .join(tree, child.c.parent_comment_id == tree.c.id)
+        .where(tree.c.depth <= depth, tree.c.pos <= roots, *(
+            [child.c.status == status] if status else []
+        ))
+    )
+
+    sibling = func.row_number().over(
+        partition_by=tree.c.parent_id, order_by=(Comment.created_at, Comment.id),
+    ).label("sibling")
+    ranked = (
+        select(tree.c.id, tree.c.depth, tree.c.pos, sibling)
+        .join(Comment, Comment.id == tree.c.id)
+        .subquery()
+    )
+    rows = (
+        db.query(Comment, ranked.c.depth, ranked.c.pos, ranked.c.sibling)
+        .join(ranked, ranked.c.id == Comment.id)
+        .filter(or_(ranked.c.depth == 0, ranked.c.sibling <= replies + 1))
+        .filter(or_(ranked.c.depth <= depth, and_(ranked.c.depth == depth + 1, ranked.c.sibling == 1)))
+        .all()
+    )
+
+    top_level = [c for c, d, pos, _ in sorted(rows, key=lambda r: r[2]) if d == 0]
+    top_level, next_cursor = cut_page(top_level, roots, lambda c: (c.created_at, c.id))
+
+    children: dict[int, list[tuple[int, Comment]]] = {}
+    for c, d, _, sib in rows:
+        if d > 0:
+            children.setdefault(c.parent_comment_id, []).append((sib, c))
+
+    def build(c: Comment, level: int) -> ThreadNode:
+        kids = [k for _, k in sorted(children.get(c.id, ()), key=lambda x: x[0])]
+        shown = kids[:replies] if level < depth else []
+        node = ThreadNode(c, [build(k, level + 1) for k in shown], more_replies=len(kids) > len(shown))
+        if node.more_replies and shown:
+            node.replies_cursor = created_cursor(shown[-1].created_at, shown[-1].id)
+        return node
+
+    return [build(c, 0) for c in top_level], next_cursor
+
+
+def thread_comments(nodes: list[ThreadNode]) -> list[Comment]:
+    """Every comment in the page, depth-first."""
+    out: list[Comment] = []
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        out.append(node.comment)
+        stack.extend(reversed(node.replies))
+    return out
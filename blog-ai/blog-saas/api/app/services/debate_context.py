@@ -0,0 +1,219 @@
+"""
+Rolling per-post context for agent prompts.
+
+Every debate comment used to resend the post body (up to 3500 chars) and
+the last 6 comments, every human reply the body (1500) and the last 8:
+the same post was re-tokenized for each comment of each round. A post's
+context is now three parts:
+
+- digest: the post in about DIGEST_WORDS words, written by the LLM once
+  per version of the post (keyed by a hash of title + body). Posts under
+  DIGEST_MIN_CHARS are used as they are;
+- summary: the thread so far. Comments past summarized_through_id pile up
+  until there are SUMMARY_EVERY of them; then all but the KEEP_VERBATIM
+  newest are folded into the summary with one LLM call and the pointer
+  moves past them;
+- tail: the comments after the pointer, verbatim, so an agent still sees
+  the exact words it replies to.
+
+Rows live in post_contexts and are shared by every worker. They are
+written on a session of their own: building a prompt never commits the
+caller's transaction (a debate round holds its comments until the round
+ends). A fold may cover comments of that open transaction, so it is only
+staged on the caller's session — later prompts on it use it — and saved
+once the caller commits; a rollback drops it with the comments. A failed
+digest or summary call is logged and the prompt falls back to the full
+body / the unfolded tail; the next prompt retries.
+DEBATE_CONTEXT=0 turns the store off (raw body, last comments).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+from app.models.comment import Comment
+from app.models.post_context import PostContext
+
+log = get_logger(__name__)
+
+_STAGED = "debate_context_folds"  # Session.info key: {post_id: (org_id, values)}
+_LISTENING = "debate_context_listening"
+
+ENABLED = os.getenv("DEBATE_CONTEXT", "1") == "1"
+DIGEST_MIN_CHARS = int(os.getenv("DEBATE_CONTEXT_DIGEST_MIN_CHARS", "1200"))
+DIGEST_WORDS = int(os.getenv("DEBATE_CONTEXT_DIGEST_WORDS", "150"))
+SUMMARY_WORDS = int(os.getenv("DEBATE_CONTEXT_SUMMARY_WORDS", "180"))
+SUMMARY_EVERY = int(os.getenv("DEBATE_CONTEXT_SUMMARY_EVERY", "6"))
+KEEP_VERBATIM = int(os.getenv("DEBATE_CONTEXT_KEEP_VERBATIM", "2"))
+FOLD_MAX = 4 * SUMMARY_EVERY  # comments folded by one call; older backlog is skipped
+COMMENT_CHARS = 400
+
+
+@dataclass(frozen=True)
+class DebateContext:
+    digest: str
+    summary: str
+    tail: list[Comment]  # oldest first
+
+
+def body_hash(title: str, body: str) -> str:
+    return hashlib.sha256(f"{title}\n{body}".encode("utf-8")).hexdigest()
+
+
+def comment_line(c: Comment, who: str | None = None) -> str:
+    who = who or f"{c.author_type}:{c.author_agent_id or c.author_user_id or 'n/a'}"
+    return f"- [{who}] {(c.body or '')[:COMMENT_CHARS]}"
+
+
+def _llm_summarize(system: str, user: str) -> str:
+    from app.services.llm_client import LLMClient
+    return LLMClient().chat(system=system, user=user).strip()
+
+
+class DebateContextStore:
+    def __init__(self, summarize: Callable[[str, str], str] = _llm_summarize):
+        self.summarize = summarize
+
+    def context(self, db: Session, post, tail_limit: int) -> DebateContext:
+        title = getattr(post, "title", "") or ""
+        body = getattr(post, "body_md", None) or getattr(post, "body", "") or ""
+        if not ENABLED:
+            return DebateContext(digest=body, summary="", tail=self._newest(db, post, 0, tail_limit))
+
+        # populate_existing: another prompt may have moved the row since
+        # this session last loaded it
+        row = db.execute(
+            select(PostContext).where(PostContext.post_id == post.id).execution_options(populate_existing=True)
+        ).scalar_one_or_none()
+        digest = self._digest(db, post, row, title, body)
+        summary = row.summary if row else ""
+        through = row.summarized_through_id if row else 0
+        count = row.summarized_comments if row else 0
+        # a fold this session made and hasn't committed yet
+        _, staged = db.info.get(_STAGED, {}).get(post.id, (None, None))
+        if staged is not None and staged["summarized_through_id"] > through:
+            summary, through, count = staged["summary"], staged["summarized_through_id"], staged["summarized_comments"]
+
+        pending = self._newest(db, post, through, FOLD_MAX + KEEP_VERBATIM)
+        if len(pending) >= SUMMARY_EVERY:
+            fold, keep = pending[:-KEEP_VERBATIM or None], pending[len(pending) - KEEP_VERBATIM:]
+            folded = self._fold(db, post, title, summary, fold, count)
+            if folded is not None:
+                summary, pending = folded, keep
+        return DebateContext(digest=digest, summary=summary, tail=pending[-tail_limit:] if tail_limit > 0 else [])
+
+    # ── parts ───────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _newest(db: Session, post, after_id: int, limit: int) -> list[Comment]:
+        rows = db.execute(
+            select(Comment)
+            .where(Comment.org_id == post.org_id, Comment.post_id == post.id, Comment.id > after_id)
+            .order_by(Comment.id.desc())
+            .limit(limit)
+        ).scalars().all()
+        return list(reversed(rows))
+
+    def _digest(self, db: Session, post, row, title: str, body: str) -> str:
+        if len(body) < DIGEST_MIN_CHARS:
+            return body
+        h = body_hash(title, body)
+        if row is not None and row.body_hash == h and row.digest:
+            return row.digest
+        try:
+            digest = self.summarize(
+                "You condense blog posts for writers who will comment on them. "
+                "Reply with the condensed text only.",
+                f"Condense this post to at most {DIGEST_WORDS} words. Keep its thesis, "
+                f"key claims, figures and names.\n\nTITLE: {title}\n\n{body}",
+            )
+        except Exception as e:
+            log.warning("debate_context_digest_failed", post_id=post.id, error=str(e))
+            return body
+        if not digest:
+            return body
+        self._save(db, post.id, post.org_id, {"body_hash": h, "digest": digest})
+        return digest
+
+    def _fold(self, db: Session, post, title: str, summary: str, comments: list[Comment], count: int) -> str | None:
+        try:
+            new = self.summarize(
+                "You keep the running summary of a comment thread. Reply with the summary only.",
+                f"POST: {title}\n\nSUMMARY SO FAR:\n{summary or '(none)'}\n\nNEW COMMENTS:\n"
+                + "\n".join(comment_line(c) for c in comments)
+                + f"\n\nRewrite the summary in at most {SUMMARY_WORDS} words: the positions taken "
+                "and by whom (keep the [tags]), where they disagree, open questions.",
+            )
+        except Exception as e:
+            log.warning("debate_context_summary_failed", post_id=post.id, error=str(e))
+            return None
+        if not new:
+            return None
+        through = comments[-1].id
+        self._stage(
+            db, post,
+            {"summary": new, "summarized_through_id": through, "summarized_comments": count + len(comments)},
+        )
+        log.info("debate_context_folded", post_id=post.id, comments=len(comments), through=through)
+        return new
+
+    @staticmethod
+    def _stage(db: Session, post, values: dict) -> None:
+        """Keep a fold on the caller's session until it commits."""
+        if not db.info.get(_LISTENING):
+            db.info[_LISTENING] = True
+            event.listen(db, "after_commit", _save_staged)
+            event.listen(db, "after_transaction_end", _drop_staged)
+        db.info.setdefault(_STAGED, {})[post.id] = (post.org_id, values)
+
+    @staticmethod
+    def _save(db: Session, post_id: int, org_id: int, values: dict, only_forward: bool = False) -> None:
+        """Upsert on a session of its own, so the caller's transaction stays
+        open. only_forward: don't move the summary pointer back if another
+        worker got further meanwhile."""
+        s = Session(bind=db.get_bind())
+        try:
+            if s.bind.dialect.name == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            stmt = dialect_insert(PostContext).values(post_id=post_id, org_id=org_id, **values)
+            where = (
+                PostContext.summarized_through_id < stmt.excluded.summarized_through_id if only_forward else None
+            )
+            s.execute(stmt.on_conflict_do_update(
+                index_elements=[PostContext.post_id],
+                set_={**{k: stmt.excluded[k] for k in values}, "updated_at": func.now()},
+                where=where,
+            ))
+            s.commit()
+        except Exception as e:
+            s.rollback()
+            log.warning("debate_context_save_failed", post_id=post_id, error=str(e))
+        finally:
+            s.close()
+
+
+def _save_staged(session: Session) -> None:
+    for post_id, (org_id, values) in session.info.pop(_STAGED, {}).items():
+        DebateContextStore._save(session, post_id, org_id, values, only_forward=True)
+
+
+def _drop_staged(session: Session, transaction) -> None:
+    # the outermost transaction ended without a commit (rollback, close):
+    # its comments are gone, and so is the fold over them
+    if transaction.parent is None:
+        session.info.pop(_STAGED, None)
+
+
+store = DebateContextStore()
+
+
+def context_for(db: Session, post, tail_limit: int) -> DebateContext:
+    return store.context(db, post, tail_limit)
@@ -0,0 +1,327 @@
+"""
+Engagement counters — incremental maintenance + drift reconciliation.
+
+Feed endpoints used to recompute comment / vote / save / view counts with
+GROUP BY over comments, votes, post_votes, saved_posts and video_views on
+every request. Writers now call the record_* helpers below in the SAME
+transaction as the write (before commit), so post_stats / comment_stats
+stay in step with the source rows and reads are single-table lookups.
+
+Anything that changes the source tables without going through these
+helpers (moderation status flips, cascaded deletes, manual SQL) is
+repaired by reconcile_counters(), which the background scheduler runs
+periodically.
+"""
+from __future__ import annotations
+
+import os
+from typing import Iterable
+
+from sqlalchemy import case, func, inspect, text, update
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+from app.models.comment import Comment
+from app.models.post import Post
+from app.models.post_stats import CommentStats, PostStats
+from app.models.saved_post import SavedPost
+from app.models.video_view import VideoView
+from app.models.vote import Vote
+
+log = get_logger(__name__)
+
+POST_COUNTERS = (
+    "comment_count",
+    "human_comment_count",
+    "upvotes",
+    "downvotes",
+    "comment_upvotes",
+    "saves",
+    "views",
+    "completed_views",
+)
+COMMENT_COUNTERS = ("upvotes", "downvotes")
+
+RECONCILE_BATCH = int(os.getenv("COUNTER_RECONCILE_BATCH", "1000"))
+
+
+# ── Low-level bump ──────────────────────────────────────────────────────────
+
+def _bump(db: Session, model, key: str, key_value: int, seed: dict, deltas: dict) -> None:
+    deltas = {k: int(v) for k, v in deltas.items() if v}
+    if not deltas:
+        return
+
+    key_col = getattr(model, key)
+    values = {}
+    for col_name, d in deltas.items():
+        col = getattr(model, col_name)
+        # Never let a counter go negative: a decrement against a row that
+        # predates the counters (or was never backfilled) clamps at 0 and
+        # the reconciliation job fills in the real number later.
+        values[col_name] = case((col + d < 0, 0), else_=col + d) if d < 0 else col + d
+
+    res = db.execute(update(model).where(key_col == key_value).values(**values))
+    if res.rowcount:
+        return
+
+    cols = ", ".join(seed)
+    params = ", ".join(f":{c}" for c in seed)
+    db.execute(
+        text(
+            f"INSERT INTO {model.__tablename__} ({cols}) VALUES ({params}) "
+            f"ON CONFLICT ({key}) DO NOTHING"
+        ),
+        seed,
+    )
+    db.execute(update(model).where(key_col == key_value).values(**values))
+
+
+def bump_post(db: Session, post_id: int, org_id: int, **deltas: int) -> None:
+    unknown = set(deltas) - set(POST_COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown post counter(s): {sorted(unknown)}")
+    _bump(db, PostStats, "post_id", post_id, {"post_id": post_id, "org_id": org_id}, deltas)
+
+
+def bump_comment(db: Session, comment_id: int, post_id: int, **deltas: int) -> None:
+    unknown = set(deltas) - set(COMMENT_COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown comment counter(s): {sorted(unknown)}")
+    _bump(db, CommentStats, "comment_id", comment_id, {"comment_id": comment_id, "post_id": post_id}, deltas)
+
+
+def _vote_deltas(old: int, new: int) -> dict:
+    """old/new are -1, 0 (no vote) or 1."""
+    return {
+        "upvotes": (new == 1) - (old == 1),
+        "downvotes": (new == -1) - (old == -1),
+    }
+
+
+# ── Write-path hooks ────────────────────────────────────────────────────────
+
+def record_comment_created(db: Session, comment: Comment) -> None:
+    """Call right after db.add(comment), before commit."""
+    if (comment.status or "published") != "published":
+        return
+    if not comment.post_id or comment.org_id is None:
+        return
+    bump_post(
+        db,
+        comment.post_id,
+        comment.org_id,
+        comment_count=1,
+        human_comment_count=1 if comment.author_type == "user" else 0,
+    )
+
+
+def record_comments_created(db: Session, comments: Iterable[Comment]) -> None:
+    """record_comment_created for a batch: one bump per post instead of one
+    per comment."""
+    per_post: dict[tuple[int, int], list[int]] = {}
+    for c in comments:
+        if (c.status or "published") != "published" or not c.post_id or c.org_id is None:
+            continue
+        d = per_post.setdefault((c.post_id, c.org_id), [0, 0])
+        d[0] += 1
+        d[1] += 1 if c.author_type == "user" else 0
+    for (post_id, org_id), (total, human) in per_post.items():
+        bump_post(db, post_id, org_id, comment_count=total, human_comment_count=human)
+
+
+def record_post_vote(db: Session, post_id: int, org_id: int, old: int, new: int) -> None:
+    bump_post(db, post_id, org_id, **_vote_deltas(old, new))
+
+
+def record_comment_vote(db: Session, comment: Comment, old: int, new: int) -> None:
+    deltas = _vote_deltas(old, new)
+    bump_comment(db, comment.id, comment.post_id, **deltas)
+    bump_post(db, comment.post_id, comment.org_id, comment_upvotes=deltas["upvotes"])
+
+
+def record_save(db: Session, post_id: int, org_id: int, delta: int) -> None:
+    bump_post(db, post_id, org_id, saves=delta)
+
+
+def record_video_view(db: Session, post_id: int, org_id: int, new_view: bool, completed_delta: int) -> None:
+    bump_post(db, post_id, org_id, views=1 if new_view else 0, completed_views=completed_delta)
+
+
+# ── Reads ───────────────────────────────────────────────────────────────────
+
+def load_post_stats(db: Session, post_ids: Iterable[int]) -> dict[int, dict[str, int]]:
+    """{post_id: {counter: value}} — posts without a row are simply absent."""
+    ids = list({int(i) for i in post_ids})
+    if not ids:
+        return {}
+    rows = db.query(PostStats).filter(PostStats.post_id.in_(ids)).all()
+    return {r.post_id: {c: getattr(r, c) or 0 for c in POST_COUNTERS} for r in rows}
+
+
+def load_comment_stats(db: Session, comment_ids: Iterable[int]) -> dict[int, dict[str, int]]:
+    ids = list({int(i) for i in comment_ids})
+    if not ids:
+        return {}
+    rows = db.query(CommentStats).filter(CommentStats.comment_id.in_(ids)).all()
+    return {r.comment_id: {c: getattr(r, c) or 0 for c in COMMENT_COUNTERS} for r in rows}
+
+
+# ── Reconciliation ──────────────────────────────────────────────────────────
+
+def _has_table(db: Session, name: str) -> bool:
+    try:
+        return inspect(db.get_bind()).has_table(name)
+    except Exception:
+        return False
+
+
+def _actual_counts(db: Session, post_ids: list[int], has_post_votes: bool):
+    """Recompute every counter for a batch of posts from the source tables."""
+    posts: dict[int, dict[str, int]] = {pid: dict.fromkeys(POST_COUNTERS, 0) for pid in post_ids}
+    comments: dict[int, dict] = {}
+
+    for pid, total, human in (
+        db.query(
+            Comment.post_id,
+            func.count(Comment.id),
+            func.sum(case((Comment.author_type == "user", 1), else_=0)),
+        )
+        .filter(Comment.post_id.in_(post_ids), Comment.status == "published")
+        .group_by(Comment.post_id)
+        .all()
+    ):
+        posts[pid]["comment_count"] = int(total or 0)
+        posts[pid]["human_comment_count"] = int(human or 0)
+
+    for pid, cid, ups, downs in (
+        db.query(
+            Comment.post_id,
+            Vote.comment_id,
+            func.sum(case((Vote.value == 1, 1), else_=0)),
+            func.sum(case((Vote.value == -1, 1), else_=0)),
+        )
+        .join(Comment, Comment.id == Vote.comment_id)
+        .filter(Comment.post_id.in_(post_ids))
+        .group_by(Comment.post_id, Vote.comment_id)
+        .all()
+    ):
+        comments[cid] = {"post_id": pid, "upvotes": int(ups or 0), "downvotes": int(downs or 0)}
+        posts[pid]["comment_upvotes"] += int(ups or 0)
+
+    if has_post_votes:
+        placeholders = ",".join(str(int(i)) for i in post_ids)
+        for pid, ups, downs in db.execute(text(
+            "SELECT post_id, "
+            "SUM(CASE WHEN value = 1 THEN 1 ELSE 0 END), "
+            "SUM(CASE WHEN value = -1 THEN 1 ELSE 0 END) "
+            f"FROM post_votes WHERE post_id IN ({placeholders}) GROUP BY post_id"
+        )).fetchall():
+            posts[pid]["upvotes"] = int(ups or 0)
+            posts[pid]["downvotes"] = int(downs or 0)
+
+    for pid, cnt in (
+        db.query(SavedPost.post_id, func.count(SavedPost.id))
+        .filter(SavedPost.post_id.in_(post_ids))
+        .group_by(SavedPost.post_id)
+        .all()
+    ):
+        posts[pid]["saves"] = int(cnt or 0)
+
+    for pid, views, done in (
+        db.query(
+            VideoView.post_id,
+            func.count(VideoView.id),
+            func.sum(case((VideoView.completed.is_(True), 1), else_=0)),
+        )
+        .filter(VideoView.post_id.in_(post_ids))
+        .group_by(VideoView.post_id)
+        .all()
+    ):
+        posts[pid]["views"] = int(views or 0)
+        posts[pid]["completed_views"] = int(done or 0)
+
+    return posts, comments
+
+
+def _write_exact(db: Session, model, key: str, key_value: int, seed: dict, values: dict) -> None:
+    res = db.execute(update(model).where(getattr(model, key) == key_value).values(**values))
+    if res.rowcount:
+        return
+    row = {**seed, **values}
+    cols = ", ".join(row)
+    params = ", ".join(f":{c}" for c in row)
+    db.execute(
+        text(f"INSERT INTO {model.__tablename__} ({cols}) VALUES ({params}) ON CONFLICT ({key}) DO NOTHING"),
+        row,
+    )
+
+
+def reconcile_counters(db: Session, org_id: int | None = None, batch_size: int = RECONCILE_BATCH) -> dict:
+    """Recompute counters from the source tables in keyset batches of posts and
+    rewrite only the rows that drifted. Commits per batch so no lock is held
+    across the whole table."""
+    has_post_votes = _has_table(db, "post_votes")
+    checked = posts_repaired = comments_repaired = 0
+    last_id = 0
+
+    while True:
+        q = db.query(Post.id, Post.org_id).filter(Post.id > last_id)
+        if org_id is not None:
+            q = q.filter(Post.org_id == org_id)
+        batch = q.order_by(Post.id.asc()).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        post_ids = [pid for pid, _ in batch]
+        org_of = dict(batch)
+
+        actual_posts, actual_comments = _actual_counts(db, post_ids, has_post_votes)
+
+        stored_posts = load_post_stats(db, post_ids)
+        for pid, counts in actual_posts.items():
+            if stored_posts.get(pid) != counts:
+                _write_exact(db, PostStats, "post_id", pid, {"post_id": pid, "org_id": org_of[pid]}, counts)
+                posts_repaired += 1
+
+        stored_comments = {
+            r.comment_id: r
+            for r in db.query(CommentStats).filter(CommentStats.post_id.in_(post_ids)).all()
+        }
+        for cid, counts in actual_comments.items():
+            cur = stored_comments.pop(cid, None)
+            values = {"upvotes": counts["upvotes"], "downvotes": counts["downvotes"]}
+            if cur is None or (cur.upvotes, cur.downvotes) != (values["upvotes"], values["downvotes"]):
+                _write_exact(db, CommentStats, "comment_id", cid, {"comment_id": cid, "post_id": counts["post_id"]}, values)
+                comments_repaired += 1
+        # Rows left over have no votes any more
+        for cid, cur in stored_comments.items():
+            if cur.upvotes or cur.downvotes:
+                db.execute(update(CommentStats).where(CommentStats.comment_id == cid).values(upvotes=0, downvotes=0))
+                comments_repaired += 1
+
+        db.commit()
+        checked += len(post_ids)
+
+    log.info(
+        "counter_reconcile_done",
+        org_id=org_id,
+        posts_checked=checked,
+        posts_repaired=posts_repaired,
+        comments_repaired=comments_repaired,
+    )
+    return {
+        "posts_checked": checked,
+        "posts_repaired": posts_repaired,
+        "comments_repaired": comments_repaired,
+    }
+
+
+def run_counter_reconcile_job() -> dict:
+    """Entry point for scheduled runs."""
+    from app.core.db import SessionLocal
+    db = SessionLocal()
+    try:
+        return reconcile_counters(db)
+    finally:
+        db.close()
@@ -7,9 +7,15 @@ log = get_logger(__name__)
 human_reply_spawner.py
 Lógica para que agentes respondan a comentarios humanos con razonamiento previo.
 El agente evalúa primero si el comentario merece respuesta antes de responder.
+
+With COMMENT_STREAMING on, the completion is streamed and the "response"
+field is forwarded to app.services.comment_stream as it is generated, so
+people watching the post see the reply being written; the comment row is
+still committed once, when the full JSON has been parsed.
 """
 import hashlib
 import json
+import re
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -20,14 +26,69 @@ from app.models.agent_profile import AgentProfile
 from app.models.comment import Comment
 from app.models.post import Post
 from app.models.user import User
+from app.services import comment_stream
 from app.services.llm_client import LLMClient
 from app.services.comment_spawner import _clean_llm_json, _set_if_has
+from app.services.debate_context import context_for
+from app.services.engagement_counters import record_comment_created
 
 
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class _JsonStringField:
+    """Decodes one string field of a JSON object while the object is still
+    arriving: feed() raw chunks, get back the newly decoded field text."""
+
+    def __init__(self, name: str):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(name))
+        self._raw = ""
+        self._pos: Optional[int] = None  # next undecoded char of the value
+        self.closed = False
+
+    def feed(self, chunk: str) -> str:
+        self._raw += chunk
+        if self.closed:
+            return ""
+        if self._pos is None:
+            m = self._start.search(self._raw)
+            if not m:
+                return ""
+            self._pos = m.end()
+        out = []
+        raw, i = self._raw, self._pos
+        while i < len(raw):
+            ch = raw[i]
+            if ch == '"':
+                self.closed = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(raw):
+                break  # escape split across chunks
+            esc = raw[i + 1]
+            if esc == "u":
+                if i + 6 > len(raw):
+                    break
+                try:
+                    out.append(chr(int(raw[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                out.append(_ESCAPES.get(esc, esc))
+                i += 2
+        self._pos = i
+        return "".join(out)
+
+
 def _evaluate_and_reply(
     agent: AgentProfile,
     post_title: str,
@@ -36,10 +97,12 @@ def _evaluate_and_reply(
     human_username: str,
     conversation_context: str,
     ds: LLMClient,
+    stream: Optional[comment_stream.ReplyStream] = None,
 ) -> dict:
     """
     El agente razona primero si debe responder y cómo.
     Retorna dict con should_respond, reasoning, response_type, response.
+    With `stream`, the response text is written to it while it's generated.
     """
     system = f"""You are {agent.display_name}, an AI agent with this persona:
 {agent.persona_seed}
@@ -83,7 +146,15 @@ HUMAN COMMENT by @{human_username}:
 
 Evaluate and respond as {agent.display_name}."""
 
-    out = ds.chat(system=system, user=user)
+    if stream is None:
+        out = ds.chat(system=system, user=user)
+    else:
+        field = _JsonStringField("response")
+        parts = []
+        for chunk in ds.stream(system=system, user=user):
+            parts.append(chunk)
+            stream.write(field.feed(chunk))
+        out = "".join(parts)
     cleaned = _clean_llm_json(out)
     try:
         data = json.loads(cleaned)
@@ -132,28 +203,13 @@ def spawn_agent_replies_to_human(
         ).scalar_one_or_none()
     human_username = (human_user.username if human_user else None) or "user"
 
-    # Contexto reciente del hilo
-    recent = (
-        db.execute(
-            select(Comment)
-            .where(Comment.org_id == org_id, Comment.post_id == post_id)
-            .order_by(Comment.id.desc())
-            .limit(8)
-        )
-        .scalars()
-        .all()
-    )
-    recent = list(reversed(recent))
-    ctx_lines = []
-    for c in recent:
-        if c.author_type == "user":
-            who = f"@{human_username}"
-        else:
-            agent_name = f"agent:{c.author_agent_id}"
-            ctx_lines.append(f"[{agent_name}]: {(c.body or '')[:300]}")
-            continue
+    # Contexto del hilo: resumen del debate + comentarios desde el resumen
+    ctx = context_for(db, post, tail_limit=8)
+    ctx_lines = [f"Summary so far: {ctx.summary}"] if ctx.summary else []
+    for c in ctx.tail:
+        who = f"@{human_username}" if c.author_type == "user" else f"agent:{c.author_agent_id}"
         ctx_lines.append(f"[{who}]: {(c.body or '')[:300]}")
-    ctx = "\n".join(ctx_lines) if ctx_lines else "(no prior context)"
+    conversation = "\n".join(ctx_lines) if ctx_lines else "(no prior context)"
 
     # Cargar agentes
     agents = db.execute(
@@ -168,17 +224,38 @@ def spawn_agent_replies_to_human(
     if not agents:
         return []
 
+    # Idempotente ante reintentos del job: los agentes que ya respondieron a
+    # este comentario no vuelven a hacerlo y sus respuestas cuentan para
+    # max_replies (el hash incluye el texto, que el LLM no repite)
+    replied = {
+        aid for (aid,) in db.execute(
+            select(Comment.author_agent_id).where(
+                Comment.org_id == org_id,
+                Comment.parent_comment_id == human_comment_id,
+                Comment.author_type == "agent",
+            )
+        )
+    }
+    agents = [a for a in agents if a.id not in replied]
+
     ds = LLMClient()
     created: list[Comment] = []
-    replies_count = 0
+    replies_count = len(replied)
 
     post_title = getattr(post, "title", "") or ""
-    post_body = getattr(post, "body_md", "") or getattr(post, "body", "") or ""
+    # digest of the post (its body if short)
+    post_body = ctx.digest
+
+    hub = comment_stream.get_stream_hub() if comment_stream.ENABLED else None
 
     for agent in agents:
         if replies_count >= max_replies:
             break
 
+        stream = (
+            comment_stream.ReplyStream(hub, post_id, agent.id, parent_comment_id=human_comment_id)
+            if hub is not None else None
+        )
         try:
             decision = _evaluate_and_reply(
                 agent=agent,
@@ -186,11 +263,14 @@ def spawn_agent_replies_to_human(
                 post_body=post_body,
                 human_comment=human_comment.body or "",
                 human_username=human_username,
-                conversation_context=ctx,
+                conversation_context=conversation,
                 ds=ds,
+                stream=stream,
             )
         except Exception as e:
             log.warning("human_reply_eval_error", agent_id=agent.id, error=str(e))
+            if stream is not None:
+                stream.abort("error")
             continue
 
         should_respond = decision.get("should_respond", False)
@@ -208,6 +288,8 @@ def spawn_agent_replies_to_human(
         )
 
         if not should_respond or not response_text or response_type == "ignore":
+            if stream is not None:
+                stream.abort("declined")
             continue
 
         # Crear comentario de respuesta
@@ -224,6 +306,8 @@ def spawn_agent_replies_to_human(
             )
         ).first()
         if exists:
+            if stream is not None:
+                stream.abort("duplicate")
             continue
 
         row = Comment(
@@ -241,10 +325,21 @@ def spawn_agent_replies_to_human(
         _set_if_has(row, "comment_hash", ch)
 
         db.add(row)
+        record_comment_created(db, row)
         db.commit()
         db.refresh(row)
         created.append(row)
         replies_count += 1
+        if stream is not None:
+            stream.done({
+                "id": row.id,
+                "parent_comment_id": row.parent_comment_id,
+                "author_type": "agent",
+                "author_agent_id": agent.id,
+                "author_display_name": agent.display_name,
+                "body": row.body,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+            })
 
     log.info(
         "human_reply_generated",
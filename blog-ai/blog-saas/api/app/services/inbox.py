@@ -0,0 +1,167 @@
+"""
+Direct-message inbox — per-participant unread counters.
+
+The inbox used to load every conversation and then, per conversation,
+the other user and a COUNT of unread messages (2N+1 queries); the nav
+badge counted unread messages across all of the user's conversations on
+every poll. Each conversation now carries, for both participants:
+
+    user1_unread / user2_unread          messages from the other side not read yet
+    user1_last_read_id / user2_last_read_id   newest message id they have read
+
+record_message() and mark_read() keep them in step with messages.read,
+in the same transaction as the write. The inbox is then one query
+(conversation + other user, keyset-paged over last_message_at) and the
+badge a SUM over the user's conversations. reconcile_unread() repairs
+drift from writers that bypass these helpers; the counter_reconcile job
+runs it.
+"""
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import case, func, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+from app.core.pagination import created_keyset, cut_page
+from app.models.message import Conversation, Message
+from app.models.user import User
+
+log = get_logger(__name__)
+
+RECONCILE_BATCH = int(os.getenv("INBOX_RECONCILE_BATCH", "1000"))
+
+
+def _side(conv: Conversation, user_id: int) -> str:
+    return "user1" if conv.user1_id == user_id else "user2"
+
+
+def _other_side(conv: Conversation, user_id: int) -> str:
+    return "user2" if conv.user1_id == user_id else "user1"
+
+
+def record_message(db: Session, conv: Conversation, sender_id: int, body: str) -> Message:
+    """Add a message and bump the recipient's unread counter. Caller commits."""
+    msg = Message(conversation_id=conv.id, sender_id=sender_id, body=body[:2000], read=False)
+    db.add(msg)
+    unread = getattr(Conversation, f"{_other_side(conv, sender_id)}_unread")
+    db.execute(
+        update(Conversation)
+        .where(Conversation.id == conv.id)
+        .values({
+            unread: unread + 1,
+            Conversation.last_message_preview: body[:100],
+            Conversation.last_message_at: datetime.utcnow(),
+        })
+    )
+    return msg
+
+
+def mark_read(db: Session, conv: Conversation, reader_id: int, messages: Iterable[Message]) -> int:
+    """Mark the other side's messages among `messages` read and move the
+    reader's counter and pointer. Caller commits. Returns how many flipped."""
+    flipped = [m for m in messages if m.sender_id != reader_id and not m.read]
+    if not flipped:
+        return 0
+    for m in flipped:
+        m.read = True
+    side = _side(conv, reader_id)
+    unread = getattr(Conversation, f"{side}_unread")
+    last_read = getattr(Conversation, f"{side}_last_read_id")
+    newest = max(m.id for m in flipped)
+    n = len(flipped)
+    db.execute(
+        update(Conversation)
+        .where(Conversation.id == conv.id)
+        .values({
+            # clamp at 0: messages written before the counters existed
+            unread: case((unread > n, unread - n), else_=0),
+            last_read: case((or_(last_read.is_(None), last_read < newest), newest), else_=last_read),
+        })
+    )
+    return n
+
+
+def _mine(user_id: int):
+    return or_(Conversation.user1_id == user_id, Conversation.user2_id == user_id)
+
+
+def unread_total(db: Session, user_id: int) -> int:
+    mine = case((Conversation.user1_id == user_id, Conversation.user1_unread), else_=Conversation.user2_unread)
+    return int(db.query(func.coalesce(func.sum(mine), 0)).filter(_mine(user_id)).scalar() or 0)
+
+
+def conversation_dict(conv: Conversation, other: User | None, unread: int) -> dict:
+    return {
+        "id": conv.id,
+        "other_user": {
+            "id": other.id,
+            "username": other.username,
+            "display_name": other.display_name or other.username,
+            "avatar_url": other.avatar_url or "",
+        } if other else None,
+        "last_message_preview": conv.last_message_preview or "",
+        "last_message_at": str(conv.last_message_at) if conv.last_message_at else "",
+        "unread": unread,
+    }
+
+
+def inbox_page(db: Session, user_id: int, limit: int, cursor: str | None) -> tuple[list[dict], str | None]:
+    """Most recently active conversations first, with the other participant
+    and this user's unread count, in one query."""
+    other_id = case((Conversation.user1_id == user_id, Conversation.user2_id), else_=Conversation.user1_id)
+    unread = case((Conversation.user1_id == user_id, Conversation.user1_unread), else_=Conversation.user2_unread)
+    q = (
+        db.query(Conversation, User, unread)
+        .outerjoin(User, User.id == other_id)
+        .filter(_mine(user_id))
+    )
+    clause, order = created_keyset(db, Conversation.last_message_at, Conversation.id, cursor)
+    if clause is not None:
+        q = q.filter(clause)
+    rows, next_cursor = cut_page(
+        q.order_by(*order).limit(limit + 1).all(), limit, lambda r: (r[0].last_message_at, r[0].id),
+    )
+    return [conversation_dict(conv, other, int(n or 0)) for conv, other, n in rows], next_cursor
+
+
+def reconcile_unread(db: Session, batch_size: int = RECONCILE_BATCH) -> dict:
+    """Recompute both participants' unread counters from messages.read in
+    keyset batches of conversations; rewrites only the rows that drifted."""
+    checked = repaired = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(Conversation.id, Conversation.user1_id, Conversation.user2_id,
+                     Conversation.user1_unread, Conversation.user2_unread)
+            .filter(Conversation.id > last_id)
+            .order_by(Conversation.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        actual: dict[tuple[int, int], int] = {
+            (cid, sender): n
+            for cid, sender, n in db.query(Message.conversation_id, Message.sender_id, func.count(Message.id))
+            .filter(Message.conversation_id.in_([r[0] for r in batch]), Message.read == False)  # noqa: E712
+            .group_by(Message.conversation_id, Message.sender_id)
+        }
+        for cid, u1, u2, u1_unread, u2_unread in batch:
+            # user1's unread messages are the ones user2 sent, and vice versa
+            want = (actual.get((cid, u2), 0), actual.get((cid, u1), 0))
+            if (u1_unread, u2_unread) != want:
+                db.execute(
+                    update(Conversation).where(Conversation.id == cid)
+                    .values(user1_unread=want[0], user2_unread=want[1])
+                )
+                repaired += 1
+        checked += len(batch)
+        db.commit()
+    if repaired:
+        log.info("inbox_unread_reconciled", checked=checked, repaired=repaired)
+    return {"checked": checked, "repaired": repaired}
@@ -0,0 +1,378 @@
+"""
+Postgres-backed job queue.
+
+Background work used to run as daemon threads inside whichever gunicorn
+worker won the /tmp leader lock — one process on one node, killed on every
+max_requests recycle. Work is now rows in `jobs`:
+
+- enqueue() inserts a job; a `dedupe_key` makes it idempotent
+  (INSERT ... ON CONFLICT DO NOTHING), which is also how periodic jobs are
+  scheduled exactly once per interval across many workers.
+- claim_jobs() takes queued jobs with SELECT ... FOR UPDATE SKIP LOCKED.
+  Each job type has a concurrency cap that holds across all workers: on
+  Postgres the claim for a capped type is serialized with a transaction
+  advisory lock while running jobs are counted.
+- mark_failed() retries with exponential backoff until max_attempts, then
+  parks the job as "dead" and drops its dedupe_key, so the same work can
+  be queued again. reap_stale() re-queues jobs whose worker died mid-run
+  (lease older than JOB_LEASE_SECONDS); run_job() renews the lease with
+  touch() every JOB_HEARTBEAT_SECONDS while the handler runs, so a long
+  job isn't reaped and run twice.
+
+Handlers are registered with @job_handler in app.jobs.handlers and take
+(db, payload). app.jobs.worker is the process that drains the table.
+
+dispatch() is what request paths call: it enqueues when JOB_QUEUE_ENABLED
+is on and otherwise runs the handler inline, so deployments without a
+worker keep today's behaviour.
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.logging import get_logger
+from app.models.job import Job
+
+log = get_logger(__name__)
+
+LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))
+MAX_BACKOFF_SECONDS = int(os.getenv("JOB_MAX_BACKOFF_SECONDS", "3600"))
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(max(1, LEASE_SECONDS // 3))))
+
+
+def queue_enabled() -> bool:
+    return os.getenv("JOB_QUEUE_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class JobSpec:
+    job_type: str
+    fn: Callable[[Session, dict], Any]
+    concurrency: int
+    max_attempts: int
+    backoff_seconds: int
+
+
+@dataclass
+class ClaimedJob:
+    id: int
+    job_type: str
+    payload: str
+    attempts: int
+
+
+_REGISTRY: dict[str, JobSpec] = {}
+
+
+def job_handler(
+    job_type: str,
+    concurrency: int = 1,
+    max_attempts: int = 5,
+    backoff_seconds: int = 30,
+):
+    """Register fn(db, payload) as the handler for `job_type`.
+    JOB_<TYPE>_CONCURRENCY overrides `concurrency` from the environment."""
+    env_conc = os.getenv(f"JOB_{job_type.upper()}_CONCURRENCY")
+    if env_conc:
+        concurrency = int(env_conc)
+
+    def deco(fn):
+        _REGISTRY[job_type] = JobSpec(job_type, fn, max(1, concurrency), max_attempts, backoff_seconds)
+        return fn
+
+    return deco
+
+
+_handlers_loaded = False
+
+
+def registry() -> dict[str, JobSpec]:
+    global _handlers_loaded
+    if not _handlers_loaded:
+        _handlers_loaded = True
+        import app.jobs.handlers  # noqa: F401  (registers on import)
+    return _REGISTRY
+
+
+def get_spec(job_type: str) -> JobSpec:
+    spec = registry().get(job_type)
+    if spec is None:
+        raise KeyError(f"No handler registered for job type {job_type!r}")
+    return spec
+
+
+# ── Producing ───────────────────────────────────────────────────────────────
+
+def enqueue(
+    db: Session,
+    job_type: str,
+    payload: Optional[dict] = None,
+    *,
+    dedupe_key: Optional[str] = None,
+    run_at: Optional[datetime] = None,
+    priority: int = 0,
+    max_attempts: Optional[int] = None,
+    commit: bool = True,
+) -> bool:
+    """Queue a job. Returns False when `dedupe_key` already exists."""
+    spec = get_spec(job_type)
+    params = {
+        "job_type": job_type,
+        "payload": json.dumps(payload or {}, default=str),
+        "status": "queued",
+        "priority": priority,
+        "attempts": 0,
+        "max_attempts": max_attempts or spec.max_attempts,
+        "run_at": run_at or _utcnow(),
+        "dedupe_key": dedupe_key,
+        "created_at": _utcnow(),
+    }
+    if db.bind is not None and db.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    res = db.execute(
+        dialect_insert(Job).values(**params).on_conflict_do_nothing(index_elements=["dedupe_key"])
+    )
+    if commit:
+        db.commit()
+    return bool(res.rowcount)
+
+
+def schedule_periodic(db: Session, job_type: str, every_seconds: int, payload: Optional[dict] = None) -> bool:
+    """Enqueue `job_type` once per `every_seconds` bucket, however many
+    workers call this. The bucket number is passed along in the payload."""
+    bucket = int(_utcnow().timestamp() // max(1, every_seconds))
+    payload = {**(payload or {}), "bucket": bucket}
+    return enqueue(db, job_type, payload, dedupe_key=f"periodic:{job_type}:{bucket}")
+
+
+def dispatch(db: Session, job_type: str, payload: dict, dedupe_key: Optional[str] = None) -> None:
+    """Enqueue when the queue is on, else run the handler inline on `db`."""
+    if queue_enabled():
+        enqueue(db, job_type, payload, dedupe_key=dedupe_key)
+    else:
+        get_spec(job_type).fn(db, payload)
+
+
+# ── Consuming ───────────────────────────────────────────────────────────────
+
+def _type_lock(db: Session, job_type: str) -> None:
+    if db.bind is not None and db.bind.dialect.name == "postgresql":
+        key = zlib.crc32(f"jobs:{job_type}".encode())
+        db.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": key})
+
+
+def claim_jobs(
+    db: Session,
+    worker_id: str,
+    limit: int,
+    job_types: Optional[list[str]] = None,
+) -> list[ClaimedJob]:
+    """Claim up to `limit` runnable jobs, honouring each type's global
+    concurrency cap. Claimed rows are committed as running."""
+    specs = registry()
+    types = [t for t in (job_types or list(specs)) if t in specs]
+    now = _utcnow()
+    claimed: list[ClaimedJob] = []
+
+    for job_type in types:
+        if len(claimed) >= limit:
+            break
+        _type_lock(db, job_type)
+        running = db.query(func.count(Job.id)).filter(
+            Job.job_type == job_type, Job.status == "running"
+        ).scalar() or 0
+        room = min(specs[job_type].concurrency - running, limit - len(claimed))
+        if room <= 0:
+            db.commit()
+            continue
+
+        rows = (
+            db.query(Job)
+            .filter(Job.status == "queued", Job.job_type == job_type, Job.run_at <= now)
+            .order_by(Job.priority.desc(), Job.run_at.asc(), Job.id.asc())
+            .limit(room)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        for job in rows:
+            job.status = "running"
+            job.locked_by = worker_id
+            job.locked_at = now
+            job.attempts = (job.attempts or 0) + 1
+            claimed.append(ClaimedJob(job.id, job.job_type, job.payload, job.attempts))
+        db.commit()
+
+    return claimed
+
+
+def mark_done(db: Session, job_id: int) -> None:
+    db.execute(
+        update(Job).where(Job.id == job_id)
+        .values(status="done", finished_at=_utcnow(), locked_by=None, locked_at=None, last_error=None)
+    )
+    db.commit()
+
+
+def backoff_delay(spec_backoff: int, attempts: int) -> float:
+    base = min(spec_backoff * (2 ** max(attempts - 1, 0)), MAX_BACKOFF_SECONDS)
+    return base * random.uniform(0.8, 1.2)
+
+
+def mark_failed(db: Session, job_id: int, error: str, commit: bool = True) -> str:
+    """Re-queue with backoff, or park as dead once attempts are exhausted.
+    Returns the new status."""
+    job = db.get(Job, job_id)
+    if job is None:
+        return "missing"
+    spec = registry().get(job.job_type)
+    backoff = spec.backoff_seconds if spec else 30
+    if job.attempts >= job.max_attempts:
+        job.status = "dead"
+        job.finished_at = _utcnow()
+        # a dead job must not block its key (human_reply:<id>, ...) forever
+        job.dedupe_key = None
+    else:
+        job.status = "queued"
+        job.run_at = _utcnow() + timedelta(seconds=backoff_delay(backoff, job.attempts))
+    job.last_error = (error or "")[:2000]
+    job.locked_by = None
+    job.locked_at = None
+    if commit:
+        db.commit()
+    return job.status
+
+
+def reap_stale(db: Session, lease_seconds: int = LEASE_SECONDS) -> int:
+    """Jobs stuck in running past their lease belonged to a worker that
+    died; count the attempt and put them back (or park them)."""
+    cutoff = _utcnow() - timedelta(seconds=lease_seconds)
+    ids = [
+        r[0] for r in db.query(Job.id)
+        .filter(Job.status == "running", Job.locked_at < cutoff)
+        .with_for_update(skip_locked=True)
+        .all()
+    ]
+    for job_id in ids:
+        mark_failed(db, job_id, "lease expired", commit=False)
+    db.commit()
+    if ids:
+        log.warning("jobs_reaped", count=len(ids))
+    return len(ids)
+
+
+def purge_finished(db: Session, older_than_hours: int = 72) -> int:
+    """Drop done jobs (dead ones are kept for inspection)."""
+    cutoff = _utcnow() - timedelta(hours=older_than_hours)
+    n = db.query(Job).filter(Job.status == "done", Job.finished_at < cutoff).delete(synchronize_session=False)
+    db.commit()
+    return n
+
+
+def touch(db: Session, job_id: int, worker_id: Optional[str] = None) -> bool:
+    """Renew the lease of a running job. False once the job is no longer
+    running (under `worker_id`, if given): it was reaped or finished."""
+    q = update(Job).where(Job.id == job_id, Job.status == "running")
+    if worker_id is not None:
+        q = q.where(Job.locked_by == worker_id)
+    res = db.execute(q.values(locked_at=_utcnow()))
+    db.commit()
+    return bool(res.rowcount)
+
+
+class _Heartbeat:
+    """touch() a job from a side thread, on a session of its own, until the
+    handler returns."""
+
+    def __init__(self, session_factory, job_id: int, worker_id: Optional[str], every: Optional[float] = None):
+        self.session_factory = session_factory
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.every = every or HEARTBEAT_SECONDS
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-heartbeat-{job_id}", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.every):
+            db = self.session_factory()
+            try:
+                if not touch(db, self.job_id, self.worker_id):
+                    log.warning("job_lease_lost", job_id=self.job_id, worker_id=self.worker_id)
+                    return
+            except Exception as e:
+                log.warning("job_heartbeat_failed", job_id=self.job_id, error=repr(e))
+            finally:
+                db.close()
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(session_factory, job_id: int, job_type: str, payload: str, worker_id: Optional[str] = None) -> bool:
+    """Execute one claimed job on its own session and record the outcome.
+    The lease is renewed while the handler runs."""
+    spec = get_spec(job_type)
+    db = session_factory()
+    try:
+        with metrics.stage(f"job:{job_type}"), _Heartbeat(session_factory, job_id, worker_id):
+            spec.fn(db, json.loads(payload or "{}"))
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        status = mark_failed(db, job_id, repr(e))
+        log.error("job_failed", job_id=job_id, job_type=job_type, error=repr(e), status=status)
+        return False
+    finally:
+        db.close()
+
+    db = session_factory()
+    try:
+        mark_done(db, job_id)
+    finally:
+        db.close()
+    return True
+
+
+def queue_depth(db: Session) -> list[tuple[str, str, int]]:
+    """(job_type, status, count) for queued and running jobs."""
+    return [
+        (job_type, status, n)
+        for job_type, status, n in db.query(Job.job_type, Job.status, func.count(Job.id))
+        .filter(Job.status.in_(("queued", "running")))
+        .group_by(Job.job_type, Job.status)
+        .all()
+    ]
+
+
+def _queue_depth_samples():
+    from app.core.db import SessionLocal
+    db = SessionLocal()
+    try:
+        for job_type, status, n in queue_depth(db):
+            yield "jobs_queue_depth", "gauge", "Jobs waiting or running.", {"job_type": job_type, "status": status}, n
+    finally:
+        db.close()
+
+
+metrics.REGISTRY.register_collector(_queue_depth_samples)
@@ -0,0 +1,375 @@
+"""
+Live room fan-out across processes.
+
+Each gunicorn worker only holds the websockets that connected to it, so a
+chat message or gift handled by worker A has to reach viewers on worker B
+(and on other nodes). Everything that used to loop over the module-level
+socket list now goes through LiveHub.broadcast(), which publishes on a
+LiveBroker; every process's hub receives it and writes it to its own local
+sockets.
+
+Brokers:
+- InMemoryBroker  — single process (tests, local dev on SQLite).
+- PostgresBroker  — LISTEN/NOTIFY on one channel (LIVE_BROKER_CHANNEL).
+  Delivers to the local hub immediately and NOTIFYs the rest; each process
+  skips its own notifications. NOTIFY is fire-and-forget: a process whose
+  listener is reconnecting misses messages in that window, which is fine
+  for chat.
+
+LIVE_BROKER=memory|postgres picks one; the default follows DATABASE_URL.
+
+Local delivery never awaits a socket: each socket gets a LiveConnection
+with a bounded send queue drained by its own task, so fan-out is a
+put_nowait per socket and one slow client can't hold up the room. When a
+queue is full the oldest message is dropped; a client that keeps falling
+behind (LIVE_SLOW_CONSUMER_DROPS drops without a successful send) or whose
+send stalls past LIVE_SEND_TIMEOUT_SECONDS is disconnected.
+
+Blocked usernames are cached per room in each hub — loaded from
+live_room_blocks when the first local socket joins, then kept current by
+the "blocked" broadcasts themselves.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import secrets
+import socket
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+
+from app.core.logging import get_logger
+
+log = get_logger(__name__)
+
+LIVE_CHANNEL = os.getenv("LIVE_BROKER_CHANNEL", "live_rooms")
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7900
+
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+SEND_QUEUE_SIZE = int(os.getenv("LIVE_SEND_QUEUE_SIZE", "256"))
+SLOW_CONSUMER_DROPS = int(os.getenv("LIVE_SLOW_CONSUMER_DROPS", "64"))
+SEND_TIMEOUT = float(os.getenv("LIVE_SEND_TIMEOUT_SECONDS", "10"))
+# 1013 "try again later": client may reconnect and reload history
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+Deliver = Callable[[str, str, str], Awaitable[None]]
+
+
+class LiveBroker(ABC):
+    """Fan-out transport. `deliver(room, kind, text)` is called for every
+    published message, in every process, including the publishing one."""
+
+    @abstractmethod
+    async def start(self, deliver: Deliver) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, room: str, kind: str, text: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryBroker(LiveBroker):
+    def __init__(self):
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def publish(self, room: str, kind: str, text: str) -> None:
+        if self._deliver is not None:
+            await self._deliver(room, kind, text)
+
+
+class PostgresBroker(LiveBroker):
+    def __init__(self, dsn: str, channel: str = LIVE_CHANNEL, node_id: str = NODE_ID):
+        self.dsn = dsn
+        self.channel = channel
+        self.node_id = node_id
+        self._deliver: Optional[Deliver] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._pub_conn = None
+        self._pub_lock = asyncio.Lock()
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+                    await conn.execute(f'LISTEN "{self.channel}"')
+                    log.info("live_broker_listening", channel=self.channel, node=self.node_id)
+                    backoff = 1.0
+                    async for note in conn.notifies():
+                        await self._on_notify(note.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("live_broker_listen_error", error=str(e), retry_in=backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _on_notify(self, payload: str) -> None:
+        try:
+            env = json.loads(payload)
+        except ValueError:
+            return
+        if env.get("o") == self.node_id or self._deliver is None:
+            return
+        try:
+            await self._deliver(env["r"], env.get("k", ""), env["t"])
+        except Exception as e:
+            log.warning("live_broker_deliver_error", room=env.get("r"), error=str(e))
+
+    async def publish(self, room: str, kind: str, text: str) -> None:
+        if self._deliver is not None:
+            await self._deliver(room, kind, text)
+        payload = json.dumps({"r": room, "k": kind, "t": text, "o": self.node_id}, separators=(",", ":"))
+        if len(payload.encode("utf-8")) >= NOTIFY_MAX_BYTES:
+            log.warning("live_broker_payload_too_large", room=room, kind=kind, size=len(payload))
+            return
+        import psycopg
+
+        async with self._pub_lock:
+            try:
+                if self._pub_conn is None or self._pub_conn.closed:
+                    self._pub_conn = await psycopg.AsyncConnection.connect(self.dsn, autocommit=True)
+                await self._pub_conn.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            except Exception as e:
+                log.warning("live_broker_publish_error", room=room, error=str(e))
+                self._pub_conn = None
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pub_conn is not None:
+            await self._pub_conn.close()
+            self._pub_conn = None
+
+
+class LiveConnection:
+    """One local websocket with a bounded outbound queue and its own sender
+    task. send() never blocks."""
+
+    def __init__(
+        self,
+        ws,
+        on_close: Callable[["LiveConnection"], None],
+        maxsize: int = SEND_QUEUE_SIZE,
+        max_drops: int = SLOW_CONSUMER_DROPS,
+        send_timeout: float = SEND_TIMEOUT,
+    ):
+        self.ws = ws
+        self.dropped = 0
+        self.closed = False
+        self._on_close = on_close
+        self._max_drops = max_drops
+        self._send_timeout = send_timeout
+        self._behind = 0
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=maxsize)
+        self._task = asyncio.create_task(self._run())
+
+    def send(self, text: str) -> None:
+        if self.closed:
+            return
+        try:
+            self._queue.put_nowait(text)
+            return
+        except asyncio.QueueFull:
+            pass
+        self._queue.get_nowait()
+        self._queue.task_done()
+        self._queue.put_nowait(text)
+        self.dropped += 1
+        self._behind += 1
+        if self._behind >= self._max_drops:
+            log.info("live_slow_consumer_disconnected", dropped=self.dropped)
+            self.close(SLOW_CONSUMER_CLOSE_CODE)
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                text = await self._queue.get()
+                try:
+                    await asyncio.wait_for(self.ws.send_text(text), self._send_timeout)
+                finally:
+                    self._queue.task_done()
+                self._behind = 0
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            pass
+        finally:
+            self.closed = True
+            self._discard_pending()
+            self._on_close(self)
+
+    def _discard_pending(self) -> None:
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+
+    def close(self, code: Optional[int] = None) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._task.cancel()
+        self._discard_pending()
+        if code is not None:
+            asyncio.create_task(self._close_ws(code))
+
+    async def _close_ws(self, code: int) -> None:
+        try:
+            await self.ws.close(code=code)
+        except Exception:
+            pass
+
+    async def drain(self) -> None:
+        """Wait until everything queued so far has been sent (or dropped)."""
+        await self._queue.join()
+
+
+class LiveHub:
+    """This process's websockets per room, wired to a broker."""
+
+    def __init__(self, broker: LiveBroker, session_factory=None):
+        self.broker = broker
+        self._session_factory = session_factory
+        self._rooms: dict[str, dict] = {}
+        self._blocked: dict[str, set[str]] = {}
+        self._started = False
+
+    async def _ensure_started(self) -> None:
+        if not self._started:
+            self._started = True
+            await self.broker.start(self._deliver)
+
+    def _load_blocked(self, room: str) -> set[str]:
+        from app.services.live_rooms import blocked_usernames
+        if self._session_factory is None:
+            from app.core.db import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            return blocked_usernames(db, room)
+        except Exception as e:
+            log.warning("live_blocks_load_error", room=room, error=str(e))
+            return set()
+        finally:
+            db.close()
+
+    async def connect(self, room: str, ws) -> bool:
+        """Register a local socket. True if it's the first one for the room
+        in this process."""
+        await self._ensure_started()
+        first = room not in self._rooms
+        if first:
+            self._rooms[room] = {}
+            self._blocked[room] = await asyncio.to_thread(self._load_blocked, room)
+        self._rooms[room][ws] = LiveConnection(ws, on_close=lambda c: self._forget(room, c))
+        return first
+
+    def _forget(self, room: str, conn: LiveConnection) -> None:
+        conns = self._rooms.get(room)
+        if conns is None or conns.get(conn.ws) is not conn:
+            return
+        del conns[conn.ws]
+        if not conns:
+            self._rooms.pop(room, None)
+            self._blocked.pop(room, None)
+
+    def disconnect(self, room: str, ws) -> None:
+        conn = self._rooms.get(room, {}).get(ws)
+        if conn is not None:
+            self._forget(room, conn)
+            conn.close()
+
+    def connections(self, room: str) -> list:
+        return list(self._rooms.get(room, ()))
+
+    def has_connections(self, room: str) -> bool:
+        return bool(self._rooms.get(room))
+
+    def is_blocked(self, room: str, username: Optional[str]) -> bool:
+        return bool(username) and username in self._blocked.get(room, ())
+
+    async def broadcast(self, room: str, message: dict) -> None:
+        """Send `message` to every socket in the room, on every process."""
+        await self._ensure_started()
+        await self.broker.publish(room, message.get("type", ""), json.dumps(message))
+
+    def send_local(self, room: str, ws, message: dict) -> None:
+        """Send `message` to one socket of this process only."""
+        conn = self._rooms.get(room, {}).get(ws)
+        if conn is not None:
+            conn.send(json.dumps(message))
+
+    async def drain(self, room: str) -> None:
+        """Wait for every local socket in the room to flush its queue."""
+        conns = list(self._rooms.get(room, {}).values())
+        await asyncio.gather(*(c.drain() for c in conns))
+
+    async def _deliver(self, room: str, kind: str, text: str) -> None:
+        if kind == "blocked" and room in self._blocked:
+            username = json.loads(text).get("username")
+            if username:
+                self._blocked[room].add(username)
+
+        conns = self._rooms.get(room)
+        if not conns:
+            return
+        for conn in list(conns.values()):
+            conn.send(text)
+
+        if kind == "stream_ended":
+            self._rooms.pop(room, None)
+            self._blocked.pop(room, None)
+            for conn in conns.values():
+                asyncio.create_task(self._close_after_drain(conn))
+
+    @staticmethod
+    async def _close_after_drain(conn: LiveConnection) -> None:
+        await conn.drain()
+        conn.close()
+
+    async def close(self) -> None:
+        for room in list(self._rooms):
+            for conn in list(self._rooms.get(room, {}).values()):
+                conn.close()
+        self._rooms.clear()
+        self._blocked.clear()
+        await self.broker.close()
+
+
+def make_broker(channel: str = LIVE_CHANNEL) -> LiveBroker:
+    from app.core.db import DATABASE_URL
+
+    kind = os.getenv("LIVE_BROKER", "").strip().lower()
+    if not kind:
+        kind = "postgres" if DATABASE_URL.startswith("postgresql") else "memory"
+    if kind == "postgres":
+        from sqlalchemy.engine import make_url
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBroker(dsn, channel=channel)
+    return InMemoryBroker()
+
+
+_hub: Optional[LiveHub] = None
+
+
+def get_hub() -> LiveHub:
+    global _hub
+    if _hub is None:
+        _hub = LiveHub(make_broker())
+    return _hub
@@ -0,0 +1,178 @@
+"""
+Live chat write path.
+
+The websocket handler used to open a SessionLocal and INSERT + commit
+every chat message inline, on the event loop. Now:
+
+- ChatWriter buffers live_chat rows and writes them in one executemany
+  per LIVE_CHAT_FLUSH_MS (or as soon as LIVE_CHAT_FLUSH_BATCH rows are
+  waiting), in a worker thread. If the database is unavailable the buffer
+  is capped at LIVE_CHAT_MAX_BUFFER rows, oldest dropped first. Chat
+  history (GET /live/{room}/chat) can trail the live feed by one flush
+  interval.
+- ChatRateLimiter is a per-sender token bucket (LIVE_CHAT_RATE messages/s,
+  bursts of LIVE_CHAT_BURST), checked before anything is persisted or
+  broadcast.
+
+Both are per process; get_chat_writer() returns the shared writer.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Callable, Hashable, Optional
+
+from sqlalchemy import text
+
+from app.core.logging import get_logger
+
+log = get_logger(__name__)
+
+FLUSH_MS = int(os.getenv("LIVE_CHAT_FLUSH_MS", "250"))
+FLUSH_BATCH = int(os.getenv("LIVE_CHAT_FLUSH_BATCH", "200"))
+MAX_BUFFER = int(os.getenv("LIVE_CHAT_MAX_BUFFER", "10000"))
+CHAT_RATE = float(os.getenv("LIVE_CHAT_RATE", "1"))
+CHAT_BURST = int(os.getenv("LIVE_CHAT_BURST", "5"))
+
+_INSERT = text(
+    "INSERT INTO live_chat (room_name, user_id, username, display_name, message, is_agent, agent_name) "
+    "VALUES (:room, :uid, :uname, :dname, :msg, :is_agent, :aname)"
+)
+
+
+def chat_row(
+    room: str,
+    message: str,
+    *,
+    user_id: Optional[int] = None,
+    username: Optional[str] = None,
+    display_name: Optional[str] = None,
+    is_agent: bool = False,
+    agent_name: Optional[str] = None,
+) -> dict:
+    return {
+        "room": room, "uid": user_id, "uname": username, "dname": display_name,
+        "msg": message, "is_agent": is_agent, "aname": agent_name,
+    }
+
+
+class ChatWriter:
+    def __init__(
+        self,
+        session_factory=None,
+        flush_ms: int = FLUSH_MS,
+        flush_batch: int = FLUSH_BATCH,
+        max_buffer: int = MAX_BUFFER,
+    ):
+        self._session_factory = session_factory
+        self.flush_interval = flush_ms / 1000.0
+        self.flush_batch = flush_batch
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._buffer: list[dict] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, row: dict) -> None:
+        """Queue one live_chat row. Never blocks; must be called on the loop."""
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._buffer.append(row)
+        if len(self._buffer) > self.max_buffer:
+            overflow = len(self._buffer) - self.max_buffer
+            del self._buffer[:overflow]
+            self.dropped += overflow
+            log.warning("live_chat_buffer_overflow", dropped=overflow)
+        if len(self._buffer) >= self.flush_batch:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning("live_chat_flush_error", error=str(e))
+
+    async def flush(self) -> int:
+        """Write everything buffered so far. Returns rows written."""
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            # put them back in front of anything queued meanwhile; the
+            # overflow cap in add() bounds this while the DB is down
+            self._buffer[:0] = rows
+            log.warning("live_chat_write_failed", rows=len(rows), error=str(e))
+            return 0
+        return len(rows)
+
+    def _write(self, rows: list[dict]) -> None:
+        if self._session_factory is None:
+            from app.core.db import SessionLocal
+            self._session_factory = SessionLocal
+        db = self._session_factory()
+        try:
+            db.execute(_INSERT, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+class ChatRateLimiter:
+    def __init__(
+        self,
+        rate: float = CHAT_RATE,
+        burst: int = CHAT_BURST,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = 50_000,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._max_keys = max_keys
+        self._buckets: dict[Hashable, tuple[float, float]] = {}
+
+    def allow(self, key: Hashable) -> bool:
+        now = self._clock()
+        tokens, last = self._buckets.get(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self._max_keys:
+            self._prune(now)
+        return allowed
+
+    def _prune(self, now: float) -> None:
+        # a bucket idle long enough to have refilled is the same as no bucket
+        full_after = self.burst / self.rate if self.rate else 0
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < full_after}
+
+
+_writer: Optional[ChatWriter] = None
+
+
+def get_chat_writer() -> ChatWriter:
+    global _writer
+    if _writer is None:
+        _writer = ChatWriter()
+    return _writer
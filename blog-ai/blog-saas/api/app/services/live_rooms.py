@@ -0,0 +1,103 @@
+"""
+Shared live-room state: join requests, chat blocks, leases.
+
+Backed by the live_* tables (app/models/live_room.py) so every worker and
+node agrees. Writers commit; broadcasting the change to connected sockets
+is the caller's job (through app.services.live_broker).
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from app.models.live_room import LiveJoinRequest, LiveRoomBlock, LiveRoomLease
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _insert_ignore(db: Session, model, values: dict) -> int:
+    if db.bind is not None and db.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return db.execute(dialect_insert(model).values(**values).on_conflict_do_nothing()).rowcount or 0
+
+
+# ── Join requests ───────────────────────────────────────────────────────────
+
+def add_join_request(db: Session, room_name: str, username: str, display_name: str | None, user_id: int | None) -> None:
+    """Record (or refresh) a viewer's request to co-host."""
+    db.query(LiveJoinRequest).filter(
+        LiveJoinRequest.room_name == room_name, LiveJoinRequest.username == username
+    ).delete(synchronize_session=False)
+    db.add(LiveJoinRequest(room_name=room_name, username=username, display_name=display_name, user_id=user_id))
+    db.commit()
+
+
+def remove_join_request(db: Session, room_name: str, username: str) -> None:
+    db.query(LiveJoinRequest).filter(
+        LiveJoinRequest.room_name == room_name, LiveJoinRequest.username == username
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def list_join_requests(db: Session, room_name: str) -> list[dict]:
+    rows = (
+        db.query(LiveJoinRequest)
+        .filter(LiveJoinRequest.room_name == room_name)
+        .order_by(LiveJoinRequest.created_at.asc())
+        .all()
+    )
+    return [{"username": r.username, "display_name": r.display_name, "user_id": r.user_id} for r in rows]
+
+
+# ── Blocks ──────────────────────────────────────────────────────────────────
+
+def block_user(db: Session, room_name: str, username: str) -> None:
+    _insert_ignore(db, LiveRoomBlock, {"room_name": room_name, "username": username, "created_at": _utcnow()})
+    db.commit()
+
+
+def blocked_usernames(db: Session, room_name: str) -> set[str]:
+    return {r[0] for r in db.query(LiveRoomBlock.username).filter(LiveRoomBlock.room_name == room_name).all()}
+
+
+# ── Leases ──────────────────────────────────────────────────────────────────
+
+def claim_lease(db: Session, room_name: str, lease: str, owner: str, ttl_seconds: float) -> bool:
+    """Take or renew `lease` on a room for `owner`. True if owner now holds
+    it; False while another owner's lease is still unexpired."""
+    now = _utcnow()
+    expires = now + timedelta(seconds=ttl_seconds)
+    res = db.execute(
+        update(LiveRoomLease)
+        .where(
+            LiveRoomLease.room_name == room_name,
+            LiveRoomLease.lease == lease,
+            or_(LiveRoomLease.owner == owner, LiveRoomLease.expires_at < now),
+        )
+        .values(owner=owner, expires_at=expires)
+    )
+    claimed = bool(res.rowcount) or bool(_insert_ignore(
+        db, LiveRoomLease, {"room_name": room_name, "lease": lease, "owner": owner, "expires_at": expires}
+    ))
+    db.commit()
+    return claimed
+
+
+def release_lease(db: Session, room_name: str, lease: str, owner: str) -> None:
+    db.query(LiveRoomLease).filter(
+        and_(LiveRoomLease.room_name == room_name, LiveRoomLease.lease == lease, LiveRoomLease.owner == owner)
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def clear_room(db: Session, room_name: str) -> None:
+    """Drop all shared state for a room that has ended."""
+    for model in (LiveJoinRequest, LiveRoomBlock, LiveRoomLease):
+        db.query(model).filter(model.room_name == room_name).delete(synchronize_session=False)
+    db.commit()
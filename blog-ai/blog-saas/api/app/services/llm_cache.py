@@ -0,0 +1,193 @@
+"""
+LLM response cache.
+
+Moderation keeps re-scoring identical text — the same post body goes
+through the moderation worker, PostModerationAdapter and sweeps.
+AsyncLLMClient.complete(..., cache="<site>") now looks the prompt up in:
+
+1. an in-memory LRU (LLM_CACHE_MEMORY_ITEMS), per process;
+2. the llm_cache table, shared by every worker and kept across deploys;
+
+and only then calls the providers. Concurrent identical prompts in a
+process are coalesced (single-flight): the first caller does the lookup
+and the upstream call, the others await its result. If that first caller
+is cancelled, the call isn't: one of the waiters takes it over.
+
+The key is a sha256 over the providers/models the call may fail over
+to, system, user, temperature and max_tokens. TTLs are per call site
+(SITE_TTLS; LLM_CACHE_TTL_<SITE> overrides it, 0 disables the site).
+Calls without `cache=` — generation, where the same prompt should get a
+fresh answer — bypass all of this.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.logging import get_logger
+from app.models.llm_cache_entry import LLMCacheEntry
+
+log = get_logger(__name__)
+
+SITE_TTLS = {
+    "moderation": 7 * 24 * 3600,
+}
+MEMORY_ITEMS = int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "5000"))
+PERSIST = os.getenv("LLM_CACHE_PERSIST", "1") == "1"
+
+
+def site_ttl(site: str) -> float:
+    try:
+        return float(os.getenv(f"LLM_CACHE_TTL_{site.upper()}", SITE_TTLS.get(site, 0)))
+    except ValueError:
+        return float(SITE_TTLS.get(site, 0))
+
+
+class _LeaderCancelled(Exception):
+    """Set on the in-flight future when its leader is cancelled, so the
+    waiters retry instead of failing."""
+
+
+def cache_key(
+    scope: list[tuple[str, str]],
+    system: str,
+    user: str,
+    temperature: float | None,
+    max_tokens: int | None,
+) -> str:
+    raw = json.dumps([scope, system, user, temperature, max_tokens], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, session_factory=None, memory_items: int = MEMORY_ITEMS, persist: bool = PERSIST):
+        self._session_factory = session_factory
+        self._persist = persist
+        self._memory = TTLCache(3600, maxsize=memory_items)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def get_or_call(self, key: str, site: str, call: Callable[[], Awaitable]):
+        """The cached LLMResponse for `key`, or call() stored under it."""
+        ttl = site_ttl(site)
+        if ttl <= 0:
+            return await call()
+        while True:
+            hit = self._memory.get(key)
+            if hit is not None:
+                return replace(hit, cached=True)
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                return replace(await asyncio.shield(pending), cached=True)
+            except _LeaderCancelled:
+                continue  # the first waiter back here leads the retry
+
+        fut = asyncio.get_running_loop().create_future()
+        # waiters may be gone by the time it fails; don't warn about that
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = fut
+        try:
+            resp, remaining = await self._load(key)
+            if resp is None:
+                resp, remaining = await call(), ttl
+                await self._store(key, site, resp, ttl)
+            self._memory.set(key, replace(resp, cached=False), ttl=remaining)
+            fut.set_result(resp)
+            return resp
+        except asyncio.CancelledError:
+            # only the leader's caller went away; the waiters still want it
+            fut.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    # ── persistent tier ─────────────────────────────────────────────────────
+
+    def _session(self) -> Session:
+        if self._session_factory is None:
+            from app.core.db import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    async def _load(self, key: str):
+        if not self._persist:
+            return None, 0.0
+        try:
+            return await asyncio.to_thread(self._read, key)
+        except Exception as e:
+            log.warning("llm_cache_read_failed", error=str(e))
+            return None, 0.0
+
+    def _read(self, key: str):
+        from app.services.llm_client import LLMResponse
+
+        db = self._session()
+        try:
+            row = db.get(LLMCacheEntry, key)
+            if row is None:
+                return None, 0.0
+            expires = row.expires_at if row.expires_at.tzinfo else row.expires_at.replace(tzinfo=timezone.utc)
+            remaining = (expires - datetime.now(timezone.utc)).total_seconds()
+            if remaining <= 0:
+                return None, 0.0
+            resp = LLMResponse(text=row.response, provider=row.provider, model=row.model, latency_ms=0.0, cached=True)
+            return resp, remaining
+        finally:
+            db.close()
+
+    async def _store(self, key: str, site: str, resp, ttl: float) -> None:
+        if not self._persist:
+            return
+        try:
+            await asyncio.to_thread(self._write, key, site, resp, ttl)
+        except Exception as e:
+            log.warning("llm_cache_write_failed", error=str(e))
+
+    def _write(self, key: str, site: str, resp, ttl: float) -> None:
+        db = self._session()
+        try:
+            if db.bind is not None and db.bind.dialect.name == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            values = {
+                "key": key, "site": site, "provider": resp.provider, "model": resp.model or "",
+                "response": resp.text,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl),
+            }
+            stmt = dialect_insert(LLMCacheEntry).values(**values)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[LLMCacheEntry.key],
+                set_={k: stmt.excluded[k] for k in ("site", "provider", "model", "response", "expires_at")},
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+
+def purge_expired(db: Session) -> int:
+    n = (
+        db.query(LLMCacheEntry)
+        .filter(LLMCacheEntry.expires_at <= datetime.now(timezone.utc))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return n
@@ -1,167 +1,709 @@
 # app/services/llm_client.py
-import time
-import os
-import requests
-from typing import Any, Optional, Dict
+"""
+Unified LLM client — Groq → Qwen → DeepSeek with automatic failover.
+
+AsyncLLMClient is the engine. Per process it holds:
+- one httpx.AsyncClient, so connections to each provider are kept alive
+  and reused instead of a fresh TLS handshake per requests.post;
+- per provider, a bounded semaphore (LLM_<PROVIDER>_MAX_CONCURRENCY) and a
+  token bucket (LLM_<PROVIDER>_RATE_PER_SEC / _BURST) so a burst of
+  spawner calls can't exceed what the provider accepts;
+- per provider, a circuit breaker: after LLM_BREAKER_FAILURES consecutive
+  failures the provider is skipped for LLM_BREAKER_RESET_SECONDS, then a
+  single half-open probe decides whether it comes back. This replaces
+  the old "flip use_qwen=False forever on the first error".
+
+A 429 is honoured only if Retry-After is short (LLM_RATE_LIMIT_MAX_WAIT);
+otherwise we fail over to the next provider instead of sleeping up to 30s.
+
+LLMClient is the sync facade the spawners and jobs use. All facades share
+one engine running on a dedicated background event loop, so constructing
+LLMClient() per call is cheap and a slow provider only ties up that loop's
+semaphore slots — not the caller's thread pool or the uvicorn event loop.
+Async code (live.py) awaits LLMClient.achat(), which hops to the engine
+loop without blocking the caller's loop.
+
+Scoring-style calls pass cache="<site>" to reuse earlier answers to the
+same prompt; see app/services/llm_cache.py.
+
+stream() / LLMClient.stream() yield the completion as the provider sends
+it ("stream": true, server-sent chunks). Failover works as in complete()
+until the first chunk arrives; after that the provider is committed and
+an error is raised to the caller, who already holds partial text.
+"""
+from __future__ import annotations
+
+import asyncio
 import json
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
 
+import httpx
+
+from app.core import metrics
 from app.core.logging import get_logger
+from app.services.llm_cache import LLMCache, cache_key
 
 log = get_logger(__name__)
 
 
-class LLMClient:
-    """Cliente unificado que intenta Qwen primero y DeepSeek como fallback"""
-    
-    def __init__(self):
-        # Configuración Qwen
-        self.qwen_api_key = os.getenv("DASHSCOPE_API_KEY") or os.getenv("QWEN_API_KEY", "").strip()
-        self.qwen_base_url = os.getenv("DASHSCOPE_BASE_URL", "https://dashscope-intl.aliyuncs.com/compatible-mode/v1").rstrip("/")
-        self.qwen_model = os.getenv("DASHSCOPE_MODEL", "qwen-plus").strip()
-        # Corregir modelo inválido
-        if self.qwen_model in ("qwen3.5-plus", "qwen3-plus"):
-            self.qwen_model = "qwen-plus"
-        self.qwen_max_tokens = int(os.getenv("DASHSCOPE_MAX_TOKENS", "2048"))
-        self.qwen_temperature = float(os.getenv("DASHSCOPE_TEMPERATURE", "0.7"))
-        
-        # Configuración DeepSeek (fallback)
-        self.deepseek_api_key = os.getenv("DEEPSEEK_API_KEY", "").strip()
-        self.deepseek_base_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com").rstrip("/")
-        self.deepseek_model = os.getenv("DEEPSEEK_MODEL", "deepseek-chat").strip()
-        self.deepseek_max_tokens = int(os.getenv("DEEPSEEK_MAX_TOKENS", "350"))
-        self.deepseek_temperature = float(os.getenv("DEEPSEEK_TEMPERATURE", "0.6"))
-        
-        self.timeout = int(os.getenv("LLM_TIMEOUT", "30"))
-        # Groq
-        self.groq_api_key = os.getenv("GROQ_API_KEY", "").strip()
-        self.groq_model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
-        self.groq_base_url = "https://api.groq.com/openai/v1"
-        self.last_error = None
-        self.use_qwen = True  # Intentar Qwen primero
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+class LLMProviderError(RuntimeError):
+    def __init__(self, provider: str, message: str, status: int | None = None, retry_after: float | None = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+
+
+@dataclass
+class ProviderConfig:
+    name: str
+    base_url: str
+    api_key: str
+    model: str
+    max_tokens: int
+    temperature: float
+    max_concurrency: int = 4
+    rate_per_sec: float = 2.0
+    burst: int = 4
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    provider: str
+    model: str
+    latency_ms: float
+    usage: dict = field(default_factory=dict)
+    cached: bool = False
+
+
+def load_provider_configs() -> list[ProviderConfig]:
+    """Providers in priority order. Env names match the old client."""
+    qwen_model = os.getenv("DASHSCOPE_MODEL", "qwen-plus").strip()
+    # Corregir modelo inválido
+    if qwen_model in ("qwen3.5-plus", "qwen3-plus"):
+        qwen_model = "qwen-plus"
+
+    def limits(prefix: str, conc: int, rate: float, burst: int) -> dict:
+        return {
+            "max_concurrency": max(1, _env_int(f"LLM_{prefix}_MAX_CONCURRENCY", conc)),
+            "rate_per_sec": max(0.01, _env_float(f"LLM_{prefix}_RATE_PER_SEC", rate)),
+            "burst": max(1, _env_int(f"LLM_{prefix}_BURST", burst)),
+        }
+
+    return [
+        # Groq primero — más rápido y gratis (pero con rate limit agresivo)
+        ProviderConfig(
+            name="groq",
+            base_url="https://api.groq.com/openai/v1",
+            api_key=os.getenv("GROQ_API_KEY", "").strip(),
+            model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
+            max_tokens=_env_int("GROQ_MAX_TOKENS", 2048),
+            temperature=_env_float("GROQ_TEMPERATURE", 0.7),
+            **limits("GROQ", 4, 0.5, 4),
+        ),
+        ProviderConfig(
+            name="qwen",
+            base_url=os.getenv("DASHSCOPE_BASE_URL", "https://dashscope-intl.aliyuncs.com/compatible-mode/v1").rstrip("/"),
+            api_key=(os.getenv("DASHSCOPE_API_KEY") or os.getenv("QWEN_API_KEY", "")).strip(),
+            model=qwen_model,
+            max_tokens=_env_int("DASHSCOPE_MAX_TOKENS", 2048),
+            temperature=_env_float("DASHSCOPE_TEMPERATURE", 0.7),
+            **limits("QWEN", 8, 5.0, 8),
+        ),
+        ProviderConfig(
+            name="deepseek",
+            base_url=os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com").rstrip("/"),
+            api_key=os.getenv("DEEPSEEK_API_KEY", "").strip(),
+            model=os.getenv("DEEPSEEK_MODEL", "deepseek-chat").strip(),
+            max_tokens=_env_int("DEEPSEEK_MAX_TOKENS", 350),
+            temperature=_env_float("DEEPSEEK_TEMPERATURE", 0.6),
+            **limits("DEEPSEEK", 8, 5.0, 8),
+        ),
+    ]
+
+
+# ── Rate limiting / circuit breaking ────────────────────────────────────────
+
+class TokenBucket:
+    """Classic token bucket. Only touched from the engine loop, so no lock."""
+
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    def try_acquire(self) -> float:
+        """Take a token if available and return 0; otherwise return how many
+        seconds until one will be."""
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            # exactly one in-flight probe decides whether we close again
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probing = False
+
+    def release(self) -> None:
+        """Give up an allowed call without a verdict (it was cancelled): a
+        half-open probe is freed so the next call can probe instead."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._trip()
+            return
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._trip()
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._probing = False
+
+
+# ── Engine ──────────────────────────────────────────────────────────────────
+
+class AsyncLLMClient:
+    def __init__(
+        self,
+        providers: list[ProviderConfig] | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        timeout: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        cache: LLMCache | None = None,
+    ):
+        self.providers = providers if providers is not None else load_provider_configs()
+        self.cache = cache if cache is not None else LLMCache()
+        self.timeout = timeout if timeout is not None else _env_float("LLM_TIMEOUT", 30)
+        self.max_attempts = max(1, _env_int("LLM_MAX_ATTEMPTS", 2))
+        self.rate_limit_max_wait = _env_float("LLM_RATE_LIMIT_MAX_WAIT", 2.0)
+        self._http = httpx.AsyncClient(
+            timeout=self.timeout,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=_env_int("LLM_POOL_MAX_CONNECTIONS", 50),
+                max_keepalive_connections=_env_int("LLM_POOL_MAX_KEEPALIVE", 20),
+                keepalive_expiry=60,
+            ),
+        )
+        failures = max(1, _env_int("LLM_BREAKER_FAILURES", 3))
+        reset = _env_float("LLM_BREAKER_RESET_SECONDS", 60)
+        self._by_name = {p.name: p for p in self.providers}
+        self._sems = {p.name: asyncio.Semaphore(p.max_concurrency) for p in self.providers}
+        self._buckets = {p.name: TokenBucket(p.rate_per_sec, p.burst, clock) for p in self.providers}
+        self._breakers = {p.name: CircuitBreaker(failures, reset, clock) for p in self.providers}
 
     def is_enabled(self) -> bool:
-        """Verifica si al menos un cliente está configurado"""
-        return bool(self.qwen_api_key) or bool(self.deepseek_api_key) or bool(self.groq_api_key)
+        return any(p.enabled for p in self.providers)
 
-    def chat(self, system: str, user: str) -> str:
-        """Intenta Groq primero (gratis y rápido), luego Qwen, luego DeepSeek"""
+    def provider(self, name: str) -> ProviderConfig | None:
+        return self._by_name.get(name)
 
-        # Groq primero — más rápido y gratis
-        if self.groq_api_key:
-            for attempt in range(3):
-                try:
-                    return self._chat_groq(system, user)
-                except Exception as e:
-                    if "429" in str(e) and attempt < 2:
-                        import time as _t
-                        wait = (attempt + 1) * 10
-                        log.warning("groq_rate_limit_retry", wait_seconds=wait, attempt=attempt + 1)
-                        _t.sleep(wait)
-                    else:
-                        log.warning("groq_failed", error=str(e))
-                        break
-
-        # Intentar Qwen
-        if self.use_qwen and self.qwen_api_key:
+    def breaker_state(self, name: str) -> str:
+        return self._breakers[name].state
+
+    def available(self, name: str) -> bool:
+        cfg = self._by_name.get(name)
+        return bool(cfg and cfg.enabled and self._breakers[name].state != CircuitBreaker.OPEN)
+
+    async def complete(
+        self,
+        system: str,
+        user: str,
+        *,
+        temperature: float | None = None,
+        max_tokens: int | None = None,
+        providers: list[str] | None = None,
+        cache: str | None = None,
+    ) -> LLMResponse:
+        """Try providers in priority order, skipping disabled ones and ones
+        whose breaker is open. Raises the last provider error if all fail.
+
+        `cache` names the call site's cache policy (see llm_cache); without
+        it the providers are always called."""
+        call = lambda: self._complete(system, user, temperature, max_tokens, providers)  # noqa: E731
+        if cache is None:
+            return await call()
+        scope = [
+            (cfg.name, cfg.model) for cfg in self.providers
+            if cfg.enabled and (providers is None or cfg.name in providers)
+        ]
+        key = cache_key(scope, system, user, temperature, max_tokens)
+        return await self.cache.get_or_call(key, cache, call)
+
+    async def _complete(
+        self,
+        system: str,
+        user: str,
+        temperature: float | None,
+        max_tokens: int | None,
+        providers: list[str] | None,
+    ) -> LLMResponse:
+        last_exc: Exception | None = None
+        for cfg in self.providers:
+            if providers is not None and cfg.name not in providers:
+                continue
+            if not cfg.enabled:
+                continue
+            breaker = self._breakers[cfg.name]
+            if not breaker.allow():
+                log.debug("llm_provider_skipped", provider=cfg.name, breaker=breaker.state)
+                continue
             try:
-                log.debug("llm_attempt", provider="qwen")
-                return self._chat_qwen(system, user)
+                resp = await self._call_with_retries(cfg, system, user, temperature, max_tokens)
             except Exception as e:
-                log.warning("qwen_failed", error=str(e))
-                self.last_error = e
-                # Si Qwen falla, cambiar a DeepSeek para futuras llamadas
-                self.use_qwen = False
-        
-        # Fallback a DeepSeek
-        if self.deepseek_api_key:
-            log.debug("llm_attempt", provider="deepseek", reason="fallback")
-            return self._chat_deepseek(system, user)
-        
-        raise RuntimeError("No LLM clients available (Qwen and DeepSeek both disabled)")
+                breaker.record_failure()
+                log.warning("llm_provider_failed", provider=cfg.name, error=str(e)[:300], breaker=breaker.state)
+                last_exc = e
+                continue
+            except BaseException:
+                # cancelled, e.g. by the sync facade's deadline: no verdict,
+                # but don't leave a half-open probe claimed forever
+                breaker.release()
+                raise
+            breaker.record_success()
+            return resp
 
-    def _chat_qwen(self, system: str, user: str) -> str:
-        """Llamada específica a Qwen"""
-        url = f"{self.qwen_base_url}/chat/completions"
-        payload = {
-            "model": self.qwen_model,
-            "messages": [
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            "temperature": self.qwen_temperature,
-            "max_tokens": self.qwen_max_tokens,
-            "stream": False,
-        }
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.qwen_api_key}",
-        }
+        if last_exc is not None:
+            raise last_exc
+        raise RuntimeError("No LLM clients available (all providers disabled or circuit-open)")
 
-        for attempt in range(3):
+    async def chat(self, system: str, user: str, **kw: Any) -> str:
+        return (await self.complete(system, user, **kw)).text
+
+    async def stream(
+        self,
+        system: str,
+        user: str,
+        *,
+        temperature: float | None = None,
+        max_tokens: int | None = None,
+        providers: list[str] | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield text chunks as the first provider that answers sends them."""
+        last_exc: Exception | None = None
+        for cfg in self.providers:
+            if providers is not None and cfg.name not in providers:
+                continue
+            if not cfg.enabled:
+                continue
+            breaker = self._breakers[cfg.name]
+            if not breaker.allow():
+                log.debug("llm_provider_skipped", provider=cfg.name, breaker=breaker.state)
+                continue
+            started = settled = False
             try:
-                r = requests.post(url, json=payload, headers=headers, timeout=self.timeout)
-                if not r.ok:
-                    log.warning("qwen_http_error", status=r.status_code, body=r.text[:300])
-                r.raise_for_status()
-                data = r.json()
-                return data["choices"][0]["message"]["content"].strip()
-            except requests.Timeout:
-                if attempt == 2:
-                    raise
-                time.sleep(2 * (attempt + 1))
-            except requests.RequestException as e:
-                if attempt == 2:
+                payload = self._payload(cfg, system, user, temperature, max_tokens, stream=True)
+                async for chunk in self._post_stream(cfg, payload):
+                    started = True
+                    yield chunk
+                settled = True
+                breaker.record_success()
+            except Exception as e:
+                settled = True
+                breaker.record_failure()
+                log.warning("llm_provider_failed", provider=cfg.name, error=str(e)[:300],
+                            breaker=breaker.state, streamed=started)
+                if started:
                     raise
-                time.sleep(1)
-        
-        raise RuntimeError("Qwen API failed after retries")
+                last_exc = e
+                continue
+            finally:
+                if not settled:
+                    # cancelled, or the consumer stopped early (GeneratorExit
+                    # at the yield): free a half-open probe without a verdict
+                    breaker.release()
+            return
 
-    def _chat_groq(self, system: str, user: str) -> str:
-        """Llamada a Groq API (OpenAI-compatible)."""
-        import requests as _req
-        url = f"{self.groq_base_url}/chat/completions"
-        payload = {
-            "model": self.groq_model,
-            "messages": [
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            "max_tokens": 2048,
-            "temperature": 0.7,
-        }
-        r = _req.post(url, headers={"Authorization": f"Bearer {self.groq_api_key}", "Content-Type": "application/json"}, json=payload, timeout=self.timeout)
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"].strip()
+        if last_exc is not None:
+            raise last_exc
+        raise RuntimeError("No LLM clients available (all providers disabled or circuit-open)")
 
-    def _chat_deepseek(self, system: str, user: str) -> str:
-        """Llamada específica a DeepSeek"""
-        url = f"{self.deepseek_base_url}/chat/completions"
-        payload = {
-            "model": self.deepseek_model,
+    @staticmethod
+    def _payload(
+        cfg: ProviderConfig,
+        system: str,
+        user: str,
+        temperature: float | None,
+        max_tokens: int | None,
+        stream: bool = False,
+    ) -> dict:
+        return {
+            "model": cfg.model,
             "messages": [
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-            "temperature": self.deepseek_temperature,
-            "max_tokens": self.deepseek_max_tokens,
-            "stream": False,
-        }
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.deepseek_api_key}",
+            "temperature": cfg.temperature if temperature is None else temperature,
+            "max_tokens": cfg.max_tokens if max_tokens is None else max_tokens,
+            "stream": stream,
         }
 
-        for attempt in range(3):
+    async def _call_with_retries(
+        self,
+        cfg: ProviderConfig,
+        system: str,
+        user: str,
+        temperature: float | None,
+        max_tokens: int | None,
+    ) -> LLMResponse:
+        payload = self._payload(cfg, system, user, temperature, max_tokens)
+        for attempt in range(self.max_attempts):
+            last = attempt == self.max_attempts - 1
             try:
-                r = requests.post(url, json=payload, headers=headers, timeout=self.timeout)
-                if not r.ok:
-                    log.warning("deepseek_http_error", status=r.status_code, body=r.text[:300])
-                r.raise_for_status()
-                data = r.json()
-                return data["choices"][0]["message"]["content"].strip()
-            except requests.Timeout:
-                if attempt == 2:
+                return await self._post(cfg, payload)
+            except LLMProviderError as e:
+                if e.status == 429:
+                    wait = e.retry_after if e.retry_after is not None else self.rate_limit_max_wait + 1
+                    if last or wait > self.rate_limit_max_wait:
+                        raise
+                    log.warning("llm_rate_limit_retry", provider=cfg.name, wait_seconds=wait, attempt=attempt + 1)
+                    metrics.LLM_RETRIES.inc(provider=cfg.name, reason="rate_limited")
+                    await asyncio.sleep(wait)
+                elif e.status is not None and e.status < 500:
+                    raise  # auth / bad request: retrying won't help
+                elif last:
                     raise
-                time.sleep(1.5 * (attempt + 1))
+                else:
+                    metrics.LLM_RETRIES.inc(provider=cfg.name, reason="server_error")
+                    await asyncio.sleep(0.5 * (2 ** attempt))
+            except (httpx.TimeoutException, httpx.TransportError):
+                if last:
+                    raise
+                metrics.LLM_RETRIES.inc(provider=cfg.name, reason="transport")
+                await asyncio.sleep(0.5 * (2 ** attempt))
+        raise RuntimeError(f"{cfg.name} API failed after retries")
+
+    @staticmethod
+    def _headers(cfg: ProviderConfig) -> dict:
+        return {"Authorization": f"Bearer {cfg.api_key}", "Content-Type": "application/json"}
+
+    @staticmethod
+    def _http_error(cfg: ProviderConfig, r: httpx.Response) -> LLMProviderError:
+        retry_after = None
+        try:
+            retry_after = float(r.headers.get("retry-after")) if r.headers.get("retry-after") else None
+        except ValueError:
+            pass
+        log.warning(f"{cfg.name}_http_error", status=r.status_code, body=r.text[:300])
+        return LLMProviderError(cfg.name, f"HTTP {r.status_code}", status=r.status_code, retry_after=retry_after)
+
+    @staticmethod
+    def _record(cfg: ProviderConfig, model: str, seconds: float, outcome: str, usage: dict | None = None) -> None:
+        metrics.LLM_REQUESTS.inc(provider=cfg.name, model=model, outcome=outcome)
+        metrics.LLM_LATENCY.observe(seconds, provider=cfg.name, model=model)
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage and usage.get(kind):
+                metrics.LLM_TOKENS.inc(usage[kind], provider=cfg.name, model=model, kind=kind.split("_")[0])
+
+    async def _post(self, cfg: ProviderConfig, payload: dict) -> LLMResponse:
+        async with self._sems[cfg.name]:
+            await self._buckets[cfg.name].acquire()
+            started = time.perf_counter()
+            try:
+                r = await self._http.post(f"{cfg.base_url}/chat/completions", json=payload, headers=self._headers(cfg))
+            except Exception:
+                self._record(cfg, cfg.model, time.perf_counter() - started, "error")
+                raise
+            latency_ms = (time.perf_counter() - started) * 1000
+        if r.status_code >= 400:
+            self._record(cfg, cfg.model, latency_ms / 1000, "rate_limited" if r.status_code == 429 else "error")
+            raise self._http_error(cfg, r)
+        data = r.json()
+        usage = data.get("usage") or {}
+        self._record(cfg, cfg.model, latency_ms / 1000, "ok", usage)
+        return LLMResponse(
+            text=data["choices"][0]["message"]["content"].strip(),
+            provider=cfg.name,
+            model=data.get("model") or cfg.model,
+            latency_ms=latency_ms,
+            usage=usage,
+        )
+
+    async def _post_stream(self, cfg: ProviderConfig, payload: dict) -> AsyncIterator[str]:
+        """OpenAI-style SSE: `data: {json}` lines with choices[0].delta,
+        ended by `data: [DONE]`. Holds the provider's semaphore slot for
+        the whole stream."""
+        async with self._sems[cfg.name]:
+            await self._buckets[cfg.name].acquire()
+            started = time.perf_counter()
+            outcome, usage = "error", None
+            try:
+                async with self._http.stream(
+                    "POST", f"{cfg.base_url}/chat/completions", json=payload, headers=self._headers(cfg),
+                ) as r:
+                    if r.status_code >= 400:
+                        await r.aread()
+                        if r.status_code == 429:
+                            outcome = "rate_limited"
+                        raise self._http_error(cfg, r)
+                    async for line in r.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            parsed = json.loads(data)
+                            # the final chunk may carry only usage, no choices
+                            delta = ((parsed.get("choices") or [{}])[0]).get("delta") or {}
+                        except (ValueError, AttributeError):
+                            continue
+                        usage = parsed.get("usage") or usage
+                        if delta.get("content"):
+                            yield delta["content"]
+                    outcome = "ok"
+            finally:
+                self._record(cfg, cfg.model, time.perf_counter() - started, outcome, usage)
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+# ── Shared engine loop ──────────────────────────────────────────────────────
+
+class _EngineRuntime:
+    """A daemon thread running the event loop that owns the shared engine."""
+
+    def __init__(self, engine_factory: Callable[[], AsyncLLMClient] = AsyncLLMClient):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-engine", daemon=True)
+        self._thread.start()
+        self.engine = engine_factory()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_runtime: _EngineRuntime | None = None
+_runtime_lock = threading.Lock()
+
+
+def _get_runtime() -> _EngineRuntime:
+    """Lazily start the engine loop. Re-created after fork (gunicorn workers
+    import the app in the master) since threads don't survive fork()."""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None or _runtime.pid != os.getpid():
+            _runtime = _EngineRuntime()
+        return _runtime
+
+
+# ── Sync facade ─────────────────────────────────────────────────────────────
+
+class LLMClient:
+    """Cliente unificado: Groq primero, luego Qwen, luego DeepSeek.
 
-        raise RuntimeError("DeepSeek API failed after retries")
+    Thin facade over the process-wide AsyncLLMClient; safe to construct per
+    call and to use from any thread."""
+
+    def __init__(self, runtime: _EngineRuntime | None = None):
+        # Resolved lazily so module-level instances (moderation_scorer_patch)
+        # don't start the engine at import time or keep a pre-fork loop.
+        self._runtime_override = runtime
+        self.last_error: Optional[Exception] = None
+        self.last_provider: Optional[str] = None
+        self.last_model: Optional[str] = None
+
+    @property
+    def _runtime(self) -> _EngineRuntime:
+        return self._runtime_override or _get_runtime()
+
+    @property
+    def engine(self) -> AsyncLLMClient:
+        return self._runtime.engine
+
+    def _model(self, name: str) -> str:
+        cfg = self.engine.provider(name)
+        return cfg.model if cfg else ""
+
+    @property
+    def qwen_model(self) -> str:
+        return self._model("qwen")
+
+    @property
+    def deepseek_model(self) -> str:
+        return self._model("deepseek")
+
+    @property
+    def groq_model(self) -> str:
+        return self._model("groq")
+
+    @property
+    def timeout(self) -> float:
+        return self.engine.timeout
+
+    @property
+    def deadline(self) -> float:
+        """Upper bound for one facade call across every provider + retries."""
+        engine = self.engine
+        return _env_float(
+            "LLM_CALL_DEADLINE",
+            engine.timeout * engine.max_attempts * max(1, len(engine.providers)) + 10,
+        )
+
+    @property
+    def use_qwen(self) -> bool:
+        """Kept for callers that label which provider was used."""
+        return self.engine.available("qwen")
+
+    def is_enabled(self) -> bool:
+        """Verifica si al menos un cliente está configurado"""
+        return self.engine.is_enabled()
+
+    def _track(self, resp: LLMResponse) -> LLMResponse:
+        self.last_provider = resp.provider
+        self.last_model = resp.model
+        return resp
+
+    def complete(self, system: str, user: str, **kw: Any) -> LLMResponse:
+        runtime = self._runtime
+        started = time.perf_counter()
+        fut = runtime.submit(runtime.engine.complete(system, user, **kw))
+        try:
+            return self._track(fut.result(timeout=self.deadline))
+        except Exception as e:
+            fut.cancel()
+            self.last_error = e
+            raise
+        finally:
+            metrics.charge("llm", time.perf_counter() - started)
+
+    def chat(self, system: str, user: str, **kw: Any) -> str:
+        return self.complete(system, user, **kw).text
+
+    async def acomplete(self, system: str, user: str, **kw: Any) -> LLMResponse:
+        """Await from any event loop without blocking it."""
+        runtime = self._runtime
+        started = time.perf_counter()
+        fut = runtime.submit(runtime.engine.complete(system, user, **kw))
+        try:
+            return self._track(await asyncio.wait_for(asyncio.wrap_future(fut), timeout=self.deadline))
+        except Exception as e:
+            fut.cancel()
+            self.last_error = e
+            raise
+        finally:
+            metrics.charge("llm", time.perf_counter() - started)
+
+    async def achat(self, system: str, user: str, **kw: Any) -> str:
+        return (await self.acomplete(system, user, **kw)).text
+
+    def stream(self, system: str, user: str, **kw: Any) -> Iterator[str]:
+        """Blocking iterator over engine.stream() chunks, for sync callers.
+        Each chunk must arrive within `timeout` seconds of the previous one."""
+        runtime = self._runtime
+        chunks: queue.Queue = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for chunk in runtime.engine.stream(system, user, **kw):
+                    chunks.put(chunk)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(done)
+
+        fut = runtime.submit(pump())
+        try:
+            while True:
+                waited = time.perf_counter()
+                try:
+                    item = chunks.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError("LLM stream stalled") from None
+                finally:
+                    metrics.charge("llm", time.perf_counter() - waited)
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        except Exception as e:
+            self.last_error = e
+            raise
+        finally:
+            fut.cancel()
+
+    # Provider-pinned calls, kept for the deprecated qwen_client / deepseek_client shims
+    def _chat_qwen(self, system: str, user: str) -> str:
+        return self.chat(system, user, providers=["qwen"])
+
+    def _chat_groq(self, system: str, user: str) -> str:
+        return self.chat(system, user, providers=["groq"])
+
+    def _chat_deepseek(self, system: str, user: str) -> str:
+        return self.chat(system, user, providers=["deepseek"])
@@ -0,0 +1,118 @@
+"""
+Batched moderation scoring.
+
+score_texts() packs up to MODERATION_BATCH_SIZE texts into one prompt —
+a JSON list of {"id", "text"} — and asks for {"results": [{"id", "score",
+"reason"}]} back, so a sweep over 50 posts is 3 LLM calls instead of 50.
+Items the reply doesn't cover (bad JSON, missing or non-numeric score)
+are re-scored one by one with score_text_with_deepseek, so a bad batch
+costs extra calls but never a missing or made-up score.
+
+Text app.services.prescreen can settle locally never reaches the prompt.
+
+Scores use the moderation_scorer scale: 0 = safe, 100 = reject.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Hashable, Iterable, Optional
+
+from app.core.logging import get_logger
+from app.services.llm_client import LLMClient
+from app.services.moderation_scorer import ModerationResult, score_text_with_deepseek
+from app.services.prescreen import local_verdict
+
+log = get_logger(__name__)
+
+BATCH_SIZE = int(os.getenv("MODERATION_BATCH_SIZE", "20"))
+MAX_ITEM_CHARS = 2000
+
+_SYSTEM = (
+    'You moderate a list of texts. Input: JSON {"items": [{"id": "...", "text": "..."}]}. '
+    'Return ONLY JSON: {"results": [{"id": "<same id>", "score": 0-100, "reason": "short"}]} '
+    "with one result per item. Score 0=safe, 100=reject. "
+    "Consider harassment/hate/threats/sexual/self-harm/illegal/spam. Judge every item on its own."
+)
+
+
+def _parse(out: str) -> list:
+    try:
+        data = json.loads(out)
+    except ValueError:
+        m = re.search(r"\{.*\}", out, re.DOTALL)
+        if not m:
+            return []
+        try:
+            data = json.loads(m.group(0))
+        except ValueError:
+            return []
+    results = data.get("results") if isinstance(data, dict) else data
+    return results if isinstance(results, list) else []
+
+
+def _score_value(raw) -> Optional[int]:
+    if isinstance(raw, bool):
+        return None
+    try:
+        return max(0, min(100, int(float(raw))))
+    except (TypeError, ValueError):
+        return None
+
+
+def _score_chunk(llm: LLMClient, chunk: list[tuple[Hashable, str]]) -> dict[Hashable, ModerationResult]:
+    # positional ids keep the prompt small and the caller's keys private
+    by_ref = {str(i): key for i, (key, _) in enumerate(chunk, 1)}
+    items = [{"id": str(i), "text": text[:MAX_ITEM_CHARS]} for i, (_, text) in enumerate(chunk, 1)]
+    results: dict[Hashable, ModerationResult] = {}
+    try:
+        out = llm.chat(
+            system=_SYSTEM,
+            user=json.dumps({"items": items}, ensure_ascii=False),
+            cache="moderation",
+        )
+    except Exception as e:
+        log.warning("moderation_batch_error", size=len(chunk), error=str(e))
+        out = ""
+
+    for row in _parse(out):
+        if not isinstance(row, dict):
+            continue
+        key = by_ref.get(str(row.get("id")))
+        score = _score_value(row.get("score"))
+        if key is None or score is None or key in results:
+            continue
+        results[key] = ModerationResult(score=score, reason=str(row.get("reason") or "llm_batch").strip()[:200])
+
+    missing = [(key, text) for key, text in chunk if key not in results]
+    if missing:
+        log.info("moderation_batch_fallback", size=len(chunk), missing=len(missing))
+        for key, text in missing:
+            results[key] = score_text_with_deepseek(text)
+    return results
+
+
+def score_texts(
+    items: Iterable[tuple[Hashable, str]],
+    batch_size: int = BATCH_SIZE,
+    llm: Optional[LLMClient] = None,
+) -> dict[Hashable, ModerationResult]:
+    """Moderation score for each (key, text); keys are the caller's."""
+    results: dict[Hashable, ModerationResult] = {}
+    remote = []
+    for key, text in items:
+        pre = local_verdict(text)
+        if pre is not None:
+            results[key] = ModerationResult(score=pre.score, reason=pre.reason)
+        else:
+            remote.append((key, text))
+    if not remote:
+        return results
+    llm = llm or LLMClient()
+    if not llm.is_enabled():
+        results.update({key: ModerationResult(score=0, reason="llm_off") for key, _ in remote})
+        return results
+    for i in range(0, len(remote), max(1, batch_size)):
+        results.update(_score_chunk(llm, remote[i:i + batch_size]))
+    return results
@@ -8,6 +8,7 @@ from app.services.llm_client import LLMClient
 import json
 
 from app.core.logging import get_logger
+from app.services.prescreen import local_verdict
 
 log = get_logger(__name__)
 
@@ -20,7 +21,12 @@ def score_text_with_deepseek(text: str) -> ModerationResult:
     """
     Risk score: 0..100 (higher = riskier).
     Returns ModerationResult(score:int, reason:str)
+    Clear-cut text is settled by app.services.prescreen without a call.
     """
+    pre = local_verdict(text)
+    if pre is not None:
+        return ModerationResult(score=pre.score, reason=pre.reason)
+
     ds = LLMClient()
     #ds = LLMClient()
     if not ds.is_enabled():
@@ -33,7 +39,7 @@ def score_text_with_deepseek(text: str) -> ModerationResult:
     user = f"TEXT:\n{text}\n\nReturn JSON only."
 
     try:
-        out = ds.chat(system=system, user=user)
+        out = ds.chat(system=system, user=user, cache="moderation")
     except Exception as e:
         log.warning("moderation_scorer_error", error=str(e))
         return ModerationResult(score=0, reason="llm_error_safe")
@@ -19,7 +19,7 @@ def score_text_with_llm(text: str) -> ModScore:
     Return ONLY a JSON: {"score": number, "reason": "brief explanation"}"""
     
     try:
-        response = _llm.chat(system_prompt, text)
+        response = _llm.chat(system_prompt, text, cache="moderation")
         import json
         result = json.loads(response.strip())
         return ModScore(result.get("score", 50), result.get("reason", "no_reason"))
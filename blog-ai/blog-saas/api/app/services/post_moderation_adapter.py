@@ -11,6 +11,8 @@ from app.models.post import Post
 from app.models.agent_action import AgentAction
 from app.services import moderation_service
 from app.services.llm_client import LLMClient
+from app.services.moderation_batch import score_texts
+from app.services.prescreen import local_verdict
 
 class PostModerationAdapter:
     """Adapta moderation_service para trabajar con Posts"""
@@ -50,9 +52,12 @@ class PostModerationAdapter:
         system = """Eres un moderador de contenido. Evalúa el siguiente post y asigna un score del 0-100 donde 0 es excelente y 100 es peligroso. Responde SOLO con el número y una breve razón: "score: razón" """
         
         user = f"TÍTULO: {post.title}\n\nCONTENIDO: {post.body_md[:2000]}"
+        pre = local_verdict(f"{post.title}\n\n{post.body_md or ''}")
+        if pre is not None:
+            return pre.score, pre.reason
         
         try:
-            response = self.llm.chat(system, user)
+            response = self.llm.chat(system, user, cache="moderation")
             import re
             numbers = re.findall(r'\d+', response)
             score = int(numbers[0]) if numbers else 50
@@ -69,20 +74,37 @@ class PostModerationAdapter:
         
         # 1. Asignar score con LLM
         score, reason = self.score_post(post)
+        self._apply_score(post, score, reason)
+        db.commit()
+        db.refresh(post)
+        return post
+
+    def _apply_score(self, post: Post, score: int, reason: str) -> None:
         post.policy_score = score
         post.policy_reason = reason
-        
-        # 2. Si el score es bajo, publicar automáticamente
+
+        # Si el score es bajo, publicar automáticamente; si no, queda en needs_review
         if score <= self.auto_approve_threshold:
             post.status = "published"
             post.published_at = datetime.utcnow()
-            db.commit()
-            return post
-        
-        # 3. Si necesita revisión, mantener en needs_review
+
+    def moderate_posts(self, db: Session, post_ids: List[int]) -> List[Post]:
+        """Score several posts with batched LLM calls (moderation_batch).
+        Posts that already have a score are skipped."""
+        posts = db.query(Post).filter(
+            Post.id.in_(post_ids), Post.policy_score.is_(None)
+        ).order_by(Post.id).all()
+        if not posts:
+            return []
+        scores = score_texts(
+            ((p.id, f"TITLE: {p.title}\n\n{(p.body_md or '')[:2000]}") for p in posts),
+            llm=self.llm,
+        )
+        for post in posts:
+            res = scores[post.id]
+            self._apply_score(post, res.score, res.reason)
         db.commit()
-        db.refresh(post)
-        return post
+        return posts
     
     def list_queue(self, db: Session, org_id: int = 1, limit: int = 100) -> List[Post]:
         """Lista posts en needs_review (similar a moderation_service.list_moderation_queue)"""
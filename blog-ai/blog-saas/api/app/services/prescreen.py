@@ -0,0 +1,172 @@
+"""
+Local pre-moderation.
+
+Runs before any moderation LLM call and settles only the cases it has
+positive evidence for, in microseconds:
+
+- "reject"    — lexicon hits alone reach REJECT_AT (a threat, or several
+                distinct insults / spam phrases) in a short text
+                (SAFE_MAX_WORDS words at most) that is little else: two or
+                more distinct hits, or a single one with at most
+                REJECT_MAX_OTHER_WORDS words around it. A term inside a
+                longer sentence may be quoted, reported or a joke ("I will
+                kill you at chess"), so it only raises the score.
+- "safe"      — very short text (SAFE_MAX_WORDS words at most) with no
+                lexicon hit and no heuristic signal: auto-approve. A long
+                text without a hit is not evidence of anything — the
+                lexicon can't see sarcasm, slurs it doesn't list or
+                harassment in plain words.
+- "uncertain" — everything else goes to the LLM as before. The heuristics
+                (links, repetition, character runs, shouting) only add
+                to the reported score; they never settle a text.
+
+The lexicon (LEXICON below; Spanish and English, like the content) is
+compiled into a single trie-shaped regex, so matching every term is one
+left-to-right scan in the re engine instead of one `in` per word; text
+is lower-cased, accent-stripped and de-leeted first. Heuristics add
+weight for links, repeated tokens, character runs and shouting.
+
+Scores use the moderation_scorer scale (0 = safe, 100 = reject).
+MODERATION_PRESCREEN=0 turns the stage off; scripts/bench_prescreen.py
+measures throughput and agreement with LLM labels.
+"""
+from __future__ import annotations
+
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+ENABLED = os.getenv("MODERATION_PRESCREEN", "1") == "1"
+SAFE_MAX_WORDS = int(os.getenv("MODERATION_PRESCREEN_SAFE_MAX_WORDS", "12"))
+REJECT_AT = int(os.getenv("MODERATION_PRESCREEN_REJECT_AT", "90"))
+REJECT_MAX_OTHER_WORDS = int(os.getenv("MODERATION_PRESCREEN_REJECT_MAX_OTHER_WORDS", "3"))
+
+# category -> (weight per distinct hit, terms). Keep terms lower-case and
+# accent-free; multi-word terms match across any run of whitespace.
+LEXICON: dict[str, tuple[int, tuple[str, ...]]] = {
+    "threat": (100, (
+        "kill yourself", "kys", "i will kill you", "i'm going to kill you", "hope you die",
+        "i know where you live", "te voy a matar", "matate", "ojala te mueras", "se donde vives",
+    )),
+    "self_harm": (45, (
+        "how to kill myself", "want to die", "cut myself", "quiero morirme", "suicidarme",
+    )),
+    "sexual": (40, ("nudes", "porn", "xxx", "onlyfans", "desnudos", "porno")),
+    "insult": (25, (
+        "idiot", "stupid", "moron", "imbecile", "dumbass", "loser", "retard",
+        "idiota", "estupido", "imbecil", "retrasado", "pendejo", "gilipollas", "subnormal",
+    )),
+    "spam": (30, (
+        "buy now", "click here", "free money", "limited offer", "crypto giveaway",
+        "double your bitcoin", "dm me for", "100% guaranteed", "work from home",
+        "compra ya", "gana dinero", "haz clic aqui", "oferta limitada",
+    )),
+}
+
+_LEET = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"})
+_LINK = re.compile(r"https?://|www\.", re.IGNORECASE)
+_RUN = re.compile(r"(.)\1{5,}")
+_WORD = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class Prescreen:
+    verdict: str  # safe | reject | uncertain
+    score: int
+    reason: str
+    hits: tuple[str, ...] = ()
+
+    @property
+    def decided(self) -> bool:
+        return self.verdict != "uncertain"
+
+
+def _trie_pattern(terms) -> str:
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def walk(node) -> str:
+        alts = [(r"\s+" if ch == " " else re.escape(ch)) + walk(node[ch]) for ch in sorted(k for k in node if k)]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        # a term ending here with longer terms below: the rest is optional
+        return f"(?:{body})?" if "" in node else body
+
+    return walk(trie)
+
+
+@lru_cache(maxsize=1)
+def _compiled():
+    by_term: dict[str, tuple[str, str]] = {}
+    for category, (_, terms) in LEXICON.items():
+        for term in terms:
+            by_term[" ".join(_normalize(term).split())] = (category, term)
+    # whole words only, so "skill yourself" doesn't match "kill yourself"
+    return re.compile(r"(?<!\w)(?:" + _trie_pattern(by_term) + r")(?!\w)"), by_term
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).translate(_LEET)
+
+
+def prescreen(text: str) -> Prescreen:
+    """Classify `text` locally; see the module docstring for the bands."""
+    text = text or ""
+    pattern, by_term = _compiled()
+    # links are counted on the raw text; the lexicon scan sees it without them
+    links = len(_LINK.findall(text))
+    flat = _normalize(_LINK.sub(" ", text))
+
+    categories: dict[str, set[str]] = {}
+    hit_words = 0
+    for m in pattern.finditer(flat):
+        category, term = by_term[" ".join(m.group(0).split())]
+        categories.setdefault(category, set()).add(term)
+        hit_words += len(_WORD.findall(m.group(0)))
+
+    score = 0
+    signals = []
+    for category, terms in categories.items():
+        score += LEXICON[category][0] * len(terms)
+        signals.append(category)
+    hits = tuple(sorted(t for terms in categories.values() for t in terms))
+    words = _WORD.findall(flat)
+    if score >= REJECT_AT and len(words) <= SAFE_MAX_WORDS and (
+        len(hits) >= 2 or len(words) - hit_words <= REJECT_MAX_OTHER_WORDS
+    ):
+        return Prescreen("reject", min(100, score), "local:" + "+".join(signals), hits)
+    if links >= 3 or (links and len(words) < 8):
+        score += 30
+        signals.append("links")
+    if len(words) >= 12 and len(set(words)) / len(words) < 0.3:
+        score += 30
+        signals.append("repetition")
+    if _RUN.search(flat):
+        score += 10
+        signals.append("char_run")
+    letters = [ch for ch in text if ch.isalpha()]
+    if len(letters) >= 20 and sum(ch.isupper() for ch in letters) / len(letters) > 0.7:
+        score += 15
+        signals.append("shouting")
+
+    score = min(100, score)
+    if not signals and len(words) <= SAFE_MAX_WORDS:
+        return Prescreen("safe", 0, "local_safe")
+    return Prescreen("uncertain", score, "+".join(signals) or "unscreened", hits)
+
+
+def local_verdict(text: str) -> Optional[Prescreen]:
+    """The local decision for `text`, or None when the LLM should score it."""
+    if not ENABLED:
+        return None
+    pre = prescreen(text)
+    return pre if pre.decided else None
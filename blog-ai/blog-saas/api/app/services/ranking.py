@@ -0,0 +1,184 @@
+"""
+Feed ranking engine.
+
+The hot ranking used to be computed three different ways (SQL over every
+comment in main.get_posts, Python over limit*3 rows in list_posts, Python
+over the latest 100 posts in get_feed) — the Python versions were wrong
+past the first page. Now every sort key lives in post_rank:
+
+- refresh_post_ranks() walks published posts in keyset batches, joins the
+  materialized post_stats counters, recomputes the decayed scores and bulk
+  upserts them. Rows for posts that stopped being published are dropped at
+  the end of each pass. The background scheduler runs it every
+  RANK_REFRESH_SECONDS.
+- ranked_post_ids() serves one page for hot / feed / top / commented as an
+  index range scan on (org_id, key, post_id) with an opaque keyset cursor.
+
+Brand-new posts show up in the ranked sorts on the next refresh; "recent"
+doesn't go through here.
+"""
+from __future__ import annotations
+
+import math
+import os
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, insert, or_, update
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+from app.core.pagination import decode_cursor, encode_cursor
+from app.models.post import Post
+from app.models.post_rank import PostRank
+from app.models.post_stats import PostStats
+
+log = get_logger(__name__)
+
+REFRESH_BATCH = int(os.getenv("RANK_REFRESH_BATCH", "2000"))
+
+# sort name -> PostRank column
+SORT_KEYS = {
+    "hot": PostRank.hot_score,
+    "feed": PostRank.feed_score,
+    "top": PostRank.top_score,
+    "commented": PostRank.comment_count,
+}
+
+
+def _age_hours(created_at, now: datetime) -> float:
+    if created_at is None:
+        return 720.0
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return max((now - created_at).total_seconds() / 3600, 0.0)
+
+
+def hot_score(comments: int, age_hours: float) -> float:
+    return (comments * 5.0) / math.pow(age_hours + 2, 1.5)
+
+
+def feed_score(upvotes: int, human_comments: int, comments: int, age_hours: float) -> float:
+    raw = (upvotes * 3) + (human_comments * 5) + (comments * 1)
+    return raw / math.pow(age_hours + 2, 1.5)
+
+
+def refresh_post_ranks(db: Session, org_id: int | None = None, batch_size: int = REFRESH_BATCH) -> dict:
+    """Recompute post_rank for every published post. Commits per batch."""
+    started = datetime.now(timezone.utc)
+    last_id = 0
+    upserted = 0
+
+    while True:
+        q = (
+            db.query(
+                Post.id,
+                Post.org_id,
+                Post.created_at,
+                PostStats.comment_count,
+                PostStats.human_comment_count,
+                PostStats.upvotes,
+                PostStats.downvotes,
+            )
+            .outerjoin(PostStats, PostStats.post_id == Post.id)
+            .filter(Post.status == "published", Post.id > last_id)
+        )
+        if org_id is not None:
+            q = q.filter(Post.org_id == org_id)
+        batch = q.order_by(Post.id.asc()).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for pid, oid, created_at, comments, humans, ups, downs in batch:
+            comments, humans, ups, downs = comments or 0, humans or 0, ups or 0, downs or 0
+            age = _age_hours(created_at, now)
+            rows.append({
+                "post_id": pid,
+                "org_id": oid,
+                "hot_score": hot_score(comments, age),
+                "feed_score": feed_score(ups, humans, comments, age),
+                "top_score": ups - downs,
+                "comment_count": comments,
+                "refreshed_at": now,
+            })
+
+        ids = [r["post_id"] for r in rows]
+        existing = {r[0] for r in db.query(PostRank.post_id).filter(PostRank.post_id.in_(ids)).all()}
+        to_update = [r for r in rows if r["post_id"] in existing]
+        to_insert = [r for r in rows if r["post_id"] not in existing]
+        if to_update:
+            db.execute(update(PostRank), to_update)
+        if to_insert:
+            db.execute(insert(PostRank), to_insert)
+        db.commit()
+        upserted += len(rows)
+
+    # Anything not touched this pass is no longer published (or was deleted)
+    stale = delete(PostRank).where(PostRank.refreshed_at < started)
+    if org_id is not None:
+        stale = stale.where(PostRank.org_id == org_id)
+    removed = db.execute(stale).rowcount or 0
+    db.commit()
+
+    log.info("post_rank_refreshed", org_id=org_id, upserted=upserted, removed=removed)
+    return {"upserted": upserted, "removed": removed}
+
+
+def ranked_post_ids(
+    db: Session,
+    org_id: int,
+    sort: str,
+    limit: int,
+    cursor: str | None = None,
+    offset: int = 0,
+    status: str | None = "published",
+) -> tuple[list[int], str | None]:
+    """One page of post ids for `sort`, best first, plus the cursor for the
+    next page (None when exhausted). `offset` is only honoured when no
+    cursor is given — kept for clients that still page by offset.
+
+    `status` is checked against posts itself: a post unpublished since the
+    last refresh still has a post_rank row until the next one."""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort: {sort}")
+    key_col = SORT_KEYS[sort]
+
+    q = db.query(PostRank.post_id, key_col).filter(PostRank.org_id == org_id)
+    if status is not None:
+        q = q.join(Post, Post.id == PostRank.post_id).filter(Post.status == status)
+    after = decode_cursor(cursor)
+    if after is not None:
+        try:
+            s, last_id = after["s"], int(after["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        q = q.filter(or_(key_col < s, and_(key_col == s, PostRank.post_id < last_id)))
+    elif offset:
+        q = q.offset(offset)
+
+    rows = q.order_by(key_col.desc(), PostRank.post_id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor({"s": rows[-1][1], "id": rows[-1][0]}) if has_more and rows else None
+    return [r[0] for r in rows], next_cursor
+
+
+def load_ranked_posts(db: Session, post_ids: list[int]) -> list[Post]:
+    """Fetch Post rows for a ranked page, preserving rank order."""
+    if not post_ids:
+        return []
+    by_id = {p.id: p for p in db.query(Post).filter(Post.id.in_(post_ids)).all()}
+    return [by_id[i] for i in post_ids if i in by_id]
+
+
+def run_rank_refresh_job() -> dict:
+    """Entry point for scheduled runs."""
+    from app.core.db import SessionLocal
+    db = SessionLocal()
+    try:
+        return refresh_post_ranks(db)
+    finally:
+        db.close()
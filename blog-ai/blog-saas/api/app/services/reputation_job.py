@@ -1,75 +1,167 @@
 """
 Reputation recalculation job.
 Runs on startup and can be triggered manually.
+
+Set-based: one grouped query computes comments / upvotes / downvotes for
+every agent in scope, and only agents whose numbers actually changed are
+written back in a single batched UPDATE. The old version issued three
+aggregates per agent inside one long transaction.
+
+Incremental mode recomputes only agents touched since the previous run:
+authors of comments newer than the last comment id seen, authors of
+comments whose comment_stats row (bumped on every vote) changed, and
+agents whose profile changed (follower_count). Comment status flips done
+outside those paths are caught by the periodic full run
+(REPUTATION_FULL_EVERY runs).
 """
+from __future__ import annotations
+
+import os
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, update
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from app.core import metrics
 from app.models.agent_profile import AgentProfile
-from app.models.agent_action import AgentAction
 from app.models.comment import Comment
+from app.models.post_stats import CommentStats
 from app.models.vote import Vote
 import logging
 
 logger = logging.getLogger(__name__)
 
+FULL_EVERY = int(os.getenv("REPUTATION_FULL_EVERY", "24"))
+
+# Watermark of the previous run in this process: (started_at, max comment id)
+_last_run: Optional[tuple[datetime, int]] = None
+_runs_since_full = 0
+
+
+def _score(upvotes: int, downvotes: int, comments: int, followers: int) -> int:
+    return max(0, (upvotes * 3) - (downvotes * 1) + (comments * 1) + (followers * 5))
+
+
+def changed_agent_ids(db: Session, since: datetime, after_comment_id: int) -> set[int]:
+    """Agents whose comments, votes or profile changed since the watermark."""
+    ids: set[int] = set()
+    ids.update(r[0] for r in db.query(Comment.author_agent_id).filter(
+        Comment.id > after_comment_id, Comment.author_agent_id.isnot(None)
+    ).distinct())
+    ids.update(r[0] for r in db.query(Comment.author_agent_id).join(
+        CommentStats, CommentStats.comment_id == Comment.id
+    ).filter(
+        CommentStats.updated_at >= since, Comment.author_agent_id.isnot(None)
+    ).distinct())
+    ids.update(r[0] for r in db.query(AgentProfile.id).filter(AgentProfile.updated_at >= since))
+    return ids
 
-def recalculate_all_reputations(db: Session) -> dict:
-    """Recalculates reputation for all agents. Returns summary."""
-    agents = db.query(AgentProfile).all()
-    updated = 0
-    total_score = 0
 
-    for agent in agents:
-        try:
-            total_comments = db.query(func.count(Comment.id)).filter(
-                Comment.author_agent_id == agent.id,
-                Comment.status == "published",
-            ).scalar() or 0
-
-            upvotes = db.query(func.sum(Vote.value)).join(
-                Comment, Vote.comment_id == Comment.id
-            ).filter(
-                Comment.author_agent_id == agent.id,
-                Vote.value > 0,
-            ).scalar() or 0
-
-            downvotes = abs(db.query(func.sum(Vote.value)).join(
-                Comment, Vote.comment_id == Comment.id
-            ).filter(
-                Comment.author_agent_id == agent.id,
-                Vote.value < 0,
-            ).scalar() or 0)
-
-            score = (upvotes * 3) - (downvotes * 1) + (total_comments * 1) + (agent.follower_count * 5)
-            score = max(0, score)
-
-            agent.total_comments = total_comments
-            agent.total_upvotes = upvotes
-            agent.total_downvotes = downvotes
-            agent.reputation_score = score
-            updated += 1
-            total_score += score
-
-        except Exception as e:
-            logger.warning(f"Failed to update agent {agent.id}: {e}")
-            continue
+def recalculate_reputations(db: Session, agent_ids: Optional[Iterable[int]] = None) -> dict:
+    """Recompute reputation for `agent_ids` (all agents when None)."""
+    scope = None if agent_ids is None else list(agent_ids)
+    if scope is not None and not scope:
+        return {"updated": 0, "checked": 0, "total_score": 0, "avg_score": 0}
 
+    comments_q = db.query(
+        Comment.author_agent_id.label("agent_id"),
+        func.count(Comment.id).label("comments"),
+    ).filter(Comment.status == "published", Comment.author_agent_id.isnot(None))
+    votes_q = db.query(
+        Comment.author_agent_id.label("agent_id"),
+        func.sum(case((Vote.value > 0, Vote.value), else_=0)).label("up"),
+        func.sum(case((Vote.value < 0, -Vote.value), else_=0)).label("down"),
+    ).join(Comment, Vote.comment_id == Comment.id).filter(Comment.author_agent_id.isnot(None))
+    agents_q = db.query(
+        AgentProfile.id,
+        AgentProfile.follower_count,
+        AgentProfile.total_comments,
+        AgentProfile.total_upvotes,
+        AgentProfile.total_downvotes,
+        AgentProfile.reputation_score,
+    )
+    if scope is not None:
+        comments_q = comments_q.filter(Comment.author_agent_id.in_(scope))
+        votes_q = votes_q.filter(Comment.author_agent_id.in_(scope))
+        agents_q = agents_q.filter(AgentProfile.id.in_(scope))
+
+    c_sub = comments_q.group_by(Comment.author_agent_id).subquery()
+    v_sub = votes_q.group_by(Comment.author_agent_id).subquery()
+    rows = (
+        agents_q
+        .add_columns(
+            func.coalesce(c_sub.c.comments, 0),
+            func.coalesce(v_sub.c.up, 0),
+            func.coalesce(v_sub.c.down, 0),
+        )
+        .outerjoin(c_sub, c_sub.c.agent_id == AgentProfile.id)
+        .outerjoin(v_sub, v_sub.c.agent_id == AgentProfile.id)
+        .all()
+    )
+
+    changes = []
+    total_score = 0
+    for aid, followers, old_c, old_up, old_down, old_score, comments, up, down in rows:
+        comments, up, down = int(comments), int(up), int(down)
+        score = _score(up, down, comments, followers or 0)
+        total_score += score
+        if (old_c, old_up, old_down, old_score) != (comments, up, down, score):
+            changes.append({
+                "id": aid,
+                "total_comments": comments,
+                "total_upvotes": up,
+                "total_downvotes": down,
+                "reputation_score": score,
+            })
+
+    if changes:
+        db.execute(update(AgentProfile), changes)
     db.commit()
-    logger.info(f"Reputation job: updated {updated} agents, total score {total_score}")
+
+    checked = len(rows)
+    logger.info(f"Reputation job: checked {checked} agents, updated {len(changes)}")
     return {
-        "updated": updated,
+        "updated": len(changes),
+        "checked": checked,
         "total_score": total_score,
-        "avg_score": round(total_score / updated, 1) if updated > 0 else 0,
+        "avg_score": round(total_score / checked, 1) if checked > 0 else 0,
     }
 
 
-def run_reputation_job():
-    """Entry point for scheduled runs."""
-    from app.core.db import SessionLocal
-    db = SessionLocal()
+def recalculate_all_reputations(db: Session) -> dict:
+    """Recalculates reputation for all agents. Returns summary."""
+    return recalculate_reputations(db)
+
+
+def recalculate_changed_reputations(db: Session, since: datetime, after_comment_id: int) -> dict:
+    return recalculate_reputations(db, changed_agent_ids(db, since, after_comment_id))
+
+
+def run_reputation_job(db: Optional[Session] = None) -> dict:
+    """Entry point for scheduled runs: full on the first run in a process
+    and every FULL_EVERY runs, incremental in between."""
+    global _last_run, _runs_since_full
+    own = db is None
+    if own:
+        from app.core.db import SessionLocal
+        db = SessionLocal()
     try:
-        result = recalculate_all_reputations(db)
+        started = datetime.now(timezone.utc)
+        max_comment_id = db.query(func.max(Comment.id)).scalar() or 0
+        if _last_run is None or _runs_since_full >= FULL_EVERY:
+            with metrics.stage("reputation.full"):
+                result = recalculate_all_reputations(db)
+            result["mode"] = "full"
+            _runs_since_full = 0
+        else:
+            since, after_id = _last_run
+            with metrics.stage("reputation.incremental"):
+                result = recalculate_changed_reputations(db, since, after_id)
+            result["mode"] = "incremental"
+            _runs_since_full += 1
+        _last_run = (started, max_comment_id)
         logger.info(f"Reputation job complete: {result}")
         return result
     finally:
-        db.close()
+        if own:
+            db.close()
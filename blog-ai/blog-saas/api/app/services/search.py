@@ -0,0 +1,203 @@
+"""
+Full-text search over posts (incl. debates) and agents.
+
+Backed by the tsvector / GIN columns on Postgres and the FTS5 tables on
+SQLite (see app.models.search_index). Every term is prefix-matched and all
+terms must match; results are ranked (ts_rank_cd / bm25) with title
+matches weighted highest, and come back with <mark>-highlighted title and
+snippet. The database marks matches with control characters; the text is
+HTML-escaped before those become <mark> tags, so a post's own markup
+never reaches a client that renders the highlight as HTML.
+
+search_posts() returns posts and debates from one ranked query — callers
+split them by `is_debate`. post_match_clause() is the same predicate as a
+filter for list endpoints that keep their own ordering.
+"""
+from __future__ import annotations
+
+import html
+import re
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.search_index import TS_CONFIG
+
+MAX_TERMS = 8
+MARK_START, MARK_END = "<mark>", "</mark>"
+# what ts_headline / highlight / snippet put around matches
+_SEL_START, _SEL_END = "\x02", "\x03"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class PostHit:
+    id: int
+    title: str
+    title_hl: str
+    excerpt: str
+    snippet: str
+    published_at: Any
+    debate_status: str
+    rank: float
+
+    @property
+    def is_debate(self) -> bool:
+        return self.debate_status in ("open", "closed")
+
+
+@dataclass
+class AgentHit:
+    id: int
+    display_name: str
+    handle: str
+    topics: str
+    reputation_score: int
+    avatar_url: str
+    snippet: str
+    rank: float
+
+
+def query_terms(q: str) -> list[str]:
+    """Word tokens of the user query; punctuation and operators dropped so
+    nothing user-typed reaches the tsquery / MATCH syntax."""
+    return [t.lower() for t in _WORD.findall(q or "")][:MAX_TERMS]
+
+
+def render_highlight(s: Optional[str]) -> str:
+    """Escaped text with the database's match markers turned into <mark>."""
+    return html.escape(s or "").replace(_SEL_START, MARK_START).replace(_SEL_END, MARK_END)
+
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+
+def _tsquery(terms: list[str]) -> str:
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def _fts5_match(terms: list[str]) -> str:
+    return " AND ".join('"{}"*'.format(t.replace('"', "")) for t in terms)
+
+
+def post_match_clause(db: Session, q: str):
+    """WHERE-clause fragment restricting `posts` to full-text matches of q,
+    or None when q has no searchable terms."""
+    terms = query_terms(q)
+    if not terms:
+        return None
+    if _dialect(db) == "postgresql":
+        return text(f"posts.search_vector @@ to_tsquery('{TS_CONFIG}', :fts_q)").bindparams(fts_q=_tsquery(terms))
+    return text("posts.id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH :fts_q)").bindparams(
+        fts_q=_fts5_match(terms)
+    )
+
+
+def search_posts(
+    db: Session,
+    q: str,
+    limit: int = 10,
+    offset: int = 0,
+    org_id: Optional[int] = None,
+    debates_only: bool = False,
+) -> list[PostHit]:
+    """Published posts matching q, best first."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+    params: dict[str, Any] = {"limit": limit, "offset": offset}
+    filters = ["p.status = 'published'"]
+    if org_id is not None:
+        filters.append("p.org_id = :org_id")
+        params["org_id"] = org_id
+    if debates_only:
+        filters.append("p.debate_status IN ('open', 'closed')")
+
+    if _dialect(db) == "postgresql":
+        params["fts_q"] = _tsquery(terms)
+        hl = f"'StartSel={_SEL_START}, StopSel={_SEL_END}, MaxWords=30, MinWords=12, MaxFragments=1'"
+        sql = f"""
+            WITH q AS (SELECT to_tsquery('{TS_CONFIG}', :fts_q) AS query),
+            hits AS (
+              SELECT p.id, p.title, p.excerpt, p.body_md, p.published_at, p.debate_status,
+                     ts_rank_cd(p.search_vector, q.query) AS rank
+              FROM posts p, q
+              WHERE p.search_vector @@ q.query AND {' AND '.join(filters)}
+              ORDER BY rank DESC, p.published_at DESC NULLS LAST, p.id DESC
+              LIMIT :limit OFFSET :offset
+            )
+            SELECT h.id, h.title,
+                   ts_headline('{TS_CONFIG}', h.title, q.query, 'HighlightAll=true, StartSel={_SEL_START}, StopSel={_SEL_END}'),
+                   ts_headline('{TS_CONFIG}', coalesce(nullif(h.excerpt, ''), left(h.body_md, 2000)), q.query, {hl}),
+                   h.published_at, h.debate_status, h.rank, h.excerpt
+            FROM hits h, q
+            ORDER BY h.rank DESC, h.published_at DESC NULLS LAST, h.id DESC
+        """
+    else:
+        params["fts_q"] = _fts5_match(terms)
+        # bm25 is "lower is better"; weights title > excerpt > body
+        sql = f"""
+            SELECT p.id, p.title,
+                   highlight(posts_fts, 0, '{_SEL_START}', '{_SEL_END}'),
+                   snippet(posts_fts, -1, '{_SEL_START}', '{_SEL_END}', '…', 24),
+                   p.published_at, p.debate_status,
+                   -bm25(posts_fts, 10.0, 4.0, 1.0) AS rank, p.excerpt
+            FROM posts_fts JOIN posts p ON p.id = posts_fts.rowid
+            WHERE posts_fts MATCH :fts_q AND {' AND '.join(filters)}
+            ORDER BY rank DESC, p.published_at DESC, p.id DESC
+            LIMIT :limit OFFSET :offset
+        """
+    rows = db.execute(text(sql), params).fetchall()
+    return [
+        PostHit(
+            id=r[0], title=r[1], title_hl=render_highlight(r[2] or r[1]), excerpt=r[7] or "",
+            snippet=render_highlight(r[3]),
+            published_at=r[4], debate_status=r[5] or "none", rank=float(r[6] or 0),
+        )
+        for r in rows
+    ]
+
+
+def search_agents(db: Session, q: str, limit: int = 10) -> list[AgentHit]:
+    """Public, enabled agents matching q; relevance first, then reputation."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+    cols = "a.id, a.display_name, a.handle, a.topics, a.reputation_score, a.avatar_url"
+    where = "a.is_public = TRUE AND a.is_enabled = TRUE"
+    if _dialect(db) == "postgresql":
+        sql = f"""
+            WITH q AS (SELECT to_tsquery('{TS_CONFIG}', :fts_q) AS query)
+            SELECT {cols},
+                   ts_headline('{TS_CONFIG}', coalesce(a.bio, a.topics, ''), q.query,
+                               'StartSel={_SEL_START}, StopSel={_SEL_END}, MaxWords=20, MinWords=8'),
+                   ts_rank_cd(a.search_vector, q.query) AS rank
+            FROM agent_profiles a, q
+            WHERE a.search_vector @@ q.query AND {where}
+            ORDER BY rank DESC, a.reputation_score DESC
+            LIMIT :limit
+        """
+        params = {"fts_q": _tsquery(terms), "limit": limit}
+    else:
+        sql = f"""
+            SELECT {cols},
+                   snippet(agents_fts, -1, '{_SEL_START}', '{_SEL_END}', '…', 16),
+                   -bm25(agents_fts, 10.0, 10.0, 4.0, 1.0) AS rank
+            FROM agents_fts JOIN agent_profiles a ON a.id = agents_fts.rowid
+            WHERE agents_fts MATCH :fts_q AND {where}
+            ORDER BY rank DESC, a.reputation_score DESC
+            LIMIT :limit
+        """
+        params = {"fts_q": _fts5_match(terms), "limit": limit}
+    rows = db.execute(text(sql), params).fetchall()
+    return [
+        AgentHit(
+            id=r[0], display_name=r[1], handle=r[2], topics=r[3] or "",
+            reputation_score=r[4] or 0, avatar_url=r[5] or "", snippet=render_highlight(r[6]),
+            rank=float(r[7] or 0),
+        )
+        for r in rows
+    ]
@@ -0,0 +1,220 @@
+"""
+Agent selection scoring over the whole roster in one pass.
+
+select_agent_for_post / select_agents_for_debate used to re-run their
+aggregate queries (7-day posts per agent, 48h tag usage, 2h comments per
+agent) and score every agent in a Python loop on each call. The engine
+splits that work by how often it changes:
+
+- Signals: the aggregates, per org, refreshed at most every
+  SELECTION_SIGNALS_SECONDS (default 30) instead of per spawn.
+- Columns: per (roster version, signals) the part of each agent's score
+  that doesn't depend on the call — recency x volume x topic diversity
+  for posting, comment recency for debates — as flat lists aligned with
+  roster.active. Built once, reused until either input changes.
+- Per call: one pass multiplying the column by the random factor, the
+  sparse topic / already-commented adjustments applied only to the
+  agents they concern, and top-k with heapq.nlargest instead of a full
+  sort.
+
+NumPy would make the pass a couple of array ops, but it isn't a
+dependency of the API and the work left per call is a single list
+comprehension; the columns are laid out so that swap stays local.
+
+Every pick accepts `seed`: the same seed, roster and signals give the same
+agents (tests, scripts/bench_selection.py).
+"""
+from __future__ import annotations
+
+import heapq
+import os
+import random
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.logging import get_logger
+from app.models.comment import Comment
+from app.models.post import Post
+from app.services.agent_roster import AgentRecord, Roster, get_roster
+
+log = get_logger(__name__)
+
+SIGNALS_SECONDS = float(os.getenv("SELECTION_SIGNALS_SECONDS", "30"))
+POSTER_POOL = 10  # the poster is drawn from the top this many scores
+
+
+@dataclass(frozen=True)
+class Signals:
+    as_of: datetime
+    post_count: dict[int, int]        # posts per agent, last 7 days
+    last_post: dict[int, datetime]    # newest of those per agent
+    tag_usage: dict[str, int]         # post tags, last 48h
+    comment_count: dict[int, int]     # agent comments, last 2h
+
+    @classmethod
+    def load(cls, db: Session, org_id: int, now: Optional[datetime] = None) -> "Signals":
+        now = now or datetime.now(timezone.utc)
+        posts = (
+            db.query(Post.author_agent_id, func.count(Post.id), func.max(Post.created_at))
+            .filter(Post.org_id == org_id, Post.author_agent_id.isnot(None),
+                    Post.created_at > now - timedelta(days=7))
+            .group_by(Post.author_agent_id)
+            .all()
+        )
+        comments = (
+            db.query(Comment.author_agent_id, func.count(Comment.id))
+            .filter(Comment.org_id == org_id, Comment.author_type == "agent",
+                    Comment.author_agent_id.isnot(None), Comment.created_at > now - timedelta(hours=2))
+            .group_by(Comment.author_agent_id)
+            .all()
+        )
+        return cls(
+            as_of=now,
+            post_count={a: int(n) for a, n, _ in posts},
+            last_post={a: _aware(last) for a, _, last in posts if last is not None},
+            tag_usage=_tag_usage(db, org_id, now - timedelta(hours=48)),
+            comment_count={a: int(n) for a, n in comments},
+        )
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+def _has_tag_column(db: Session) -> bool:
+    try:
+        return any(c["name"] == "tag" for c in inspect(db.get_bind()).get_columns("post_tags"))
+    except Exception:
+        return False
+
+
+def _tag_usage(db: Session, org_id: int, since: datetime) -> dict[str, int]:
+    # post_tags.tag is written by tag_extractor with raw SQL; the ORM model
+    # (tag_id) never caught up, so databases built from it lack the column
+    if not _has_tag_column(db):
+        return {}
+    rows = db.execute(text("""
+        SELECT pt.tag, COUNT(*) FROM post_tags pt
+        JOIN posts p ON p.id = pt.post_id
+        WHERE p.org_id = :org_id AND p.created_at > :since
+        GROUP BY pt.tag
+    """), {"org_id": org_id, "since": since}).fetchall()
+    return {tag: int(n) for tag, n in rows if tag}
+
+
+@dataclass(frozen=True)
+class Columns:
+    """Call-independent score factors, aligned with roster.active."""
+    key: tuple
+    roster: Roster
+    position: dict[int, int]  # agent id -> index
+    poster: list[float]
+    debater: list[float]
+
+    @property
+    def agents(self) -> tuple[AgentRecord, ...]:
+        return self.roster.active
+
+    @classmethod
+    def build(cls, roster: Roster, signals: Signals) -> "Columns":
+        # topic diversity: recent use of each agent's topics, via the index
+        overlap: dict[int, int] = {}
+        for tag, n in signals.tag_usage.items():
+            for agent_id in roster.topic_index.get(tag, ()):
+                overlap[agent_id] = overlap.get(agent_id, 0) + n
+
+        poster, debater = [], []
+        for agent in roster.active:
+            last = signals.last_post.get(agent.id)
+            if last is not None:
+                hours_since = (signals.as_of - last).total_seconds() / 3600
+                recency = min(hours_since / 24, 5.0)  # max 5x boost after 5 days
+            else:
+                recency = 5.0  # never posted
+            volume = 1.0 / (1 + signals.post_count.get(agent.id, 0) * 0.3)
+            diversity = 1.0 / (1 + overlap.get(agent.id, 0) * 0.2)
+            poster.append(recency * volume * diversity)
+            debater.append(1.0 / (1 + signals.comment_count.get(agent.id, 0) * 0.2))
+        return cls(
+            key=(roster.org_id, roster.version, signals.as_of), roster=roster,
+            position={a.id: i for i, a in enumerate(roster.active)}, poster=poster, debater=debater,
+        )
+
+    def pick_poster(self, rng) -> Optional[AgentRecord]:
+        """An agent to write the next post: drawn from the POSTER_POOL best
+        scores (recency x volume x topic diversity x random 0.5-1.5)."""
+        if not self.agents:
+            return None
+        scores = [base * rng.uniform(0.5, 1.5) for base in self.poster]
+        pool = heapq.nlargest(POSTER_POOL, range(len(scores)), key=scores.__getitem__)
+        return self.agents[rng.choice(pool)]
+
+    def pick_debaters(self, title_words, already: set[int], n: int, rng) -> list[AgentRecord]:
+        """The n best debaters: comment recency x random 0.6-1.4, x (1 + 0.5
+        per topic among the title words), x 0.1 if already in the debate."""
+        if not self.agents or n <= 0:
+            return []
+        scores = [base * rng.uniform(0.6, 1.4) for base in self.debater]
+        for agent_id, k in self.roster.topic_overlap(title_words).items():
+            scores[self.position[agent_id]] *= 1.0 + k * 0.5
+        for agent_id in already:
+            if agent_id in self.position:
+                scores[self.position[agent_id]] *= 0.1
+        best = heapq.nlargest(n, range(len(scores)), key=scores.__getitem__)
+        return [self.agents[i] for i in best]
+
+
+def _rng(seed: Optional[int]):
+    return random.Random(seed) if seed is not None else random
+
+
+class SelectionEngine:
+    def __init__(self, signals_seconds: float = SIGNALS_SECONDS):
+        self._signals = TTLCache(signals_seconds, maxsize=1024)
+        self._columns: dict[int, Columns] = {}
+        self._lock = threading.Lock()
+
+    def signals(self, db: Session, org_id: int) -> Signals:
+        return self._signals.get_or_set(org_id, lambda: Signals.load(db, org_id))
+
+    def columns(self, db: Session, org_id: int) -> Columns:
+        roster = get_roster(db, org_id)
+        signals = self.signals(db, org_id)
+        key = (org_id, roster.version, signals.as_of)
+        with self._lock:
+            cols = self._columns.get(org_id)
+        if cols is None or cols.key != key:
+            cols = Columns.build(roster, signals)
+            with self._lock:
+                self._columns[org_id] = cols
+        return cols
+
+    def pick_poster(self, db: Session, org_id: int, seed: Optional[int] = None) -> Optional[AgentRecord]:
+        return self.columns(db, org_id).pick_poster(_rng(seed))
+
+    def pick_debaters(
+        self, db: Session, org_id: int, post, n: int, seed: Optional[int] = None,
+    ) -> list[AgentRecord]:
+        cols = self.columns(db, org_id)
+        if not cols.agents or n <= 0:
+            return []
+        already = {
+            agent_id for (agent_id,) in db.query(Comment.author_agent_id).filter(
+                Comment.post_id == post.id, Comment.author_type == "agent", Comment.author_agent_id.isnot(None),
+            ).distinct()
+        }
+        return cols.pick_debaters((post.title or "").lower().split(), already, n, _rng(seed))
+
+    def clear(self) -> None:
+        self._signals.clear()
+        with self._lock:
+            self._columns.clear()
+
+
+engine = SelectionEngine()
@@ -0,0 +1,163 @@
+"""
+Unit of work for spawner output — comments, agent votes, post tags and
+agent actions.
+
+The spawners used to write row by row: a dedupe SELECT, add, commit and
+refresh per debate comment, one INSERT per agent vote and per tag, a
+lookup per action. SpawnWriter collects the rows of one debate round (or
+one vote pass, one tag extraction, one action spawn) and writes them
+together:
+
+- comments: deduped in memory by comment_hash against the post's existing
+  hashes (one query per post) and the rows already queued, inserted with a
+  single flush (SQLAlchemy batches the INSERT ... RETURNING). A parent that
+  is itself queued in the same round is linked after that flush;
+- the post_stats bumps for those comments: one per post, at commit, so the
+  counter row isn't locked while a round waits on the LLM;
+- votes and tags: deduped by key and sent as one executemany
+  INSERT ... ON CONFLICT DO NOTHING each, under a SAVEPOINT so a batch
+  that fails is logged and skipped without losing the rest of the round;
+- actions: deduped by idempotency_key, added in the same flush.
+
+commit() flushes and commits once. Nothing is written before flush() /
+commit(); rollback() drops the queue with the transaction.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Iterable, Union
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from app.core.logging import get_logger
+from app.models.agent_action import AgentAction
+from app.models.comment import Comment
+from app.services.engagement_counters import record_comments_created
+
+log = get_logger(__name__)
+
+_INSERT_VOTES = text(
+    "INSERT INTO agent_votes (org_id, agent_id, comment_id, value, created_at) "
+    "VALUES (:org_id, :agent_id, :comment_id, :value, :now) "
+    "ON CONFLICT DO NOTHING"
+)
+_INSERT_TAGS = text("INSERT INTO post_tags (post_id, tag) VALUES (:post_id, :tag) ON CONFLICT DO NOTHING")
+
+
+class SpawnWriter:
+    def __init__(self, db: Session):
+        self.db = db
+        self._hashes: dict[tuple[int, int], dict[str, Union[int, Comment]]] = {}
+        self._comments: list[Comment] = []
+        self._linked: list[tuple[Comment, Comment]] = []  # (row, queued parent)
+        self._created: list[Comment] = []  # flushed, counters not bumped yet
+        self._actions: dict[str, AgentAction] = {}
+        self._votes: dict[tuple[int, int], dict] = {}
+        self._tags: dict[tuple[int, str], dict] = {}
+
+    # ── Queueing ────────────────────────────────────────────────────────────
+
+    def _known_hashes(self, org_id: int, post_id: int) -> dict[str, Union[int, Comment]]:
+        known = self._hashes.get((org_id, post_id))
+        if known is None:
+            known = {
+                h: cid for cid, h in self.db.query(Comment.id, Comment.comment_hash).filter(
+                    Comment.org_id == org_id, Comment.post_id == post_id, Comment.comment_hash.isnot(None),
+                )
+            }
+            self._hashes[(org_id, post_id)] = known
+        return known
+
+    def comment(self, row: Comment, parent: Union[Comment, int, None] = None) -> Comment:
+        """Queue `row` as a reply to `parent` (an id, a stored Comment or one
+        queued on this writer). With a comment_hash already on the post or
+        in the queue, returns that comment instead and queues nothing."""
+        if row.comment_hash:
+            known = self._known_hashes(row.org_id, row.post_id)
+            seen = known.get(row.comment_hash)
+            if seen is not None:
+                return seen if isinstance(seen, Comment) else self.db.get(Comment, seen)
+            known[row.comment_hash] = row
+        if isinstance(parent, Comment):
+            # the identity, not parent.id: a committed parent is expired and
+            # reading an attribute would reload it
+            state = inspect(parent)
+            if state.key is None:
+                self._linked.append((row, parent))
+            else:
+                row.parent_comment_id = state.identity[0]
+        elif parent is not None:
+            row.parent_comment_id = parent
+        self._comments.append(row)
+        return row
+
+    def vote(self, org_id: int, agent_id: int, comment_id: int, value: int) -> bool:
+        """Queue an agent vote; False if this agent already has one queued
+        on the comment."""
+        key = (agent_id, comment_id)
+        if key in self._votes:
+            return False
+        self._votes[key] = {
+            "org_id": org_id, "agent_id": agent_id, "comment_id": comment_id, "value": value,
+            "now": datetime.now(timezone.utc).isoformat(),
+        }
+        return True
+
+    def tags(self, post_id: int, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self._tags.setdefault((post_id, tag), {"post_id": post_id, "tag": tag})
+
+    def action(self, row: AgentAction) -> AgentAction:
+        """Queue an action; the one already queued under the same
+        idempotency_key wins."""
+        if row.idempotency_key:
+            return self._actions.setdefault(row.idempotency_key, row)
+        self._actions[f"id:{id(row)}"] = row
+        return row
+
+    # ── Writing ─────────────────────────────────────────────────────────────
+
+    def _executemany(self, stmt, rows: list[dict], what: str) -> None:
+        if not rows:
+            return
+        try:
+            # a SAVEPOINT, so a failed batch is undone alone: on Postgres the
+            # error would otherwise abort the round's transaction
+            with self.db.begin_nested():
+                self.db.execute(stmt, rows)
+        except Exception as e:
+            # best effort, as the row-by-row inserts were: these tables live
+            # outside the ORM models and may be missing
+            log.warning("spawn_writer_insert_failed", table=what, rows=len(rows), error=str(e))
+
+    def flush(self) -> None:
+        """Write everything queued; comments and actions get their ids."""
+        if self._comments or self._actions:
+            self.db.add_all(self._comments)
+            self.db.add_all(self._actions.values())
+            self.db.flush()
+        if self._linked:
+            for row, parent in self._linked:
+                row.parent_comment_id = parent.id
+            self.db.flush()
+        self._created.extend(self._comments)
+        self._comments, self._linked, self._actions = [], [], {}
+
+        votes, self._votes = list(self._votes.values()), {}
+        tags, self._tags = list(self._tags.values()), {}
+        self._executemany(_INSERT_VOTES, votes, "agent_votes")
+        self._executemany(_INSERT_TAGS, tags, "post_tags")
+
+    def commit(self) -> None:
+        self.flush()
+        record_comments_created(self.db, self._created)
+        self._created = []
+        self.db.commit()
+
+    def rollback(self) -> None:
+        self.db.rollback()
+        self._hashes.clear()
+        self._comments, self._linked, self._created, self._actions = [], [], [], {}
+        self._votes, self._tags = {}, {}
+
@@ -23,14 +23,10 @@ def extract_tags(title: str, body: str, max_tags: int = 5) -> List[str]:
 
 
 def save_tags_for_post(db, post_id: int, title: str, body: str) -> List[str]:
-    from sqlalchemy import text
+    from app.services.spawn_writer import SpawnWriter
     tags = extract_tags(title, body)
-    for tag in tags:
-        try:
-            db.execute(text(
-                "INSERT INTO post_tags (post_id, tag) VALUES (:post_id, :tag) ON CONFLICT DO NOTHING"
-            ), {"post_id": post_id, "tag": tag})
-        except Exception:
-            pass
-    db.commit()
+    # todos los tags en un INSERT ... ON CONFLICT (executemany)
+    writer = SpawnWriter(db)
+    writer.tags(post_id, tags)
+    writer.commit()
     return tags
@@ -97,7 +97,7 @@ class TrendScanner:
         try:
             response = self.deepseek.chat(
                 system="Eres un blogger profesional experto en crear contenido viral.",
-                user=prompt
+                user=prompt,
             )
             
             # Parsear respuesta
@@ -1,22 +1,84 @@
 """
-Video recommendation engine — Fase 1
-Score = trending(0.30) + tags(0.25) + saves(0.20) + following(0.15) + language(0.10)
+Video recommendation engine.
+
+Score = trending(0.25) + tags(0.20) + saves(0.15) + following(0.15)
+        + language(0.10) + watch(0.15)
+already watched x0.4, already saved x0.8
+
+Two stages:
+
+1. Candidates — refresh_video_candidates() (background job, every
+   VIDEO_CANDIDATES_REFRESH_SECONDS) writes the VIDEO_CANDIDATE_POOL most
+   recent videos per org into video_candidates with every viewer-independent
+   signal precomputed: decayed trending, save / watch scores from post_stats,
+   tags (the post_tags.tag strings tag_extractor writes), and the detected
+   language (detected once, when a video first enters the pool). Requests
+   only read that table into a column-oriented CandidateSet, cached per org
+   for a few seconds; they never refresh it. An org with no candidates yet
+   gets one refresh started in the background and an empty feed until it
+   lands.
+
+2. Scoring — the viewer-independent part of every score is summed once per
+   CandidateSet (`base`). Per request only the viewer's own features
+   (saved / liked / watched posts, tags, follows; cached per user with a
+   TTL) are applied, through inverted indexes on the set, so the work is
+   proportional to what the viewer touched rather than to the pool.
+
+The ranked list is cached per (org, viewer, language); pages are cut from
+it with an opaque (score, id) cursor, so scrolling doesn't recompute
+anything and a page boundary stays put even if the list is rebuilt between
+requests. New videos enter the feed on the next candidate refresh.
 """
+from __future__ import annotations
+
 import math
+import os
 import re
-from datetime import datetime, timezone, timedelta
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, delete, text, update
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+
+from app.core.cache import TTLCache
+from app.core.logging import get_logger
+from app.core.pagination import decode_cursor, encode_cursor
 from app.models.post import Post
-from app.models.saved_post import SavedPost
+from app.models.post_stats import PostStats
+from app.models.user import User
+from app.models.video_candidate import VideoCandidate
+from app.services.selection_engine import _has_tag_column
+
+log = get_logger(__name__)
+
+CANDIDATE_POOL = int(os.getenv("VIDEO_CANDIDATE_POOL", "200"))
+
+W_TRENDING = 0.25
+W_TAGS = 0.20
+W_SAVES = 0.15
+W_FOLLOWING = 0.15
+W_LANGUAGE = 0.10
+W_WATCH = 0.15
+WATCHED_FACTOR = 0.4
+SAVED_FACTOR = 0.8
 
+_candidate_cache = TTLCache(float(os.getenv("VIDEO_CANDIDATE_CACHE_SECONDS", "30")), maxsize=256)
+# an org with no candidates yet: how long the empty pool (and the refresh
+# it started) stands before another refresh is tried
+EMPTY_POOL_SECONDS = float(os.getenv("VIDEO_EMPTY_POOL_CACHE_SECONDS", "600"))
+_user_cache = TTLCache(float(os.getenv("VIDEO_USER_CACHE_SECONDS", "120")), maxsize=10_000)
+_ranked_cache = TTLCache(float(os.getenv("VIDEO_FEED_CACHE_SECONDS", "60")), maxsize=10_000)
 
-def _hours_ago(dt) -> float:
+
+def _hours_ago(dt, now: Optional[datetime] = None) -> float:
     if dt is None:
         return 720.0
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=timezone.utc)
-    delta = datetime.now(timezone.utc) - dt
+    delta = (now or datetime.now(timezone.utc)) - dt
     return max(delta.total_seconds() / 3600, 0.1)
 
 
@@ -26,6 +88,13 @@ def _trending_score(upvotes: int, comments: int, hours: float) -> float:
     return score / math.pow(hours + 2, 1.5)
 
 
+def _watch_score(views: int, completed: int) -> float:
+    """completion_rate * 0.6 + normalized_views * 0.4"""
+    if not views:
+        return 0.0
+    return min((completed / views) * 0.6 + min(views / 100.0, 1.0) * 0.4, 1.0)
+
+
 def _detect_language(text_content: str) -> str:
     """Simple heuristic — detect Arabic, Chinese, Korean, Spanish, etc."""
     if not text_content:
@@ -33,7 +102,6 @@ def _detect_language(text_content: str) -> str:
     arabic = len(re.findall(r'[\u0600-\u06FF]', text_content))
     chinese = len(re.findall(r'[\u4e00-\u9fff]', text_content))
     korean = len(re.findall(r'[\uAC00-\uD7A3]', text_content))
-    latin = len(re.findall(r'[a-zA-Z]', text_content))
     spanish_markers = len(re.findall(r'\b(el|la|los|las|es|que|con|por|para|una|un)\b', text_content.lower()))
     if arabic > 5:
         return "ar"
@@ -46,6 +114,379 @@ def _detect_language(text_content: str) -> str:
     return "en"
 
 
+# ── Stage 1: candidates ─────────────────────────────────────────────────────
+
+def _video_filter(q):
+    return q.filter(
+        Post.status == "published",
+        Post.media_type == "video",
+        Post.media_url.isnot(None),
+    )
+
+
+_TAGS_OF_POSTS = text("SELECT DISTINCT post_id, tag FROM post_tags WHERE post_id IN :ids").bindparams(
+    bindparam("ids", expanding=True)
+)
+
+
+def _tag_map(db: Session, post_ids: list[int]) -> dict[int, list[str]]:
+    # post_tags.tag is written by tag_extractor with raw SQL; the ORM model
+    # (tag_id) never caught up, so databases built from it lack the column
+    out: dict[int, list[str]] = {}
+    if not post_ids or not _has_tag_column(db):
+        return out
+    for pid, tag in db.execute(_TAGS_OF_POSTS, {"ids": post_ids}).fetchall():
+        if tag:
+            out.setdefault(pid, []).append(tag.replace(",", " "))
+    return out
+
+
+def refresh_video_candidates(db: Session, org_id: int | None = None, pool: int = CANDIDATE_POOL) -> dict:
+    """Rewrite video_candidates for one org (or all). Commits per org."""
+    started = datetime.now(timezone.utc)
+    if org_id is not None:
+        org_ids = [org_id]
+    else:
+        org_ids = [r[0] for r in _video_filter(db.query(Post.org_id)).distinct().all()]
+
+    upserted = 0
+    for oid in org_ids:
+        rows = (
+            _video_filter(
+                db.query(
+                    Post.id, Post.author_user_id, Post.created_at,
+                    PostStats.upvotes, PostStats.comment_count, PostStats.saves,
+                    PostStats.views, PostStats.completed_views,
+                ).outerjoin(PostStats, PostStats.post_id == Post.id)
+            )
+            .filter(Post.org_id == oid)
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(pool)
+            .all()
+        )
+        if not rows:
+            continue
+        ids = [r[0] for r in rows]
+
+        known_lang = dict(
+            db.query(VideoCandidate.post_id, VideoCandidate.language)
+            .filter(VideoCandidate.post_id.in_(ids)).all()
+        )
+        new_ids = {i for i in ids if i not in known_lang}
+        if new_ids:
+            for pid, title, body in db.query(Post.id, Post.title, Post.body_md).filter(Post.id.in_(new_ids)).all():
+                known_lang[pid] = _detect_language((title or "") + " " + (body or ""))
+        tags = _tag_map(db, ids)
+
+        now = datetime.now(timezone.utc)
+        values = []
+        for pid, author, created_at, ups, comments, saves, views, completed in rows:
+            values.append({
+                "post_id": pid,
+                "org_id": oid,
+                "author_user_id": author,
+                "language": known_lang.get(pid, "en"),
+                "tags": ",".join(sorted(tags.get(pid, ()))),
+                "trending": min(_trending_score(ups or 0, comments or 0, _hours_ago(created_at, now)) / 10.0, 1.0),
+                "save_score": min((saves or 0) / 10.0, 1.0),
+                "watch_score": _watch_score(views or 0, completed or 0),
+                "post_created_at": created_at,
+                "refreshed_at": now,
+            })
+        to_update = [v for v in values if v["post_id"] not in new_ids]
+        to_insert = [v for v in values if v["post_id"] in new_ids]
+        if to_update:
+            db.execute(update(VideoCandidate), to_update)
+        if to_insert:
+            # a refresh of the same org elsewhere (the background one in an
+            # API process, the scheduled job) may have inserted them since
+            db.execute(_upsert_candidates(db), to_insert)
+        db.commit()
+        upserted += len(values)
+        _candidate_cache.invalidate(oid)
+
+    # Anything not touched this pass fell out of the pool or was unpublished
+    stale = delete(VideoCandidate).where(VideoCandidate.refreshed_at < started)
+    if org_id is not None:
+        stale = stale.where(VideoCandidate.org_id == org_id)
+    removed = db.execute(stale).rowcount or 0
+    db.commit()
+
+    log.info("video_candidates_refreshed", org_id=org_id, upserted=upserted, removed=removed)
+    return {"upserted": upserted, "removed": removed}
+
+
+def _upsert_candidates(db: Session):
+    if db.bind is not None and db.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    stmt = dialect_insert(VideoCandidate)
+    return stmt.on_conflict_do_update(
+        index_elements=[VideoCandidate.post_id],
+        set_={c.name: stmt.excluded[c.name] for c in VideoCandidate.__table__.columns if c.name != "post_id"},
+    )
+
+
+@dataclass(frozen=True)
+class CandidateSet:
+    """The candidate pool of one org, column-oriented. Position i across
+    every tuple is the same post."""
+    post_ids: tuple[int, ...]
+    base: tuple[float, ...]
+    save_score: tuple[float, ...]
+    tag_count: tuple[int, ...]
+    position: dict[int, int] = field(default_factory=dict)
+    by_author: dict[int, tuple[int, ...]] = field(default_factory=dict)
+    by_language: dict[str, tuple[int, ...]] = field(default_factory=dict)
+    by_tag: dict[str, tuple[int, ...]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.post_ids)
+
+
+def build_candidate_set(rows) -> CandidateSet:
+    """rows: (post_id, author_user_id, language, tags, trending, save_score, watch_score)"""
+    post_ids, base, saves, tag_count = [], [], [], []
+    by_author: dict[int, list[int]] = {}
+    by_language: dict[str, list[int]] = {}
+    by_tag: dict[str, list[int]] = {}
+    for i, (pid, author, lang, tags, trending, save, watch) in enumerate(rows):
+        tag_ids = tags.split(",") if tags else []
+        post_ids.append(pid)
+        base.append(trending * W_TRENDING + save * W_SAVES + watch * W_WATCH)
+        saves.append(save)
+        tag_count.append(len(tag_ids))
+        if author:
+            by_author.setdefault(author, []).append(i)
+        by_language.setdefault(lang or "en", []).append(i)
+        for t in tag_ids:
+            by_tag.setdefault(t, []).append(i)
+    freeze = lambda d: {k: tuple(v) for k, v in d.items()}  # noqa: E731
+    return CandidateSet(
+        post_ids=tuple(post_ids),
+        base=tuple(base),
+        save_score=tuple(saves),
+        tag_count=tuple(tag_count),
+        position={pid: i for i, pid in enumerate(post_ids)},
+        by_author=freeze(by_author),
+        by_language=freeze(by_language),
+        by_tag=freeze(by_tag),
+    )
+
+
+def _load_candidates(db: Session, org_id: int) -> CandidateSet:
+    cands = _candidate_cache.get(org_id)
+    if cands is not None:
+        return cands
+    rows = (
+        db.query(
+            VideoCandidate.post_id, VideoCandidate.author_user_id, VideoCandidate.language,
+            VideoCandidate.tags, VideoCandidate.trending, VideoCandidate.save_score,
+            VideoCandidate.watch_score,
+        )
+        .filter(VideoCandidate.org_id == org_id)
+        .order_by(VideoCandidate.post_created_at.desc(), VideoCandidate.post_id.desc())
+        .limit(CANDIDATE_POOL)
+        .all()
+    )
+    if rows:
+        cands = build_candidate_set(rows)
+        _candidate_cache.set(org_id, cands)
+        return cands
+    # fresh deploy / first video of the org: refresh off the request. The
+    # refresh invalidates this entry if it finds videos; an org without any
+    # keeps the empty pool for EMPTY_POOL_SECONDS instead of starting a
+    # refresh every VIDEO_CANDIDATE_CACHE_SECONDS
+    _refresh_in_background(org_id)
+    cands = build_candidate_set(())
+    _candidate_cache.set(org_id, cands, ttl=EMPTY_POOL_SECONDS)
+    return cands
+
+
+_refreshing: set[int] = set()
+_refreshing_lock = threading.Lock()
+
+
+def _refresh_in_background(org_id: int) -> None:
+    """One refresh of `org_id` on a thread of its own, unless one is
+    already running."""
+    with _refreshing_lock:
+        if org_id in _refreshing:
+            return
+        _refreshing.add(org_id)
+
+    def run() -> None:
+        try:
+            run_video_candidates_job(org_id)
+        except Exception as e:
+            log.error("video_candidates_error", org_id=org_id, error=str(e))
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(org_id)
+
+    threading.Thread(target=run, name=f"video-candidates-{org_id}", daemon=True).start()
+
+
+# ── Stage 2: per-user features + scoring ────────────────────────────────────
+
+@dataclass(frozen=True)
+class UserFeatures:
+    saved: frozenset[int] = frozenset()
+    liked: frozenset[int] = frozenset()
+    watched: frozenset[int] = frozenset()
+    tags: frozenset[str] = frozenset()
+    following: frozenset[int] = frozenset()
+
+
+ANONYMOUS = UserFeatures()
+
+
+def _id_set(db: Session, sql: str, uid: int) -> frozenset[int]:
+    try:
+        return frozenset(r[0] for r in db.execute(text(sql), {"uid": uid}).fetchall())
+    except Exception:
+        db.rollback()
+        return frozenset()
+
+
+def load_user_features(db: Session, user_id: int) -> UserFeatures:
+    saved = _id_set(db, "SELECT post_id FROM saved_posts WHERE user_id = :uid", user_id)
+    liked = _id_set(db, "SELECT post_id FROM post_votes WHERE user_id = :uid AND value = 1", user_id)
+    watched = _id_set(db, "SELECT DISTINCT post_id FROM video_views WHERE user_id = :uid", user_id)
+    following = _id_set(db, "SELECT following_id FROM user_follows WHERE follower_id = :uid", user_id)
+    engaged = saved | liked
+    tags = frozenset(
+        t for ts in _tag_map(db, list(engaged)).values() for t in ts
+    )
+    return UserFeatures(saved=saved, liked=liked, watched=watched, tags=tags, following=following)
+
+
+def _user_features(db: Session, user_id: int | None) -> UserFeatures:
+    if not user_id:
+        return ANONYMOUS
+    return _user_cache.get_or_set(user_id, lambda: load_user_features(db, user_id))
+
+
+def score_candidates(cands: CandidateSet, user: UserFeatures, language: str) -> list[tuple[float, int]]:
+    """(score, post_id) for every candidate, best first (ties: newest id first)."""
+    scores = list(cands.base)
+
+    for i in cands.by_language.get(language, ()):
+        scores[i] += W_LANGUAGE
+
+    for author in user.following:
+        for i in cands.by_author.get(author, ()):
+            scores[i] += W_FOLLOWING
+
+    if user.tags:
+        overlap: dict[int, int] = {}
+        for t in user.tags:
+            for i in cands.by_tag.get(t, ()):
+                overlap[i] = overlap.get(i, 0) + 1
+        for i, n in overlap.items():
+            scores[i] += W_TAGS * n / cands.tag_count[i]
+
+    saved_pos = [cands.position[p] for p in user.saved if p in cands.position]
+    for i in saved_pos:
+        # personal save: +0.5 on the save signal (capped at 1)
+        s = cands.save_score[i]
+        scores[i] += (min(s + 0.5, 1.0) - s) * W_SAVES
+    for p in user.watched:
+        i = cands.position.get(p)
+        if i is not None:
+            scores[i] *= WATCHED_FACTOR
+    for i in saved_pos:
+        scores[i] *= SAVED_FACTOR
+
+    ranked = [(s, pid) for s, pid in zip(scores, cands.post_ids)]
+    ranked.sort(key=lambda r: (r[0], r[1]), reverse=True)
+    return ranked
+
+
+def _ranked(db: Session, org_id: int, user_id: int | None, language: str) -> list[tuple[float, int]]:
+    def factory():
+        return score_candidates(_load_candidates(db, org_id), _user_features(db, user_id), language)
+    return _ranked_cache.get_or_set((org_id, user_id or 0, language), factory)
+
+
+def _page(ranked: list[tuple[float, int]], limit: int, cursor: str | None, offset: int):
+    after = decode_cursor(cursor)
+    if after is not None:
+        try:
+            key = (float(after["s"]), int(after["id"]))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        start = next((n for n, r in enumerate(ranked) if r < key), len(ranked))
+    else:
+        start = max(offset, 0)
+    page = ranked[start:start + limit]
+    has_more = start + limit < len(ranked)
+    next_cursor = encode_cursor({"s": page[-1][0], "id": page[-1][1]}) if has_more and page else None
+    return page, next_cursor
+
+
+def _hydrate(db: Session, page: list[tuple[float, int]]) -> list[dict]:
+    ids = [pid for _, pid in page]
+    if not ids:
+        return []
+    posts = {
+        r[0]: r for r in db.query(
+            Post.id, Post.title, Post.excerpt, Post.media_url, Post.media_type,
+            Post.author_user_id, Post.author_agent_id, Post.created_at,
+        ).filter(Post.id.in_(ids)).all()
+    }
+    stats = {
+        r[0]: r for r in db.query(PostStats.post_id, PostStats.comment_count, PostStats.upvotes)
+        .filter(PostStats.post_id.in_(ids)).all()
+    }
+    author_ids = {p[5] for p in posts.values() if p[5]}
+    users = {
+        r[0]: r for r in db.query(User.id, User.username, User.display_name)
+        .filter(User.id.in_(author_ids)).all()
+    } if author_ids else {}
+
+    out = []
+    for score, pid in page:
+        p = posts.get(pid)
+        if p is None:  # deleted since the candidate refresh
+            continue
+        _, title, excerpt, media_url, media_type, author_uid, author_aid, created_at = p
+        u = users.get(author_uid)
+        st = stats.get(pid)
+        out.append({
+            "id": pid,
+            "title": title,
+            "excerpt": excerpt,
+            "media_url": media_url,
+            "media_type": media_type,
+            "author_user_id": author_uid,
+            "author_agent_id": author_aid,
+            "author_display_name": (u[2] or u[1] or "") if u else None,
+            "author_username": (u[1] or "") if u else None,
+            "comment_count": st[1] if st else 0,
+            "upvote_count": st[2] if st else 0,
+            "created_at": created_at.isoformat() if created_at else "",
+            "_score": round(score, 4),
+        })
+    return out
+
+
+def video_feed_page(
+    db: Session,
+    org_id: int = 1,
+    user_id: int | None = None,
+    user_language: str = "en",
+    limit: int = 50,
+    cursor: str | None = None,
+    offset: int = 0,
+) -> tuple[list[dict], str | None]:
+    """One page of the ranked feed plus the cursor for the next one (None
+    when exhausted). `offset` is only honoured when no cursor is given."""
+    page, next_cursor = _page(_ranked(db, org_id, user_id, user_language), limit, cursor, offset)
+    return _hydrate(db, page), next_cursor
+
+
 def get_video_feed(
     db: Session,
     org_id: int = 1,
@@ -58,209 +499,15 @@ def get_video_feed(
     """
     Returns scored and ranked video posts for a user.
     """
+    videos, _ = video_feed_page(db, org_id, user_id, user_language, limit=limit, offset=offset)
+    return videos
 
-    # ── Fetch all video posts ─────────────────────────────────────────
-    posts = (
-        db.query(Post)
-        .filter(
-            Post.org_id == org_id,
-            Post.status == "published",
-            Post.media_type == "video",
-            Post.media_url.isnot(None),
-        )
-        .order_by(Post.created_at.desc())
-        .limit(200)
-        .all()
-    )
-
-    if not posts:
-        return []
-
-    # ── User context ──────────────────────────────────────────────────
-    user_saved_post_ids: set[int] = set()
-    user_liked_post_ids: set[int] = set()
-    user_tag_ids: set[int] = set()
-    following_user_ids: set[int] = set()
-
-    if user_id:
-        # Saved posts
-        saved = db.execute(
-            text("SELECT post_id FROM saved_posts WHERE user_id = :uid"),
-            {"uid": user_id}
-        ).fetchall()
-        user_saved_post_ids = {r[0] for r in saved}
-
-        # Liked posts
-        liked = db.execute(
-            text("SELECT post_id FROM post_votes WHERE user_id = :uid AND value = 1"),
-            {"uid": user_id}
-        ).fetchall()
-        user_liked_post_ids = {r[0] for r in liked}
-
-        # Tags from liked/saved posts
-        all_engaged = user_saved_post_ids | user_liked_post_ids
-        if all_engaged:
-            try:
-                tags = db.execute(
-                    text("SELECT DISTINCT tag FROM post_tags WHERE post_id = ANY(:pids)"),
-                    {"pids": list(all_engaged)}
-                ).fetchall()
-                user_tag_ids = {r[0] for r in tags}
-            except Exception:
-                pass
-
-        # Following (user follows)
-        follows = db.execute(
-            text("SELECT following_id FROM user_follows WHERE follower_id = :uid"),
-            {"uid": user_id}
-        ).fetchall()
-        following_user_ids = {r[0] for r in follows}
-
-    # ── Saved by others (social proof) ───────────────────────────────
-    save_counts: dict[int, int] = {}
-    save_rows = db.execute(
-        text("SELECT post_id, COUNT(*) as cnt FROM saved_posts GROUP BY post_id")
-    ).fetchall()
-    for row in save_rows:
-        save_counts[row[0]] = row[1]
-
-    # ── Post tags ─────────────────────────────────────────────────────
-    post_tag_map: dict[int, set[int]] = {}
-    post_ids = [p.id for p in posts]
-    try:
-        tag_rows = db.execute(
-            text("SELECT post_id, tag FROM post_tags WHERE post_id = ANY(:pids)"),
-            {"pids": post_ids}
-        ).fetchall()
-        for row in tag_rows:
-            post_tag_map.setdefault(row[0], set()).add(row[1])
-    except Exception:
-        pass
 
-    # ── Load author usernames ────────────────────────────────────────
-    user_ids = [p.author_user_id for p in posts if p.author_user_id]
-    username_map: dict[int, str] = {}
-    display_map: dict[int, str] = {}
-    if user_ids:
-        try:
-            urows = db.execute(
-                text("SELECT id, username, display_name FROM users WHERE id = ANY(:uids)"),
-                {"uids": user_ids}
-            ).fetchall()
-            for row in urows:
-                username_map[row[0]] = row[1] or ""
-                display_map[row[0]] = row[2] or row[1] or ""
-        except Exception:
-            pass
-
-    # ── Watch time scores ────────────────────────────────────────────
-    watch_scores: dict[int, float] = {}
+def run_video_candidates_job(org_id: int | None = None) -> dict:
+    """Entry point for scheduled runs."""
+    from app.core.db import SessionLocal
+    db = SessionLocal()
     try:
-        watch_rows = db.execute(
-            text("""
-                SELECT post_id, 
-                    COUNT(*) as views,
-                    AVG(watch_seconds) as avg_watch,
-                    SUM(CASE WHEN completed THEN 1 ELSE 0 END)::float / NULLIF(COUNT(*), 0) as completion_rate
-                FROM video_views
-                GROUP BY post_id
-            """)
-        ).fetchall()
-        for row in watch_rows:
-            # Score: completion_rate * 0.6 + normalized_views * 0.4
-            views = row[1] or 0
-            completion = float(row[3] or 0)
-            watch_scores[row[0]] = min(completion * 0.6 + min(views / 100.0, 1.0) * 0.4, 1.0)
-    except Exception:
-        pass
-
-    # ── User already watched ──────────────────────────────────────────
-    user_watched_ids: set[int] = set()
-    if user_id:
-        try:
-            watched = db.execute(
-                text("SELECT post_id FROM video_views WHERE user_id=:uid"),
-                {"uid": user_id}
-            ).fetchall()
-            user_watched_ids = {r[0] for r in watched}
-        except Exception:
-            pass
-
-    # ── Score each post ───────────────────────────────────────────────
-    scored = []
-    for post in posts:
-        hours = _hours_ago(post.created_at)
-        upvotes = getattr(post, "upvote_count", 0) or 0
-        comments = getattr(post, "comment_count", 0) or 0
-
-        # 1. Trending score (0-1 normalized roughly)
-        trending = min(_trending_score(upvotes, comments, hours) / 10.0, 1.0)
-
-        # 2. Tag relevance score
-        post_tags = post_tag_map.get(post.id, set())
-        if user_tag_ids and post_tags:
-            tag_score = len(user_tag_ids & post_tags) / max(len(post_tags), 1)
-        else:
-            tag_score = 0.0
-
-        # 3. Save score (social proof + personal)
-        total_saves = save_counts.get(post.id, 0)
-        save_score = min(total_saves / 10.0, 1.0)
-        if post.id in user_saved_post_ids:
-            save_score = min(save_score + 0.5, 1.0)
-
-        # 4. Following score
-        following_score = 0.0
-        if post.author_user_id and post.author_user_id in following_user_ids:
-            following_score = 1.0
-
-        # 5. Language score
-        post_lang = _detect_language((post.title or "") + " " + (post.body_md or ""))
-        language_score = 1.0 if post_lang == user_language else 0.0
-
-        # Watch time score
-        watch_score = watch_scores.get(post.id, 0.0)
-
-        # ── Final weighted score ──────────────────────────────────────
-        final_score = (
-            trending        * 0.25 +
-            tag_score       * 0.20 +
-            save_score      * 0.15 +
-            following_score * 0.15 +
-            language_score  * 0.10 +
-            watch_score     * 0.15
-        )
-
-        # Demote already watched videos
-        if post.id in user_watched_ids:
-            final_score *= 0.4
-
-        # Slight demote already saved
-        if post.id in user_saved_post_ids:
-            final_score *= 0.8
-
-        scored.append((final_score, post))
-
-    # ── Sort by score descending ──────────────────────────────────────
-    scored.sort(key=lambda x: x[0], reverse=True)
-
-    # ── Serialize ─────────────────────────────────────────────────────
-    result = []
-    for score, post in scored[offset:offset + limit]:
-        result.append({
-            "id": post.id,
-            "title": post.title,
-            "excerpt": post.excerpt,
-            "media_url": post.media_url,
-            "media_type": post.media_type,
-            "author_user_id": post.author_user_id,
-            "author_agent_id": post.author_agent_id,
-            "author_display_name": display_map.get(post.author_user_id) if post.author_user_id else None,
-            "author_username": username_map.get(post.author_user_id) if post.author_user_id else None,
-            "comment_count": getattr(post, "comment_count", 0) or 0,
-            "upvote_count": getattr(post, "upvote_count", 0) or 0,
-            "created_at": post.created_at.isoformat() if post.created_at else "",
-            "_score": round(score, 4),
-        })
-
-    return result
+        return refresh_video_candidates(db, org_id)
+    finally:
+        db.close()
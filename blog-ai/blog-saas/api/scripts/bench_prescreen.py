@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Benchmark the local pre-moderation stage (app.services.prescreen).
+
+Reads a JSONL corpus of {"text": ..., "llm_score": 0-100} — scores the
+LLM gave the same texts — and reports:
+
+- throughput: texts/sec for prescreen() over the corpus, --repeat times;
+- coverage: share of texts settled locally (LLM calls saved);
+- agreement: of the texts settled locally, how many the LLM labels the
+  same way (safe: llm_score <= --safe-max, reject: >= --reject-min).
+
+Uso: python scripts/bench_prescreen.py [corpus.jsonl] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.prescreen import prescreen
+
+DEFAULT_CORPUS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures", "moderation_corpus.jsonl"
+)
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(rows, safe_max=30, reject_min=80):
+    """Coverage/agreement of prescreen() against the rows' LLM labels."""
+    decided = agree = 0
+    disagreements = []
+    for row in rows:
+        pre = prescreen(row["text"])
+        if not pre.decided:
+            continue
+        decided += 1
+        label = row["llm_score"]
+        if (pre.verdict == "safe" and label <= safe_max) or (pre.verdict == "reject" and label >= reject_min):
+            agree += 1
+        else:
+            disagreements.append((pre.verdict, label, row["text"]))
+    return {
+        "total": len(rows),
+        "decided": decided,
+        "coverage": decided / len(rows) if rows else 0.0,
+        "agreement": agree / decided if decided else 1.0,
+        "disagreements": disagreements,
+    }
+
+
+def throughput(rows, repeat):
+    texts = [row["text"] for row in rows]
+    prescreen(texts[0])  # compile the lexicon outside the timing
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            prescreen(text)
+    return len(texts) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--safe-max", type=int, default=30)
+    parser.add_argument("--reject-min", type=int, default=80)
+    args = parser.parse_args()
+
+    rows = load_corpus(args.corpus)
+    result = evaluate(rows, args.safe_max, args.reject_min)
+    print(f"corpus:     {result['total']} texts ({args.corpus})")
+    print(f"throughput: {throughput(rows, args.repeat):,.0f} texts/sec")
+    print(f"coverage:   {result['coverage']:.1%} settled locally ({result['decided']} LLM calls saved)")
+    print(f"agreement:  {result['agreement']:.1%} with LLM labels")
+    for verdict, label, text in result["disagreements"]:
+        print(f"  ✗ local={verdict} llm={label}: {text[:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Benchmark agent selection scoring (app.services.selection_engine).
+
+Builds a synthetic roster of --agents agents (topics drawn from a fixed
+vocabulary) with synthetic aggregate signals, then reports:
+
+- build: ms to precompute the score columns (once per roster / signals
+  refresh);
+- poster / debate picks per second over the warm columns;
+- determinism: the same --seed gives the same picks.
+
+No database: the per-call DB work left is one indexed query for the
+agents already in the debate.
+
+Uso: python scripts/bench_selection.py [--agents 5000] [--picks 2000] [--seed 7]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.agent_roster import AgentRecord, Roster
+from app.services.selection_engine import Columns, Signals
+
+TOPICS = [
+    "ai", "climate", "economy", "music", "health", "politics", "science", "sports",
+    "film", "books", "crypto", "privacy", "education", "space", "food", "travel",
+]
+TITLES = [
+    "Is AI good for the economy", "Climate science and politics", "Privacy in the age of crypto",
+    "Space travel on a budget", "Music, film and books this week", "Health and food myths",
+]
+
+
+def synthetic(n, rng):
+    now = datetime.now(timezone.utc)
+    records = [
+        AgentRecord(id=i, org_id=1, handle=f"sc_{rng.choice(['skeptic', 'analyst', 'poet'])}_{i}",
+                    display_name=f"Agent {i}", style="concise",
+                    topics=frozenset(rng.sample(TOPICS, rng.randint(1, 4))), reputation_score=0,
+                    is_shadow_banned=False)
+        for i in range(1, n + 1)
+    ]
+    posters = rng.sample(range(1, n + 1), n // 3)
+    signals = Signals(
+        as_of=now,
+        post_count={a: rng.randint(1, 8) for a in posters},
+        last_post={a: now - timedelta(hours=rng.uniform(0, 160)) for a in posters},
+        tag_usage={t: rng.randint(0, 30) for t in TOPICS},
+        comment_count={a: rng.randint(1, 12) for a in rng.sample(range(1, n + 1), n // 4)},
+    )
+    return Roster.build(1, 1, (n, ""), records), signals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--agents", type=int, default=5000)
+    parser.add_argument("--picks", type=int, default=2000)
+    parser.add_argument("--debaters", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    roster, signals = synthetic(args.agents, random.Random(args.seed))
+    start = time.perf_counter()
+    cols = Columns.build(roster, signals)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    for _ in range(args.picks):
+        cols.pick_poster(rng)
+    poster_rate = args.picks / (time.perf_counter() - start)
+
+    titles = [t.lower().split() for t in TITLES]
+    already = set(range(1, 40))
+    start = time.perf_counter()
+    for i in range(args.picks):
+        cols.pick_debaters(titles[i % len(titles)], already, args.debaters, rng)
+    debate_rate = args.picks / (time.perf_counter() - start)
+
+    same = (
+        cols.pick_debaters(titles[0], already, args.debaters, random.Random(args.seed))
+        == cols.pick_debaters(titles[0], already, args.debaters, random.Random(args.seed))
+    )
+    print(f"roster:       {args.agents} agents, {len(roster.topic_index)} topics")
+    print(f"build:        {build_ms:.1f} ms")
+    print(f"poster picks: {poster_rate:,.0f}/sec")
+    print(f"debate picks: {debate_rate:,.0f}/sec (n={args.debaters})")
+    print(f"determinism:  {'ok' if same else 'FAILED'} (seed {args.seed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import SessionLocal
+from app.models.post import Post
 from app.services.post_moderation_adapter import PostModerationAdapter
 
 def run_cycle():
@@ -23,11 +24,9 @@ def run_cycle():
         
         print(f"📊 Moderando {len(posts)} posts...")
         
-        for post in posts:
-            moderated = adapter.moderate_post(db, post.id)
-            if moderated:
-                status = "✅ publicado" if moderated.status == "published" else "⏳ needs_review"
-                print(f"  {status} - Post {moderated.id} (score: {moderated.policy_score})")
+        for moderated in adapter.moderate_posts(db, [p.id for p in posts]):
+            status = "✅ publicado" if moderated.status == "published" else "⏳ needs_review"
+            print(f"  {status} - Post {moderated.id} (score: {moderated.policy_score})")
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -51,6 +51,12 @@ def db_session():
         session.close()
         Base.metadata.drop_all(bind=engine)
         engine.dispose()
+        # ids are reused by the next test's fresh database
+        from app.core import identity
+        from app.services import agent_roster, selection_engine
+        identity.clear()
+        agent_roster.registry.clear()
+        selection_engine.engine.clear()
 
 
 @pytest.fixture
@@ -227,3 +233,86 @@ def _mute_outbound_email(monkeypatch):
     ):
         if hasattr(email_svc, fn):
             monkeypatch.setattr(email_svc, fn, lambda *a, **kw: None)
+
+
+@pytest.fixture
+def make_post(db_session):
+    """Seed a published Post (and its Org on first use)."""
+    session, _ = db_session
+
+    def _make(
+        org_id: int = 1,
+        title: str = "A post",
+        status: str = "published",
+        author_user_id: int | None = None,
+        **extra,
+    ):
+        from app.models.org import Org
+        from app.models.post import Post
+        if session.get(Org, org_id) is None:
+            session.add(Org(id=org_id, name=f"org{org_id}", slug=f"org{org_id}"))
+            session.commit()
+        p = Post(
+            org_id=org_id,
+            title=title,
+            slug=title.lower().replace(" ", "-")[:120],
+            body_md=extra.pop("body_md", ""),
+            status=status,
+            author_user_id=author_user_id,
+            **extra,
+        )
+        session.add(p)
+        session.commit()
+        session.refresh(p)
+        return p
+
+    return _make
+
+
+@pytest.fixture()
+def make_agent(db_session):
+    """Seed an enabled AgentProfile (org must already exist, e.g. via make_post)."""
+    session, _ = db_session
+
+    def _make(org_id: int = 1, handle: str = "agent", **extra):
+        from app.models.agent_profile import AgentProfile
+        a = AgentProfile(
+            org_id=org_id,
+            handle=handle,
+            display_name=extra.pop("display_name", handle.title()),
+            **extra,
+        )
+        session.add(a)
+        session.commit()
+        session.refresh(a)
+        return a
+
+    return _make
+
+
+@pytest.fixture
+def query_budget(db_session):
+    """Assert how many SQL statements a block may run on the test DB.
+
+        with query_budget(4, max_repeats=1):
+            client.get("/api/v1/...")
+
+    `max_repeats` caps how often one statement shape may repeat — the
+    signature of an N+1. Yields the QueryRecorder; a failure prints the
+    repeated shapes."""
+    from contextlib import contextmanager
+
+    from app.core.query_profiler import recording
+
+    session, _ = db_session
+
+    @contextmanager
+    def _budget(max_queries: int, max_repeats: int | None = None):
+        with recording(session.get_bind()) as rec:
+            yield rec
+        assert rec.count <= max_queries, f"query budget {max_queries} exceeded:\n{rec.report()}"
+        worst = max((n for _, n in rec.duplicates()), default=1)
+        if max_repeats is not None:
+            assert worst <= max_repeats, f"a statement repeated {worst} times:\n{rec.report()}"
+
+    return _budget
@@ -0,0 +1,80 @@
+"""
+Agent roster registry tests.
+
+Covers the topic index and the active / enabled split, invalidation on
+ORM commits in this process, the COUNT/MAX(updated_at) stamp check that
+picks up other processes' writes, and pick_agents_for_post ranking topic
+matches first from the index.
+"""
+from __future__ import annotations
+
+import random
+
+from sqlalchemy import text
+
+from app.services import agent_roster
+from app.services.agent_roster import AgentRegistry
+
+
+def test_index_and_active_split(db_session, make_post, make_agent):
+    session, _ = db_session
+    make_post()
+    a = make_agent(handle="sc_skeptic_1", topics="AI, Climate ,")
+    b = make_agent(handle="sc_poet_1", topics="poetry,climate")
+    c = make_agent(handle="banned", topics="ai", is_shadow_banned=True)
+    make_agent(handle="off", topics="ai", is_enabled=False)
+
+    roster = agent_roster.get_roster(session, 1)
+    assert [r.id for r in roster.enabled] == [a.id, b.id, c.id]
+    assert [r.id for r in roster.active] == [a.id, b.id]
+    assert roster.by_id[a.id].topics == {"ai", "climate"} and roster.by_id[a.id].kind == "skeptic"
+    assert roster.topic_index["climate"] == {a.id, b.id}
+    assert roster.topic_overlap("ai climate policy".split()) == {a.id: 2, b.id: 1}
+
+
+def test_commit_invalidates_and_unchanged_roster_costs_nothing(db_session, make_post, make_agent, query_budget):
+    session, _ = db_session
+    make_post()
+    a = make_agent(handle="one", topics="ai")
+    first = agent_roster.get_roster(session, 1)
+    with query_budget(0):
+        assert agent_roster.get_roster(session, 1) is first
+
+    a.is_shadow_banned = True
+    session.commit()
+    second = agent_roster.get_roster(session, 1)
+    assert second.version == first.version + 1
+    assert second.active == ()
+
+
+def test_stamp_check_sees_other_processes(db_session, make_post, make_agent, query_budget):
+    session, _ = db_session
+    make_post()
+    a = make_agent(handle="one", topics="ai")
+    registry = AgentRegistry(check_seconds=0)
+    first = registry.roster(session, 1)
+
+    with query_budget(1):  # the stamp only
+        assert registry.roster(session, 1) is first
+
+    # another process renamed the agent: this one saw no commit
+    session.execute(text("UPDATE agent_profiles SET handle = 'renamed', updated_at = '2099-01-01 00:00:00' WHERE id = :id"),
+                    {"id": a.id})
+    session.commit()
+    assert registry.roster(session, 1).by_id[a.id].handle == "renamed"
+
+
+def test_pick_agents_ranks_topic_matches_first(db_session, make_post, make_agent):
+    from app.jobs import spawn_loop
+
+    session, _ = db_session
+    post = make_post(title="Climate policy and AI")
+    matched = make_agent(handle="m", topics="climate,ai")
+    half = make_agent(handle="h", topics="policy")
+    others = [make_agent(handle=f"o{i}", topics="cooking") for i in range(6)]
+
+    random.seed(3)
+    picked = spawn_loop.pick_agents_for_post(session, 1, post, 4)
+    assert len(picked) == len(set(picked)) == 4
+    assert {matched.id, half.id} <= set(picked)
+    assert set(picked) <= {matched.id, half.id, *(o.id for o in others)}
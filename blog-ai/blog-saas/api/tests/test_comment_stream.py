@@ -0,0 +1,213 @@
+"""
+Streaming agent reply tests.
+
+Providers are an httpx.MockTransport answering with SSE bodies; the hub
+uses an InMemoryBroker. Covers stream parsing and failover before the
+first chunk, the sync facade, incremental decoding of the "response"
+field, and a human reply arriving as start/delta/done events with the
+comment committed once.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import threading
+
+import httpx
+import pytest
+
+from app.services import human_reply_spawner
+from app.services.comment_stream import CommentStreamHub, ReplyStream
+from app.services.human_reply_spawner import _JsonStringField
+from app.services.live_broker import InMemoryBroker
+from app.services.llm_client import (
+    AsyncLLMClient, CircuitBreaker, LLMClient, LLMProviderError, ProviderConfig, _EngineRuntime,
+)
+
+
+def _provider(name: str) -> ProviderConfig:
+    return ProviderConfig(
+        name=name, base_url=f"https://{name}.test/v1", api_key="k", model=f"{name}-model",
+        max_tokens=64, temperature=0.5, rate_per_sec=1000, burst=1000,
+    )
+
+
+def _sse(*chunks: str) -> httpx.Response:
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': c}}]})}" for c in chunks]
+    body = "\n\n".join([": keepalive", *lines, "data: [DONE]"]) + "\n\n"
+    return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+
+def _engine(handler, monkeypatch) -> AsyncLLMClient:
+    monkeypatch.setenv("LLM_MAX_ATTEMPTS", "1")
+    return AsyncLLMClient(providers=[_provider("groq"), _provider("qwen")], transport=httpx.MockTransport(handler))
+
+
+async def test_stream_fails_over_before_first_chunk(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        if request.url.host == "groq.test":
+            return httpx.Response(503, text="busy")
+        return _sse("Hel", "lo", " there")
+
+    engine = _engine(handler, monkeypatch)
+    assert [c async for c in engine.stream("s", "u")] == ["Hel", "lo", " there"]
+    await engine.aclose()
+
+
+async def test_stream_closed_early_releases_half_open_probe(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_ATTEMPTS", "1")
+    monkeypatch.setenv("LLM_BREAKER_FAILURES", "1")
+    monkeypatch.setenv("LLM_BREAKER_RESET_SECONDS", "0")  # open -> half-open at once
+    up = {"ok": False}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return _sse("a", "b", "c") if up["ok"] else httpx.Response(503)
+
+    engine = AsyncLLMClient(providers=[_provider("qwen")], transport=httpx.MockTransport(handler))
+    with pytest.raises(LLMProviderError):
+        await anext(engine.stream("s", "u"))
+    assert engine.breaker_state("qwen") == CircuitBreaker.HALF_OPEN
+
+    up["ok"] = True
+    probe = engine.stream("s", "u")
+    assert await anext(probe) == "a"
+    await probe.aclose()  # consumer stops early, as LLMClient.stream's cancel does
+
+    assert [c async for c in engine.stream("s", "u")] == ["a", "b", "c"]
+    assert engine.breaker_state("qwen") == CircuitBreaker.CLOSED
+    await engine.aclose()
+
+
+def test_sync_stream_facade(monkeypatch):
+    runtime = _EngineRuntime(lambda: _engine(lambda r: _sse("a", "b", "c"), monkeypatch))
+    assert list(LLMClient(runtime=runtime).stream("s", "u")) == ["a", "b", "c"]
+
+
+def test_json_field_decodes_across_chunk_boundaries():
+    raw = json.dumps({"should_respond": True, "response": 'Say "hi"\nto ünïcode ✓'})
+    field = _JsonStringField("response")
+    out = "".join(field.feed(raw[i:i + 3]) for i in range(0, len(raw), 3))
+    assert out == json.loads(raw)["response"]
+    assert field.closed
+
+
+class StreamingLLM:
+    def __init__(self, reply: dict):
+        self.raw = json.dumps(reply)
+
+    def stream(self, system: str, user: str, **kw):
+        for i in range(0, len(self.raw), 7):
+            yield self.raw[i:i + 7]
+
+
+async def test_human_reply_streams_then_commits(db_session, make_post, make_agent, make_user, monkeypatch):
+    session, _ = db_session
+    from app.models.comment import Comment
+
+    post = make_post(title="Streamed debate")
+    agent = make_agent(handle="streamer")
+    human = make_user(email="h@example.com", username="human")
+    hc = Comment(org_id=1, post_id=post.id, author_type="user", author_user_id=human.id, body="Why though?")
+    session.add(hc)
+    session.commit()
+
+    hub = CommentStreamHub(InMemoryBroker())
+    monkeypatch.setattr(human_reply_spawner.comment_stream, "get_stream_hub", lambda: hub)
+    monkeypatch.setattr(human_reply_spawner.comment_stream, "ENABLED", True)
+    reply = {"should_respond": True, "reasoning": "fair", "response_type": "question",
+             "response": "Because the data says so."}
+    monkeypatch.setattr(human_reply_spawner, "LLMClient", lambda: StreamingLLM(reply))
+
+    events = []
+    async with hub.subscribe(post.id) as q:
+        done = threading.Event()
+
+        def run():
+            try:
+                human_reply_spawner.spawn_agent_replies_to_human(session, 1, post.id, hc.id, [agent.id])
+            finally:
+                done.set()
+
+        threading.Thread(target=run).start()
+        while not (events and events[-1]["type"] == "comment_done"):
+            events.append(await asyncio.wait_for(q.get(), timeout=5))
+    assert done.wait(5)
+
+    types = [e["type"] for e in events]
+    assert types[0] == "comment_start" and types[-1] == "comment_done"
+    assert set(types[1:-1]) <= {"comment_delta"}
+    assert len({e["stream_id"] for e in events}) == 1
+    final = events[-1]["comment"]
+    assert final["body"] == reply["response"] and final["parent_comment_id"] == hc.id
+    assert session.get(Comment, final["id"]).body == reply["response"]
+
+
+def test_retried_human_reply_does_not_answer_twice(db_session, make_post, make_agent, make_user, monkeypatch):
+    session, _ = db_session
+    from app.models.comment import Comment
+
+    post = make_post(title="Retried job")
+    agents = [make_agent(handle=f"retry{i}").id for i in range(3)]
+    human = make_user(email="r@example.com", username="retrier")
+    hc = Comment(org_id=1, post_id=post.id, author_type="user", author_user_id=human.id, body="Sources?")
+    session.add(hc)
+    session.commit()
+
+    monkeypatch.setattr(human_reply_spawner.comment_stream, "ENABLED", False)
+    takes = itertools.count(1)
+
+    class FreshTakeLLM:
+        # a retry gets a different text, so comment_hash can't catch it
+        def chat(self, system: str, user: str, **kw) -> str:
+            return json.dumps({"should_respond": True, "reasoning": "ok", "response_type": "question",
+                               "response": f"take {next(takes)}"})
+
+    monkeypatch.setattr(human_reply_spawner, "LLMClient", FreshTakeLLM)
+
+    first = human_reply_spawner.spawn_agent_replies_to_human(session, 1, post.id, hc.id, agents, max_replies=1)
+    # the job is retried (say the commit of its outcome was lost)
+    again = human_reply_spawner.spawn_agent_replies_to_human(session, 1, post.id, hc.id, agents, max_replies=1)
+
+    assert len(first) == 1 and again == []
+    assert session.query(Comment).filter(Comment.parent_comment_id == hc.id).count() == 1
+
+
+async def test_declined_reply_is_aborted():
+    hub = CommentStreamHub(InMemoryBroker())
+    async with hub.subscribe(7) as q:
+        quiet = ReplyStream(hub, 7, agent_id=1)
+        quiet.abort("declined")  # nothing streamed: nothing to retract
+        loud = ReplyStream(hub, 7, agent_id=2, flush_ms=0)
+        loud.write("Actually")
+        loud.abort("declined")
+        got = [await asyncio.wait_for(q.get(), timeout=5) for _ in range(3)]
+    assert [e["type"] for e in got] == ["comment_start", "comment_delta", "comment_abort"]
+    assert {e["stream_id"] for e in got} == {loud.stream_id}
+    assert hub.subscribers(7) == 0
+
+
+async def test_sse_endpoint_formats_events(client, monkeypatch):
+    from app.api.v1 import comments
+
+    assert client.get("/api/v1/orgs/1/posts/999/comments/stream").status_code == 404
+
+    hub = CommentStreamHub(InMemoryBroker())
+    monkeypatch.setattr(comments, "get_stream_hub", lambda: hub)
+
+    class Request:
+        polls = 0
+
+        async def is_disconnected(self):
+            self.polls += 1
+            return self.polls > 3
+
+    gen = comments._sse_events(Request(), 5, keepalive=0.05)
+    assert await gen.__anext__() == ": connected\n\n"
+    hub.publish(5, {"type": "comment_delta", "stream_id": "s", "text": "hé"})
+    frame = await gen.__anext__()
+    assert frame.startswith("event: comment_delta\ndata: ") and '"text": "hé"' in frame
+    assert await gen.__anext__() == ": ping\n\n"
+    assert [f async for f in gen] == [": ping\n\n"]
+    assert hub.subscribers(5) == 0
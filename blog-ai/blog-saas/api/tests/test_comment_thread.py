@@ -0,0 +1,85 @@
+"""
+Threaded comment endpoint tests.
+
+Builds a small debate tree and checks the page shape (roots, first K
+replies, depth cap), that the "more replies" cursors expand exactly the
+remaining siblings, root paging, and that authors and vote counts are
+attached to nested replies too.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from app.models.comment import Comment
+
+_T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _tree(session, post_id, user_id):
+    """r0 has replies a0..a3; a0 has b0 -> c0 -> d0; r1, r2 are bare."""
+    minute = iter(range(1000))
+
+    def add(body, parent=None, **kw):
+        c = Comment(org_id=1, post_id=post_id, body=body, parent_comment_id=parent.id if parent else None,
+                    created_at=_T0 + timedelta(minutes=next(minute)), **kw)
+        session.add(c)
+        session.commit()
+        return c
+
+    r0 = add("r0", author_type="user", author_user_id=user_id)
+    a = [add(f"a{i}", r0) for i in range(4)]
+    b0 = add("b0", a[0], author_type="user", author_user_id=user_id)
+    c0 = add("c0", b0)
+    add("d0", c0)
+    add("r1")
+    add("r2")
+
+
+def _url(post_id):
+    return f"/api/v1/orgs/1/posts/{post_id}/comments/thread"
+
+
+def test_thread_page_shape_and_expand(client, db_session, make_post, make_user):
+    session, _ = db_session
+    user = make_user()
+    post = make_post()
+    _tree(session, post.id, user.id)
+
+    r = client.get(_url(post.id), params={"roots": 2, "replies": 2, "depth": 2})
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert [c["body"] for c in data["comments"]] == ["r0", "r1"]
+    r0 = data["comments"][0]
+    assert r0["author_username"] == user.username
+    assert [c["body"] for c in r0["replies"]] == ["a0", "a1"]
+    assert r0["more_replies"] and r0["replies_cursor"]
+
+    b0 = r0["replies"][0]["replies"][0]
+    assert b0["body"] == "b0" and b0["author_username"] == user.username
+    # depth cap: c0 exists but isn't loaded, b0 says so without a cursor
+    assert b0["replies"] == [] and b0["more_replies"] and b0["replies_cursor"] is None
+    assert r0["replies"][1]["more_replies"] is False
+
+    r = client.get(_url(post.id), params={"parent_id": r0["id"], "cursor": r0["replies_cursor"], "replies": 2})
+    assert [c["body"] for c in r.json()["comments"]] == ["a2", "a3"]
+    assert r.json()["next_cursor"] is None
+
+    r = client.get(_url(post.id), params={"roots": 2, "cursor": data["next_cursor"]})
+    assert [c["body"] for c in r.json()["comments"]] == ["r2"]
+    assert r.json()["next_cursor"] is None
+
+
+def test_thread_votes_and_unknown_parent(client, db_session, make_post, make_user, auth_header):
+    session, _ = db_session
+    user = make_user()
+    post = make_post()
+    _tree(session, post.id, user.id)
+    a1 = session.query(Comment).filter_by(body="a1").one()
+    r = client.post(f"/api/v1/orgs/1/posts/{post.id}/comments/{a1.id}/vote", json={"value": 1},
+                    headers=auth_header(user.id))
+    assert r.status_code == 200
+
+    r0 = client.get(_url(post.id)).json()["comments"][0]
+    assert [(c["body"], c["upvotes"]) for c in r0["replies"]] == [("a0", 0), ("a1", 1), ("a2", 0)]
+
+    assert client.get(_url(post.id), params={"parent_id": 99999}).status_code == 404
@@ -0,0 +1,127 @@
+"""
+Debate context store tests.
+
+The summarizer is stubbed. Covers the digest cached per version of the
+post, the summary folded only once SUMMARY_EVERY comments are pending and
+stored only when the caller commits, and debate prompts carrying the
+digest instead of the raw body.
+"""
+from __future__ import annotations
+
+import itertools
+
+import pytest
+
+from app.models.comment import Comment
+from app.models.post_context import PostContext
+from app.services import comment_spawner, debate_context
+from app.services.comment_spawner import spawn_debate_for_post
+from app.services.debate_context import context_for
+
+LONG_BODY = "Tabs are better because of accessibility. " * 80
+
+
+@pytest.fixture()
+def summarizer(monkeypatch):
+    calls = []
+
+    def _summarize(system: str, user: str) -> str:
+        calls.append(user)
+        kind = "digest" if user.startswith("Condense") else "summary"
+        return f"{kind} {len(calls)}"
+
+    monkeypatch.setattr(debate_context.store, "summarize", _summarize)
+    return calls
+
+
+def _comment(session, post, agent_id, body):
+    c = Comment(org_id=post.org_id, post_id=post.id, author_type="agent", author_agent_id=agent_id, body=body)
+    session.add(c)
+    session.commit()
+    return c
+
+
+def test_digest_is_made_once_per_version_of_the_post(db_session, make_post, summarizer):
+    session, _ = db_session
+    post = make_post(body_md=LONG_BODY)
+
+    assert context_for(session, post, 6).digest == "digest 1"
+    assert context_for(session, post, 6).digest == "digest 1"
+    assert len(summarizer) == 1
+
+    post.body_md = LONG_BODY + " Edited."
+    session.commit()
+    assert context_for(session, post, 6).digest == "digest 2"
+    # short posts go in as they are
+    assert context_for(session, make_post(body_md="Short take."), 6).digest == "Short take."
+    assert len(summarizer) == 2
+
+
+def test_summary_folds_only_every_n_comments(db_session, make_post, make_agent, summarizer):
+    session, _ = db_session
+    post = make_post(body_md="Short take.")
+    agent = make_agent(handle="ctx_a")
+    every, keep = debate_context.SUMMARY_EVERY, debate_context.KEEP_VERBATIM
+
+    made = [_comment(session, post, agent.id, f"c{i}") for i in range(every - 1)]
+    ctx = context_for(session, post, 10)
+    assert (ctx.summary, [c.body for c in ctx.tail]) == ("", [c.body for c in made])
+    assert summarizer == []
+
+    made.append(_comment(session, post, agent.id, f"c{every - 1}"))
+    ctx = context_for(session, post, 10)
+    assert ctx.summary == "summary 1" and [c.body for c in ctx.tail] == [c.body for c in made[-keep:]]
+    assert all(f"] c{i}" in summarizer[0] for i in range(every - keep))
+    # stored once the caller's transaction commits
+    assert session.get(PostContext, post.id) is None
+    session.commit()
+    row = session.get(PostContext, post.id)
+    assert (row.summarized_through_id, row.summarized_comments) == (made[-keep - 1].id, every - keep)
+
+    # the next comments ride verbatim until another batch is pending
+    _comment(session, post, agent.id, "later")
+    ctx = context_for(session, post, 2)
+    assert ctx.summary == "summary 1" and [c.body for c in ctx.tail] == [made[-1].body, "later"]
+    assert len(summarizer) == 1
+
+
+def test_fold_over_a_rolled_back_round_is_dropped(db_session, make_post, make_agent, summarizer):
+    session, _ = db_session
+    post = make_post(body_md="Short take.")
+    agent = make_agent(handle="ctx_rb")
+    for i in range(debate_context.SUMMARY_EVERY):
+        session.add(Comment(org_id=post.org_id, post_id=post.id, author_type="agent",
+                            author_agent_id=agent.id, body=f"c{i}"))
+    session.flush()  # a round in flight
+
+    assert context_for(session, post, 2).summary == "summary 1"
+    assert context_for(session, post, 2).summary == "summary 1"  # staged, not folded again
+    assert len(summarizer) == 1
+    session.rollback()
+    session.commit()
+
+    assert session.get(PostContext, post.id) is None
+    assert context_for(session, post, 2) == debate_context.DebateContext("Short take.", "", [])
+
+
+def test_debate_prompts_send_digest_not_body(db_session, make_post, make_agent, summarizer, monkeypatch):
+    session, _ = db_session
+    prompts = []
+    seq = itertools.count(1)
+
+    def _body(system: str, user: str) -> str:
+        prompts.append(user)
+        return f"take {next(seq)}"
+
+    monkeypatch.setattr(comment_spawner, "_generate_comment_body", _body)
+    post = make_post(title="Tabs or spaces", body_md=LONG_BODY)
+    ids = [make_agent(handle=f"ctx{i}").id for i in range(4)]
+
+    spawn_debate_for_post(session, 1, post.id, ids, rounds=2)
+
+    assert len(prompts) == 8
+    assert all("digest 1" in p and LONG_BODY[:200] not in p for p in prompts)
+    assert all(len(p) < len(LONG_BODY) / 2 for p in prompts)
+    # one digest, one fold once six comments were pending
+    assert [u.split()[0] for u in summarizer] == ["Condense", "POST:"]
+    assert "DEBATE_SO_FAR: summary 2" in prompts[-1]
@@ -0,0 +1,103 @@
+"""
+Materialized engagement counter tests.
+
+The feed endpoints read comment / vote / save counts from post_stats and
+comment_stats instead of aggregating the source tables, so the write paths
+must keep them exact — including toggles (vote twice = remove) and vote
+flips (+1 → -1). reconcile_counters() is the safety net for anything that
+bypasses the write hooks.
+"""
+from __future__ import annotations
+
+from app.models.comment import Comment
+from app.models.post_stats import CommentStats, PostStats
+from app.services.engagement_counters import reconcile_counters
+
+
+COMMENTS_PATH = "/api/v1/orgs/{org}/posts/{post}/comments"
+VOTE_PATH = "/api/v1/orgs/{org}/posts/{post}/comments/{comment}/vote"
+SAVE_PATH = "/api/v1/posts/{post}/save"
+
+
+def _post_stats(session, post_id):
+    session.expire_all()
+    return session.get(PostStats, post_id)
+
+
+def test_create_comment_bumps_comment_and_human_counts(client, db_session, make_user, make_post, auth_header):
+    session, _ = db_session
+    user = make_user()
+    post = make_post()
+
+    for body in ("first take", "second take"):
+        resp = client.post(COMMENTS_PATH.format(org=1, post=post.id), json={"body": body}, headers=auth_header(user.id))
+        assert resp.status_code == 200
+
+    st = _post_stats(session, post.id)
+    assert st.comment_count == 2
+    assert st.human_comment_count == 2
+
+
+def test_comment_vote_add_flip_and_toggle(client, db_session, make_user, make_post, auth_header):
+    session, _ = db_session
+    author = make_user(email="a@example.com", username="a")
+    voter = make_user(email="v@example.com", username="v")
+    post = make_post()
+    c = client.post(COMMENTS_PATH.format(org=1, post=post.id), json={"body": "hello"}, headers=auth_header(author.id)).json()
+    path = VOTE_PATH.format(org=1, post=post.id, comment=c["id"])
+
+    assert client.post(path, json={"value": 1}, headers=auth_header(voter.id)).json()["upvotes"] == 1
+    assert _post_stats(session, post.id).comment_upvotes == 1
+
+    body = client.post(path, json={"value": -1}, headers=auth_header(voter.id)).json()
+    assert (body["upvotes"], body["downvotes"]) == (0, 1)
+    assert _post_stats(session, post.id).comment_upvotes == 0
+
+    body = client.post(path, json={"value": -1}, headers=auth_header(voter.id)).json()
+    assert body["action"] == "removed"
+    assert (body["upvotes"], body["downvotes"]) == (0, 0)
+
+    listed = client.get(COMMENTS_PATH.format(org=1, post=post.id)).json()["comments"]
+    assert (listed[0]["upvotes"], listed[0]["downvotes"]) == (0, 0)
+
+
+def test_save_toggle_tracks_saves(client, db_session, make_user, make_post, auth_header):
+    session, _ = db_session
+    user = make_user()
+    post = make_post()
+
+    assert client.post(SAVE_PATH.format(post=post.id), headers=auth_header(user.id)).json() == {"saved": True}
+    assert _post_stats(session, post.id).saves == 1
+    assert client.post(SAVE_PATH.format(post=post.id), headers=auth_header(user.id)).json() == {"saved": False}
+    assert _post_stats(session, post.id).saves == 0
+
+
+def test_save_unknown_post_returns_404(client, make_user, auth_header):
+    user = make_user()
+    assert client.post(SAVE_PATH.format(post=999), headers=auth_header(user.id)).status_code == 404
+
+
+def test_reconcile_repairs_drift(db_session, make_post):
+    """Comments inserted behind the hooks' back (and a stale counter) are
+    fixed by the reconciliation pass; a second pass finds nothing to do."""
+    session, _ = db_session
+    post = make_post()
+    session.add_all([
+        Comment(org_id=1, post_id=post.id, author_type="agent", author_agent_id=1, body="x", status="published"),
+        Comment(org_id=1, post_id=post.id, author_type="user", author_user_id=1, body="y", status="published"),
+        Comment(org_id=1, post_id=post.id, author_type="agent", author_agent_id=2, body="z", status="rejected"),
+    ])
+    session.add(CommentStats(comment_id=12345, post_id=post.id, upvotes=7, downvotes=0))
+    session.commit()
+
+    result = reconcile_counters(session)
+    assert result["posts_repaired"] == 1
+    assert result["comments_repaired"] == 1
+
+    st = _post_stats(session, post.id)
+    assert (st.comment_count, st.human_comment_count) == (2, 1)
+    assert session.get(CommentStats, 12345).upvotes == 0
+
+    again = reconcile_counters(session)
+    assert again["posts_repaired"] == 0
+    assert again["comments_repaired"] == 0
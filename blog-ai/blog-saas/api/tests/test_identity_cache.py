@@ -0,0 +1,87 @@
+"""
+Identity cache tests.
+
+Repeat lookups of the caller's user / membership / org plan are served
+from the in-process cache without SQL, come back attached to the calling
+session (so they can still be modified), and ORM commits that touch a
+User, OrgMember or Org drop the stale entries.
+"""
+from __future__ import annotations
+
+from sqlalchemy import event
+
+from app.core import identity
+from app.core.plan_enforcement import get_user_org_plan
+from app.models.org import Org
+from app.models.org_member import OrgMember
+from app.models.plan import Plan
+
+
+class _Counter:
+    def __init__(self, engine):
+        self.n = 0
+        event.listen(engine, "before_cursor_execute", self._hit)
+
+    def _hit(self, *args, **kwargs):
+        self.n += 1
+
+
+def test_user_cached_until_committed_change(db_session, make_user):
+    session, SessionFactory = db_session
+    user = make_user()
+    first = SessionFactory()
+    assert identity.get_user(first, user.id).username == "user"
+
+    counter = _Counter(session.get_bind())
+    second = SessionFactory()
+    cached = identity.get_user(second, user.id)
+    assert counter.n == 0
+    assert cached in second
+
+    # the snapshot is attached, so edits persist and invalidate the entry
+    cached.display_name = "Renamed"
+    second.commit()
+    third = SessionFactory()
+    assert identity.get_user(third, user.id).display_name == "Renamed"
+    assert counter.n > 0
+    for s in (first, second, third):
+        s.close()
+
+
+def test_org_plan_follows_billing_change(db_session, make_user):
+    session, SessionFactory = db_session
+    session.add_all([
+        Plan(id=1, name="free", max_agents=0),
+        Plan(id=2, name="creator", max_agents=3),
+    ])
+    user = make_user()
+    session.add(Org(id=7, name="Acme", slug="acme", plan_id=1))
+    session.commit()
+    session.add(OrgMember(org_id=7, user_id=user.id, role="owner"))
+    session.commit()
+
+    req = SessionFactory()
+    assert get_user_org_plan(req, user.id)[1].name == "free"
+    counter = _Counter(session.get_bind())
+    assert get_user_org_plan(req, user.id)[1].name == "free"
+    assert identity.get_membership(req, 7, user.id).role == "owner"
+    assert counter.n == 1  # membership by org was the only miss
+
+    org = session.get(Org, 7)
+    org.plan_id = 2
+    session.commit()
+    assert get_user_org_plan(SessionFactory(), user.id)[1].name == "creator"
+
+
+def test_role_check_sees_membership_change(client, db_session, make_user, auth_header):
+    session, _ = db_session
+    user = make_user()
+    r = client.get("/api/v1/orgs/1", headers=auth_header(user.id))
+    assert r.status_code == 403
+
+    session.add(Org(id=1, name="org1", slug="org1"))
+    session.commit()
+    session.add(OrgMember(org_id=1, user_id=user.id, role="viewer"))
+    session.commit()
+    r = client.get("/api/v1/orgs/1", headers=auth_header(user.id))
+    assert r.status_code == 200 and r.json()["slug"] == "org1"
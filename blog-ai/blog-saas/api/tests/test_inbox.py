@@ -0,0 +1,86 @@
+"""
+Direct-message inbox tests.
+
+The per-participant unread counters must follow sends and reads, the inbox
+must be one query whatever the number of conversations (query_budget), page
+by activity, and reconcile_unread() must repair counters for messages
+written around the helpers.
+"""
+from __future__ import annotations
+
+from app.models.message import Conversation, Message
+from app.services import inbox
+
+
+def _conversations(session, me, others):
+    convs = []
+    for other in others:
+        conv = Conversation(user1_id=min(me.id, other.id), user2_id=max(me.id, other.id))
+        session.add(conv)
+        session.commit()
+        convs.append(conv)
+    return convs
+
+
+def test_counters_follow_sends_and_reads(client, db_session, make_user, auth_header):
+    session, _ = db_session
+    me = make_user()
+    other = make_user(email="o@example.com", username="other")
+    (conv,) = _conversations(session, me, [other])
+
+    for body in ("hi", "you there?", "hello??"):
+        inbox.record_message(session, conv, other.id, body)
+    inbox.record_message(session, conv, me.id, "yes")
+    session.commit()
+
+    assert client.get("/api/v1/messages/unread-count", headers=auth_header(me.id)).json() == {"unread": 3}
+    assert client.get("/api/v1/messages/unread-count", headers=auth_header(other.id)).json() == {"unread": 1}
+    listed = client.get("/api/v1/messages/conversations", headers=auth_header(me.id)).json()
+    assert [(c["other_user"]["username"], c["unread"], c["last_message_preview"]) for c in listed] == [
+        ("other", 3, "yes"),
+    ]
+
+    r = client.get(f"/api/v1/messages/conversations/{conv.id}/messages", params={"limit": 2}, headers=auth_header(me.id))
+    assert [m["body"] for m in r.json()] == ["hello??", "yes"]
+    assert client.get("/api/v1/messages/unread-count", headers=auth_header(me.id)).json() == {"unread": 2}
+    session.expire_all()
+    newest = session.query(Message).filter_by(body="hello??").one()
+    assert conv.user1_id == me.id and conv.user1_last_read_id == newest.id
+
+    client.get(f"/api/v1/messages/conversations/{conv.id}/messages", headers=auth_header(me.id))
+    assert client.get("/api/v1/messages/unread-count", headers=auth_header(me.id)).json() == {"unread": 0}
+
+
+def test_inbox_is_one_query_and_pages_by_activity(client, db_session, make_user, auth_header, query_budget):
+    session, _ = db_session
+    me = make_user()
+    others = [make_user(email=f"o{i}@example.com", username=f"o{i}") for i in range(5)]
+    convs = _conversations(session, me, others)
+    for conv, other in zip(convs, others):
+        inbox.record_message(session, conv, other.id, f"from {other.username}")
+        session.commit()
+
+    headers = auth_header(me.id)
+    with query_budget(2, max_repeats=1):  # the current user, then the inbox
+        r = client.get("/api/v1/messages/conversations", params={"limit": 3}, headers=headers)
+    assert [c["other_user"]["username"] for c in r.json()] == ["o4", "o3", "o2"]
+    r = client.get("/api/v1/messages/conversations", params={"limit": 3, "cursor": r.headers["X-Next-Cursor"]},
+                   headers=headers)
+    assert [c["other_user"]["username"] for c in r.json()] == ["o1", "o0"]
+    assert "X-Next-Cursor" not in r.headers
+
+
+def test_reconcile_repairs_drift(db_session, make_user):
+    session, _ = db_session
+    me = make_user()
+    other = make_user(email="o@example.com", username="other")
+    (conv,) = _conversations(session, me, [other])
+    # written around record_message: the counters never saw these
+    session.add_all([Message(conversation_id=conv.id, sender_id=other.id, body=f"m{i}") for i in range(2)])
+    session.add(Message(conversation_id=conv.id, sender_id=me.id, body="read one", read=True))
+    session.commit()
+
+    assert inbox.unread_total(session, me.id) == 0
+    assert inbox.reconcile_unread(session) == {"checked": 1, "repaired": 1}
+    assert (inbox.unread_total(session, me.id), inbox.unread_total(session, other.id)) == (2, 0)
+    assert inbox.reconcile_unread(session)["repaired"] == 0
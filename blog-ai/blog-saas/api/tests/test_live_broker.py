@@ -0,0 +1,157 @@
+"""
+Live room fan-out tests.
+
+Covers the hub (local fan-out, dead-socket cleanup, block cache), the
+Postgres broker's own-notification filtering (without a live Postgres —
+notifications are fed in directly), that join requests / blocks /
+leases go through the shared tables so every worker sees them, and that
+the AI commenter moves to another process once the lease is released.
+
+Out of scope: an actual LISTEN/NOTIFY round-trip.
+"""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.models.live_room import LiveRoomBlock
+from app.models.live_stream import LiveStream  # noqa: F401  (registers live_streams)
+from app.services import live_rooms
+from app.services.live_broker import InMemoryBroker, LiveBroker, LiveHub, PostgresBroker
+
+
+class FakeSocket:
+    def __init__(self, fail: bool = False):
+        self.sent: list[dict] = []
+        self.fail = fail
+
+    async def send_text(self, text: str) -> None:
+        if self.fail:
+            raise RuntimeError("gone")
+        self.sent.append(json.loads(text))
+
+
+async def test_hub_fans_out_and_drops_dead_sockets(db_session):
+    _, SessionFactory = db_session
+    hub = LiveHub(InMemoryBroker(), session_factory=SessionFactory)
+    a, b, dead, other = FakeSocket(), FakeSocket(), FakeSocket(fail=True), FakeSocket()
+    assert await hub.connect("r1", a) is True
+    assert await hub.connect("r1", b) is False
+    await hub.connect("r1", dead)
+    await hub.connect("r2", other)
+
+    await hub.broadcast("r1", {"type": "chat", "message": "hi"})
+    await hub.drain("r1")
+    assert a.sent == b.sent == [{"type": "chat", "message": "hi"}]
+    assert other.sent == []
+    assert dead not in hub.connections("r1")
+
+    await hub.broadcast("r1", {"type": "stream_ended"})
+    assert not hub.has_connections("r1")
+
+
+async def test_hub_block_cache_loads_from_db_and_follows_broadcasts(db_session):
+    session, SessionFactory = db_session
+    live_rooms.block_user(session, "r1", "troll")
+    hub = LiveHub(InMemoryBroker(), session_factory=SessionFactory)
+    await hub.connect("r1", FakeSocket())
+    assert hub.is_blocked("r1", "troll")
+    assert not hub.is_blocked("r1", "spammer")
+
+    await hub.broadcast("r1", {"type": "blocked", "username": "spammer"})
+    assert hub.is_blocked("r1", "spammer")
+
+
+async def test_postgres_broker_skips_own_notifications():
+    got = []
+
+    async def deliver(room, kind, text):
+        got.append((room, kind, json.loads(text)))
+
+    broker = PostgresBroker("postgresql://unused/db", node_id="me")
+    broker._deliver = deliver
+    text = json.dumps({"type": "gift"})
+    await broker._on_notify(json.dumps({"r": "r1", "k": "gift", "t": text, "o": "me"}))
+    await broker._on_notify(json.dumps({"r": "r1", "k": "gift", "t": text, "o": "other-node"}))
+    await broker._on_notify("not json")
+    assert got == [("r1", "gift", {"type": "gift"})]
+
+
+def test_join_requests_and_blocks_are_shared(client, db_session, make_user, make_stream, auth_header):
+    session, _ = db_session
+    host = make_user(email="h@example.com", username="host")
+    viewer = make_user(email="v@example.com", username="viewer")
+    make_stream("room1", host_user_id=host.id)
+
+    r = client.post("/api/v1/live/room1/request-join", headers=auth_header(viewer.id))
+    assert r.status_code == 200
+    r = client.get("/api/v1/live/room1/join-requests", headers=auth_header(host.id))
+    assert [x["username"] for x in r.json()["requests"]] == ["viewer"]
+
+    r = client.post("/api/v1/live/room1/accept-join", json={"username": "viewer", "accept": False},
+                    headers=auth_header(host.id))
+    assert r.status_code == 200
+    assert client.get("/api/v1/live/room1/join-requests", headers=auth_header(host.id)).json()["requests"] == []
+
+    r = client.post("/api/v1/live/room1/block", json={"username": "viewer"}, headers=auth_header(host.id))
+    assert r.status_code == 200
+    assert session.query(LiveRoomBlock).filter_by(room_name="room1", username="viewer").count() == 1
+
+
+def test_lease_has_a_single_owner(db_session):
+    session, _ = db_session
+    assert live_rooms.claim_lease(session, "r1", "ai_agents", "a", 60)
+    assert not live_rooms.claim_lease(session, "r1", "ai_agents", "b", 60)
+    assert live_rooms.claim_lease(session, "r1", "ai_agents", "a", 60)
+    live_rooms.release_lease(session, "r1", "ai_agents", "a")
+    assert live_rooms.claim_lease(session, "r1", "ai_agents", "b", 60)
+
+
+def test_broker_is_abstract():
+    with pytest.raises(TypeError):
+        LiveBroker()
+
+
+async def test_ai_loop_takes_over_a_released_lease(db_session, make_user, make_stream, make_agent, monkeypatch):
+    session, SessionFactory = db_session
+    from app.api.v1 import live
+    from app.services import llm_client
+
+    host = make_user(email="host@example.com", username="host")
+    make_stream("room-ai", host.id)
+    make_agent(handle="commenter")
+    assert live_rooms.claim_lease(session, "room-ai", live.AI_LIVE_LEASE, "other-node", 600)
+
+    class OneViewerHub:
+        # the loop checks twice per round; the holder lets go after round one
+        def __init__(self):
+            self.checks, self.sent = 0, []
+
+        def has_connections(self, room):
+            self.checks += 1
+            if self.checks == 4:
+                live_rooms.release_lease(session, room, live.AI_LIVE_LEASE, "other-node")
+            return self.checks <= 6
+
+        async def broadcast(self, room, message):
+            self.sent.append((self.checks, message["message"]))
+
+    class FakeLLM:
+        async def achat(self, system, user, **kw):
+            return "nice stream"
+
+    hub = OneViewerHub()
+    monkeypatch.setattr(live, "get_hub", lambda: hub)
+    monkeypatch.setattr(live, "SessionLocal", SessionFactory)
+    monkeypatch.setattr(live, "get_chat_writer", lambda: type("W", (), {"add": lambda self, row: None})())
+    monkeypatch.setattr(llm_client, "LLMClient", FakeLLM)
+    monkeypatch.setattr(live, "AI_LIVE_INITIAL_DELAY_SEC", 0)
+    monkeypatch.setattr(live, "AI_LIVE_INTERVAL_SEC", 0)
+
+    await live._ai_agent_loop("room-ai")
+
+    # round one: the other node holds the lease; rounds two and three: ours
+    assert hub.sent == [(4, "nice stream"), (6, "nice stream")]
+    # and it let go once its viewers were gone
+    assert live_rooms.claim_lease(session, "room-ai", live.AI_LIVE_LEASE, "third-node", 60)
@@ -0,0 +1,123 @@
+"""
+Live chat write-path tests.
+
+Covers batched persistence (rows buffered and written together, kept on a
+failed write), the per-sender rate limiter and its key (the account, never
+a client-supplied name), and slow-consumer handling of
+the per-socket send queues — a stalled socket neither delays the rest of
+the room nor grows without bound.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+
+from sqlalchemy import text
+
+from app.services.live_broker import InMemoryBroker, LiveConnection, LiveHub
+from app.services.live_chat import ChatRateLimiter, ChatWriter, chat_row
+
+
+def _create_live_chat(session) -> None:
+    # live_chat has no ORM model
+    session.execute(text(
+        "CREATE TABLE live_chat (id INTEGER PRIMARY KEY, room_name TEXT, user_id INTEGER, username TEXT, "
+        "display_name TEXT, message TEXT, is_agent BOOLEAN DEFAULT 0, agent_name TEXT, "
+        "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    session.commit()
+
+
+async def test_writer_batches_rows_and_keeps_them_on_failure(db_session):
+    session, SessionFactory = db_session
+    writer = ChatWriter(session_factory=SessionFactory, flush_ms=60_000, flush_batch=1000)
+    for i in range(3):
+        writer.add(chat_row("r1", f"m{i}", username="u"))
+    writer.add(chat_row("r1", "bot says", is_agent=True, agent_name="Bot"))
+
+    # table missing -> write fails, rows stay buffered
+    assert await writer.flush() == 0
+    _create_live_chat(session)
+    assert await writer.flush() == 4
+    rows = session.execute(text("SELECT message, is_agent FROM live_chat ORDER BY id")).fetchall()
+    assert [r[0] for r in rows] == ["m0", "m1", "m2", "bot says"]
+    assert [bool(r[1]) for r in rows] == [False, False, False, True]
+    await writer.close()
+
+
+async def test_writer_flushes_when_batch_fills(db_session):
+    session, SessionFactory = db_session
+    _create_live_chat(session)
+    writer = ChatWriter(session_factory=SessionFactory, flush_ms=60_000, flush_batch=2)
+    writer.add(chat_row("r1", "a"))
+    writer.add(chat_row("r1", "b"))
+    for _ in range(50):
+        await asyncio.sleep(0.01)
+        if session.execute(text("SELECT COUNT(*) FROM live_chat")).scalar() == 2:
+            break
+    assert session.execute(text("SELECT COUNT(*) FROM live_chat")).scalar() == 2
+    await writer.close()
+
+
+def test_rate_limiter_allows_bursts_then_refills():
+    now = [0.0]
+    limiter = ChatRateLimiter(rate=1.0, burst=3, clock=lambda: now[0])
+    assert [limiter.allow("u") for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow("other")
+    now[0] += 1.0
+    assert limiter.allow("u")
+    assert not limiter.allow("u")
+
+
+def test_chat_limit_keys_on_the_account_not_the_message(auth_header, make_user):
+    from app.api.v1.live import _chat_sender_key
+
+    user = make_user(email="chat@example.com", username="chatter")
+    token = auth_header(user.id)["Authorization"].split()[1]
+    ws_a, ws_b = object(), object()
+
+    # two sockets of one account share a bucket, whatever name they send
+    assert _chat_sender_key(token, ws_a) == _chat_sender_key(token, ws_b) == ("user", user.id)
+    # anonymous or forged tokens are limited per socket
+    assert _chat_sender_key(None, ws_a) == ("ws", id(ws_a))
+    assert _chat_sender_key("forged", ws_b) == ("ws", id(ws_b))
+
+
+class StalledSocket:
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.closed_with = None
+
+    async def send_text(self, text: str) -> None:
+        await self.release.wait()
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+
+class FastSocket:
+    def __init__(self):
+        self.sent: list[dict] = []
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+
+async def test_slow_socket_does_not_delay_room_and_gets_disconnected():
+    hub = LiveHub(InMemoryBroker(), session_factory=lambda: None)
+    hub._load_blocked = lambda room: set()
+    slow, fast = StalledSocket(), FastSocket()
+    await hub.connect("r1", slow)
+    await hub.connect("r1", fast)
+    # tighter limits for the slow one
+    hub._rooms["r1"][slow].close()
+    hub._rooms["r1"][slow] = LiveConnection(
+        slow, on_close=lambda c: hub._forget("r1", c), maxsize=2, max_drops=3,
+    )
+
+    for i in range(10):
+        await asyncio.wait_for(hub.broadcast("r1", {"type": "chat", "message": str(i)}), 0.5)
+    await asyncio.sleep(0)
+    assert [m["message"] for m in fast.sent] == [str(i) for i in range(10)]
+    assert slow not in hub.connections("r1")
+    assert slow.closed_with == 1013
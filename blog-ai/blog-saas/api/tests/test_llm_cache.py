@@ -0,0 +1,107 @@
+"""
+LLM response cache tests.
+
+Providers are an httpx.MockTransport that counts upstream calls. Covers
+single-flight coalescing of concurrent identical prompts, the shared
+llm_cache table surviving a fresh process-level cache, a waiter taking
+over when the leader is cancelled, what is part of the key, and that
+calls without a cache policy always go upstream.
+"""
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from app.models.llm_cache_entry import LLMCacheEntry
+from app.services.llm_cache import LLMCache
+from app.services.llm_client import AsyncLLMClient, ProviderConfig
+
+
+def _provider(name: str) -> ProviderConfig:
+    return ProviderConfig(
+        name=name, base_url=f"https://{name}.test/v1", api_key="k", model=f"{name}-model",
+        max_tokens=64, temperature=0.5, rate_per_sec=1000, burst=1000,
+    )
+
+
+class Upstream:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        return httpx.Response(200, json={"choices": [{"message": {"content": f"answer {self.calls}"}}]})
+
+
+def _engine(upstream, cache) -> AsyncLLMClient:
+    return AsyncLLMClient(providers=[_provider("groq")], transport=httpx.MockTransport(upstream), cache=cache)
+
+
+async def test_concurrent_identical_prompts_make_one_call(db_session):
+    _, SessionFactory = db_session
+    upstream = Upstream()
+    engine = _engine(upstream, LLMCache(session_factory=SessionFactory))
+
+    results = await asyncio.gather(*(engine.complete("sys", "same text", cache="moderation") for _ in range(5)))
+    assert upstream.calls == 1
+    assert {r.text for r in results} == {"answer 1"}
+    assert sorted(r.cached for r in results) == [False, True, True, True, True]
+
+    again = await engine.complete("sys", "same text", cache="moderation")
+    assert again.cached and upstream.calls == 1
+    await engine.aclose()
+
+
+async def test_cancelled_leader_hands_the_call_to_a_waiter(db_session):
+    _, SessionFactory = db_session
+    upstream = Upstream()
+    engine = _engine(upstream, LLMCache(session_factory=SessionFactory))
+
+    leader = asyncio.create_task(engine.complete("sys", "same text", cache="moderation"))
+    while upstream.calls == 0:  # wait for the leader to be upstream
+        await asyncio.sleep(0.001)
+    waiters = [asyncio.create_task(engine.complete("sys", "same text", cache="moderation")) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    results = await asyncio.gather(*waiters)
+    assert leader.cancelled()
+    assert {r.text for r in results} == {"answer 2"}  # one retry, shared
+    assert sorted(r.cached for r in results) == [False, True, True]
+    assert upstream.calls == 2
+    await engine.aclose()
+
+
+async def test_table_tier_is_shared_and_key_covers_parameters(db_session):
+    session, SessionFactory = db_session
+    upstream = Upstream()
+    first = _engine(upstream, LLMCache(session_factory=SessionFactory))
+    await first.complete("sys", "post body", cache="moderation")
+    assert session.query(LLMCacheEntry).count() == 1
+
+    # another worker: cold memory tier, same table
+    second = _engine(upstream, LLMCache(session_factory=SessionFactory))
+    resp = await second.complete("sys", "post body", cache="moderation")
+    assert resp.cached and resp.text == "answer 1" and resp.provider == "groq"
+    assert upstream.calls == 1
+
+    await second.complete("sys", "post body", temperature=0.0, cache="moderation")
+    await second.complete("other sys", "post body", cache="moderation")
+    assert upstream.calls == 3
+    await first.aclose()
+    await second.aclose()
+
+
+async def test_uncached_calls_always_go_upstream(db_session, monkeypatch):
+    _, SessionFactory = db_session
+    upstream = Upstream()
+    engine = _engine(upstream, LLMCache(session_factory=SessionFactory))
+    await engine.complete("sys", "write a comment")
+    await engine.complete("sys", "write a comment")
+    monkeypatch.setenv("LLM_CACHE_TTL_MODERATION", "0")
+    await engine.complete("sys", "post body", cache="moderation")
+    await engine.complete("sys", "post body", cache="moderation")
+    assert upstream.calls == 4
+    await engine.aclose()
@@ -0,0 +1,221 @@
+"""
+LLM client tests.
+
+No network: providers point at an httpx.MockTransport. Covers failover
+order, the 429 / circuit-breaker behaviour that replaced the permanent
+use_qwen=False switch, token-bucket pacing, and the sync/async facade.
+"""
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.llm_client import (
+    AsyncLLMClient,
+    CircuitBreaker,
+    LLMClient,
+    LLMProviderError,
+    ProviderConfig,
+    TokenBucket,
+    _EngineRuntime,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _provider(name: str, **kw) -> ProviderConfig:
+    defaults = dict(
+        base_url=f"https://{name}.test/v1",
+        api_key="k",
+        model=f"{name}-model",
+        max_tokens=64,
+        temperature=0.5,
+        rate_per_sec=1000,
+        burst=1000,
+    )
+    defaults.update(kw)
+    return ProviderConfig(name=name, **defaults)
+
+
+def _ok(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}], "usage": {"total_tokens": 3}})
+
+
+def _engine(handler, monkeypatch, clock=None, names=("groq", "qwen")) -> AsyncLLMClient:
+    monkeypatch.setenv("LLM_MAX_ATTEMPTS", "1")
+    monkeypatch.setenv("LLM_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("LLM_BREAKER_RESET_SECONDS", "30")
+    return AsyncLLMClient(
+        providers=[_provider(n) for n in names],
+        transport=httpx.MockTransport(handler),
+        clock=clock or FakeClock(),
+    )
+
+
+def test_breaker_opens_then_half_open_probe():
+    clock = FakeClock()
+    b = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    b.record_failure()
+    assert b.allow()
+    b.record_failure()
+    assert b.state == CircuitBreaker.OPEN and not b.allow()
+
+    clock.now += 31
+    assert b.state == CircuitBreaker.HALF_OPEN
+    assert b.allow()          # one probe
+    assert not b.allow()      # no second concurrent probe
+    b.record_failure()
+    assert b.state == CircuitBreaker.OPEN
+
+    clock.now += 31
+    assert b.allow()
+    b.record_success()
+    assert b.state == CircuitBreaker.CLOSED and b.allow()
+
+
+def test_token_bucket_paces_after_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_acquire() == 0
+
+
+async def test_failover_on_429_without_sleeping(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        if request.url.host == "groq.test":
+            return httpx.Response(429, headers={"retry-after": "30"})
+        return _ok("from qwen")
+
+    engine = _engine(handler, monkeypatch)
+    resp = await asyncio.wait_for(engine.complete("s", "u"), timeout=2)
+    assert resp.text == "from qwen" and resp.provider == "qwen"
+    assert calls == ["groq.test", "qwen.test"]
+    await engine.aclose()
+
+
+async def test_open_breaker_skips_provider_until_reset(monkeypatch):
+    clock = FakeClock()
+    calls = []
+    qwen_up = {"ok": False}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        if request.url.host == "qwen.test" and qwen_up["ok"]:
+            return _ok("qwen back")
+        if request.url.host == "qwen.test":
+            return httpx.Response(503)
+        return _ok("deepseek")
+
+    engine = _engine(handler, monkeypatch, clock=clock, names=("qwen", "deepseek"))
+    for _ in range(2):
+        assert await engine.chat("s", "u") == "deepseek"
+    assert engine.breaker_state("qwen") == CircuitBreaker.OPEN
+    assert not engine.available("qwen")
+
+    calls.clear()
+    assert await engine.chat("s", "u") == "deepseek"
+    assert calls == ["deepseek.test"]
+
+    clock.now += 31
+    qwen_up["ok"] = True
+    assert await engine.chat("s", "u") == "qwen back"
+    assert engine.breaker_state("qwen") == CircuitBreaker.CLOSED
+    await engine.aclose()
+
+
+async def test_cancelled_probe_releases_half_open_breaker(monkeypatch):
+    clock = FakeClock()
+    qwen = {"mode": "down"}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host != "qwen.test":
+            return _ok("deepseek")
+        if qwen["mode"] == "hang":
+            await asyncio.sleep(10)
+        return httpx.Response(503) if qwen["mode"] == "down" else _ok("qwen back")
+
+    engine = _engine(handler, monkeypatch, clock=clock, names=("qwen", "deepseek"))
+    for _ in range(2):
+        assert await engine.chat("s", "u") == "deepseek"
+    assert engine.breaker_state("qwen") == CircuitBreaker.OPEN
+
+    clock.now += 31
+    qwen["mode"] = "hang"
+    probe = asyncio.ensure_future(engine.chat("s", "u"))
+    await asyncio.sleep(0.05)
+    probe.cancel()  # what LLMClient does when its deadline passes
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    qwen["mode"] = "up"
+    assert await engine.chat("s", "u") == "qwen back"
+    assert engine.breaker_state("qwen") == CircuitBreaker.CLOSED
+    await engine.aclose()
+
+
+async def test_client_error_is_not_retried(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.host)
+        return httpx.Response(401, json={"error": "bad key"})
+
+    engine = _engine(handler, monkeypatch, names=("qwen",))
+    monkeypatch.setattr(engine, "max_attempts", 3)
+    with pytest.raises(LLMProviderError) as exc:
+        await engine.complete("s", "u")
+    assert exc.value.status == 401
+    assert calls == ["qwen.test"]
+    await engine.aclose()
+
+
+def test_sync_facade_shares_one_engine(monkeypatch):
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.host)
+        return _ok("hello")
+
+    runtime = _EngineRuntime(lambda: _engine(handler, monkeypatch, names=("deepseek",)))
+    a, b = LLMClient(runtime=runtime), LLMClient(runtime=runtime)
+    assert a.engine is b.engine
+    assert a.chat("s", "u") == "hello"
+    assert a.last_provider == "deepseek" and a.last_model == "deepseek-model"
+    assert b._chat_deepseek("s", "u") == "hello"
+    assert not a.use_qwen
+    assert seen == ["deepseek.test", "deepseek.test"]
+
+
+async def test_achat_does_not_block_caller_loop(monkeypatch):
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.2)
+        return _ok("late")
+
+    runtime = _EngineRuntime(lambda: _engine(slow, monkeypatch, names=("groq",)))
+    llm = LLMClient(runtime=runtime)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    t = asyncio.create_task(ticker())
+    assert await llm.achat("s", "u") == "late"
+    t.cancel()
+    assert ticks >= 5
@@ -0,0 +1,174 @@
+"""
+Metrics tests.
+
+Covers the text exposition (cumulative buckets, label escaping), summing
+snapshots written by other processes through metrics_snapshots, expired
+processes' counters kept in the retired row (once, if the process comes
+back), stage() splitting DB and LLM time, and the /metrics endpoint.
+"""
+from __future__ import annotations
+
+from sqlalchemy import text
+
+from app.core import metrics
+
+
+def _sample(body: str, line_start: str) -> float:
+    for line in body.splitlines():
+        if line.startswith(line_start + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_start} not in output")
+
+
+def test_render_counters_and_histograms():
+    reg = metrics.Registry()
+    c = reg.counter("demo_total", "Demo.", ("path",))
+    h = reg.histogram("demo_seconds", "Demo latency.", ("path",), buckets=(0.1, 1.0))
+    c.inc(path='a"b')
+    c.inc(2, path='a"b')
+    for v in (0.05, 0.5, 3.0):
+        h.observe(v, path="/x")
+
+    out = reg.render()
+    assert "# TYPE demo_total counter" in out
+    assert _sample(out, 'demo_total{path="a\\"b"}') == 3
+    assert _sample(out, 'demo_seconds_bucket{path="/x",le="0.1"}') == 1
+    assert _sample(out, 'demo_seconds_bucket{path="/x",le="1"}') == 2
+    assert _sample(out, 'demo_seconds_bucket{path="/x",le="+Inf"}') == 3
+    assert _sample(out, 'demo_seconds_count{path="/x"}') == 3
+    assert _sample(out, 'demo_seconds_sum{path="/x"}') == 3.55
+
+
+def test_snapshots_are_summed_across_processes(db_session):
+    session, SessionFactory = db_session
+    session.execute(text(
+        "CREATE TABLE metrics_snapshots (node VARCHAR(200) PRIMARY KEY, "
+        "updated_at DOUBLE PRECISION NOT NULL, payload TEXT NOT NULL)"
+    ))
+    session.commit()
+
+    def worker():
+        reg = metrics.Registry()
+        return reg, reg.counter("jobs_done_total", "Jobs.", ("job_type",))
+
+    (web, web_jobs), (job, job_jobs) = worker(), worker()
+    web_jobs.inc(job_type="rank")
+    job_jobs.inc(4, job_type="rank")
+    job_jobs.inc(job_type="reputation")
+    metrics.SnapshotStore(job, SessionFactory, node_id="job-1").flush()
+    web_store = metrics.SnapshotStore(web, SessionFactory, node_id="web-1")
+    web_store.flush()
+
+    out = web.render(web_store.others())
+    assert _sample(out, 'jobs_done_total{job_type="rank"}') == 5
+    assert _sample(out, 'jobs_done_total{job_type="reputation"}') == 1
+
+    # a process that stopped flushing drops out after the TTL
+    late = metrics.SnapshotStore(web, SessionFactory, node_id="web-1", clock=lambda: 1e12)
+    assert late.others() == []
+
+
+def test_expired_process_counters_are_retired_not_dropped(db_session):
+    session, SessionFactory = db_session
+    session.execute(text(
+        "CREATE TABLE metrics_snapshots (node VARCHAR(200) PRIMARY KEY, "
+        "updated_at DOUBLE PRECISION NOT NULL, payload TEXT NOT NULL)"
+    ))
+    session.commit()
+    now = [1000.0]
+
+    def node(name):
+        reg = metrics.Registry()
+        jobs = reg.counter("jobs_done_total", "Jobs.", ("job_type",))
+        lat = reg.histogram("job_seconds", "Job time.", buckets=(1.0,))
+        return reg, jobs, lat, metrics.SnapshotStore(reg, SessionFactory, node_id=name, clock=lambda: now[0])
+
+    web, _, _, web_store = node("web-1")
+    for name, done in (("job-1", 3), ("job-2", 4)):
+        _, jobs, lat, store = node(name)
+        jobs.inc(done, job_type="rank")
+        lat.observe(0.5)
+        store.flush()
+
+    now[0] += metrics.NODE_TTL_SECONDS + 1
+    web_store.flush()  # job-1 and job-2 have stopped flushing
+    rows = session.execute(text("SELECT node FROM metrics_snapshots ORDER BY node")).scalars().all()
+    assert rows == [metrics.RETIRED_NODE, "web-1"]
+
+    out = web.render(web_store.others())
+    assert _sample(out, 'jobs_done_total{job_type="rank"}') == 7
+    assert _sample(out, "job_seconds_count") == 2
+
+    # a later expiry adds to the retired totals
+    _, jobs, _, store = node("job-3")
+    jobs.inc(job_type="rank")
+    store.flush()
+    now[0] += metrics.NODE_TTL_SECONDS + 1
+    web_store.flush()
+    assert _sample(web.render(web_store.others()), 'jobs_done_total{job_type="rank"}') == 8
+
+
+def test_process_back_after_expiry_is_not_counted_twice(db_session):
+    session, SessionFactory = db_session
+    session.execute(text(
+        "CREATE TABLE metrics_snapshots (node VARCHAR(200) PRIMARY KEY, "
+        "updated_at DOUBLE PRECISION NOT NULL, payload TEXT NOT NULL)"
+    ))
+    session.commit()
+    now = [1000.0]
+
+    def node(name):
+        reg = metrics.Registry()
+        return reg, reg.counter("x_total", "X."), metrics.SnapshotStore(reg, SessionFactory, node_id=name,
+                                                                         clock=lambda: now[0])
+
+    a, a_x, a_store = node("a")
+    b, b_x, b_store = node("b")
+    a_x.inc(10)
+    b_x.inc(5)
+    a_store.flush()
+    b_store.flush()
+
+    now[0] += metrics.NODE_TTL_SECONDS + 1
+    a_store.flush()  # b stalled past the TTL: retired
+    b_store.flush()  # and comes back
+    assert _sample(a.render(a_store.others()), "x_total") == 15
+    assert _sample(b.render(b_store.others(), baseline=b_store.baseline), "x_total") == 15
+
+    b_x.inc()
+    b_store.flush()
+    now[0] += metrics.NODE_TTL_SECONDS + 1
+    a_store.flush()  # retired a second time
+    b_store.flush()
+    assert _sample(a.render(a_store.others()), "x_total") == 16
+
+
+def test_stage_splits_db_and_llm_time(db_session):
+    session, _ = db_session
+    metrics.install_db_metrics(session.get_bind())
+    metrics.STAGE_DB_SECONDS.clear()
+    metrics.STAGE_LLM_SECONDS.clear()
+
+    with metrics.stage("unit.test"):
+        session.execute(text("SELECT 1")).all()
+        metrics.charge("llm", 0.25)
+    metrics.charge("llm", 5.0)  # outside any stage: ignored
+
+    snap = metrics.REGISTRY.snapshot()
+    db_series = dict((tuple(k), v) for k, v in snap["stage_db_seconds"]["series"])
+    llm_series = dict((tuple(k), v) for k, v in snap["stage_llm_seconds"]["series"])
+    assert db_series[("unit.test",)][1] > 0
+    assert llm_series[("unit.test",)][1] == 0.25
+    assert any(k == ["select"] for k, _ in snap["db_query_duration_seconds"]["series"])
+
+
+def test_metrics_endpoint(client, monkeypatch):
+    client.get("/health")
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert _sample(r.text, 'http_requests_total{method="GET",route="/health",status="200"}') >= 1
+
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
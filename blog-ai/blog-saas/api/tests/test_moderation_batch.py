@@ -0,0 +1,97 @@
+"""
+Batched moderation tests.
+
+A fake LLM answers the batch prompt from its JSON input, so no network.
+Covers chunking (one call per MODERATION_BATCH_SIZE items), per-item
+fallback when the reply is partial or unparseable, and the adapter
+applying batch scores to queued posts. The local prescreen is off here
+(test_prescreen covers it) so every text reaches the fake.
+"""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.services import moderation_batch, prescreen
+from app.services.moderation_scorer import ModerationResult
+from app.services.post_moderation_adapter import PostModerationAdapter
+
+
+@pytest.fixture(autouse=True)
+def _no_prescreen(monkeypatch):
+    monkeypatch.setattr(prescreen, "ENABLED", False)
+
+
+class FakeLLM:
+    def __init__(self, reply=None):
+        self.calls = []
+        self.reply = reply
+
+    def is_enabled(self) -> bool:
+        return True
+
+    def chat(self, system: str, user: str, **kw) -> str:
+        items = json.loads(user)["items"]
+        self.calls.append(len(items))
+        if self.reply is not None:
+            return self.reply(items)
+        # "bad" texts score high, everything else low
+        return "Here you go:\n" + json.dumps({"results": [
+            {"id": it["id"], "score": 90 if "bad" in it["text"] else 5, "reason": "r"} for it in items
+        ]})
+
+
+def test_scores_in_chunks_and_keeps_caller_keys():
+    llm = FakeLLM()
+    items = [(f"k{i}", "bad words" if i % 7 == 0 else "fine") for i in range(45)]
+    out = moderation_batch.score_texts(items, batch_size=20, llm=llm)
+    assert llm.calls == [20, 20, 5]
+    assert {k: r.score for k, r in out.items()} == {k: (90 if "bad" in t else 5) for k, t in items}
+
+
+def test_partial_reply_falls_back_per_item(monkeypatch):
+    single = []
+    monkeypatch.setattr(moderation_batch, "score_text_with_deepseek",
+                        lambda text: single.append(text) or ModerationResult(score=42, reason="single"))
+    llm = FakeLLM(lambda items: json.dumps({"results": [
+        {"id": "1", "score": 3, "reason": "ok"},
+        {"id": "2", "score": "n/a"},
+        {"id": "99", "score": 0},
+    ]}))
+    out = moderation_batch.score_texts([("a", "one"), ("b", "two"), ("c", "three")], llm=llm)
+    assert out["a"] == ModerationResult(score=3, reason="ok")
+    assert out["b"].reason == out["c"].reason == "single"
+    assert single == ["two", "three"]
+
+    single.clear()
+    out = moderation_batch.score_texts([("a", "one")], llm=FakeLLM(lambda items: "not json"))
+    assert out["a"].score == 42 and single == ["one"]
+
+
+def test_adapter_moderates_queue_in_one_call(db_session, make_post):
+    session, _ = db_session
+    good = make_post(title="Good", status="needs_review", body_md="fine")
+    bad = make_post(title="Bad", status="needs_review", body_md="bad stuff")
+    done = make_post(title="Done", status="needs_review", policy_score=75)
+
+    adapter = PostModerationAdapter()
+    adapter.llm = FakeLLM()
+    moderated = adapter.moderate_posts(session, [good.id, bad.id, done.id])
+    assert [p.id for p in moderated] == [good.id, bad.id]
+    assert adapter.llm.calls == [2]
+    session.expire_all()
+    assert (good.status, good.policy_score) == ("published", 5)
+    assert (bad.status, bad.policy_score) == ("needs_review", 90)
+
+
+def test_sweep_enqueues_batches(db_session, make_post, monkeypatch):
+    from app.jobs import handlers
+    from app.models.job import Job
+
+    session, _ = db_session
+    monkeypatch.setattr(moderation_batch, "BATCH_SIZE", 2)
+    ids = [make_post(title=f"Queued {i}", status="needs_review").id for i in range(5)]
+    handlers.moderation_sweep_job(session, {})
+    jobs = session.query(Job).filter(Job.job_type == "moderate_batch").order_by(Job.id).all()
+    assert [json.loads(j.payload)["post_ids"] for j in jobs] == [ids[0:2], ids[2:4], ids[4:5]]
@@ -0,0 +1,83 @@
+"""
+SQL query profiler tests.
+
+Covers statement shapes, the Server-Timing header of QueryProfilerMiddleware,
+and query budgets (the query_budget fixture) on the comment list and the
+spawn loop's pending-reply check, which used to run a query per comment.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core import query_profiler
+from app.core.middleware import QueryProfilerMiddleware
+from app.models.comment import Comment
+
+
+def test_shapes_blank_literals_and_in_lists():
+    a = query_profiler.shape_of("SELECT * FROM users WHERE id = 5 AND name = 'o''brien'")
+    b = query_profiler.shape_of("SELECT *  FROM users\n WHERE id = 71 AND name = 'x'")
+    assert a == b == "SELECT * FROM users WHERE id = ? AND name = ?"
+    assert query_profiler.shape_of("SELECT 1 FROM t WHERE x IN (%(a)s, %(b)s, %(c)s)") == \
+        "SELECT ? FROM t WHERE x IN (?...)"
+    assert query_profiler.shape_of("SELECT x::text FROM m20261018 WHERE y = :y") == \
+        "SELECT x::text FROM m20261018 WHERE y = ?"
+
+
+def test_middleware_reports_server_timing(db_session):
+    session, SessionFactory = db_session
+    query_profiler.install_query_profiler(session.get_bind())
+    app = FastAPI()
+    app.add_middleware(QueryProfilerMiddleware)
+
+    @app.get("/n-plus-one")
+    def n_plus_one():
+        db = SessionFactory()
+        try:
+            return [db.execute(text("SELECT :i"), {"i": i}).scalar() for i in range(6)]
+        finally:
+            db.close()
+
+    with TestClient(app) as c:
+        r = c.get("/n-plus-one")
+    assert r.json() == list(range(6))
+    assert r.headers["server-timing"].endswith('desc="6 queries"')
+    assert r.headers["server-timing"].startswith("db;dur=")
+
+
+def test_comment_list_budget(client, make_post, make_user, auth_header, query_budget):
+    post = make_post()
+    user = make_user()
+    for i in range(8):
+        r = client.post(f"/api/v1/orgs/1/posts/{post.id}/comments", json={"body": f"take {i}"}, headers=auth_header(user.id))
+        assert r.status_code == 200
+    # flat in the number of comments: authors, votes and counts are batched
+    with query_budget(5, max_repeats=1):
+        r = client.get(f"/api/v1/orgs/1/posts/{post.id}/comments")
+    assert len(r.json()["comments"]) == 8
+
+
+def test_pending_human_comments_is_two_queries(db_session, make_post, make_agent, query_budget):
+    from app.jobs import spawn_loop
+
+    session, _ = db_session
+    post = make_post()
+    agent = make_agent()
+    now = datetime.now(timezone.utc)
+    humans = [
+        Comment(org_id=1, post_id=post.id, author_type="user", source="human", body=f"q{i}", created_at=now)
+        for i in range(4)
+    ]
+    session.add_all(humans)
+    session.commit()
+    session.add(Comment(org_id=1, post_id=post.id, author_type="agent", author_agent_id=agent.id,
+                        parent_comment_id=humans[1].id, body="answered"))
+    session.commit()
+
+    with query_budget(2):
+        pending = spawn_loop.pending_human_comment_ids(session)
+    assert pending == [h.id for h in reversed(humans) if h.id != humans[1].id]
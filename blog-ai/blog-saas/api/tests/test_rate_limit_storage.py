@@ -0,0 +1,103 @@
+"""
+Shared rate-limit storage tests.
+
+Two SQLCounterStorage instances on one database stand in for two
+gunicorn workers: hits are buffered locally, written in one batch on
+sync(), and each worker's limit decisions include the other's hits once
+synced. Also covers the sliding-window weighting, the per-user key and
+that every LLM-backed route is limited.
+"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from app.core.rate_limit import user_or_ip
+from app.core.rate_limit_storage import SQLCounterStorage
+
+
+def _create_table(session) -> None:
+    # rate_limit_counters has no ORM model
+    session.execute(text(
+        "CREATE TABLE rate_limit_counters (bucket VARCHAR(512) NOT NULL, win BIGINT NOT NULL, "
+        "hits INTEGER NOT NULL DEFAULT 0, expires_at BIGINT NOT NULL, PRIMARY KEY (bucket, win))"
+    ))
+    session.commit()
+
+
+def _storages(SessionFactory, now):
+    clock = lambda: now[0]  # noqa: E731
+    return [SQLCounterStorage(session_factory=SessionFactory, sync_ms=0, clock=clock) for _ in range(2)]
+
+
+def test_workers_share_counts_after_sync(db_session):
+    session, SessionFactory = db_session
+    _create_table(session)
+    now = [600.0]
+    a, b = _storages(SessionFactory, now)
+
+    assert all(a.acquire_sliding_window_entry("k", 5, 60) for _ in range(3))
+    # buffered until the sync
+    assert session.execute(text("SELECT COUNT(*) FROM rate_limit_counters")).scalar() == 0
+    a.sync()
+    assert session.execute(text("SELECT hits FROM rate_limit_counters")).scalar() == 3
+
+    # b hasn't seen the key: its first hit is decided locally, the sync
+    # after it brings in a's three
+    assert b.acquire_sliding_window_entry("k", 5, 60)
+    b.sync()
+    assert [b.acquire_sliding_window_entry("k", 5, 60) for _ in range(2)] == [True, False]
+    b.sync()
+    a.sync()
+    assert not a.acquire_sliding_window_entry("k", 5, 60)
+    assert a.get_sliding_window("k", 60)[2] == 5
+
+
+def test_previous_window_is_weighted(db_session):
+    session, SessionFactory = db_session
+    _create_table(session)
+    now = [600.0]
+    a, _ = _storages(SessionFactory, now)
+    assert all(a.acquire_sliding_window_entry("k", 4, 60) for _ in range(4))
+    a.sync()
+
+    now[0] = 660.0 + 45  # 3/4 into the next window: previous counts 1/4
+    a.sync()
+    assert [a.acquire_sliding_window_entry("k", 4, 60) for _ in range(4)] == [True, True, True, False]
+
+
+def test_failed_sync_keeps_pending_hits(db_session):
+    _, SessionFactory = db_session
+    a, _ = _storages(SessionFactory, [600.0])
+    a.acquire_sliding_window_entry("k", 5, 60)
+    a.sync()  # no table yet
+    assert a.get_sliding_window("k", 60)[2] == 1
+
+
+def test_user_or_ip_prefers_token_user(make_user, auth_header):
+    user = make_user()
+    req = lambda headers: SimpleNamespace(  # noqa: E731
+        headers=headers, client=SimpleNamespace(host="10.0.0.1"),
+    )
+    token = auth_header(user.id)["Authorization"]
+    assert user_or_ip(req({"authorization": token})) == f"user:{user.id}"
+    assert user_or_ip(req({"authorization": "Bearer nope"})) == "10.0.0.1"
+    assert user_or_ip(req({})) == "10.0.0.1"
+
+
+def test_llm_routes_are_limited_per_user(client, monkeypatch):
+    from app.api.v1 import agent_factory, agent_posts, auto_posts, debate
+    from app.core.rate_limit import limiter
+
+    for fn in (
+        debate.spawn_debate, auto_posts.generate_post_from_trends, auto_posts.generate_multiple_posts,
+        agent_factory.spawn_agents, agent_posts.generate_post,
+    ):
+        assert f"{fn.__module__}.{fn.__name__}" in limiter._route_limits
+
+    codes = [
+        client.post("/api/v1/orgs/1/posts/999/spawn-debate", params={"agent_ids": "1"}).status_code
+        for _ in range(11)
+    ]
+    assert codes == [200] * 10 + [429]  # "Post not found" is a 200 here
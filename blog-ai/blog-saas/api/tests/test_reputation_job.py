@@ -0,0 +1,90 @@
+"""
+Reputation job tests.
+
+The set-based recalculation must produce the same numbers the old
+per-agent loop did (score = up*3 - down + comments + followers*5, floored
+at 0), and incremental runs must only touch agents whose comments, votes
+or profile changed since the watermark.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from app.models.agent_profile import AgentProfile
+from app.models.comment import Comment
+from app.models.vote import Vote
+from app.services.engagement_counters import record_comment_vote
+from app.services.reputation_job import (
+    changed_agent_ids,
+    recalculate_all_reputations,
+    recalculate_changed_reputations,
+)
+
+
+def _comment(session, post, agent, status="published"):
+    c = Comment(org_id=1, post_id=post.id, author_type="agent", author_agent_id=agent.id, body="x", status=status)
+    session.add(c)
+    session.commit()
+    return c
+
+
+def _vote(session, user, comment, value):
+    session.add(Vote(org_id=1, user_id=user.id, comment_id=comment.id, value=value))
+    record_comment_vote(session, comment, 0, value)
+    session.commit()
+
+
+def test_full_recalculation_matches_formula(db_session, make_post, make_agent, make_user):
+    session, _ = db_session
+    post = make_post()
+    a, b, idle = make_agent(handle="a", follower_count=2), make_agent(handle="b"), make_agent(handle="idle")
+    u1, u2 = make_user(email="u1@x.io", username="u1"), make_user(email="u2@x.io", username="u2")
+
+    c1, c2 = _comment(session, post, a), _comment(session, post, a)
+    _comment(session, post, a, status="needs_review")  # not counted
+    cb = _comment(session, post, b)
+    _vote(session, u1, c1, 1)
+    _vote(session, u2, c1, 1)
+    _vote(session, u1, c2, -1)
+    _vote(session, u1, cb, -1)
+    _vote(session, u2, cb, -1)
+
+    result = recalculate_all_reputations(session)
+    session.expire_all()
+    a, b, idle = session.get(AgentProfile, a.id), session.get(AgentProfile, b.id), session.get(AgentProfile, idle.id)
+
+    assert (a.total_comments, a.total_upvotes, a.total_downvotes) == (2, 2, 1)
+    assert a.reputation_score == 2 * 3 - 1 + 2 + 2 * 5
+    assert (b.total_comments, b.total_upvotes, b.total_downvotes) == (1, 0, 2)
+    assert b.reputation_score == 0  # floored
+    assert idle.reputation_score == 0
+    assert result["checked"] == 3 and result["updated"] == 2
+
+    # nothing changed -> nothing written
+    assert recalculate_all_reputations(session)["updated"] == 0
+
+
+def test_incremental_only_recomputes_touched_agents(db_session, make_post, make_agent, make_user):
+    session, _ = db_session
+    post = make_post()
+    a, b, c = make_agent(handle="a"), make_agent(handle="b"), make_agent(handle="c")
+    user = make_user()
+    ca = _comment(session, post, a)
+    _comment(session, post, b)
+    recalculate_all_reputations(session)
+
+    max_id = session.query(Comment.id).order_by(Comment.id.desc()).first()[0]
+    since = datetime.now(timezone.utc) + timedelta(seconds=1)
+    assert changed_agent_ids(session, since, max_id) == set()
+
+    # a gets a vote, c posts a new comment; b untouched
+    _vote(session, user, ca, 1)
+    _comment(session, post, c)
+    touched = changed_agent_ids(session, datetime.now(timezone.utc) - timedelta(minutes=1), max_id)
+    assert a.id in touched and c.id in touched
+
+    result = recalculate_changed_reputations(session, datetime.now(timezone.utc) - timedelta(minutes=1), max_id)
+    session.expire_all()
+    assert session.get(AgentProfile, a.id).total_upvotes == 1
+    assert session.get(AgentProfile, c.id).total_comments == 1
+    assert result["updated"] == 2
@@ -0,0 +1,96 @@
+"""
+Full-text search tests.
+
+Run against the SQLite FTS5 fallback (the Postgres tsvector path shares
+the query shaping and result contract). Covers prefix matching, ranking
+(title beats body), escaped highlighting, that updates/deletes stay in sync with
+the index, that user input can't inject FTS syntax, and the endpoints.
+"""
+from __future__ import annotations
+
+from app.services.search import query_terms, search_agents, search_posts
+
+
+def test_prefix_match_rank_and_highlight(db_session, make_post):
+    session, _ = db_session
+    body_hit = make_post(title="Weekly notes", body_md="we talked about quantum computing at length")
+    title_hit = make_post(title="Quantum supremacy explained", body_md="no keywords here")
+    make_post(title="Unrelated", body_md="nothing to see")
+
+    hits = search_posts(session, "quant")
+    assert [h.id for h in hits] == [title_hit.id, body_hit.id]
+    assert "<mark>Quantum</mark>" in hits[0].title_hl
+    assert "<mark>quantum</mark>" in hits[1].snippet
+
+
+def test_highlight_escapes_the_text_around_marks(db_session, make_post):
+    session, _ = db_session
+    make_post(title="<script>alert(1)</script> quantum")
+    make_post(title="<b>Notes</b>", body_md='on quantum <img src=x onerror="boom"> computing')
+
+    title_hit, body_hit = search_posts(session, "quantum")
+    assert title_hit.title_hl == "&lt;script&gt;alert(1)&lt;/script&gt; <mark>quantum</mark>"
+    assert body_hit.title_hl == "&lt;b&gt;Notes&lt;/b&gt;"
+    assert "<img" not in body_hit.snippet and "&lt;img" in body_hit.snippet
+    assert "<mark>quantum</mark>" in body_hit.snippet
+
+
+def test_all_terms_required_and_drafts_excluded(db_session, make_post):
+    session, _ = db_session
+    both = make_post(title="Rust async runtimes")
+    make_post(title="Rust ownership")
+    make_post(title="Async python draft", status="draft")
+    assert [h.id for h in search_posts(session, "rust async")] == [both.id]
+
+
+def test_index_follows_updates_and_deletes(db_session, make_post):
+    session, _ = db_session
+    p = make_post(title="Old title")
+    p.title = "Fresh headline"
+    session.commit()
+    assert search_posts(session, "old") == []
+    assert [h.id for h in search_posts(session, "fresh")] == [p.id]
+    session.delete(p)
+    session.commit()
+    assert search_posts(session, "fresh") == []
+
+
+def test_operators_in_user_input_are_neutralised(db_session, make_post):
+    session, _ = db_session
+    make_post(title="C plus plus tips")
+    assert query_terms('"c" OR * NEAR(') == ["c", "or", "near"]
+    # would be a syntax error if passed through raw
+    assert search_posts(session, '") OR title:*') == []
+    assert search_posts(session, "%%") == []
+
+
+def test_agents_search(db_session, make_post, make_agent):
+    session, _ = db_session
+    make_post()  # creates org 1
+    a = make_agent(handle="econ", topics="economics,markets", bio="Macro nerd")
+    make_agent(handle="hidden", topics="economics", is_public=False)
+    hits = search_agents(session, "econom")
+    assert [h.id for h in hits] == [a.id]
+
+
+def test_search_endpoint_splits_posts_and_debates(client, db_session, make_post):
+    session, _ = db_session
+    posts = [make_post(title=f"Climate post {i}") for i in range(3)]
+    debate = make_post(title="Climate debate", debate_status="open")
+    r = client.get("/api/v1/search", params={"q": "climat", "limit": 2})
+    assert r.status_code == 200
+    data = r.json()
+    assert len(data["posts"]) == 2
+    returned = {p["id"] for p in data["posts"]} | {d["id"] for d in data["debates"]}
+    assert debate.id in returned
+    assert all(d["debate_status"] == "open" for d in data["debates"])
+    assert all("<mark>" in p["title_highlight"] for p in data["posts"])
+    assert {p.id for p in posts} >= {p["id"] for p in data["posts"] if p["id"] != debate.id}
+
+
+def test_list_posts_q_filter(client, make_post):
+    make_post(title="Searchable thing")
+    make_post(title="Other")
+    r = client.get("/api/v1/orgs/1/posts", params={"q": "searchab"})
+    assert r.status_code == 200
+    assert [p["title"] for p in r.json()["posts"]] == ["Searchable thing"]
@@ -0,0 +1,79 @@
+"""
+Agent selection engine tests.
+
+Covers the precomputed score columns (recency / volume / topic diversity),
+seeded picks being reproducible, debate picks favouring topic matches and
+agents not yet in the debate, and the aggregates being served from cache
+so a warm pick costs at most the already-commented query.
+"""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.models.comment import Comment
+from app.services import agent_selector
+from app.services.agent_roster import AgentRecord, Roster
+from app.services.selection_engine import Columns, SelectionEngine, Signals
+
+NOW = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+
+
+def _roster(n: int) -> Roster:
+    topics = ["ai", "climate", "economy", "music", "health"]
+    records = [
+        AgentRecord(id=i, org_id=1, handle=f"sc_kind{i % 3}_{i}", display_name=f"A{i}", style="concise",
+                    topics=frozenset({topics[i % 5], topics[(i * 7) % 5]}), reputation_score=0,
+                    is_shadow_banned=False)
+        for i in range(1, n + 1)
+    ]
+    return Roster.build(1, 1, (n, ""), records)
+
+
+def test_columns_carry_the_static_factors():
+    signals = Signals(
+        as_of=NOW,
+        post_count={1: 4},
+        last_post={1: NOW - timedelta(hours=12)},
+        tag_usage={"climate": 5},
+        comment_count={3: 10},
+    )
+    cols = Columns.build(_roster(3), signals)
+    by_id = {a.id: (p, d) for a, p, d in zip(cols.agents, cols.poster, cols.debater)}
+    # 1 and 3 cover climate, which was just used a lot; 1 also posted 4
+    # times, 12h ago; 2 never posted and covers neither
+    assert by_id[1][0] == 0.5 * (1 / (1 + 4 * 0.3)) * (1 / (1 + 5 * 0.2))
+    assert by_id[2][0] == 5.0
+    assert by_id[3][0] == 5.0 * (1 / (1 + 5 * 0.2))
+    assert by_id[3][1] == 1 / (1 + 10 * 0.2) and by_id[2][1] == 1.0
+
+
+def test_seeded_picks_are_reproducible():
+    cols = Columns.build(_roster(500), Signals(NOW, {}, {}, {}, {}))
+    words = "the economy of ai".split()
+    a = cols.pick_debaters(words, {5, 10}, 6, random.Random(42))
+    b = cols.pick_debaters(words, {5, 10}, 6, random.Random(42))
+    assert a == b and len({r.id for r in a}) == 6
+    assert cols.pick_poster(random.Random(7)) == cols.pick_poster(random.Random(7))
+    # with hundreds of topic matches on the roster, the top 6 all match
+    assert all(r.topics & {"economy", "ai"} for r in a)
+    assert not {r.id for r in a} & {5, 10}
+
+
+def test_warm_picks_skip_the_aggregates(db_session, make_post, make_agent, query_budget, monkeypatch):
+    session, _ = db_session
+    post = make_post(title="Climate talk")
+    agents = [make_agent(handle=f"sc_kind_{i}", topics="climate" if i < 2 else "music") for i in range(4)]
+    session.add(Comment(org_id=1, post_id=post.id, author_type="agent", author_agent_id=agents[0].id, body="x"))
+    session.commit()
+
+    engine = SelectionEngine(signals_seconds=60)
+    assert engine.pick_poster(session, 1, seed=1) is not None  # cold: roster + aggregates
+    session.refresh(post)
+    with query_budget(1):
+        picked = engine.pick_debaters(session, 1, post, 2, seed=3)
+    assert [a.id for a in picked][0] == agents[1].id  # topic match, not yet in the debate
+
+    monkeypatch.setattr(agent_selector, "engine", engine)
+    rows = agent_selector.select_agents_for_debate(session, 1, post, 2, seed=3)
+    assert [r.id for r in rows] == [a.id for a in picked]
@@ -0,0 +1,82 @@
+"""
+Debate spawning tests.
+
+The LLM half of a generation is stubbed. The contract for the parallel
+mode: same comments, same authors, same parent chain and same insertion
+order as the serial loop, however the worker threads finish.
+"""
+from __future__ import annotations
+
+import itertools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import comment_spawner
+from app.services.comment_spawner import spawn_debate_for_post
+
+
+@pytest.fixture()
+def fake_llm(monkeypatch):
+    seq = itertools.count(1)
+
+    def _body(system: str, user: str) -> str:
+        # finish in random order so the pool can't accidentally preserve it
+        time.sleep(random.random() * 0.02)
+        stance = system.split("Stance: ")[1].split("\n")[0]
+        return f"take {next(seq)} ({stance})"
+
+    monkeypatch.setattr(comment_spawner, "_generate_comment_body", _body)
+
+
+def _shape(comments):
+    by_id = {c.id: c for c in comments}
+    return [
+        (c.author_agent_id, by_id[c.parent_comment_id].author_agent_id if c.parent_comment_id else None)
+        for c in comments
+    ]
+
+
+def _debate(session, make_post, make_agent, pool):
+    post = make_post(title="Is tabs vs spaces settled")
+    agents = [make_agent(handle=f"a{i}-{post.id}") for i in range(4)]
+    ids = [a.id for a in agents]
+    out = spawn_debate_for_post(session, 1, post.id, ids, rounds=2, llm_pool=pool)
+    return ids, out
+
+
+def test_parallel_rounds_match_serial_structure(db_session, make_post, make_agent, fake_llm):
+    session, _ = db_session
+    ids_s, serial = _debate(session, make_post, make_agent, None)
+    with ThreadPoolExecutor(4) as pool:
+        ids_p, parallel = _debate(session, make_post, make_agent, pool)
+
+    remap = dict(zip(ids_p, ids_s))
+    assert len(parallel) == len(serial) == 8
+    assert [(remap[a], remap.get(p)) for a, p in _shape(parallel)] == _shape(serial)
+    # insertion order == agent order within each round
+    assert [c.id for c in parallel] == sorted(c.id for c in parallel)
+    assert [c.author_agent_id for c in parallel] == ids_p * 2
+
+
+def test_parallel_round_failure_keeps_prefix(db_session, make_post, make_agent, monkeypatch):
+    session, _ = db_session
+    post = make_post(title="Failing debate")
+    ids = [make_agent(handle=f"f{i}").id for i in range(4)]
+    seen = []
+
+    def _body(system: str, user: str) -> str:
+        seen.append(1)
+        if len(seen) == 3:
+            raise RuntimeError("provider down")
+        return f"ok {len(seen)}"
+
+    monkeypatch.setattr(comment_spawner, "_generate_comment_body", _body)
+    from app.models.comment import Comment
+
+    with ThreadPoolExecutor(1) as pool, pytest.raises(RuntimeError):
+        spawn_debate_for_post(session, 1, post.id, ids, rounds=1, llm_pool=pool)
+    rows = session.query(Comment).filter(Comment.post_id == post.id).order_by(Comment.id).all()
+    assert [c.author_agent_id for c in rows] == ids[:2]
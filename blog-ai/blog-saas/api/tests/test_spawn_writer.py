@@ -0,0 +1,92 @@
+"""
+SpawnWriter tests — the unit of work behind the spawners.
+
+Covers in-memory dedupe by comment_hash, parents queued in the same
+round, one counter bump per post, one commit per debate round and the
+executemany vote insert under its savepoint.
+"""
+from __future__ import annotations
+
+import itertools
+
+from sqlalchemy import event, text
+
+from app.models.comment import Comment
+from app.models.post_stats import PostStats
+from app.services import comment_spawner
+from app.services.comment_spawner import _agent_comment, spawn_debate_for_post
+from app.services.spawn_writer import SpawnWriter
+from app.services.tag_extractor import save_tags_for_post
+
+
+def test_round_dedupes_links_parents_and_bumps_once(db_session, make_post, make_agent, query_budget):
+    session, _ = db_session
+    post = make_post()
+    a, b = make_agent(handle="w_a").id, make_agent(handle="w_b").id
+
+    first = SpawnWriter(session)
+    root = first.comment(_agent_comment(1, post.id, a, "root"))
+    first.commit()
+
+    w = SpawnWriter(session)
+    c1 = w.comment(_agent_comment(1, post.id, b, "one"), parent=root)
+    c2 = w.comment(_agent_comment(1, post.id, a, "two"), parent=c1)
+    c3 = w.comment(_agent_comment(1, post.id, b, "three"), parent=c2)
+    assert w.comment(_agent_comment(1, post.id, a, "root")) is root  # already stored
+    assert w.comment(_agent_comment(1, post.id, b, "one"), parent=c2) is c1  # already queued
+
+    # the round's INSERT, one UPDATE linking in-round parents, one counter
+    # bump and no lookups. SQLite has no ordered multi-row RETURNING, so
+    # SQLAlchemy sends that INSERT a row at a time here; PostgreSQL gets one
+    with query_budget(5) as rec:
+        w.commit()
+    verbs = [q.statement.split()[0] for q in rec.queries]
+    assert verbs == ["INSERT"] * 3 + ["UPDATE", "UPDATE"]
+
+    assert [c.parent_comment_id for c in (c1, c2, c3)] == [root.id, c1.id, c2.id]
+    assert session.query(Comment).filter(Comment.post_id == post.id).count() == 4
+    assert session.get(PostStats, post.id).comment_count == 4
+
+
+def test_debate_commits_once_per_round(db_session, make_post, make_agent, monkeypatch):
+    session, _ = db_session
+    seq = itertools.count(1)
+    monkeypatch.setattr(comment_spawner, "_generate_comment_body", lambda system, user: f"take {next(seq)}")
+    post = make_post(title="One transaction per round")
+    ids = [make_agent(handle=f"r{i}").id for i in range(3)]
+    commits = []
+    event.listen(session, "after_commit", lambda s: commits.append(1))
+
+    out = spawn_debate_for_post(session, 1, post.id, ids, rounds=2)
+
+    assert len(out) == 6 and len(commits) == 2
+    assert [c.parent_comment_id is None for c in out] == [True] * 3 + [False] * 3
+    assert session.get(PostStats, post.id).comment_count == 6
+
+
+def test_votes_go_out_in_one_statement(db_session, make_post, make_agent, query_budget):
+    session, _ = db_session
+    session.execute(text(
+        "CREATE TABLE agent_votes (org_id INTEGER, agent_id INTEGER, comment_id INTEGER, "
+        "value INTEGER, created_at TEXT, UNIQUE (agent_id, comment_id))"
+    ))
+    post = make_post()
+    agents = [make_agent(handle=f"v{i}").id for i in range(3)]
+    w = SpawnWriter(session)
+    c = w.comment(_agent_comment(1, post.id, agents[0], "vote on me"))
+    w.commit()
+
+    w = SpawnWriter(session)
+    assert [w.vote(1, aid, c.id, 1) for aid in agents] == [True] * 3
+    assert w.vote(1, agents[0], c.id, -1) is False  # one per agent and comment
+    # one INSERT, under a SAVEPOINT so a failed batch can't abort the round
+    with query_budget(3) as rec:
+        w.commit()
+    assert [q.statement.split()[0] for q in rec.queries] == ["SAVEPOINT", "INSERT", "RELEASE"]
+    w.vote(1, agents[0], c.id, -1)
+    w.commit()  # ON CONFLICT DO NOTHING keeps the first vote
+
+    rows = session.execute(text("SELECT agent_id, value FROM agent_votes ORDER BY agent_id")).fetchall()
+    assert [tuple(r) for r in rows] == [(aid, 1) for aid in agents]
+    # post_tags.tag is missing from the ORM schema: logged, not raised
+    assert save_tags_for_post(session, post.id, "Writers batching inserts", "") == ["writers", "batching", "inserts"]
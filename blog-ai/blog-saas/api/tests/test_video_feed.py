@@ -0,0 +1,172 @@
+"""
+Video feed pipeline tests.
+
+Covers the candidate refresh (signals precomputed, language detected once,
+stale rows dropped), tags keyed on the post_tags.tag strings, the per-viewer
+scoring adjustments, overlapping refreshes upserting, requests never
+refreshing inline (nor more than once per EMPTY_POOL_SECONDS for an org
+without videos), and cursor paging over the cached ranked list through
+the endpoint.
+"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import text
+
+from app.services import video_feed as vf
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    for c in (vf._candidate_cache, vf._user_cache, vf._ranked_cache):
+        c.clear()
+    yield
+
+
+@pytest.fixture
+def make_video(make_post):
+    def _make(title: str, **extra):
+        extra.setdefault("media_type", "video")
+        extra.setdefault("media_url", f"https://cdn.example/{title}.mp4")
+        return make_post(title=title, **extra)
+    return _make
+
+
+def test_refresh_precomputes_signals_and_detects_language_once(db_session, make_video, make_post, monkeypatch):
+    session, _ = db_session
+    from app.models.video_candidate import VideoCandidate
+    from app.services.engagement_counters import bump_post
+
+    es = make_video("Hola", body_md="el perro y la casa con una puerta para los niños")
+    en = make_video("Hello", body_md="plain english words")
+    make_post(title="Not a video")
+    bump_post(session, en.id, en.org_id, saves=5, views=10, completed_views=10)
+    session.commit()
+
+    vf.refresh_video_candidates(session)
+    rows = {r.post_id: r for r in session.query(VideoCandidate).all()}
+    assert set(rows) == {es.id, en.id}
+    assert rows[es.id].language == "es"
+    assert rows[en.id].save_score == pytest.approx(0.5)
+    assert rows[en.id].watch_score == pytest.approx(0.64)
+
+    calls = []
+    monkeypatch.setattr(vf, "_detect_language", lambda t: calls.append(t) or "en")
+    en.status = "draft"
+    session.commit()
+    vf.refresh_video_candidates(session)
+    assert calls == []
+    assert [r.post_id for r in session.query(VideoCandidate).all()] == [es.id]
+
+
+def test_scoring_applies_viewer_features():
+    rows = [
+        # post_id, author, lang, tags, trending, save, watch
+        (1, 10, "en", "", 0.0, 0.0, 0.0),
+        (2, 20, "es", "rust", 0.0, 0.0, 0.0),
+        (3, 30, "en", "async,rust", 0.0, 0.6, 0.0),
+        (4, 40, "en", "", 1.0, 0.0, 0.0),
+    ]
+    cands = vf.build_candidate_set(rows)
+    assert [pid for _, pid in vf.score_candidates(cands, vf.ANONYMOUS, "en")] == [4, 3, 1, 2]
+
+    user = vf.UserFeatures(
+        saved=frozenset({3}), watched=frozenset({4}),
+        following=frozenset({20}), tags=frozenset({"rust"}),
+    )
+    scores = dict((pid, s) for s, pid in vf.score_candidates(cands, user, "en"))
+    assert scores[1] == pytest.approx(0.10)
+    assert scores[2] == pytest.approx(0.15 + 0.20)
+    assert scores[3] == pytest.approx((0.10 + 0.20 * 0.5 + 1.0 * 0.15) * 0.8)
+    assert scores[4] == pytest.approx((0.25 + 0.10) * 0.4)
+
+
+def test_tags_come_from_post_tags_tag(db_session, make_video, make_user):
+    session, _ = db_session
+    # the production shape of post_tags (tag_extractor writes strings)
+    session.execute(text("DROP TABLE post_tags"))
+    session.execute(text("CREATE TABLE post_tags (post_id INTEGER, tag TEXT, UNIQUE (post_id, tag))"))
+    rust, other = make_video("Rust clip"), make_video("Cooking clip")
+    user = make_user(email="tags@example.com", username="tagger")
+    session.execute(text("INSERT INTO post_tags VALUES (:p, 'rust'), (:p, 'async'), (:o, 'cooking')"),
+                    {"p": rust.id, "o": other.id})
+    session.execute(text("INSERT INTO saved_posts (user_id, post_id) VALUES (:u, :p)"), {"u": user.id, "p": rust.id})
+    session.commit()
+
+    vf.refresh_video_candidates(session)
+    cands = vf._load_candidates(session, 1)
+    assert set(cands.by_tag) == {"rust", "async", "cooking"}
+    assert vf.load_user_features(session, user.id).tags == {"rust", "async"}
+
+
+def test_requests_leave_the_refresh_to_the_background(db_session, make_video, monkeypatch):
+    session, _ = db_session
+    make_video("clip")
+    kicked = []
+    monkeypatch.setattr(vf, "_refresh_in_background", kicked.append)
+    monkeypatch.setattr(vf, "refresh_video_candidates", lambda *a, **k: pytest.fail("refreshed inline"))
+
+    assert vf.video_feed_page(session, 1) == ([], None)
+    assert kicked == [1]
+
+
+def test_overlapping_refreshes_upsert(db_session, make_video, monkeypatch):
+    session, _ = db_session
+    from app.models.video_candidate import VideoCandidate
+
+    clip = make_video("clip")
+    tag_map = vf._tag_map
+
+    def racing_tag_map(db, post_ids):
+        # another refresh inserts the same new posts after this one looked
+        monkeypatch.setattr(vf, "_tag_map", tag_map)
+        vf.refresh_video_candidates(db)
+        return tag_map(db, post_ids)
+
+    monkeypatch.setattr(vf, "_tag_map", racing_tag_map)
+    assert vf.refresh_video_candidates(session)["upserted"] == 1
+    assert [r.post_id for r in session.query(VideoCandidate).all()] == [clip.id]
+
+
+def test_empty_pool_is_not_refreshed_every_expiry(db_session, monkeypatch):
+    session, _ = db_session
+    from app.core.cache import TTLCache
+
+    now = [0.0]
+    monkeypatch.setattr(vf, "_candidate_cache", TTLCache(30, clock=lambda: now[0]))
+    kicked = []
+    monkeypatch.setattr(vf, "_refresh_in_background", kicked.append)
+
+    assert len(vf._load_candidates(session, 7)) == 0
+    now[0] += 31
+    assert len(vf._load_candidates(session, 7)) == 0
+    assert kicked == [7]
+    now[0] += vf.EMPTY_POOL_SECONDS
+    vf._load_candidates(session, 7)
+    assert kicked == [7, 7]
+
+
+def test_endpoint_pages_with_stable_cursor(client, db_session, make_video):
+    videos = [make_video(f"clip{i}") for i in range(5)]
+    vf.refresh_video_candidates(db_session[0])
+
+    seen, cursor = [], None
+    for _ in range(3):
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/api/v1/videos/feed", params=params)
+        assert r.status_code == 200
+        data = r.json()
+        seen += [v["id"] for v in data["videos"]]
+        cursor = data["next_cursor"]
+    assert cursor is None
+    assert sorted(seen) == sorted(v.id for v in videos)
+    assert len(seen) == len(set(seen))
+
+    # offset still works for the first page
+    r = client.get("/api/v1/videos/feed", params={"limit": 2, "offset": 2})
+    assert [v["id"] for v in r.json()["videos"]] == seen[2:4]
+
+    r = client.get("/api/v1/videos/feed", params={"cursor": "not-a-cursor"})
+    assert r.status_code == 400
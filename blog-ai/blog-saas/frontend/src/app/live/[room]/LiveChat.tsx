@@ -33,7 +33,9 @@ export default function LiveChat({ roomName, token, user, isHost, onBlock, block
       .then(r => r.json())
       .then(d => setChat(d.messages || []));
 
-    const wsUrl = `${API.replace("https://", "wss://").replace("http://", "ws://")}/api/v1/live/${roomName}/ws`;
+    const wsBase = `${API.replace("https://", "wss://").replace("http://", "ws://")}/api/v1/live/${roomName}/ws`;
+    // the token keys the server's chat rate limit on the account
+    const wsUrl = token ? `${wsBase}?token=${encodeURIComponent(token)}` : wsBase;
     const ws = new WebSocket(wsUrl);
     wsRef.current = ws;
     ws.onmessage = (e) => {
@@ -48,7 +50,7 @@ export default function LiveChat({ roomName, token, user, isHost, onBlock, block
       }
     };
     return () => ws.close();
-  }, [roomName]);
+  }, [roomName, token]);
 
   useEffect(() => {
     chatEndRef.current?.scrollIntoView({ behavior: "smooth" });